@@ -1,16 +1,33 @@
+import os
+
 from ruk.jcore.cpu import CPU
-from ruk.jcore.memory import Memory, MemoryMap
+from ruk.jcore.memory import MappedMemory, Memory, MemoryMap, SparseMemory
+from ruk.jcore.scheduler import Scheduler
 
 
 class Classpad:
-    def __init__(self, rom: bytes, debug: bool = False, start_pc=None, ram_size: int = 0x100_0000,
+    # CPU cycles per tick of each peripheral clock (None: not clocked,
+    # the host ticks it with tick_tmu()).  The CMT and the RTC run much
+    # faster than on hardware so the OS boot polling loops finish:
+    #   - the RTC R64CNT ticks every 4 cycles.  The OS polls R64CNT
+    #     waiting for it to change (at 0xA00008CC), and the
+    #     "cmp/gt r4, r0" check (r4=2) there passes within ~12 cycles;
+    #   - the CMT ticks every cycle.  The OS polls CMCSR.CMF waiting for
+    #     a compare match (at 0x800034CC); with CMCOR=0x1200 (4608),
+    #     CMF is set after ~4608 cycles.  The real ratio would be
+    #     ~257 CPU cycles per CMT tick (118 MHz / 459 KHz).
+    # enable_timing() switches to the real ratios from the CPG.
+    CLOCK_PERIODS = {'cmt': 1, 'rtc': 4, 'pphi': None, 'etmu': None}
+
+    def __init__(self, rom, debug: bool = False, start_pc=None, ram_size: int = 0x100_0000,
                  with_tmu: bool = False, with_rtc: bool = False, with_ubc: bool = False,
                  with_dma: bool = False, with_display: bool = False,
                  with_bsc: bool = True, with_cpg: bool = True):
         """
         Create a virtual Classpad II.
 
-        :param rom: rom bytes, raw assembly !
+        :param rom: rom bytes, raw assembly !  A file path maps the
+                    image (MappedMemory) instead of copying it.
         :param debug: Flag to enable exception and stacktrace printing
         :param with_tmu: If True, attach a TMU+ETMU peripheral and an
                          InterruptController to the CPU.
@@ -24,14 +41,18 @@ class Classpad:
         """
         # TODO: get real values !!
         self._ram = Memory(ram_size)
-        self._rom = Memory(len(rom))  # 0x1FF_FFFF)
-        self._cached_rom = Memory(len(rom))  # 0x1FF_FFFF)
+        if isinstance(rom, (str, os.PathLike)):
+            self._rom = MappedMemory(rom)
+        else:
+            self._rom = Memory(len(rom))  # 0x1FF_FFFF)
+            self.load_rom(rom)
+        # The P2 ROM mirror shares the same backing store.
+        self._cached_rom = self._rom
         # Debug turn on stacktrace
         self.debug = debug
 
         self._memory = MemoryMap()
 
-        self.load_rom(rom)
         self.setup_memory()
 
         if start_pc is None:
@@ -47,12 +68,17 @@ class Classpad:
         self._cpu.regs['vbr'] = 0x80020F00  # vector base register (OS exception table)
         self._cpu.regs['sr'] = 0x700000F0   # MD=1, RB=1, BL=1 (privileged, banked, exceptions blocked); IMASK=0xF
 
-        # Register the peripheral auto-tick callback so peripherals
-        # advance even when stepping via the GUI (not just in run()).
-        self._cpu.on_step = self._tick_peripherals
+        # Peripheral time: step() and the JIT both advance the
+        # scheduler, which catches the clocked peripherals up on access
+        # and at their deadlines (see ruk.jcore.scheduler).
+        self._scheduler = Scheduler()
+        self._cpu.scheduler = self._scheduler
+        # name -> (peripheral, tick, next_event) of every peripheral
+        # clock, clocked or not (see _add_clock, enable_timing)
+        self._clock_sources = {}
 
         # Optional peripherals
-        self._cpu_step_count = 0   # for auto-ticking RTC
+        self._cpu_step_count = 0
         self._tmu = None
         self._rtc = None
         self._ubc = None
@@ -61,6 +87,10 @@ class Classpad:
         self._bsc = None
         self._cpg = None
         self._intc = None
+        # Incremental checkpoints (enable_checkpoints)
+        self.checkpoints = None
+        # Reverse execution (enable_timeline)
+        self.timeline = None
 
         if with_tmu:
             self._setup_tmu()
@@ -83,15 +113,15 @@ class Classpad:
         """Attach the TMU+ETMU peripheral and an InterruptController."""
         from ruk.jcore.tmu import TMU
         from ruk.jcore.mmio import attach_tmu
-        from ruk.jcore.intc import InterruptController, attach_intc
 
         self._tmu = TMU()
-        if self._intc is None:
-            self._intc = InterruptController()
-            attach_intc(self._cpu, self._intc)
-            self._intc.enable()
+        self._setup_intc()
         # Wire TMU IRQs -> INTC -> CPU
         self._tmu.on_irq = self._intc.request
+        tmu = self._tmu
+        self._add_clock(tmu, 'cmt', tmu.tick_cmt, tmu.cmt_next_event)
+        self._add_clock(tmu, 'pphi', tmu.tick_pphi, tmu.pphi_next_event)
+        self._add_clock(tmu, 'etmu', tmu.tick_etmu, tmu.etmu_next_event)
         # Map the TMU MMIO regions into the memory map
         attach_tmu(self._memory, self._tmu)
 
@@ -99,18 +129,137 @@ class Classpad:
         """Attach the RTC peripheral."""
         from ruk.jcore.rtc import RTC
         from ruk.jcore.mmio import attach_rtc
-        from ruk.jcore.intc import InterruptController, attach_intc
 
         self._rtc = RTC()
-        if self._intc is None:
-            self._intc = InterruptController()
-            attach_intc(self._cpu, self._intc)
-            self._intc.enable()
+        self._setup_intc()
         # Wire RTC IRQs -> INTC -> CPU
         self._rtc.on_irq = self._intc.request
+        self._add_clock(self._rtc, 'rtc', self._tick_rtc, self._rtc.next_event)
         # Map the RTC MMIO region
         attach_rtc(self._memory, self._rtc)
 
+    def _setup_intc(self):
+        """Attach the InterruptController (once) and map its IPRs."""
+        from ruk.jcore.intc import InterruptController, attach_intc
+        from ruk.jcore.mmio import attach_ipr
+
+        if self._intc is not None:
+            return
+        self._intc = InterruptController()
+        attach_intc(self._cpu, self._intc)
+        self._intc.enable()
+        attach_ipr(self._memory, self._intc)
+
+    def _add_clock(self, peripheral, name: str, tick, next_event):
+        """
+        Clock `peripheral` from the scheduler at CLOCK_PERIODS[name]
+        cycles per tick, catching it up before each register access.
+        Call before the peripheral is mapped.
+        """
+        self._clock_sources[name] = (peripheral, tick, next_event)
+        period = self.CLOCK_PERIODS[name]
+        if period is None:
+            return
+        self._scheduler.add_clock(name, period, tick, next_event)
+        peripheral.on_access = self._scheduler.sync
+        peripheral.on_written = self._scheduler.reschedule
+
+    def enable_timing(self, op_cycles=None):
+        """
+        Count each instruction's issue cycles instead of one cycle per
+        instruction, and clock every peripheral at its real rate from
+        the CPG dividers, following FRQCR writes (see ruk.jcore.timing).
+        The pphi and etmu clocks are driven by the scheduler from then
+        on, so don't also tick them with tick_tmu().
+
+        Real rates make the OS boot polling loops much longer (see
+        CLOCK_PERIODS).
+
+        :param op_cycles: op_id -> cycles overriding timing.OP_CYCLES
+        """
+        from ruk.jcore.timing import cycle_costs
+        cpu = self._cpu
+        cpu.cycle_costs = cycle_costs(cpu.emulator, op_cycles)
+        if hasattr(cpu, '_jit'):
+            cpu._jit.flush()  # compiled code has no block costs yet
+        if self._cpg is not None:
+            self._cpg.on_written = self._update_clocks
+        self._update_clocks()
+
+    def enable_fast_forward(self):
+        """
+        Skip idle time instead of executing it (see cpu.fast_forward):
+
+          - SLEEP jumps to the next peripheral event, which usually
+            raises the interrupt that wakes the CPU;
+          - a polling loop the JIT finds spinning on registers (the
+            OS waits on CMCSR.CMF and R64CNT while booting) jumps to
+            the next time one of the polled registers may change: the
+            peripheral's next event, or its next counter tick.
+
+        Nothing is skipped while an interrupt the CPU accepts is
+        pending.  The skipped loop iterations are not counted as
+        instructions and where a skip starts depends on how the JIT
+        dispatched, which a Timeline cannot re-execute: fast-forward and
+        enable_timeline() exclude each other.
+        """
+        if self.timeline is not None:
+            raise ValueError("can't fast-forward while a Timeline records")
+        self._cpu.fast_forward = self._fast_forward
+
+    def _fast_forward(self, addresses=None) -> bool:
+        """cpu.fast_forward: move the scheduler on, see enable_fast_forward()."""
+        from ruk.jcore.scheduler import NEVER
+        if self._intc is not None and self._intc.has_pending(self._cpu.regs['sr']):
+            return False
+        scheduler = self._scheduler
+        target = scheduler.next_deadline
+        if addresses is not None:
+            scheduler.sync()
+            peripherals = {id(source[0]): source[0] for source in self._clock_sources.values()}
+            for peripheral in peripherals.values():
+                for addr in addresses:
+                    change = peripheral.next_change(addr)
+                    clock = change and scheduler.clocks.get(change[0])
+                    if clock:
+                        target = min(target, (clock.ticks + change[1]) * clock.period)
+        if target >= NEVER or target <= scheduler.now:
+            return False
+        scheduler.advance(target - scheduler.now)
+        return True
+
+    def _update_clocks(self):
+        """Set every peripheral clock to its period at the current CPG rates."""
+        from ruk.jcore.cpg import CPG
+        from ruk.jcore.timing import clock_periods
+        cpg = self._cpg if self._cpg is not None else CPG()
+        scheduler = self._scheduler
+        for name, period in clock_periods(cpg.clock_rates()).items():
+            source = self._clock_sources.get(name)
+            if source is None:
+                continue
+            clock = scheduler.clocks.get(name)
+            if clock is not None:
+                clock.set_period(period)
+                continue
+            peripheral, tick, next_event = source
+            scheduler.add_clock(name, period, tick, next_event)
+            peripheral.on_access = scheduler.sync
+            peripheral.on_written = scheduler.reschedule
+
+    def _tick_rtc(self, ticks: int):
+        """RTC clock: tick it and keep it started.
+
+        The OS waits for R64CNT to move before it sets RCR2.START; the
+        date registers only advance once START is set, so it is forced
+        on after the first tick.
+        """
+        self._rtc.tick_128hz(1)
+        if not (self._rtc.rcr2 & 0x01):
+            self._rtc.rcr2 |= 0x01
+        if ticks > 1:
+            self._rtc.tick_128hz(ticks - 1)
+
     def _setup_ubc(self):
         """Attach the UBC (User Break Controller) for hardware breakpoints."""
         from ruk.jcore.ubc import UBC
@@ -163,19 +312,22 @@ class Classpad:
 
     def load_rom(self, rom: bytes):
         self._rom.write_bin(0, rom)
-        self._cached_rom.write_bin(0, rom)
 
     def setup_memory(self):
+        # RAM, ROM, ILRAM and XRAM are flat Memory regions the JIT can
+        # access directly; the large, mostly untouched areas below are
+        # SparseMemory (4KB pages allocated on first write).
+
         # RAM (P1, uncached) and its P2 alias (cached)
         self._memory.add(0x8C00_0000, self._ram, name="RAM", perms="RWX")
-        self._memory.add(0xAC00_0000, self._ram, name="RAM (P2 cached)", perms="RWX")
+        self._memory.alias(0xAC00_0000, 0x8C00_0000, name="RAM (P2 cached)")
 
         # ROM (P1) and its P2 alias
         self._memory.add(0x8000_0000, self._rom, name="ROM", perms="RX")
-        self._memory.add(0xA000_0000, self._cached_rom, name="Cached ROM", perms="RX")
+        self._memory.alias(0xA000_0000, 0x8000_0000, name="Cached ROM")
 
         # 64KB null page at address 0 (catches null pointer dereferences)
-        self._null_page = Memory(0x10000)
+        self._null_page = SparseMemory(0x10000)
         self._memory.add(0x00000000, self._null_page, name="Null page", perms="RW")
 
         # ILRAM (4KB at 0xE5200000) -- instruction/data RAM
@@ -189,27 +341,27 @@ class Classpad:
         self._memory.add(0xE5000000, self._xram, name="XRAM", perms="RW")
 
         # YRAM (8KB at 0xE5010000, wraps every 8KB) -- DSP Y memory
-        self._yram = Memory(0x80000)   # 512KB
+        self._yram = SparseMemory(0x80000)   # 512KB
         self._memory.add(0xE5010000, self._yram, name="YRAM", perms="RW")
 
         # RS memory (16KB at 0xFD800000) -- storage memory
-        self._rs = Memory(0x4000)
+        self._rs = SparseMemory(0x4000)
         self._memory.add(0xFD800000, self._rs, name="RS memory", perms="RW")
 
         # PRAM0 (160KB at 0xFE200000) -- display RAM or similar
-        self._pram0 = Memory(160 * 1024)
+        self._pram0 = SparseMemory(160 * 1024)
         self._memory.add(0xFE200000, self._pram0, name="PRAM0", perms="RW")
 
         # XRAM0 (224KB at 0xFE240000) -- extended RAM
-        self._xram0 = Memory(224 * 1024)
+        self._xram0 = SparseMemory(224 * 1024)
         self._memory.add(0xFE240000, self._xram0, name="XRAM0", perms="RW")
 
         # Additional VRAM/PRAM area at 0xFE280000 (512KB) -- used by OS for display buffers
-        self._vram = Memory(0x80000)   # 512KB
+        self._vram = SparseMemory(0x80000)   # 512KB
         self._memory.add(0xFE280000, self._vram, name="VRAM", perms="RW")
 
         # FE300000 area (1MB) -- more display/OS buffer area, also contains DSP1 at 0xFE3FFD00
-        self._fe3 = Memory(0x100000)
+        self._fe3 = SparseMemory(0x100000)
         self._memory.add(0xFE300000, self._fe3, name="FE3 area (DSP1)", perms="RW")
 
         # SPU at 0xFE2FFC00 (256 bytes, covers SPU + DSP0 registers)
@@ -247,13 +399,13 @@ class Classpad:
     def setup_catch_all_mmio(self):
         """Add catch-all MMIO regions AFTER all specific peripherals so
         MemoryMap first-match resolution falls through to them."""
-        self._mmio_a4 = Memory(0x1000000)
+        self._mmio_a4 = SparseMemory(0x1000000)
         self._memory.add(0xA4000000, self._mmio_a4, name="MMIO (A4xxxxxx)", perms="RW")
 
-        self._mmio_ff = Memory(0x1000000)
+        self._mmio_ff = SparseMemory(0x1000000)
         self._memory.add(0xFF000000, self._mmio_ff, name="MMIO (FFxxxxxx)", perms="RW")
 
-        self._mmio_catchall = Memory(0x40000)
+        self._mmio_catchall = SparseMemory(0x40000)
         self._memory.add(0xFEC00000, self._mmio_catchall, name="MMIO (catch-all)", perms="RW")
 
     @property
@@ -309,14 +461,79 @@ class Classpad:
         """The InterruptController, or None if not attached."""
         return self._intc
 
+    @property
+    def scheduler(self):
+        """The Scheduler that keeps peripheral time."""
+        return self._scheduler
+
+    def snapshot(self, path=None) -> bytes:
+        """
+        Save the whole machine: CPU, every memory region and the
+        attached peripherals (see ruk.jcore.snapshot).
+
+        :param path: If given, also write the snapshot to this file.
+        :return: the snapshot bytes
+        """
+        from ruk.jcore.snapshot import snapshot
+        data = snapshot(self)
+        if path is not None:
+            with open(path, 'wb') as f:
+                f.write(data)
+        return data
+
+    def restore(self, snapshot):
+        """
+        Load a snapshot() taken on a Classpad built the same way (same
+        ROM, RAM size and peripherals).
+
+        :param snapshot: snapshot bytes, or the path of a snapshot file
+        """
+        from ruk.jcore.snapshot import restore
+        if isinstance(snapshot, (str, os.PathLike)):
+            with open(snapshot, 'rb') as f:
+                snapshot = f.read()
+        restore(self, snapshot)
+
+    def enable_checkpoints(self, budget: int = 64 << 20):
+        """
+        Start tracking memory writes for incremental checkpoints and
+        take the first one (see ruk.jcore.checkpoint).
+
+        :param budget: bytes the checkpoints may keep before the oldest
+                       ones are folded into the base copy
+        :return: the CheckpointRing, also kept as `self.checkpoints`
+        """
+        from ruk.jcore.checkpoint import CheckpointRing
+        self.checkpoints = CheckpointRing(self, budget)
+        return self.checkpoints
+
+    def enable_timeline(self, interval: int = 100_000, run_interval: int = 2_000_000,
+                        budget: int = 64 << 20):
+        """
+        Record an instruction-exact history for step back and reverse
+        continue (see ruk.jcore.replay).  Enables checkpoints if needed
+        and turns fast-forward off (see enable_fast_forward()).
+
+        :param interval: stepped instructions between checkpoints
+        :param run_interval: JIT-run instructions between checkpoints
+        :param budget: checkpoint budget, see enable_checkpoints()
+        :return: the Timeline, also kept as `self.timeline`
+        """
+        from ruk.jcore.replay import Timeline
+        self._cpu.fast_forward = None
+        self.timeline = Timeline(self, interval, run_interval, budget)
+        return self.timeline
+
     def tick_tmu(self, pphi_cycles: int = 0, rtc_cycles: int = 0):
         """
-        Advance the TMU/ETMU by the given number of cycles.  Any pending
-        IRQs are queued to the INTC and will be delivered before the
-        next CPU instruction.
+        Advance the TMU/ETMU by the given number of cycles.  Any IRQs
+        raised are requested from the INTC, which delivers them before
+        the next CPU instruction if SR and their priority allow.
         """
         if self._tmu is not None:
+            self._scheduler.sync()
             self._tmu.tick(pphi_cycles=pphi_cycles, rtc_cycles=rtc_cycles)
+            self._scheduler.reschedule()
 
     def tick_rtc(self, ticks_128hz: int = 1):
         """
@@ -324,41 +541,16 @@ class Classpad:
         Call this 128 times per emulated second for real-time speed.
         """
         if self._rtc is not None:
+            self._scheduler.sync()
             self._rtc.tick_128hz(ticks_128hz)
-
-    def _tick_peripherals(self, step_count: int):
-        """Auto-tick peripherals.  Called after every CPU step.
-
-        Tick rates are calibrated to let the Casio OS boot code make
-        forward progress on its polling loops:
-          - RTC R64CNT ticks at ~1 tick per 4 CPU steps.  The OS polls
-            R64CNT waiting for it to change (at 0xA00008CC); ticking
-            every 4 steps means R64CNT advances fast enough for the
-            "cmp/gt r4, r0" check (r4=2) to pass within ~12 CPU steps.
-          - CMT ticks every step.  The OS polls CMCSR.CMF waiting for
-            a compare match (at 0x800034CC); with CMCOR=0x1200 (4608),
-            ticking every step means CMF is set after ~4608 CPU steps,
-            which is fast enough for boot.  The real ratio would be
-            ~257 CPU cycles per CMT tick (118 MHz / 459 KHz), but
-            that's too slow for emulation.
-        """
-        # Tick RTC every 4 steps (R64CNT advances fast enough for boot)
-        if self._rtc is not None and (step_count & 0x3) == 0:
-            self._rtc.tick_128hz(1)
-            if not (self._rtc.rcr2 & 0x01):
-                self._rtc.rcr2 |= 0x01
-        # Tick CMT every step (so CMF gets set fast enough for the
-        # OS polling loop at 0x800034CC)
-        if self._tmu is not None:
-            self._tmu.tick_cmt(1)
+            self._scheduler.reschedule()
 
     def run(self):
         while not self._cpu.ebreak:
             try:
                 self._cpu.step()
-                # Peripheral ticking is handled by the on_step callback
-                # registered in __init__, so it works in both run() and
-                # GUI stepping modes.
+                # Peripherals advance on the scheduler, which step()
+                # and the JIT both drive.
             except Exception as e:
                 print(f"!!! CPU Error : {e} !!!")
                 self._cpu.stacktrace()
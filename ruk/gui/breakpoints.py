@@ -6,7 +6,9 @@ adding, editing, and deleting them.
 
 Software breakpoints are unlimited and checked by the emulator before
 each CPU step.  Hardware breakpoints use the UBC (User Break
-Controller) and are limited to 2 channels per CPU specs.
+Controller) and are limited to 2 channels per CPU specs.  Watchpoints
+pause after the instruction that reads or writes a watched range (see
+MemoryMap.add_watchpoint).
 """
 
 import tkinter as tk
@@ -41,6 +43,7 @@ class BreakpointsWindow:
 
         ttk.Button(toolbar, text="Add Soft", command=self._add_soft).pack(side=tk.LEFT, padx=2)
         ttk.Button(toolbar, text="Add Hardware", command=self._add_hw).pack(side=tk.LEFT, padx=2)
+        ttk.Button(toolbar, text="Add Watch", command=self._add_watch).pack(side=tk.LEFT, padx=2)
         ttk.Button(toolbar, text="Delete", command=self._delete_selected).pack(side=tk.LEFT, padx=2)
         ttk.Button(toolbar, text="Clear All", command=self._clear_all).pack(side=tk.LEFT, padx=2)
         ttk.Button(toolbar, text="Refresh", command=self._refresh_list).pack(side=tk.LEFT, padx=2)
@@ -64,6 +67,8 @@ class BreakpointsWindow:
         # Bind double-click to edit
         self._tree.bind('<Double-1>', self._edit_selected)
 
+        # Tree item -> Watchpoint, for the watchpoint rows
+        self._watch_items = {}
         self._refresh_list()
 
     def _refresh_list(self):
@@ -82,6 +87,13 @@ class BreakpointsWindow:
                 channel = '-'
             self._tree.insert('', tk.END, values=(f"0x{addr:08X}", btype, str(channel)))
 
+        # Watchpoints: the channel column shows the size and condition
+        self._watch_items = {}
+        for wp in self._control.get_watchpoints():
+            cond = f"+{wp.size}" + ("" if wp.value is None else f" == 0x{wp.value:X}")
+            item = self._tree.insert('', tk.END, values=(f"0x{wp.start:08X}", f"watch {wp.kind}", cond))
+            self._watch_items[item] = wp
+
     def _add_soft(self):
         """Add a software breakpoint."""
         addr = self._prompt_address("Add Software Breakpoint")
@@ -102,11 +114,27 @@ class BreakpointsWindow:
             else:
                 self._refresh_list()
 
+    def _add_watch(self):
+        """Add a data watchpoint."""
+        spec = self._prompt_watch()
+        if spec is None:
+            return
+        try:
+            self._control.add_watchpoint(*spec)
+        except (IndexError, ValueError) as e:
+            messagebox.showerror("Error", f"Cannot watch this range:\n{e}")
+            return
+        self._refresh_list()
+
     def _delete_selected(self):
         """Delete the selected breakpoint."""
         sel = self._tree.selection()
         if not sel:
             return
+        if sel[0] in self._watch_items:
+            self._control.remove_watchpoint(self._watch_items[sel[0]])
+            self._refresh_list()
+            return
         item = self._tree.item(sel[0])
         addr_str = item['values'][0]
         # Parse address (might be a string like "0x80000000" or an int)
@@ -141,6 +169,64 @@ class BreakpointsWindow:
             self._control.clear_all_breakpoints()
             self._refresh_list()
 
+    def _prompt_watch(self):
+        """Show a dialog prompting for a watchpoint.
+
+        Returns (address, size, kind, value) or None if cancelled.
+        """
+        dialog = tk.Toplevel(self._root)
+        dialog.title("Add Watchpoint")
+        dialog.geometry("300x230")
+        dialog.transient(self._root)
+        dialog.grab_set()
+
+        ttk.Label(dialog, text="Address (hex):").pack(pady=2)
+        addr_var = tk.StringVar()
+        entry = ttk.Entry(dialog, textvariable=addr_var, width=30)
+        entry.pack(pady=2)
+        entry.focus_set()
+
+        ttk.Label(dialog, text="Size (bytes):").pack(pady=2)
+        size_var = tk.StringVar(value="4")
+        ttk.Entry(dialog, textvariable=size_var, width=30).pack(pady=2)
+
+        kind_var = tk.StringVar(value="w")
+        kinds = ttk.Frame(dialog)
+        kinds.pack(pady=2)
+        for text, kind in (("Read", "r"), ("Write", "w"), ("Both", "rw")):
+            ttk.Radiobutton(kinds, text=text, variable=kind_var, value=kind).pack(side=tk.LEFT, padx=2)
+
+        ttk.Label(dialog, text="Only if value == (hex, optional):").pack(pady=2)
+        value_var = tk.StringVar()
+        ttk.Entry(dialog, textvariable=value_var, width=30).pack(pady=2)
+
+        result = [None]
+
+        def on_ok():
+            try:
+                addr = int(addr_var.get().strip(), 16)
+                size = int(size_var.get().strip(), 0)
+                value = value_var.get().strip()
+                value = int(value, 16) if value else None
+                result[0] = (addr, size, kind_var.get(), value)
+                dialog.destroy()
+            except ValueError:
+                messagebox.showerror("Error", "Invalid address, size or value")
+
+        def on_cancel():
+            dialog.destroy()
+
+        btn_frame = ttk.Frame(dialog)
+        btn_frame.pack(pady=5)
+        ttk.Button(btn_frame, text="OK", command=on_ok).pack(side=tk.LEFT, padx=5)
+        ttk.Button(btn_frame, text="Cancel", command=on_cancel).pack(side=tk.LEFT, padx=5)
+
+        dialog.bind('<Return>', lambda e: on_ok())
+        dialog.bind('<Escape>', lambda e: on_cancel())
+
+        self._root.wait_window(dialog)
+        return result[0]
+
     def _prompt_address(self, title):
         """Show a dialog prompting for an address.
 
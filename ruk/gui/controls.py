@@ -38,6 +38,10 @@ class ControlsFrame(BaseFrame):
         self._soft_breakpoints: set = set()
         self._hw_breakpoints: dict = {}  # addr -> channel (0 or 1)
 
+        # Reverse execution (ruk.jcore.replay.Timeline).  When set, the
+        # CPU is driven through it so step back can replay the run.
+        self.timeline = None
+
         def noop():
             pass
 
@@ -97,6 +101,26 @@ class ControlsFrame(BaseFrame):
         )
         HookToolTip(self.step_into_btn, "Step into")
 
+        self.step_back_btn = ttk.Button(
+            master=widget,
+            image=self.resources['step_back'],
+            width=28,
+            style="Titlebar.TButton",
+            command=self.do_step_back
+        )
+        # Shift+click asks how many instructions to go back
+        self.step_back_btn.bind('<Shift-Button-1>', self.do_step_back_n)
+        HookToolTip(self.step_back_btn, "Step back (Shift: N instructions)")
+
+        self.reverse_continue_btn = ttk.Button(
+            master=widget,
+            image=self.resources['reverse_continue'],
+            width=28,
+            style="Titlebar.TButton",
+            command=self.do_reverse_continue
+        )
+        HookToolTip(self.reverse_continue_btn, "Reverse continue to breakpoint")
+
         self.except_pause_btn = ttk.Button(
             master=widget,
             image=self.resources['except_pause_on'],
@@ -126,6 +150,10 @@ class ControlsFrame(BaseFrame):
         col += 1
         self.step_into_btn.grid(row=0, column=col, padx=2)
         col += 1
+        self.step_back_btn.grid(row=0, column=col, padx=2)
+        col += 1
+        self.reverse_continue_btn.grid(row=0, column=col, padx=2)
+        col += 1
         self.stop_btn.grid(row=0, column=col, padx=2)
         col += 1
         self.except_pause_btn.grid(row=0, column=col, padx=2)
@@ -158,7 +186,9 @@ class ControlsFrame(BaseFrame):
 
     def do_step(self):
         try:
-            self._cpu.step()
+            self._clear_watch_hit()
+            self._step_cpu()
+            self._report_watch_hit()
             self.on_step_callback()
         except Exception as e:
             print(f"!!! CPU Error : {e} !!!")
@@ -171,6 +201,38 @@ class ControlsFrame(BaseFrame):
     def do_step_into(self):
         self.do_step()
 
+    def _step_cpu(self):
+        if self.timeline is not None:
+            self.timeline.step()
+        else:
+            self._cpu.step()
+
+    def do_step_back(self, count: int = 1):
+        """Go back `count` instructions (replayed from the last checkpoint)."""
+        if self.timeline is None or self._running:
+            return
+        if self.timeline.step_back(count) < count:
+            print(f"Reached the start of the recorded history "
+                  f"({self.timeline.now} instructions in)")
+        self.on_step_callback()
+
+    def do_step_back_n(self, event=None):
+        from tkinter import simpledialog
+        count = simpledialog.askinteger("Step back", "Instructions to go back:",
+                                        initialvalue=100, minvalue=1)
+        if count:
+            self.do_step_back(count)
+        return 'break'
+
+    def do_reverse_continue(self):
+        """Go back to the last time the CPU reached a breakpoint."""
+        if self.timeline is None or self._running:
+            return
+        hit = self.timeline.reverse_continue(self.get_all_breakpoints())
+        if hit is None:
+            print("No breakpoint hit in the recorded history")
+        self.on_step_callback()
+
     def do_run(self):
         """Toggle between run and pause.
 
@@ -207,14 +269,15 @@ class ControlsFrame(BaseFrame):
         # The JIT runs in batches of max_steps_per_batch, then returns
         # control so we can check for pause/breakpoints and refresh the GUI.
         if hasattr(self._cpu, 'run'):
+            runner = self.timeline if self.timeline is not None else self._cpu
             try:
                 # Run a batch of ~50K steps via JIT.  should_continue
                 # returns False if the user clicked Pause.  We check
                 # soft breakpoints after each batch.
-                # Note: peripheral ticking (RTC, CMT) is handled inside
-                # the JIT's run loop via cpu.on_step, so we don't need
-                # to pass a tick_callback here.
-                self._cpu.run_with_check(
+                # Note: peripherals (RTC, CMT) advance on cpu.scheduler,
+                # which the JIT's run loop drives, so we don't need to
+                # pass a tick_callback here.
+                runner.run_with_check(
                     should_continue=lambda: self._running and not self._cpu.ebreak,
                     max_steps_per_batch=50000,
                     tick_callback=None,
@@ -226,8 +289,9 @@ class ControlsFrame(BaseFrame):
                 self._refresh_callback()
                 return
 
-            # Check software breakpoints after the batch
-            if hasattr(self, '_soft_breakpoints') and self._cpu.pc in self._soft_breakpoints:
+            # Check software breakpoints and watchpoints after the batch
+            if self._report_watch_hit() or (
+                    hasattr(self, '_soft_breakpoints') and self._cpu.pc in self._soft_breakpoints):
                 self._running = False
                 self.start_btn.configure(image=self.resources['start'])
                 self._refresh_callback()
@@ -235,7 +299,8 @@ class ControlsFrame(BaseFrame):
         else:
             # Fallback: step() loop (no JIT)
             batch_size = 1000
-            
+            self._clear_watch_hit()
+
             for _ in range(batch_size):
                 if self._cpu.ebreak:
                     break
@@ -249,7 +314,7 @@ class ControlsFrame(BaseFrame):
                     return
 
                 try:
-                    self._cpu.step()
+                    self._step_cpu()
                 except Exception as e:
                     print(f"!!! CPU Error : {e} !!!")
                     self._running = False
@@ -257,6 +322,12 @@ class ControlsFrame(BaseFrame):
                     self._refresh_callback()
                     return
 
+                if self._report_watch_hit():
+                    self._running = False
+                    self.start_btn.configure(image=self.resources['start'])
+                    self._refresh_callback()
+                    return
+
         # Periodically refresh the GUI (every batch)
         self._refresh_callback()
 
@@ -272,6 +343,9 @@ class ControlsFrame(BaseFrame):
         self._running = False
         self.start_btn.configure(image=self.resources['start'])
         self._cpu.reset()
+        if self.timeline is not None:
+            # Replays must not cross the reset
+            self.timeline.sync()
         self.on_stop_callback()
 
     def hook(self, root: tk.Frame):
@@ -344,6 +418,37 @@ class ControlsFrame(BaseFrame):
                 if self._cpu.ubc is not None:
                     self._cpu.ubc.clear_breakpoint(ch)
 
+    def add_watchpoint(self, addr: int, size: int = 4, kind: str = 'w', value: int = None):
+        """Add a data watchpoint ('r', 'w' or 'rw') on [addr, addr + size).
+
+        Raises IndexError if the range isn't mapped.
+        """
+        return self._cpu.mem.add_watchpoint(addr & 0xFFFFFFFF, size, kind, value)
+
+    def remove_watchpoint(self, wp):
+        """Remove a data watchpoint returned by add_watchpoint()."""
+        if wp in self.get_watchpoints():
+            self._cpu.mem.remove_watchpoint(wp)
+
+    def get_watchpoints(self) -> list:
+        """Return the data watchpoints currently set."""
+        return list(getattr(self._cpu.mem, 'watchpoints', ()))
+
+    def _clear_watch_hit(self):
+        if getattr(self._cpu.mem, 'watch_hit', None) is not None:
+            self._cpu.mem.watch_hit = None
+
+    def _report_watch_hit(self) -> bool:
+        """Print the pending watchpoint hit, if any.  Returns True on a hit."""
+        hit = getattr(self._cpu.mem, 'watch_hit', None)
+        if hit is None:
+            return False
+        what = "read" if hit.kind == 'r' else "write"
+        value = "" if hit.value is None else f" = 0x{hit.value:X}"
+        pc = "?" if hit.pc is None else f"0x{hit.pc:08X}"
+        print(f"Watchpoint hit: {what} at 0x{hit.address:08X}{value} (pc {pc})")
+        return True
+
     def get_all_breakpoints(self):
         """Return a dict of all breakpoints: {addr: 'soft' or 'hw'}."""
         result = {}
@@ -362,6 +467,8 @@ class ControlsFrame(BaseFrame):
         if hasattr(self, '_hw_breakpoints'):
             for addr in list(self._hw_breakpoints.keys()):
                 self.remove_hw_breakpoint(addr)
+        if self.get_watchpoints():
+            self._cpu.mem.clear_watchpoints()
 
     def do_show_breakpoints(self):
         """Show the breakpoints window.
@@ -311,15 +311,27 @@ class MemoryViewerWindow(BaseWindow):
             hex_parts = []
             right_parts = []
 
+            # One block read per row; cell by cell only when part of the
+            # row is unmapped.
+            try:
+                raw = self.cpu.mem.read_block(addr, row_bytes)
+            except Exception:
+                raw = None
+
             for col in range(0, row_bytes, sz):
                 cell_addr = (addr + col) & 0xFFFFFFFF
                 try:
-                    val = self._read_value(cell_addr, sz)
+                    if raw is not None:
+                        cell = raw[col:col + sz]
+                        val = int.from_bytes(cell, "big")
+                    else:
+                        cell = None
+                        val = self._read_value(cell_addr, sz)
                     hex_str = fmt_fn(val)
                     hex_parts.append(hex_str)
 
                     # Right column interpretation
-                    right_str = self._format_right(cell_addr, sz, val)
+                    right_str = self._format_right(cell_addr, sz, val, cell)
                     right_parts.append(right_str)
                 except Exception:
                     hex_parts.append('?' * width)
@@ -470,18 +482,14 @@ class MemoryViewerWindow(BaseWindow):
             self.cpu.mem.write32(addr, (val >> 32) & 0xFFFFFFFF)
             self.cpu.mem.write32((addr + 4) & 0xFFFFFFFF, val & 0xFFFFFFFF)
 
-    def _format_right(self, addr: int, size: int, val: int) -> str:
-        """Format a single value for the right column."""
+    def _format_right(self, addr: int, size: int, val: int, raw: bytes = None) -> str:
+        """Format a single value for the right column (`raw`: its bytes, if already read)."""
         rc = self._right_col
         if rc in ENCODING_MAP:
             # For per-byte display in view mode
             try:
-                raw = bytearray()
-                for i in range(size):
-                    b = self.cpu.mem.read8((addr + i) & 0xFFFFFFFF)
-                    if isinstance(b, bytes):
-                        b = b[0] if len(b) > 0 else 0
-                    raw.append(b & 0xFF)
+                if raw is None:
+                    raw = self.cpu.mem.read_block(addr, size)
                 if rc == 'ASCII':
                     return ''.join(chr(b) if 0x20 <= b < 0x7F else '.' for b in raw)
                 else:
@@ -513,12 +521,7 @@ class MemoryViewerWindow(BaseWindow):
         """Format the right column for a full row (edit mode)."""
         rc = self._right_col
         try:
-            raw = bytearray()
-            for i in range(row_bytes):
-                b = self.cpu.mem.read8((addr + i) & 0xFFFFFFFF)
-                if isinstance(b, bytes):
-                    b = b[0] if len(b) > 0 else 0
-                raw.append(b & 0xFF)
+            raw = self.cpu.mem.read_block(addr, row_bytes)
 
             if rc in ENCODING_MAP:
                 if rc == 'ASCII':
@@ -742,22 +745,13 @@ class MemoryViewerWindow(BaseWindow):
             self._search_results = []
             self._search_idx = -1
 
-            for offset in range(size - len(self._search_pattern) + 1):
-                addr = (start + offset) & 0xFFFFFFFF
-                match = True
-                for i, b in enumerate(self._search_pattern):
-                    try:
-                        val = self.cpu.mem.read8((addr + i) & 0xFFFFFFFF)
-                        if isinstance(val, bytes):
-                            val = val[0] if len(val) > 0 else 0
-                        if (val & 0xFF) != b:
-                            match = False
-                            break
-                    except:
-                        match = False
-                        break
-                if match:
-                    self._search_results.append(addr)
+            # Search each mapped run of the range with bytes.find (matches
+            # may overlap, as before).
+            for run_addr, data in self._read_runs(start, size):
+                pos = data.find(self._search_pattern)
+                while pos >= 0:
+                    self._search_results.append(run_addr + pos)
+                    pos = data.find(self._search_pattern, pos + 1)
 
             dlg.destroy()
             if self._search_results:
@@ -774,6 +768,37 @@ class MemoryViewerWindow(BaseWindow):
         entry.bind("<Return>", lambda e: do_search())
         dlg.bind("<Escape>", lambda e: dlg.destroy())
 
+    def _read_runs(self, start: int, size: int, chunk: int = 0x1000):
+        """
+        Read [start, start + size) as a list of (addr, bytes) runs of
+        mapped memory; unmapped bytes end a run.  Reads a chunk at a
+        time with read_block, byte by byte only inside chunks that are
+        partly unmapped.
+        """
+        mem = self.cpu.mem
+        end = min(start + size, 0x100000000)
+        runs = []
+        run_addr, run = start, bytearray()
+        addr = start
+        while addr < end:
+            n = min(chunk - addr % chunk, end - addr)
+            try:
+                run += mem.read_block(addr, n)
+            except Exception:
+                for a in range(addr, addr + n):
+                    try:
+                        b = mem.read8(a)
+                    except Exception:
+                        if run:
+                            runs.append((run_addr, bytes(run)))
+                        run_addr, run = a + 1, bytearray()
+                        continue
+                    run.append(b & 0xFF)
+            addr += n
+        if run:
+            runs.append((run_addr, bytes(run)))
+        return runs
+
     def _search_next(self):
         if not self._search_results:
             messagebox.showinfo("Search", "No search results. Use Search first.")
@@ -14,6 +14,8 @@ resource_map = {
     'except_pause_on': "res/toolbar/except_pause_on.png",
     'except_pause_off': "res/toolbar/except_pause_off.png",
     'breakpoints': "res/toolbar/breakpoint.png",  # reuse for breakpoints
+    'step_back': "res/toolbar/step_over.png",  # reuse step icons for reverse execution
+    'reverse_continue': "res/toolbar/continue_until_breakpoint.png",
 }
 
 
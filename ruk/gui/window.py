@@ -123,6 +123,8 @@ class DebuggerWindow(BaseWindow):
         control_frame = tk.Frame(master=self.root, width=50, bd=0)
 
         self.control_ctrl: ControlsFrame = ControlsFrame(self._cp.cpu, self.resources)
+        # Step back / reverse continue need a recorded history
+        self.control_ctrl.timeline = self._cp.timeline or self._cp.enable_timeline()
         self.control_ctrl.hook(control_frame)
         self.control_ctrl.set_refresh_callback(self.refresh_all)
 
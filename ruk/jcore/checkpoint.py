@@ -0,0 +1,239 @@
+"""
+Incremental checkpoints of a running Classpad.
+
+A full snapshot (ruk.jcore.snapshot) scans every region; a checkpoint
+only copies the memory written since the previous one, so taking one
+every few million instructions costs milliseconds:
+
+    ring = cp.enable_checkpoints(budget=64 << 20)
+    cp.cpu.run(5_000_000); ring.take()
+    ...
+    ring.restore(ring[-2])      # back to the checkpoint before last
+
+Dirty pages are found with the write tracking the JIT already uses for
+self-modifying code (Memory.mark_code).  After each checkpoint every
+CODE_PAGE_SIZE page of every region is flagged; the first write to a
+flagged page, from Memory.write8/16/32, write_bin, write_block or a JIT
+inline store, clears the flag and calls the ring back with the page.
+Later writes to that page cost nothing extra, and untouched pages are
+never looked at.
+
+The ring keeps a base copy of every page that differs from its initial
+contents (zero, or the ROM file) as of the oldest checkpoint. Each later
+checkpoint keeps only the pages dirtied since the one before, compressed
+one by one, plus the CPU and peripheral state.  When the ring outgrows
+`budget` bytes, the oldest checkpoint is folded into the base.
+Restoring rewrites only the pages changed since the target checkpoint;
+the checkpoints after it are dropped.
+"""
+
+import pickle
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+from ruk.jcore.memory import CODE_PAGE_SHIFT, CODE_PAGE_SIZE, SPARSE_PAGE_MASK, \
+    SPARSE_PAGE_SHIFT, SPARSE_PAGE_SIZE, MappedMemory, SparseMemory
+from ruk.jcore.snapshot import capture_devices, check_devices, file_image, \
+    memory_regions, restore_devices
+
+_ZERO_PAGE = bytes(CODE_PAGE_SIZE)
+
+# (region start, page number) -> compressed page contents
+Pages = Dict[Tuple[int, int], bytes]
+
+
+class Checkpoint:
+    """One entry of a CheckpointRing."""
+
+    def __init__(self, index: int, pages: Pages, devices: dict, blobs: Dict[str, bytes]):
+        self.index = index          # sequence number, counts from 0
+        self.pages = pages          # pages dirtied since the previous checkpoint
+        self.devices = devices      # capture_devices() without the peripherals
+        self.blobs = blobs          # peripheral -> pickled state, shared while unchanged
+        self.pc = devices['cpu']['pc']
+        self.size = sum(len(p) for p in pages.values())
+
+    def __repr__(self):
+        return (f"<Checkpoint #{self.index} pc=0x{self.pc:08X} "
+                f"pages={len(self.pages)} size={self.size}>")
+
+
+def _read_page(mem, offset: int) -> bytes:
+    if type(mem) is SparseMemory:
+        return bytes(mem.get_range(offset, offset + CODE_PAGE_SIZE))
+    return bytes(mem._mem[offset:offset + CODE_PAGE_SIZE])
+
+
+def _write_page(mem, offset: int, data: bytes):
+    """Store `data` at `offset` without going through the write tracking."""
+    if type(mem) is SparseMemory:
+        index = offset >> SPARSE_PAGE_SHIFT
+        page = mem._pages.get(index)
+        if page is None:
+            if not any(data):
+                return
+            page = mem._pages[index] = bytearray(SPARSE_PAGE_SIZE)
+        start = offset & SPARSE_PAGE_MASK
+        page[start:start + len(data)] = data
+        return
+    if mem._mem[offset:offset + len(data)] != data:
+        mem._mem[offset:offset + len(data)] = data
+
+
+class CheckpointRing:
+    """
+    Checkpoints of `cp`, newest last (see the module docstring).
+
+    `budget` bounds the bytes kept by the checkpoints themselves
+    (compressed pages and peripheral state); the base copy comes on top.
+    At least one checkpoint is always kept.
+    """
+
+    def __init__(self, cp, budget: int = 64 << 20):
+        self.cp = cp
+        self.budget = budget
+        self.checkpoints: List[Checkpoint] = []
+        self.size = 0
+        self._next_index = 0
+        # region start -> Memory, and id(Memory) -> region start
+        self._regions = dict(memory_regions(cp.mem))
+        self._starts = {id(mem): start for start, mem in self._regions.items()}
+        # Pages written since the last checkpoint
+        self._dirty: set = set()
+        self._base: Pages = {}
+        # peripheral -> (state, blob) of the newest checkpoint
+        self._peripherals: Dict[str, tuple] = {}
+        for start, mem in self._regions.items():
+            self._capture_base(start, mem)
+            mem.mark_code(0, len(mem), self._on_write)
+        self.take()
+
+    def _on_write(self, mem, page: int):
+        start = self._starts.get(id(mem))
+        if start is not None:
+            self._dirty.add((start, page))
+
+    def _capture_base(self, start: int, mem):
+        """Add the pages of `mem` that differ from its initial contents."""
+        size = len(mem)
+        if type(mem) is SparseMemory:
+            offsets = sorted({(index << SPARSE_PAGE_SHIFT) + o
+                              for index in mem._pages
+                              for o in range(0, SPARSE_PAGE_SIZE, CODE_PAGE_SIZE)})
+            image = None
+        else:
+            offsets = range(0, size, CODE_PAGE_SIZE)
+            image = file_image(mem) if type(mem) is MappedMemory else None
+        try:
+            for offset in offsets:
+                data = _read_page(mem, offset)
+                if data != self._initial(image, offset, len(data)):
+                    self._base[start, offset >> CODE_PAGE_SHIFT] = zlib.compress(data, 1)
+        finally:
+            if image is not None:
+                image.close()
+
+    @staticmethod
+    def _initial(image, offset: int, size: int) -> bytes:
+        if image is None:
+            return _ZERO_PAGE[:size]
+        return image[offset:offset + size]
+
+    def __len__(self):
+        return len(self.checkpoints)
+
+    def __getitem__(self, item) -> Checkpoint:
+        return self.checkpoints[item]
+
+    def __iter__(self):
+        return iter(self.checkpoints)
+
+    def take(self) -> Checkpoint:
+        """Record the current state; returns the new checkpoint."""
+        pages = {}
+        for start, page in self._dirty:
+            mem = self._regions[start]
+            pages[start, page] = zlib.compress(_read_page(mem, page << CODE_PAGE_SHIFT), 1)
+            # Re-arm: the next write to this page reports it again
+            mem.mark_code(page << CODE_PAGE_SHIFT, (page + 1) << CODE_PAGE_SHIFT, self._on_write)
+        self._dirty.clear()
+
+        devices = capture_devices(self.cp)
+        blobs = {}
+        new = 0
+        for name, state in devices.pop('peripherals').items():
+            last = self._peripherals.get(name)
+            if last is None or last[0] != state:
+                last = self._peripherals[name] = (state, zlib.compress(
+                    pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL), 1))
+                new += len(last[1])
+            blobs[name] = last[1]
+        checkpoint = Checkpoint(self._next_index, pages, devices, blobs)
+        checkpoint.size += new
+        self._next_index += 1
+        self.checkpoints.append(checkpoint)
+        self.size += checkpoint.size
+        self._trim()
+        return checkpoint
+
+    def _trim(self):
+        """Fold the oldest checkpoints into the base until within budget."""
+        while self.size > self.budget and len(self.checkpoints) > 1:
+            self.size -= self.checkpoints[0].size
+            del self.checkpoints[0]
+            oldest = self.checkpoints[0]
+            self._base.update(oldest.pages)
+            self.size -= oldest.size
+            oldest.pages = {}
+            oldest.size = sum(len(blob) for blob in oldest.blobs.values())
+            self.size += oldest.size
+
+    def _page_at(self, position: int, key: Tuple[int, int]) -> Optional[bytes]:
+        """Contents of page `key` as of checkpoints[position] (None: initial)."""
+        for checkpoint in reversed(self.checkpoints[1:position + 1]):
+            data = checkpoint.pages.get(key)
+            if data is not None:
+                return zlib.decompress(data)
+        data = self._base.get(key)
+        return None if data is None else zlib.decompress(data)
+
+    def restore(self, checkpoint: Checkpoint = None):
+        """
+        Go back to `checkpoint` (default: the newest one).  Checkpoints
+        taken after it are dropped; it stays in the ring.
+        """
+        if checkpoint is None:
+            checkpoint = self.checkpoints[-1]
+        position = self.checkpoints.index(checkpoint)
+        devices = dict(checkpoint.devices)
+        devices['peripherals'] = {name: pickle.loads(zlib.decompress(blob))
+                                  for name, blob in checkpoint.blobs.items()}
+        check_devices(self.cp, devices)
+
+        # Every page written since the checkpoint, and what it held then
+        changed = set(self._dirty)
+        for later in self.checkpoints[position + 1:]:
+            changed.update(later.pages)
+        images = {}
+        try:
+            for start, page in changed:
+                mem = self._regions[start]
+                data = self._page_at(position, (start, page))
+                if data is None:
+                    if type(mem) is MappedMemory and start not in images:
+                        images[start] = file_image(mem)
+                    size = min(CODE_PAGE_SIZE, len(mem) - (page << CODE_PAGE_SHIFT))
+                    data = self._initial(images.get(start), page << CODE_PAGE_SHIFT, size)
+                _write_page(mem, page << CODE_PAGE_SHIFT, data)
+                mem.mark_code(page << CODE_PAGE_SHIFT, (page + 1) << CODE_PAGE_SHIFT, self._on_write)
+        finally:
+            for image in images.values():
+                image.close()
+        self._dirty.clear()
+
+        for later in self.checkpoints[position + 1:]:
+            self.size -= later.size
+        del self.checkpoints[position + 1:]
+        restore_devices(self.cp, devices)
+        self._peripherals = {name: (state, checkpoint.blobs[name])
+                             for name, state in devices['peripherals'].items()}
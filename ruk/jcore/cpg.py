@@ -66,6 +66,15 @@ CPG_MSTPCR0_OFF = 0x030  # Note: overlaps with FLLFRQ? No -- MSTPCR0 is at 0xA41
 # Actually on the SH7305, FLLFRQ might be at a different address.
 # Let's just use a simple register file and let the OS write whatever it wants.
 
+# Clock rates (clock_rates).  gint (mpu/cpg.h) puts the SH7305 FLLFRQ at
+# +0x50, past the MSTPCRs; the multipliers only matter there.
+CPG_FLLFRQ_SH7305_OFF = 0x050
+RCLK_HZ = 32768           # RTC crystal, feeds the FLL
+# fx-CG50 boot values, used while the OS has not programmed the CPG:
+# PLL x16, FLL x900, Iphi /4, Bphi /8, Pphi /16 (~118, ~59, ~29.5 MHz)
+DEFAULT_FRQCR = 0x0F102203
+DEFAULT_FLF = 900
+
 
 class CPG:
     """
@@ -73,8 +82,13 @@ class CPG:
 
     Simple register file.  The OS writes FRQCR and MSTPCR during boot.
     We store all values and let peripherals query them if needed.
+
+    `on_written()`, when set, is called after every register write
+    (the Classpad re-derives the peripheral clocks, see clock_rates).
     """
 
+    on_written = None
+
     def __init__(self):
         self._regs = bytearray(CPG_SIZE)
         # Default MSTPCR0: all peripherals stopped except TMU
@@ -101,16 +115,22 @@ class CPG:
         offset = (addr - CPG_BASE) & 0xFF
         if offset < len(self._regs):
             self._regs[offset] = val & 0xFF
+        if self.on_written is not None:
+            self.on_written()
 
     def write16(self, addr, val):
         offset = (addr - CPG_BASE) & 0xFF
         if offset + 2 <= len(self._regs):
             self._regs[offset:offset+2] = (val & 0xFFFF).to_bytes(2, 'big')
+        if self.on_written is not None:
+            self.on_written()
 
     def write32(self, addr, val):
         offset = (addr - CPG_BASE) & 0xFF
         if offset + 4 <= len(self._regs):
             self._regs[offset:offset+4] = (val & 0xFFFFFFFF).to_bytes(4, 'big')
+        if self.on_written is not None:
+            self.on_written()
 
     @property
     def mstpcr0(self):
@@ -119,3 +139,24 @@ class CPG:
     @property
     def mstpcr2(self):
         return self.read32(CPG_BASE + 0x38)
+
+    def clock_rates(self) -> dict:
+        """
+        Iphi (CPU), Bphi (bus) and Pphi (peripheral) in Hz, from FRQCR
+        and FLLFRQ as gint computes them:
+
+            pll = FRQCR.STC + 1,  fll = FLLFRQ.FLF (halved by SELXM)
+            X = RCLK * fll * pll,  Xphi = X >> (FRQCR.XFC + 1)
+
+        PLLCR is not modelled (PLL and FLL always on); a zero FRQCR or
+        FLF reads as the boot values (DEFAULT_FRQCR, DEFAULT_FLF).
+        """
+        frqcr = self.read32(CPG_BASE + CPG_FRQCR_OFF) or DEFAULT_FRQCR
+        fllfrq = self.read32(CPG_BASE + CPG_FLLFRQ_SH7305_OFF)
+        fll = (fllfrq & 0x7FF) or DEFAULT_FLF
+        if fllfrq & (1 << 14):  # SELXM
+            fll >>= 1
+        base = RCLK_HZ * fll * (((frqcr >> 24) & 0x3F) + 1)
+        return {'iphi': base >> (((frqcr >> 20) & 0xF) + 1),
+                'bphi': base >> (((frqcr >> 8) & 0xF) + 1),
+                'pphi': base >> ((frqcr & 0xF) + 1)}
@@ -373,23 +373,51 @@ class CPU:
         # Signature: on_ubc_break(channel: int, match_addr: int) -> bool
         self.on_ubc_break = None
 
-        # Step counter and peripheral tick callback.
-        # The host (Classpad) registers a callback here that ticks
-        # peripherals (RTC, CMT, etc.) every N steps.  This ensures
-        # peripherals advance even when stepping via the GUI.
+        # Step counter and per-step callback.
         self._step_count = 0
         self.on_step = None  # callback(step_count: int) -> None
 
+        # Peripheral time (ruk.jcore.scheduler.Scheduler).  step() and
+        # the JIT advance it by the instructions they execute; the host
+        # (Classpad) sets it.
+        self.scheduler = None
+        # Cycles per opcode (ruk.jcore.timing.cycle_costs), or None to
+        # count one cycle per instruction.  Set it through
+        # Classpad.enable_timing(), which also drops compiled code.
+        self.cycle_costs = None
+        # Idle fast-forward (Classpad.enable_fast_forward):
+        # fast_forward(addresses) moves the scheduler to the next time
+        # a polled register may change (addresses=None: SLEEP, the next
+        # event) and returns whether it did.  Called after SLEEP by step()
+        # and the JIT, and by the JIT on polling loops.
+        self.fast_forward = None
+        # Interrupt controller (ruk.jcore.intc.attach_intc), and the flag
+        # telling the CPU to ask it for an interrupt: set when the
+        # pending set, the priorities or SR.IMASK/BL may have changed.
+        self.intc = None
+        self.irq_check = False
+
         # DSP repeat-loop active flag.  Set to True by LDRS/LDRE/LDRC
         # handlers when RC > 0; cleared by the step() loop when RC
         # reaches 0.  This gates the per-step RE/RS check so the common
         # case (no DSP loop active) pays zero cost.
         self._dsp_active = False
 
+        # Data watchpoints live in the MemoryMap (add_watchpoint); it
+        # reads our PC to tell instruction fetches from data reads and
+        # to report where a hit came from.
+        if hasattr(mem, 'watch_cpu'):
+            mem.watch_cpu = self
+
     @property
     def reg_pc(self):
         return self._pc_wrap
 
+    @property
+    def watch_hit(self):
+        """The pending data watchpoint hit (MemoryMap.watch_hit), or None."""
+        return getattr(self.mem, 'watch_hit', None)
+
     @property
     def r_bank(self):
         """Convenience list accessor for R0_BANK..R7_BANK."""
@@ -504,6 +532,9 @@ class CPU:
              attribute lookups on self -- CPython attribute access is
              a dict lookup on each `self.X` and costs ~30ns each.
         """
+        if self.irq_check and self.check_interrupts():
+            return
+
         ubc = self.ubc
         # ---- Pre-execution UBC check (PCB=0 break before fetch) ----
         if ubc is not None:
@@ -520,6 +551,7 @@ class CPU:
         dispatch = emu._dispatch
         dsp_cache = emu._dsp_cache
 
+        op_val = 0x0009  # costs a NOP if the fetch fails
         try:
             op_val = mem.read16(pre_pc)
 
@@ -543,6 +575,10 @@ class CPU:
                 elif cached is not None:
                     cached(self, op_val)  # DSP wrapper
 
+            # ---- SLEEP: skip to the next event before charging it ----
+            if self.is_sleeping and op_val == 0x001B and self.fast_forward is not None:
+                self.fast_forward(None)
+
             # ---- Post-execution UBC check (PCB=1 break after exec) ----
             if ubc is not None:
                 self._check_ubc_after(pre_pc)
@@ -581,9 +617,26 @@ class CPU:
         # arbitrary-precision ints); the SH-4 is a 32-bit machine.
         self.pc &= 0xFFFFFFFF
         self._step_count += 1
+        sched = self.scheduler
+        if sched is not None:
+            costs = self.cycle_costs
+            sched.now += 1 if costs is None else costs[op_val]
+            if sched.now >= sched.next_deadline:
+                sched.run_due()
         if self.on_step is not None:
             self.on_step(self._step_count)
 
+    def check_interrupts(self) -> bool:
+        """
+        Take the interrupt the INTC has for the current SR, if any, and
+        clear irq_check.  step() calls it before an instruction and the
+        JIT before a block when irq_check is set.  Returns whether an
+        interrupt was taken (it counts as a step).
+        """
+        self.irq_check = False
+        intc = self.intc
+        return intc is not None and intc.take(self)
+
     def _handle_unknown_op(self, op_val: int, pre_pc: int):
         """
         Called when the dispatch table has no entry for `op_val`.
@@ -645,7 +698,10 @@ class CPU:
         Use step() for debugging (single-instruction, UBC checks).
         Use run() for batch execution (LCD rendering, OS boot, etc.).
 
-        Returns the number of steps executed.
+        Returns the exact number of steps executed, counted like step()
+        (a delayed branch and its slot are one step).  Compiled loops
+        check the budget every iteration, so a run stops within one
+        block of max_steps.
         """
         from ruk.jcore.jit import JITCompiler
         if not hasattr(self, '_jit'):
@@ -666,6 +722,8 @@ class CPU:
         Yields (steps_run, paused_by_user) tuples so the caller can
         periodically refresh the GUI.
 
+        Stops early when a data watchpoint hits (see `watch_hit`).
+
         The JIT caches persist across calls, so resuming after a pause
         is fast.
         """
@@ -694,6 +752,8 @@ class CPU:
             # Tick peripherals
             if tick_callback is not None:
                 tick_callback(total_steps)
+            if self.watch_hit is not None:
+                break
             # If the JIT ran fewer steps than requested, it hit a
             # spin loop or end-of-program -- stop.
             if batch_steps < max_steps_per_batch // 2:
@@ -708,12 +768,36 @@ class CPU:
             return self._jit.stats()
         return {'jit_compiled': 0, 'jit_cache_size': 0, 'block_cache_size': 0}
 
+    # Plain attributes saved by snapshot_state(), besides the registers.
+    _STATE_ATTRS = (
+        'pc', 'ebreak', 'delay_slot_flag', 'spc', 'ssr', 'sgr', 'dbr',
+        'expevt', 'tra', 'intevt', 'tea', 'is_sleeping', '_ubc_break_pending',
+        '_step_count', '_dsp_active',
+    )
+
+    def snapshot_state(self) -> dict:
+        """Registers and execution state, as plain data (see ruk.jcore.snapshot)."""
+        state = {name: getattr(self, name) for name in self._STATE_ATTRS}
+        state['r'] = list(self.regs._r)
+        state['sys'] = dict(self.regs._sys)
+        return state
+
+    def restore_state(self, state: dict):
+        """Load what snapshot_state() returned and drop compiled code."""
+        for name in self._STATE_ATTRS:
+            setattr(self, name, state[name])
+        self.regs._r[:] = state['r']
+        self.regs._sys.update(state['sys'])
+        self.regs._regs_dirty = True
+        self.irq_check = True
+        if hasattr(self, '_jit'):
+            self._jit.flush()
+
     def reset(self):
         self.pc = self._start_pc
         self.regs.reset()
         self.ebreak = False
+        self.irq_check = True
         # Clear JIT caches on reset (code may have changed)
         if hasattr(self, '_jit'):
-            self._jit.jit_cache.clear()
-            self._jit.block_runner.block_cache.clear()
-            self._jit.hotness.clear()
+            self._jit.flush()
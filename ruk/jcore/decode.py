@@ -0,0 +1,211 @@
+"""
+Shared, handler-agnostic SH-4 decode table.
+
+Every Emulator needs a 65536-entry table mapping a 16-bit opcode value to
+the handler that executes it and the operand fields it takes.  Building
+that table the naive way (for every op_val, linearly scan opcodes_table
+until ``op_val & mask == code``) costs ~11M mask tests and dominated
+Emulator construction (~0.5s per CPU, paid again for every test, every
+GUI reset and every multi-CPU setup).
+
+This module splits the work in two:
+
+  1. decode_table() -- op_val -> (op_id, args) or None.  It only depends
+     on generated_opcodes.py and on the operand *order* each op_id wants,
+     so it is built once per process and shared by every Emulator.  It
+     is built by enumerating, for each opcodes_table entry in priority
+     order, only the op_vals its mask/code pair can match (first match
+     wins, exactly like Disassembler.disasm), which is ~10x less work
+     than the scan.
+
+  2. Emulator._build_dispatch_table() -- binds its own handlers onto the
+     shared table with a single list comprehension.
+
+The decoded table can optionally be persisted on disk (pickle), keyed by
+a hash of generated_opcodes.py plus the requested operand order, so a
+fresh process skips step 1 entirely.  The disk cache is off unless
+RUK_CACHE_DIR names its directory, and a cached table is only loaded
+when neither the directory nor the file can be written by other users.
+"""
+
+import hashlib
+import os
+import pickle
+import sys
+from typing import Dict, List, Optional, Tuple
+
+from ruk.jcore import generated_opcodes
+from ruk.jcore.generated_opcodes import opcodes_table
+
+# op_val -> (op_id, args_tuple), or None for unknown/DSP/unbound opcodes
+DecodeEntry = Optional[Tuple[int, tuple]]
+
+# Bump when the on-disk layout changes.
+_CACHE_VERSION = 1
+
+# In-process caches: param-order key -> decode table, and the raw
+# op_val -> opcodes_table index map both are derived from.
+_tables: Dict[tuple, List[DecodeEntry]] = {}
+_first_match: Optional[List[int]] = None
+
+
+def arg_shift(arg_mask: int) -> int:
+    """
+    Right shift that turns ``op & arg_mask`` into the operand value.
+
+    Mirrors the mask rules of Disassembler.disasm: nibble 2 fields
+    (0bXXXX_0000_0000) are shifted by 8, nibble 1 fields (0bXXXX_0000) by
+    4, everything else (immediates, displacements, 0b0XXX_0000 bank
+    fields) is used as-is.
+    """
+    if arg_mask & 0b1111_1111 == 0:
+        return 8
+    if arg_mask & 0b1111_0000_1111 == 0:
+        return 4
+    return 0
+
+
+def _cache_dir() -> Optional[str]:
+    return os.environ.get('RUK_CACHE_DIR') or None
+
+
+def _private(path: str) -> bool:
+    """Whether only we can write `path` (always true where there are no owners)."""
+    if not hasattr(os, 'getuid'):
+        return True
+    st = os.stat(path)
+    return st.st_uid == os.getuid() and not st.st_mode & 0o022
+
+
+def _cache_key(param_orders: Dict[int, tuple]) -> str:
+    h = hashlib.sha1()
+    h.update(b'ruk-decode-%d\0' % _CACHE_VERSION)
+    with open(generated_opcodes.__file__, 'rb') as f:
+        h.update(f.read())
+    h.update(repr(sorted(param_orders.items())).encode())
+    return h.hexdigest()[:20]
+
+
+def _load(path: str) -> Optional[List[DecodeEntry]]:
+    try:
+        if not (_private(os.path.dirname(path)) and _private(path)):
+            return None
+        with open(path, 'rb') as f:
+            table = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ValueError):
+        return None
+    if not isinstance(table, list) or len(table) != 65536:
+        return None
+    return table
+
+
+def _store(path: str, table: List[DecodeEntry]):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        with open(tmp, 'wb') as f:
+            pickle.dump(table, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    except OSError:
+        # Read-only home, full disk, ... -- the cache is best-effort.
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+
+
+def first_match_table() -> List[int]:
+    """
+    op_val -> index into opcodes_table of the first matching entry, or -1.
+
+    This is the priority-preserving core shared by the decode table and
+    Disassembler.disasm.  For each entry, in table order, enumerate only
+    the op_vals its mask/code pair can match (all subsets of the
+    don't-care bits OR'ed onto `code`) and claim those not already taken.
+    Built once per process.
+    """
+    global _first_match
+    if _first_match is not None:
+        return _first_match
+
+    index = [-1] * 65536
+    for idx, (op_id, fmt, mask, code, args_struct) in enumerate(opcodes_table):
+        if code & ~mask & 0xFFFF:
+            continue  # can never match
+        free = ~mask & 0xFFFF
+        sub = free
+        while True:
+            op_val = code | sub
+            if index[op_val] < 0:
+                index[op_val] = idx
+            if sub == 0:
+                break
+            sub = (sub - 1) & free
+
+    _first_match = index
+    return index
+
+
+def build_decode_table(param_orders: Dict[int, tuple]) -> List[DecodeEntry]:
+    """
+    Build the decode table from scratch.
+
+    `param_orders` maps op_id -> tuple of operand names, in the order the
+    handler takes them.  Opcodes whose op_id is absent decode to None
+    (the CPU then probes the DSP path, as before).  A handler that needs
+    an operand its opcodes_table entry doesn't provide is reported once
+    and left undecoded.
+    """
+    # Per opcodes_table entry: (op_id, ((arg_mask, shift), ...)) or None
+    bound = []
+    for op_id, fmt, mask, code, args_struct in opcodes_table:
+        order = param_orders.get(op_id)
+        fields = None
+        if order is not None:
+            try:
+                fields = (op_id, tuple((args_struct[name], arg_shift(args_struct[name]))
+                                       for name in order))
+            except KeyError:
+                print(f"[WARN] dispatch table: op_id={op_id} fmt={fmt!r} "
+                      f"args_struct={list(args_struct.keys())} "
+                      f"required_handler_params={list(order)} -- skipping",
+                      file=sys.stderr)
+        bound.append(fields)
+
+    table: List[DecodeEntry] = [None] * 65536
+    for op_val, idx in enumerate(first_match_table()):
+        if idx < 0:
+            continue
+        fields = bound[idx]
+        if fields is not None:
+            op_id, spec = fields
+            table[op_val] = (op_id, tuple((op_val & m) >> s for m, s in spec))
+    return table
+
+
+def decode_table(param_orders: Dict[int, tuple]) -> List[DecodeEntry]:
+    """
+    Return the shared decode table for `param_orders`.
+
+    Built at most once per process (per distinct operand order); loaded
+    from / saved to the disk cache when one is configured.  Callers must
+    treat the returned list as read-only.
+    """
+    key = tuple(sorted(param_orders.items()))
+    table = _tables.get(key)
+    if table is not None:
+        return table
+
+    cache_dir = _cache_dir()
+    path = None
+    if cache_dir is not None:
+        path = os.path.join(cache_dir, f"decode-{_cache_key(param_orders)}.pickle")
+        table = _load(path)
+
+    if table is None:
+        table = build_decode_table(param_orders)
+        if path is not None:
+            _store(path, table)
+
+    _tables[key] = table
+    return table
@@ -1,79 +1,101 @@
 from typing import Tuple, List, Union, Any, Dict
 
+from ruk.jcore.decode import arg_shift, first_match_table
 from ruk.jcore.generated_opcodes import opcodes_table, abstract_table
 
 
 class Disassembler:
+    """
+    SH-4 disassembler.
+
+    Decoding is O(1): a process-wide op_val -> opcodes_table index map
+    (ruk.jcore.decode.first_match_table, built lazily on first use)
+    replaces the old linear scan over opcodes_table, and each entry's
+    operand fields are pre-split into (name, mask, shift) triples.  The
+    first-match priority of the table is preserved.
+    """
+
+    # Shared by every instance, built on the first disasm() call.
+    _index = None
+    _fields = None
+
     def __init__(self, debug=False):
         self.debug = debug
 
+    @classmethod
+    def _build_tables(cls):
+        cls._fields = [
+            tuple((name, mask, arg_shift(mask)) for name, mask in args_struct.items())
+            for _, _, _, _, args_struct in opcodes_table
+        ]
+        cls._index = first_match_table()
+
+    def _lookup(self, op: int):
+        if self._index is None:
+            self._build_tables()
+        op &= 0xFFFF
+        idx = self._index[op]
+        if idx < 0:
+            return None, None
+        return opcodes_table[idx], {name: (op & mask) >> shift
+                                    for name, mask, shift in self._fields[idx]}
+
     def disasm(self, op, trace_only=False) -> Tuple[Union[int, str], Dict[str, int]]:
         """
         :param trace_only: Will only return the operation string. No action will be taken.
         """
-        for opcode_struct in opcodes_table:
-            op_id, fmt, mask, code, args_struct = opcode_struct
-
-            args: Dict[str, int] = {}
-
-            if op & mask == code:
-                # Switching arg masks. Order's very important !
-                for arg_name in args_struct:
-                    arg_mask = args_struct[arg_name]
-
-                    # arg mask is 0b1111_0000_0000
-                    if arg_mask & 0b1111_1111 == 0:
-                        args[arg_name] = ((op & arg_mask) >> 8)
-                        continue
-
-                    # arg mask is 0b1111_0000
-                    if arg_mask & 0b1111_0000_1111 == 0:
-                        args[arg_name] = ((op & arg_mask) >> 4)
-                        continue
-
-                    # arg_mask is 0b1111_1111 (i)
-                    if arg_mask & 0b1111_0000_0000 == 0:
-                        args[arg_name] = (op & arg_mask)
-                        continue
-
-                    # arg_mask is 0b1111_1111_1111 (i)
-                    if arg_mask & 0b1111_0000_0000_0000 == 0:
-                        args[arg_name] = (op & arg_mask)
-                        continue
-
-                    # arg_mask is 0b1111 (i)
-                    if arg_mask & 0b1111_1111_0000 == 0:
-                        args[arg_name] = (op & arg_mask)
-                        continue
-
-                    # Weirds ones
-                    # arg_mask is 0b0111_0000
-                    if arg_mask & 0b1111_1000_1111 == 0:
-                        args[arg_name] = (op & arg_mask)
-                        continue
-                    #
-                    # # arg_mask is 0b0111_0000
-                    # if arg_mask & 0b0001_1111_1111 == 0:
-                    #     args[arg_name] = ((op & arg_mask))
-                    #     continue
-                    #
-                    # # arg_mask is 0b0111_0000
-                    # if arg_mask & 0b0001_1111_1111 == 0:
-                    #     args[arg_name] = ((op & arg_mask))
-                    #     continue
-
-                if trace_only:
-                    return fmt, args
-
-                if self.debug:
-                    fmt_args = {**args}
-                    if "d" in fmt_args:
-                        fmt_args["d"] *= 4
-                    
-                    print(fmt.format(**fmt_args))
-                    if min(abstract_table) <= op_id <= max(abstract_table):
-                        print(abstract_table[op_id].format(**fmt_args))
-
-                # if trace_only:
-                return op_id, args
-        raise IndexError(f"Unknown OPCode : {op:02X}")
+        opcode_struct, args = self._lookup(op)
+        if opcode_struct is None:
+            raise IndexError(f"Unknown OPCode : {op:02X}")
+        op_id, fmt, mask, code, args_struct = opcode_struct
+
+        if trace_only:
+            return fmt, args
+
+        if self.debug:
+            fmt_args = {**args}
+            if "d" in fmt_args:
+                fmt_args["d"] *= 4
+            
+            print(fmt.format(**fmt_args))
+            if min(abstract_table) <= op_id <= max(abstract_table):
+                print(abstract_table[op_id].format(**fmt_args))
+
+        # if trace_only:
+        return op_id, args
+
+    def disasm_range(self, mem, start: int, end: int) -> List[Tuple[int, int, Any, Dict[str, int]]]:
+        """
+        Decode every instruction in [start, end) in one pass.
+
+        :param mem: a Memory (offsets) or MemoryMap (addresses)
+        :return: list of (addr, op_val, fmt, args); fmt is None and args
+                 is empty for op_vals that don't decode (DSP, data, ...).
+        """
+        start &= ~1
+        data = _fetch(mem, start, end)
+        lookup = self._lookup
+        out = []
+        for i in range(0, len(data) - 1, 2):
+            op_val = (data[i] << 8) | data[i + 1]
+            opcode_struct, args = lookup(op_val)
+            if opcode_struct is None:
+                out.append((start + i, op_val, None, {}))
+            else:
+                out.append((start + i, op_val, opcode_struct[1], args))
+        return out
+
+
+def _fetch(mem, start: int, end: int) -> bytes:
+    """Raw bytes for [start, end), in a single slice when the range is
+    backed by one plain Memory, halfword by halfword otherwise."""
+    if hasattr(mem, 'resolve'):
+        region, base = mem.resolve(start)
+        if hasattr(region, 'get_range') and end - base <= len(region):
+            return bytes(region.get_range(start - base, end - base))
+    elif hasattr(mem, 'get_range'):
+        return bytes(mem.get_range(start, end))
+    out = bytearray()
+    for addr in range(start, end - 1, 2):
+        out += mem.read16(addr).to_bytes(2, 'big')
+    return bytes(out)
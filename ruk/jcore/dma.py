@@ -45,8 +45,11 @@ INTEVT codes for DMA end-of-transfer:
   DEI4=0x860, DEI5=0x880 (approximate -- cp-emu doesn't model these)
 """
 
+from functools import partial
 from typing import Callable, Optional, List
 
+from ruk.jcore.mmio import RegisterMapped
+
 
 # ===========================================================================
 # Constants
@@ -162,7 +165,7 @@ class DMAChannel:
 # DMA controller
 # ===========================================================================
 
-class DMA:
+class DMA(RegisterMapped):
     """
     SH-4 DMA controller with 6 channels.
 
@@ -181,6 +184,7 @@ class DMA:
         self.channels: List[DMAChannel] = [DMAChannel(i) for i in range(6)]
         self.dmaor = 0    # 16-bit DMA Operation Register
         self.on_irq: Optional[Callable[[int], None]] = None
+        self._build_registers()
 
     def _raise_irq(self, intevt: int):
         if self.on_irq is not None:
@@ -220,6 +224,20 @@ class DMA:
         dst = ch.dar
         real_ts = min(ts, 4)   # actual memory access size (max 4 bytes)
 
+        # Memory-to-memory copy between incrementing, non-overlapping
+        # ranges: move it as one block.  Anything else (fixed/decrementing
+        # addresses, overlaps, unmapped parts) takes the per-access loop.
+        total = ts * blocks
+        if (ch.src_addr_mode == ADDR_MODE_INCREMENT
+                and ch.dst_addr_mode == ADDR_MODE_INCREMENT
+                and (src + total <= dst or dst + total <= src)
+                and hasattr(self._mem, 'read_block')):
+            try:
+                self._mem.write_block(dst, self._mem.read_block(src, total))
+                blocks = 0
+            except IndexError:
+                pass
+
         for _ in range(blocks):
             # Read `ts` bytes from src (in real_ts-sized chunks)
             remaining = ts
@@ -277,93 +295,71 @@ class DMA:
         """Set the MemoryMap used for DMA transfers."""
         self._mem = mem
 
-    # ---- MMIO read/write ----
-
-    def _find_channel(self, addr: int) -> Optional[int]:
-        """Find which channel a given address belongs to."""
-        for i, base in enumerate(DMA_CHAN_BASES):
-            if base <= addr < base + 0x10:
-                return i
-        return None
-
-    def read8(self, addr: int) -> int:
-        return self.read32(addr) & 0xFF
-
-    def read16(self, addr: int) -> int:
-        if addr == DMA_DMAOR_ADDR:
-            return self.dmaor & 0xFFFF
-        return self.read32(addr) & 0xFFFF
-
-    def read32(self, addr: int) -> int:
-        ch_idx = self._find_channel(addr)
-        if ch_idx is None:
-            if addr == DMA_DMAOR_ADDR:
-                return self.dmaor & 0xFFFF
-            return 0
-        ch = self.channels[ch_idx]
-        off = addr - DMA_CHAN_BASES[ch_idx]
+    # ---- MMIO register map ----
 
+    def register_map(self):
+        """
+        SAR/DAR/TCR/CHCR of every channel and DMAOR.  Every register
+        answers 8/16/32-bit accesses at its own address: narrow reads
+        return the low bits, narrow writes store the (zero-extended)
+        value like a 32-bit write.  A 16-bit DMAOR write only starts
+        pending transfers on DME (see _write_dmaor).
+        """
+        rows = []
+        for i, (ch, base) in enumerate(zip(self.channels, DMA_CHAN_BASES)):
+            regs = [(base + DMA_SAR_OFF, partial(getattr, ch, 'sar'), partial(setattr, ch, 'sar')),
+                    (base + DMA_DAR_OFF, partial(getattr, ch, 'dar'), partial(setattr, ch, 'dar')),
+                    (base + DMA_TCR_OFF, partial(getattr, ch, 'tcr'), partial(setattr, ch, 'tcr')),
+                    (base + DMA_CHCR_OFF, partial(self._read_chcr, i), partial(self._write_chcr, i))]
+            for addr, get, put in regs:
+                rows += [(addr, 1, lambda get=get: get() & 0xFF, put),
+                         (addr, 2, lambda get=get: get() & 0xFFFF, put),
+                         (addr, 4, get, put)]
+        dmaor = partial(getattr, self, 'dmaor')
+        rows += [
+            (DMA_DMAOR_ADDR, 1, lambda: self.dmaor & 0xFF, partial(self._write_dmaor, True)),
+            (DMA_DMAOR_ADDR, 2, dmaor, partial(self._write_dmaor, False)),
+            (DMA_DMAOR_ADDR, 4, dmaor, partial(self._write_dmaor, True)),
+        ]
+        return rows
+
+    def _read_chcr(self, ch_idx: int) -> int:
+        ch = self.channels[ch_idx]
         # Lazy transfer: if the OS reads CHCR and DE is set but TE is not,
         # trigger the transfer now (if DMAOR is non-zero).
-        if off == DMA_CHCR_OFF and ch.enabled and not ch.transfer_end:
+        if ch.enabled and not ch.transfer_end:
             if self.dmaor != 0:
                 self._do_transfer(ch_idx)
+        return ch.chcr
 
-        if off == DMA_SAR_OFF:   return ch.sar
-        if off == DMA_DAR_OFF:   return ch.dar
-        if off == DMA_TCR_OFF:   return ch.tcr
-        if off == DMA_CHCR_OFF:  return ch.chcr
-        return 0
-
-    def write8(self, addr: int, val: int):
-        self.write32(addr, val)
-
-    def write16(self, addr: int, val: int):
-        if addr == DMA_DMAOR_ADDR:
-            old_dmaor = self.dmaor
-            self.dmaor = val & 0xFFFF
-            # If DME transitions from 0 to 1, start any pending transfers
-            if (val & DMAOR_DME) and not (old_dmaor & DMAOR_DME):
-                for i, ch in enumerate(self.channels):
-                    if ch.enabled and not ch.transfer_end:
-                        self._do_transfer(i)
-            return
-        self.write32(addr, val)
-
-    def write32(self, addr: int, val: int):
-        val &= 0xFFFFFFFF
-        ch_idx = self._find_channel(addr)
-        if ch_idx is None:
-            if addr == DMA_DMAOR_ADDR:
-                old_dmaor = self.dmaor
-                self.dmaor = val & 0xFFFF
-                # If DME is set (or DMAOR is non-zero, treating any write
-                # as enabling DMA for the Casio OS which uses a non-standard
-                # DMAOR bit layout), start any pending transfers.
-                if (val & DMAOR_DME) or (val != 0 and not (old_dmaor)):
-                    for i, ch in enumerate(self.channels):
-                        if ch.enabled and not ch.transfer_end:
-                            self._do_transfer(i)
-            return
+    def _write_chcr(self, ch_idx: int, val: int):
         ch = self.channels[ch_idx]
-        off = addr - DMA_CHAN_BASES[ch_idx]
-        if off == DMA_SAR_OFF:
-            ch.sar = val
-        elif off == DMA_DAR_OFF:
-            ch.dar = val
-        elif off == DMA_TCR_OFF:
-            ch.tcr = val
-        elif off == DMA_CHCR_OFF:
-            old = ch.chcr
-            ch.chcr = val
-            # If DE is set, start the DMA transfer.
-            # We treat DMAOR as "enabled" if it has any non-zero value
-            # (the Casio OS writes 0x0001 which doesn't have the DME bit
-            # set in either the SH-4 manual's bit-7 or gint's bit-15
-            # layout, but still expects DMA to work).
-            if (val & CHCR_DE) and not (old & CHCR_TE):
-                if self.dmaor != 0:  # any non-zero DMAOR enables DMA
-                    self._do_transfer(ch_idx)
+        old = ch.chcr
+        ch.chcr = val
+        # If DE is set, start the DMA transfer.
+        # We treat DMAOR as "enabled" if it has any non-zero value
+        # (the Casio OS writes 0x0001 which doesn't have the DME bit
+        # set in either the SH-4 manual's bit-7 or gint's bit-15
+        # layout, but still expects DMA to work).
+        if (val & CHCR_DE) and not (old & CHCR_TE):
+            if self.dmaor != 0:  # any non-zero DMAOR enables DMA
+                self._do_transfer(ch_idx)
+
+    def _write_dmaor(self, any_nonzero: bool, val: int):
+        old_dmaor = self.dmaor
+        self.dmaor = val & 0xFFFF
+        # If DME transitions from 0 to 1, start any pending transfers.
+        # 32-bit (and 8-bit) writes also treat any first non-zero value
+        # as enabling DMA, for the Casio OS which uses a non-standard
+        # DMAOR bit layout.
+        if any_nonzero:
+            start = (val & DMAOR_DME) or (val != 0 and not old_dmaor)
+        else:
+            start = (val & DMAOR_DME) and not (old_dmaor & DMAOR_DME)
+        if start:
+            for i, ch in enumerate(self.channels):
+                if ch.enabled and not ch.transfer_end:
+                    self._do_transfer(i)
 
     # ---- introspection ----
 
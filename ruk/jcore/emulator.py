@@ -61,6 +61,9 @@ def _exec_delay_slot(cpu, delay_slot_pc: int, branch_target: int):
     # disassembler.disasm + resolve path, which was ~10x slower).
     try:
         op_val = cpu.mem.read16(cpu.pc)
+        if cpu.cycle_costs is not None and cpu.scheduler is not None:
+            # Compiled blocks count their delay slots themselves
+            cpu.scheduler.now += cpu.cycle_costs[op_val]
         entry = cpu.emulator._dispatch[op_val]
         if entry is not None:
             handler, args = entry
@@ -331,88 +334,41 @@ class Emulator:
         # (handler, args_tuple) or None for unknown/DSP instructions.
         # This eliminates the linear scan in Disassembler.disasm (which
         # was ~15s of 58s in the 60s profile).
+        # The decode half is shared process-wide (ruk.jcore.decode), so
+        # building it no longer costs a 65536 x opcodes_table scan per CPU.
         # -----------------------------------------------------------------
-        self._dispatch = [None] * 65536
+        self._dispatch: list = []
+        self._decode: list = []
         self._build_dispatch_table()
         # DSP / unknown opcode cache (filled lazily by cpu.step)
         self._dsp_cache: Dict[int, Callable] = {}
 
     def _build_dispatch_table(self):
-        """Precompute self._dispatch: 65536 entries of (handler, args_tuple) or None."""
-        from ruk.jcore.generated_opcodes import opcodes_table
+        """Precompute self._dispatch: 65536 entries of (handler, args_tuple) or None.
 
-        # Pre-extract parameter names per op_id (excluding 'self').
+        Decoding (op_val -> op_id + operands) is shared across Emulator
+        instances and optionally cached on disk (see ruk.jcore.decode);
+        here we only bind this emulator's handlers onto it.
+        """
+        from ruk.jcore.decode import decode_table
+
+        # Only the *required* params (those without defaults) need to be
+        # in the args_tuple.  Params with defaults (e.g. CMPIM has
+        # `n=None` because the opcode only encodes `i` and `n` is
+        # implicitly R0) are left to use their default.
         # co_varnames[0] is 'self'; we want the rest in order.
-        param_order_cache: Dict[int, tuple] = {}
-
-        for op_val in range(65536):
-            # Find the matching opcode entry (first match wins, same as disasm).
-            for entry in opcodes_table:
-                op_id, fmt, mask, code, args_struct = entry
-                if op_val & mask != code:
-                    continue
-
-                # Matched.  Look up handler.
-                handler = self._resolve_table.get(op_id)
-                if handler is None:
-                    break  # unknown -> leave dispatch[op_val] as None
-
-                # Extract args into a dict (same logic as Disassembler.disasm).
-                args_dict = {}
-                for arg_name, arg_mask in args_struct.items():
-                    if arg_mask & 0b1111_1111 == 0:
-                        # 0bXXXX_0000_0000
-                        v = (op_val & arg_mask) >> 8
-                    elif arg_mask & 0b1111_0000_1111 == 0:
-                        # 0bXXXX_0000
-                        v = (op_val & arg_mask) >> 4
-                    elif arg_mask & 0b1111_0000_0000 == 0:
-                        # 0bXXXX_XXXX
-                        v = op_val & arg_mask
-                    elif arg_mask & 0b1111_0000_0000_0000 == 0:
-                        # 0bXXXX_XXXX_XXXX
-                        v = op_val & arg_mask
-                    elif arg_mask & 0b1111_1111_0000 == 0:
-                        # 0bXXXX
-                        v = op_val & arg_mask
-                    elif arg_mask & 0b1111_1000_1111 == 0:
-                        # 0b0XXX_0000
-                        v = op_val & arg_mask
-                    else:
-                        v = op_val & arg_mask
-                    args_dict[arg_name] = v
-
-                # Reorder args to match handler's parameter order.
-                # Only the *required* params (those without defaults) need
-                # to be in the args_tuple.  Params with defaults (e.g.
-                # CMPIM has `n=None` because the opcode only encodes `i`
-                # and `n` is implicitly R0) are left to use their default.
-                if op_id not in param_order_cache:
-                    code_obj = handler.__code__
-                    n_args = code_obj.co_argcount
-                    n_defaults = len(handler.__defaults__ or ())
-                    # Required params = total positional minus 'self' minus defaults.
-                    n_required = n_args - 1 - n_defaults
-                    required_names = code_obj.co_varnames[1:1 + n_required]
-                    param_order_cache[op_id] = tuple(required_names)
-                param_order = param_order_cache[op_id]
-
-                try:
-                    args_tuple = tuple(args_dict[name] for name in param_order)
-                except KeyError:
-                    # The handler's signature has a required parameter that
-                    # the opcodes_table entry doesn't provide.  This is a
-                    # real bug -- skip this entry so we can diagnose it
-                    # without crashing the whole dispatch table build.
-                    import sys
-                    print(f"[WARN] dispatch table: op_id={op_id} fmt={fmt!r} "
-                          f"args_struct={list(args_struct.keys())} "
-                          f"required_handler_params={list(param_order)} -- skipping",
-                          file=sys.stderr)
-                    break
-
-                self._dispatch[op_val] = (handler, args_tuple)
-                break
+        param_orders: Dict[int, tuple] = {}
+        for op_id, handler in self._resolve_table.items():
+            code_obj = handler.__code__
+            n_defaults = len(handler.__defaults__ or ())
+            n_required = code_obj.co_argcount - 1 - n_defaults
+            param_orders[op_id] = tuple(code_obj.co_varnames[1:1 + n_required])
+
+        # Shared op_val -> (op_id, args_tuple) table; read-only.
+        self._decode = decode_table(param_orders)
+        handlers = self._resolve_table
+        self._dispatch = [None if d is None else (handlers[d[0]], d[1])
+                          for d in self._decode]
 
     def _reg(self, op_id: int, handler: Callable):
         """Register a handler in the resolve table."""
@@ -1480,6 +1436,7 @@ class Emulator:
         slot_pc = _u32(self.cpu.pc + 2)
         # Restore SR from SSR before executing the delay slot
         self.cpu.regs['sr'] = _u32(self.cpu.ssr)
+        self.cpu.irq_check = True
         _exec_delay_slot(self.cpu, slot_pc, target)
 
     # ===================================================================
@@ -1515,7 +1472,9 @@ class Emulator:
         self.cpu.pc = _u32(self.cpu.pc + 2)
 
     def SLEEP(self):
-        """SLEEP: CPU halts until next interrupt.  We advance PC and set is_sleeping."""
+        """SLEEP: CPU halts until next interrupt.  We advance PC and set
+        is_sleeping; with cpu.fast_forward, step() (or the JIT) then
+        moves time to the next peripheral event."""
         self.cpu.pc = _u32(self.cpu.pc + 2)
         self.cpu.is_sleeping = True
 
@@ -1582,6 +1541,7 @@ class Emulator:
     # ---- LDC Rm, REG ----
     def LDC_SR(self, m: int):
         self.cpu.regs['sr'] = _u32(self.cpu.regs[m])
+        self.cpu.irq_check = True
         self.cpu.pc = _u32(self.cpu.pc + 2)
 
     def LDC_GBR(self, m: int):
@@ -1656,6 +1616,7 @@ class Emulator:
             val = int.from_bytes(val, "big")
         if attr == 'sr':
             self.cpu.regs['sr'] = _u32(val)
+            self.cpu.irq_check = True
         elif attr == 'gbr':
             self.cpu.regs['gbr'] = _u32(val)
         elif attr == 'vbr':
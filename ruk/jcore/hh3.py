@@ -233,21 +233,17 @@ def load_hh3(classpad, path: str) -> int:
         filesz = phdr['p_filesz']
         memsz = phdr['p_memsz']
 
-        # Copy file bytes
+        # Copy file bytes.  write_block splits the copy across the
+        # regions it crosses (RAM, ILRAM, etc.), so any alignment works.
         if filesz > 0:
-            seg_data = data[phdr['p_offset']:phdr['p_offset'] + filesz]
-            # Write byte-by-byte through the memory map.  This works
-            # for any alignment and any underlying Memory region
-            # (RAM, ILRAM, etc.) without needing to know the offset.
-            for i, b in enumerate(seg_data):
-                memmap.write8(vaddr + i, b)
+            memmap.write_block(vaddr, data[phdr['p_offset']:phdr['p_offset'] + filesz])
 
         # Zero-fill the bss portion (p_memsz - p_filesz)
         # The RAM/ILRAM buffers are pre-zeroed, but if the program was
         # previously loaded (e.g. re-running), the old data may still
         # be there.  Be safe and explicitly zero it.
-        for i in range(filesz, memsz):
-            memmap.write8(vaddr + i, 0)
+        if memsz > filesz:
+            memmap.write_block(vaddr + filesz, bytes(memsz - filesz))
 
     return parsed['e_entry']
 
@@ -359,15 +355,13 @@ def run_hh3(classpad, path: str,
     argv_str_ptrs = []
     for s in argv_bytes:
         addr -= len(s)
-        for i, b in enumerate(s):
-            memmap.write8(addr + i, b)
+        memmap.write_block(addr, s)
         argv_str_ptrs.append(addr)
 
     envp_str_ptrs = []
     for s in envp_list:
         addr -= len(s)
-        for i, b in enumerate(s):
-            memmap.write8(addr + i, b)
+        memmap.write_block(addr, s)
         envp_str_ptrs.append(addr)
 
     # Align addr down to 4 bytes (for pointer array)
@@ -414,10 +408,7 @@ def run_hh3(classpad, path: str,
 
 def _write32(memmap, addr: int, val: int):
     """Write a 32-bit big-endian value through the memory map."""
-    memmap.write8(addr,     (val >> 24) & 0xFF)
-    memmap.write8(addr + 1, (val >> 16) & 0xFF)
-    memmap.write8(addr + 2, (val >> 8) & 0xFF)
-    memmap.write8(addr + 3, val & 0xFF)
+    memmap.write_block(addr, (val & 0xFFFFFFFF).to_bytes(4, "big"))
 
 
 # ---------------------------------------------------------------------------
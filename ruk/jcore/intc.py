@@ -1,20 +1,28 @@
 """
-Minimal SH-4 interrupt delivery support for RuK.
+SH-4 interrupt delivery for RuK.
 
 The base RuK CPU has no interrupt handling at all (TRAPA isn't even
-implemented).  This module adds the minimum needed to deliver a TMU/ETMU
-interrupt to the SH-4:
-
-  - An `InterruptController` that holds a queue of pending IRQs (each
-    identified by its INTEVT code).
-  - A patch to `CPU.step()` that, before executing each instruction,
-    checks the INTC for a pending IRQ and -- if interrupts are enabled
-    in SR -- takes it: pushes PC->SPC, SR->SSR, sets INTEVT, jumps to
+implemented).  This module adds the INTC side of it:
+
+  - An `InterruptController` holding the pending interrupt sources as a
+    bitmask (one bit per INTEVT code) and the IPRA..IPRL priority
+    registers of Casio's INTC2 at 0xA4080000 (mapped by
+    ruk.jcore.mmio.attach_ipr).
+  - `CPU.check_interrupts()`, which takes the highest-priority pending
+    interrupt the CPU accepts: priority above SR.IMASK and SR.BL clear.
+    It pushes PC->SPC, SR->SSR, R15->SGR, sets INTEVT and jumps to
     VBR + 0x600.
 
-We don't try to model the full SH-4 INTC (IPR registers, IMASK, etc.).
-Instead we accept all IRQs unconditionally if SR.IF (bits 4-7) is 0,
-which is enough for the TMU test.
+The CPU only asks the INTC when `cpu.irq_check` is set.  The INTC sets
+it when the pending set or an IPR changes, and LDC SR / RTE set it when
+SR changes (SR.T updates never matter), so a masked interrupt costs
+nothing until something can unmask it.  step() tests the flag before
+every instruction, BlockRunner and the JIT before every block they
+dispatch.  Code that changes SR behind the CPU's back (a host register
+edit) must set the flag itself.
+
+IPRs reset to 0 like on hardware: a source is never accepted until its
+priority is programmed (the OS does it while booting).
 
 Usage:
     from ruk.jcore.intc import InterruptController, attach_intc
@@ -25,8 +33,10 @@ Usage:
     cp.cpu.tmu.on_irq = intc.request    # wire TMU IRQs to the INTC
 """
 
-from typing import Optional, List
-import queue
+from functools import partial
+from typing import Dict, List, Optional, Tuple
+
+from ruk.jcore.mmio import RegisterMapped
 
 
 # SH-4 SR bit fields we care about
@@ -35,109 +45,187 @@ SR_RB  = 1 << 29        # register bank
 SR_BL  = 1 << 28        # exception/interrupt mask (blocks ALL exceptions)
 SR_IF_MASK = 0x000000F0 # interrupt priority mask (bits 4-7)
 
-
-class InterruptController:
+# Casio INTC2: IPRA..IPRL, 16-bit, at a 4-byte stride
+INTC_BASE = 0xA4080000
+INTC_SIZE = 0x100
+IPR_COUNT = 12
+IPRA, IPRB, IPRC, IPRD, IPRE, IPRF, IPRG, IPRH, IPRI, IPRJ, IPRK, IPRL = range(IPR_COUNT)
+
+# INTEVT -> (IPR, shift of its 4-bit priority field), after the SH7305
+# layout gint programs.  INTEVT codes are multiples of 0x20; a source
+# missing here has priority 0 and is never accepted.
+IPR_FIELDS: Dict[int, Tuple[int, int]] = {
+    0x400: (IPRA, 12),      # TMU0 (and the CMT, which shares its code here)
+    0x420: (IPRA, 8),       # TMU1
+    0x440: (IPRA, 4),       # TMU2
+    0x4A0: (IPRK, 4),       # RTC periodic
+    0x4C0: (IPRK, 4),       # RTC carry
+    0x4E0: (IPRK, 4),       # RTC alarm
+    0x800: (IPRE, 12),      # DMA 0-3
+    0x820: (IPRE, 12),
+    0x840: (IPRE, 12),
+    0x860: (IPRE, 12),      # DMA 3 and 4
+    0x880: (IPRF, 8),       # DMA 5
+    0x9E0: (IPRJ, 12),      # ETMU0
+    0xC20: (IPRJ, 8),       # ETMU1
+    0xC40: (IPRJ, 4),       # ETMU2
+    0x900: (IPRE, 0),       # ETMU3
+    0xD00: (IPRJ, 0),       # ETMU4
+    0xFA0: (IPRL, 12),      # ETMU5
+}
+
+
+class InterruptController(RegisterMapped):
     """
-    A minimal SH-4 interrupt controller.
+    SH-4 interrupt controller: pending sources and their priorities.
 
-    Holds a FIFO of pending INTEVT codes.  The CPU polls `take_pending()`
-    before each instruction; if a code is available and the CPU is in a
-    state where interrupts can be delivered (SR.BL=0 and the IRQ's
-    priority is > SR.IF), the CPU calls `deliver(intevt)` to dispatch it.
+    `pending` has bit INTEVT >> 5 set for every requested source not yet
+    taken.  `take_pending(sr)` hands out the highest-priority one SR
+    accepts (lowest INTEVT first among equal priorities) and clears it.
     """
 
     def __init__(self):
-        self._queue: "queue.Queue[int]" = queue.Queue()
+        self.pending = 0
+        self.ipr = [0] * IPR_COUNT
         self.enabled = False
+        # The CPU whose irq_check the INTC raises (attach_intc)
+        self.cpu = None
+        self._build_registers()
+
+    def register_map(self):
+        """IPRA..IPRL: 16-bit priority registers."""
+        return [(INTC_BASE + 4 * i, 2, partial(self.ipr.__getitem__, i),
+                 partial(self._write_ipr, i)) for i in range(IPR_COUNT)]
+
+    def _write_ipr(self, index: int, val: int):
+        self.ipr[index] = val
+        self._changed()
+
+    def _changed(self):
+        """The pending set or the priorities changed: have the CPU look."""
+        if self.cpu is not None:
+            self.cpu.irq_check = True
 
     def enable(self):
         self.enabled = True
+        self._changed()
 
     def disable(self):
         self.enabled = False
 
+    def priority(self, intevt: int) -> int:
+        """Priority of source `intevt` (0-15) from its IPR field."""
+        field = IPR_FIELDS.get(intevt)
+        if field is None:
+            return 0
+        return (self.ipr[field[0]] >> field[1]) & 0xF
+
     def request(self, intevt: int):
         """Called by peripherals to raise an interrupt."""
-        self._queue.put(intevt & 0xFFFF)
-
-    def take_pending(self) -> Optional[int]:
-        if not self.enabled:
-            return None
-        try:
-            return self._queue.get_nowait()
-        except queue.Empty:
+        bit = 1 << ((intevt & 0xFFFF) >> 5)
+        if not self.pending & bit:
+            self.pending |= bit
+            self._changed()
+
+    def sources(self) -> List[int]:
+        """The pending INTEVT codes, lowest first."""
+        out = []
+        mask = self.pending
+        while mask:
+            low = mask & -mask
+            out.append((low.bit_length() - 1) << 5)
+            mask ^= low
+        return out
+
+    def _best(self, level: int) -> Optional[int]:
+        """The pending source of highest priority above `level`."""
+        best = None
+        for intevt in self.sources():
+            p = self.priority(intevt)
+            if p > level:
+                best, level = intevt, p
+        return best
+
+    def take_pending(self, sr: int) -> Optional[int]:
+        """
+        Remove and return the INTEVT the CPU takes with status register
+        `sr`, or None: SR.BL set, or nothing pending above SR.IMASK.
+        """
+        if not self.enabled or not self.pending or sr & SR_BL:
             return None
+        intevt = self._best((sr & SR_IF_MASK) >> 4)
+        if intevt is not None:
+            self.pending &= ~(1 << (intevt >> 5))
+        return intevt
+
+    def take(self, cpu) -> bool:
+        """Deliver what take_pending() gives for cpu's SR.  Returns whether it did."""
+        intevt = self.take_pending(cpu.regs._sys['sr'])
+        if intevt is None:
+            return False
+        _deliver_interrupt(cpu, intevt)
+        return True
+
+    def has_pending(self, sr: Optional[int] = None) -> bool:
+        """
+        Whether a source with a priority is pending; with `sr`, whether
+        take_pending(sr) would return one.
+        """
+        if not self.enabled or not self.pending:
+            return False
+        if sr is None:
+            return self._best(0) is not None
+        return not sr & SR_BL and self._best((sr & SR_IF_MASK) >> 4) is not None
+
+    def discard(self, intevt: int) -> bool:
+        """Drop the pending request for `intevt`.  Returns True if there was one."""
+        bit = 1 << ((intevt & 0xFFFF) >> 5)
+        if not self.pending & bit:
+            return False
+        self.pending &= ~bit
+        return True
 
     def clear(self):
-        while not self._queue.empty():
-            try:
-                self._queue.get_nowait()
-            except queue.Empty:
-                break
-
+        self.pending = 0
 
-# ---------------------------------------------------------------------------
-# CPU patching
-# ---------------------------------------------------------------------------
+    def snapshot_state(self) -> dict:
+        """Pending sources, IPRs and enable flag (see ruk.jcore.snapshot)."""
+        return {'enabled': self.enabled, 'pending': self.sources(), 'ipr': list(self.ipr)}
 
-# Saved reference to the original CPU.step() function, so we can chain to it.
-_orig_step = None
-
-
-def _interruptible_step(self):
-    """
-    Replacement for CPU.step() that checks the INTC before each instruction.
-    """
-    intc = getattr(self, '_intc', None)
-    if intc is not None:
-        intevt = intc.take_pending()
-        if intevt is not None:
-            _deliver_interrupt(self, intevt)
-            return
-
-    # Run the original step (calling the saved function directly with `self`)
-    # _orig_step is a bound method of cpu, so we don't pass self again.
-    _orig_step()
+    def restore_state(self, state: dict):
+        self.clear()
+        for intevt in state['pending']:
+            self.pending |= 1 << (intevt >> 5)
+        self.ipr[:] = state['ipr']
+        self.enabled = state['enabled']
+        self._changed()
 
 
 def _deliver_interrupt(cpu, intevt: int):
     """
-    Deliver an interrupt to the SH-4 CPU.
-
-    This is the minimal "general IRQ" path (VBR + 0x600):
+    Deliver an interrupt to the SH-4 CPU (the general IRQ path, VBR + 0x600):
       1. Save PC -> SPC, SR -> SSR, R15 -> SGR
-      2. Set INTEVT register (we store it on the CPU object)
-      3. Set SR.BL=1, SR.MD=1, SR.RB=1 (mask further exceptions)
-      4. Jump to VBR + 0x600
-
-    We don't have SPC/SSR/SGR/INTEVT registers in the base CPU model, so
-    we stash them on the cpu object as plain attributes.  A future RTS
-    from the interrupt handler will need an RTE instruction to restore
-    them, which RuK doesn't implement yet either -- so for the test we
-    just verify the IRQ was delivered (PC is now VBR + 0x600) and that
-    the handler at that address got executed.
+      2. Set INTEVT (stored on the CPU object, like the other
+         system registers the base RuK CPU lacks)
+      3. Set SR.BL=1, SR.MD=1, SR.RB=1 (mask further interrupts)
+      4. Jump to VBR + 0x600, waking the CPU from SLEEP
     """
     sr = cpu.regs['sr']
-    # Block further exceptions
-    new_sr = sr | (1 << 31) | (1 << 29) | (1 << 28)
-    # Save state
     cpu.spc = cpu.pc
     cpu.ssr = sr
     cpu.sgr = cpu.regs[15]
     cpu.intevt = intevt
-    cpu.regs['sr'] = new_sr
-    # Vector to VBR + 0x600
+    cpu.regs['sr'] = sr | SR_MD | SR_RB | SR_BL
     vbr = cpu.regs['vbr']
     cpu.pc = (vbr + 0x600) & 0xFFFFFFFF
+    cpu.is_sleeping = False
 
 
 def attach_intc(cpu, intc: InterruptController):
     """
-    Attach an InterruptController to a CPU.  Patches the CPU's step()
-    method so it checks the INTC before each instruction.
+    Attach an InterruptController to a CPU: step(), BlockRunner and the
+    JIT take its interrupts through cpu.check_interrupts().
     """
-    global _orig_step
-    if _orig_step is None:
-        _orig_step = cpu.step
-    cpu._intc = intc
-    cpu.step = _interruptible_step.__get__(cpu, type(cpu))
+    cpu.intc = intc
+    intc.cpu = cpu
+    cpu.irq_check = True
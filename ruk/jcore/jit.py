@@ -14,6 +14,8 @@ Three-phase approach:
     - After a block is executed `threshold` times, generate Python source
       that inlines all instruction handlers
     - exec() the source to create a function
+    - Delayed branches (BRA/BSR/JMP/JSR/RTS/RTE/BT.S/BF.S/BRAF/BSRF)
+      are compiled too, with the delay-slot instruction emitted inline
     - Eliminates per-instruction: function call overhead, PC update
     - Expected: ~5-10x additional speedup
 
@@ -23,6 +25,18 @@ Three-phase approach:
     - The entire loop runs as a single function call
     - Expected: ~10-50x additional speedup for tight loops
 
+  Block chaining: a compiled block whose exit PC is a constant returns
+  its successor's compiled function (see _link_exits), so run() calls
+  linked blocks back to back and only returns to the dispatcher on
+  indirect branches, unlinked exits or when the step budget is used up.
+
+  Budgets: compiled functions are called as fn(cpu, budget) and return
+  (next_fn_or_None, instructions_executed).  Loops and regions count
+  the guest instructions they run and leave at the top of an iteration
+  once `budget` is used up, with cpu.pc and the registers in the state
+  the interpreter would have there.  run() therefore returns an exact
+  instruction count and can overshoot max_steps by at most one block.
+
 Usage:
     cpu.run(max_steps)   # uses JIT (fast mode)
     cpu.step()           # single-step (debug mode, no JIT)
@@ -30,21 +44,49 @@ Usage:
 Safety:
     - Generated code uses the same register/memory accessors as the
       interpreter, so MMIO, LCD writes, etc. all work correctly.
-    - If a block can't be JIT-compiled (unknown instruction, complex
-      branch), it falls back to Phase 1 (block cache).
+    - If a block can't be JIT-compiled (an instruction with no decode
+      entry -- DSP ops go through cpu.step's DSP probe -- or a branch in
+      a delay slot), it falls back to Phase 1 (block cache).  Every op_id
+      the Emulator registers has a generator; stats() reports how many
+      block executions ran compiled code and what stopped the rest.
     - The JIT is only used in run() mode. step() is unaffected.
 """
 
+import ast
+import re
+import struct
 from typing import Dict, List, Tuple, Optional, Callable
 
+from ruk.jcore.memory import CODE_PAGE_SHIFT
+
 # ---------------------------------------------------------------------------
 # Branch op_id sets (from emulator._resolve_table)
 # ---------------------------------------------------------------------------
 
 BRANCH_OP_IDS = {149, 150, 151, 152, 153, 154, 155, 156, 157, 158, 161, 221, 270}
 DELAYED_OP_IDS = {150, 152, 153, 154, 155, 156, 157, 158, 161, 221}
-# Only BF/BT (no delay slot) can be JIT-compiled inline
-JIT_SAFE_BRANCH_IDS = {149, 151}  # BF, BT
+# Branches the JIT compiles inline: BF/BT, TRAPA, plus every delayed
+# branch (the delay-slot instruction is emitted inline, see DELAYED_GENS).
+JIT_SAFE_BRANCH_IDS = {149, 151, 270} | DELAYED_OP_IDS
+# SLEEP ends a block too, so that run() can fast-forward and take the
+# wake-up interrupt before the next instruction (see JITCompiler.run)
+BLOCK_END_OP_IDS = BRANCH_OP_IDS | {226}
+SLEEP_OP = 0x001B
+
+# Most instructions compiled code runs between two updates of
+# cpu.scheduler (see JITCompiler.run)
+SCHED_QUANTUM = 1024
+
+# What an idle polling loop may contain (see JITCompiler._poll_loop):
+# loads from @Rm, @(disp,Rm), @(R0,Rm) and @(disp,GBR), register moves,
+# ALU ops and compares, and the branch back to its head.  No stores,
+# no post-increment, no system instructions.
+POLL_LOAD_IDS = {7, 8, 9, 25, 28, 31, 39, 40, 41, 45, 46, 47}
+POLL_BRANCH_IDS = {149, 150, 151, 152, 153}
+POLL_OP_IDS = (POLL_LOAD_IDS | POLL_BRANCH_IDS | set(range(83, 92)) | set(range(133, 149))
+               | {0, 1, 4, 5, 6, 60, 62, 63, 64, 79, 80, 104, 105, 106, 107, 114, 116,
+                  119, 120, 122, 123, 124, 127, 128, 130, 131, 166, 214, 225})
+MAX_POLL_LEN = 16
 
 
 # ---------------------------------------------------------------------------
@@ -60,6 +102,23 @@ def _sext12(val):
     return val - 0x1000 if val & 0x800 else val
 
 
+def _poll_address(op_val, r, gbr):
+    """Address read by a POLL_LOAD_IDS instruction, from the registers."""
+    m = (op_val >> 4) & 0xF
+    top = op_val >> 12
+    if top == 0x6:                       # MOV.x @Rm, Rn
+        addr = r[m]
+    elif top == 0x5:                     # MOV.L @(disp,Rm), Rn
+        addr = r[m] + (op_val & 0xF) * 4
+    elif top == 0x8:                     # MOV.B/W @(disp,Rm), R0
+        addr = r[m] + (op_val & 0xF) * (1 if op_val & 0x0100 == 0 else 2)
+    elif top == 0x0:                     # MOV.x @(R0,Rm), Rn
+        addr = r[0] + r[m]
+    else:                                # MOV.x @(disp,GBR), R0
+        addr = gbr + (op_val & 0xFF) * (1 << ((op_val >> 8) & 3))
+    return addr & 0xFFFFFFFF
+
+
 # ---------------------------------------------------------------------------
 # Code generators
 #
@@ -163,11 +222,11 @@ def _gen_negc(op_val, pc, bsp):
 def _gen_tst_rm(op_val, pc, bsp):
     n = (op_val >> 8) & 0xF
     m = (op_val >> 4) & 0xF
-    return ([f"sr['sr'] = (sr['sr'] & ~1) | (0 if (r[{n}] & r[{m}]) == 0 else 1)"], False)
+    return ([f"sr['sr'] = (sr['sr'] & ~1) | (1 if (r[{n}] & r[{m}]) == 0 else 0)"], False)
 
 def _gen_tst_imm(op_val, pc, bsp):
     i = op_val & 0xFF
-    return ([f"sr['sr'] = (sr['sr'] & ~1) | (0 if (r[0] & {i}) == 0 else 1)"], False)
+    return ([f"sr['sr'] = (sr['sr'] & ~1) | (1 if (r[0] & {i}) == 0 else 0)"], False)
 
 def _gen_cmpim(op_val, pc, bsp):
     i = _sext8(op_val & 0xFF)
@@ -224,6 +283,165 @@ def _gen_dt(op_val, pc, bsp):
     return ([f"r[{n}] = (r[{n}] - 1) & 0xFFFFFFFF",
              f"sr['sr'] = (sr['sr'] & ~1) | (1 if r[{n}] == 0 else 0)"], False)
 
+def _gen_addv(op_val, pc, bsp):
+    n = (op_val >> 8) & 0xF
+    m = (op_val >> 4) & 0xF
+    return ([f"_v = ((r[{n}] ^ 0x80000000) - 0x80000000) + ((r[{m}] ^ 0x80000000) - 0x80000000)",
+             f"r[{n}] = _v & 0xFFFFFFFF",
+             f"sr['sr'] = (sr['sr'] & ~1) | (1 if _v < -0x80000000 or _v > 0x7FFFFFFF else 0)"], False)
+
+def _gen_subv(op_val, pc, bsp):
+    n = (op_val >> 8) & 0xF
+    m = (op_val >> 4) & 0xF
+    return ([f"_v = ((r[{n}] ^ 0x80000000) - 0x80000000) - ((r[{m}] ^ 0x80000000) - 0x80000000)",
+             f"r[{n}] = _v & 0xFFFFFFFF",
+             f"sr['sr'] = (sr['sr'] & ~1) | (1 if _v < -0x80000000 or _v > 0x7FFFFFFF else 0)"], False)
+
+def _gen_cmpstr(op_val, pc, bsp):
+    n = (op_val >> 8) & 0xF
+    m = (op_val >> 4) & 0xF
+    return ([f"_v = r[{n}] ^ r[{m}]",
+             f"sr['sr'] = (sr['sr'] & ~1) | (0 if _v & 0xFF000000 and _v & 0xFF0000 "
+             f"and _v & 0xFF00 and _v & 0xFF else 1)"], False)
+
+# ---- Byte/word swaps and extensions ----
+
+def _gen_swapb(op_val, pc, bsp):
+    n = (op_val >> 8) & 0xF
+    m = (op_val >> 4) & 0xF
+    return ([f"_v = r[{m}]",
+             f"r[{n}] = (_v & 0xFFFF0000) | ((_v & 0xFF) << 8) | ((_v >> 8) & 0xFF)"], False)
+
+def _gen_swapw(op_val, pc, bsp):
+    n = (op_val >> 8) & 0xF
+    m = (op_val >> 4) & 0xF
+    return ([f"_v = r[{m}]",
+             f"r[{n}] = ((_v & 0xFFFF) << 16) | (_v >> 16)"], False)
+
+def _gen_xtrct(op_val, pc, bsp):
+    n = (op_val >> 8) & 0xF
+    m = (op_val >> 4) & 0xF
+    return ([f"r[{n}] = ((r[{m}] << 16) & 0xFFFF0000) | (r[{n}] >> 16)"], False)
+
+def _gen_extsb(op_val, pc, bsp):
+    n = (op_val >> 8) & 0xF
+    m = (op_val >> 4) & 0xF
+    return ([f"_v = r[{m}] & 0xFF",
+             f"r[{n}] = (_v - 0x100 if _v & 0x80 else _v) & 0xFFFFFFFF"], False)
+
+def _gen_extsw(op_val, pc, bsp):
+    n = (op_val >> 8) & 0xF
+    m = (op_val >> 4) & 0xF
+    return ([f"_v = r[{m}] & 0xFFFF",
+             f"r[{n}] = (_v - 0x10000 if _v & 0x8000 else _v) & 0xFFFFFFFF"], False)
+
+def _gen_extub(op_val, pc, bsp):
+    n = (op_val >> 8) & 0xF
+    m = (op_val >> 4) & 0xF
+    return ([f"r[{n}] = r[{m}] & 0xFF"], False)
+
+def _gen_extuw(op_val, pc, bsp):
+    n = (op_val >> 8) & 0xF
+    m = (op_val >> 4) & 0xF
+    return ([f"r[{n}] = r[{m}] & 0xFFFF"], False)
+
+# ---- Multiply / divide ----
+#
+# Products go to MACH/MACL in sr[]; signed operands are sign-extended
+# with (x ^ 0x80000000) - 0x80000000.  MAC.L/MAC.W accumulate without
+# saturation (S=0), like Emulator.MAC_L/MAC_W, and sample both pointers
+# before either is incremented.
+
+def _gen_mull(op_val, pc, bsp):
+    n = (op_val >> 8) & 0xF
+    m = (op_val >> 4) & 0xF
+    return ([f"sr['macl'] = (r[{n}] * r[{m}]) & 0xFFFFFFFF"], False)
+
+def _gen_mulsw(op_val, pc, bsp):
+    n = (op_val >> 8) & 0xF
+    m = (op_val >> 4) & 0xF
+    return ([f"sr['macl'] = ((((r[{n}] & 0xFFFF) ^ 0x8000) - 0x8000) * "
+             f"(((r[{m}] & 0xFFFF) ^ 0x8000) - 0x8000)) & 0xFFFFFFFF"], False)
+
+def _gen_muluw(op_val, pc, bsp):
+    n = (op_val >> 8) & 0xF
+    m = (op_val >> 4) & 0xF
+    return ([f"sr['macl'] = (r[{n}] & 0xFFFF) * (r[{m}] & 0xFFFF)"], False)
+
+def _gen_dmuls(op_val, pc, bsp):
+    n = (op_val >> 8) & 0xF
+    m = (op_val >> 4) & 0xF
+    return ([f"_v = ((r[{n}] ^ 0x80000000) - 0x80000000) * ((r[{m}] ^ 0x80000000) - 0x80000000)",
+             f"sr['mach'] = (_v >> 32) & 0xFFFFFFFF",
+             f"sr['macl'] = _v & 0xFFFFFFFF"], False)
+
+def _gen_dmulu(op_val, pc, bsp):
+    n = (op_val >> 8) & 0xF
+    m = (op_val >> 4) & 0xF
+    return ([f"_v = r[{n}] * r[{m}]",
+             f"sr['mach'] = _v >> 32",
+             f"sr['macl'] = _v & 0xFFFFFFFF"], False)
+
+def _gen_macl(op_val, pc, bsp):
+    n = (op_val >> 8) & 0xF
+    m = (op_val >> 4) & 0xF
+    return ([f"_x = r[{m}]",
+             f"_y = r[{n}]",
+             f"_v = mem.read32(_x)",
+             f"_w = mem.read32(_y)",
+             f"r[{m}] = (_x + 4) & 0xFFFFFFFF",
+             f"r[{n}] = (_y + 4) & 0xFFFFFFFF",
+             f"_v = ((_v ^ 0x80000000) - 0x80000000) * ((_w ^ 0x80000000) - 0x80000000) "
+             f"+ ((sr['mach'] << 32) | sr['macl'])",
+             f"sr['mach'] = (_v >> 32) & 0xFFFFFFFF",
+             f"sr['macl'] = _v & 0xFFFFFFFF"], False)
+
+def _gen_macw(op_val, pc, bsp):
+    n = (op_val >> 8) & 0xF
+    m = (op_val >> 4) & 0xF
+    return ([f"_x = r[{m}]",
+             f"_y = r[{n}]",
+             f"_v = mem.read16(_x)",
+             f"_w = mem.read16(_y)",
+             f"r[{m}] = (_x + 2) & 0xFFFFFFFF",
+             f"r[{n}] = (_y + 2) & 0xFFFFFFFF",
+             f"_v = ((_v ^ 0x8000) - 0x8000) * ((_w ^ 0x8000) - 0x8000) "
+             f"+ ((sr['mach'] << 32) | sr['macl'])",
+             f"sr['mach'] = (_v >> 32) & 0xFFFFFFFF",
+             f"sr['macl'] = _v & 0xFFFFFFFF"], False)
+
+def _gen_div0s(op_val, pc, bsp):
+    n = (op_val >> 8) & 0xF
+    m = (op_val >> 4) & 0xF
+    return ([f"_q = r[{n}] >> 31",
+             f"_x = r[{m}] >> 31",
+             f"sr['sr'] = (sr['sr'] & ~0x301) | (_q << 8) | (_x << 9) | (_q ^ _x)"], False)
+
+def _gen_div0u(op_val, pc, bsp):
+    return ([f"sr['sr'] &= ~0x301"], False)
+
+def _gen_div1(op_val, pc, bsp):
+    """DIV1 Rm, Rn: one non-restoring step.
+
+    Same result as Emulator.DIV1's case table: subtract when Q == M,
+    add otherwise, and the new Q is old MSB(Rn) ^ carry/borrow ^ M.
+    """
+    n = (op_val >> 8) & 0xF
+    m = (op_val >> 4) & 0xF
+    return ([f"_s = sr['sr']",
+             f"_x = (_s >> 9) & 1",
+             f"_v = ((r[{n}] << 1) | (_s & 1)) & 0xFFFFFFFF",
+             f"if ((_s >> 8) & 1) == _x:",
+             f"    _q = 1 if r[{m}] > _v else 0",
+             f"    _v = (_v - r[{m}]) & 0xFFFFFFFF",
+             f"else:",
+             f"    _v += r[{m}]",
+             f"    _q = _v >> 32",
+             f"    _v &= 0xFFFFFFFF",
+             f"_q ^= (r[{n}] >> 31) ^ _x",
+             f"r[{n}] = _v",
+             f"sr['sr'] = (_s & ~0x101) | (_q << 8) | (1 if _q == _x else 0)"], False)
+
 # ---- Shifts ----
 
 def _gen_shll(op_val, pc, bsp):
@@ -294,6 +512,28 @@ def _gen_rotcr(op_val, pc, bsp):
              f"sr['sr'] = (sr['sr'] & ~1) | (1 if r[{n}] & 1 else 0)",
              f"r[{n}] = ((r[{n}] >> 1) | (_t << 31)) & 0xFFFFFFFF"], False)
 
+# SHAD/SHLD follow Emulator.SHAD/SHLD: the count is the low 5 bits of
+# Rm read as a signed 5-bit value (negative = right shift).
+
+def _gen_shad(op_val, pc, bsp):
+    n = (op_val >> 8) & 0xF
+    m = (op_val >> 4) & 0xF
+    return ([f"_x = r[{m}] & 0x1F",
+             f"if _x < 0x10:",
+             f"    r[{n}] = (r[{n}] << _x) & 0xFFFFFFFF",
+             f"else:",
+             f"    r[{n}] = (((r[{n}] ^ 0x80000000) - 0x80000000) >> (0x20 - _x)) & 0xFFFFFFFF"],
+            False)
+
+def _gen_shld(op_val, pc, bsp):
+    n = (op_val >> 8) & 0xF
+    m = (op_val >> 4) & 0xF
+    return ([f"_x = r[{m}] & 0x1F",
+             f"if _x < 0x10:",
+             f"    r[{n}] = (r[{n}] << _x) & 0xFFFFFFFF",
+             f"else:",
+             f"    r[{n}] = r[{n}] >> (0x20 - _x)"], False)
+
 # ---- Memory load/store ----
 
 def _gen_movbs(op_val, pc, bsp):
@@ -331,22 +571,27 @@ def _gen_movll(op_val, pc, bsp):
 def _gen_movbp(op_val, pc, bsp):
     n = (op_val >> 8) & 0xF
     m = (op_val >> 4) & 0xF
-    return ([f"_v = mem.read8(r[{m}])",
+    # Sample the address first: with m == n the increment wins (as in
+    # the interpreter), so Rn ends up as the old address + size.
+    return ([f"_x = r[{m}]",
+             f"_v = mem.read8(_x)",
              f"r[{n}] = (_v - 0x100 if _v & 0x80 else _v) & 0xFFFFFFFF",
-             f"r[{m}] = (r[{m}] + 1) & 0xFFFFFFFF"], False)
+             f"r[{m}] = (_x + 1) & 0xFFFFFFFF"], False)
 
 def _gen_movwp(op_val, pc, bsp):
     n = (op_val >> 8) & 0xF
     m = (op_val >> 4) & 0xF
-    return ([f"_v = mem.read16(r[{m}])",
+    return ([f"_x = r[{m}]",
+             f"_v = mem.read16(_x)",
              f"r[{n}] = (_v - 0x10000 if _v & 0x8000 else _v) & 0xFFFFFFFF",
-             f"r[{m}] = (r[{m}] + 2) & 0xFFFFFFFF"], False)
+             f"r[{m}] = (_x + 2) & 0xFFFFFFFF"], False)
 
 def _gen_movlp(op_val, pc, bsp):
     n = (op_val >> 8) & 0xF
     m = (op_val >> 4) & 0xF
-    return ([f"r[{n}] = mem.read32(r[{m}])",
-             f"r[{m}] = (r[{m}] + 4) & 0xFFFFFFFF"], False)
+    return ([f"_x = r[{m}]",
+             f"r[{n}] = mem.read32(_x)",
+             f"r[{m}] = (_x + 4) & 0xFFFFFFFF"], False)
 
 def _gen_movbm(op_val, pc, bsp):
     n = (op_val >> 8) & 0xF
@@ -406,6 +651,103 @@ def _gen_movls_gbr(op_val, pc, bsp):
     disp = op_val & 0xFF
     return ([f"mem.write32(sr['gbr'] + {disp * 4}, r[0])"], False)
 
+def _gen_movbl_gbr(op_val, pc, bsp):
+    """MOV.B @(disp,GBR), R0"""
+    disp = op_val & 0xFF
+    return ([f"_v = mem.read8(sr['gbr'] + {disp})",
+             f"r[0] = (_v - 0x100 if _v & 0x80 else _v) & 0xFFFFFFFF"], False)
+
+def _gen_movwl_gbr(op_val, pc, bsp):
+    """MOV.W @(disp,GBR), R0"""
+    disp = op_val & 0xFF
+    return ([f"_v = mem.read16(sr['gbr'] + {disp * 2})",
+             f"r[0] = (_v - 0x10000 if _v & 0x8000 else _v) & 0xFFFFFFFF"], False)
+
+def _gen_movll_gbr(op_val, pc, bsp):
+    """MOV.L @(disp,GBR), R0"""
+    disp = op_val & 0xFF
+    return ([f"r[0] = mem.read32(sr['gbr'] + {disp * 4})"], False)
+
+# ---- GBR-indexed byte logic: @(R0,GBR) ----
+
+def _gen_tstb_gbr(op_val, pc, bsp):
+    i = op_val & 0xFF
+    return ([f"_g = (r[0] + sr['gbr']) & 0xFFFFFFFF",
+             f"_v = mem.read8(_g)",
+             f"sr['sr'] = (sr['sr'] & ~1) | (1 if (_v & {i}) == 0 else 0)"], False)
+
+def _gen_andb_gbr(op_val, pc, bsp):
+    i = op_val & 0xFF
+    return ([f"_g = (r[0] + sr['gbr']) & 0xFFFFFFFF",
+             f"_v = mem.read8(_g)",
+             f"mem.write8(_g, _v & {i})"], False)
+
+def _gen_orb_gbr(op_val, pc, bsp):
+    i = op_val & 0xFF
+    return ([f"_g = (r[0] + sr['gbr']) & 0xFFFFFFFF",
+             f"_v = mem.read8(_g)",
+             f"mem.write8(_g, (_v | {i}) & 0xFF)"], False)
+
+def _gen_xorb_gbr(op_val, pc, bsp):
+    i = op_val & 0xFF
+    return ([f"_g = (r[0] + sr['gbr']) & 0xFFFFFFFF",
+             f"_v = mem.read8(_g)",
+             f"mem.write8(_g, (_v ^ {i}) & 0xFF)"], False)
+
+def _gen_tasb(op_val, pc, bsp):
+    n = (op_val >> 8) & 0xF
+    return ([f"_g = r[{n}]",
+             f"_v = mem.read8(_g)",
+             f"sr['sr'] = (sr['sr'] & ~1) | (1 if _v == 0 else 0)",
+             f"mem.write8(_g, _v | 0x80)"], False)
+
+# ---- Register + displacement ----
+
+def _gen_movbl4(op_val, pc, bsp):
+    """MOV.B @(disp,Rm), R0"""
+    m = (op_val >> 4) & 0xF
+    disp = op_val & 0xF
+    return ([f"_v = mem.read8(r[{m}] + {disp})",
+             f"r[0] = (_v - 0x100 if _v & 0x80 else _v) & 0xFFFFFFFF"], False)
+
+def _gen_movwl4(op_val, pc, bsp):
+    """MOV.W @(disp,Rm), R0"""
+    m = (op_val >> 4) & 0xF
+    disp = op_val & 0xF
+    return ([f"_v = mem.read16(r[{m}] + {disp * 2})",
+             f"r[0] = (_v - 0x10000 if _v & 0x8000 else _v) & 0xFFFFFFFF"], False)
+
+def _gen_movll4(op_val, pc, bsp):
+    """MOV.L @(disp,Rm), Rn"""
+    n = (op_val >> 8) & 0xF
+    m = (op_val >> 4) & 0xF
+    disp = op_val & 0xF
+    return ([f"r[{n}] = mem.read32(r[{m}] + {disp * 4})"], False)
+
+def _gen_movbs4(op_val, pc, bsp):
+    """MOV.B R0, @(disp,Rn)"""
+    n = (op_val >> 4) & 0xF
+    disp = op_val & 0xF
+    return ([f"mem.write8(r[{n}] + {disp}, r[0] & 0xFF)"], False)
+
+def _gen_movws4(op_val, pc, bsp):
+    """MOV.W R0, @(disp,Rn)"""
+    n = (op_val >> 4) & 0xF
+    disp = op_val & 0xF
+    return ([f"mem.write16(r[{n}] + {disp * 2}, r[0] & 0xFFFF)"], False)
+
+def _gen_movls4(op_val, pc, bsp):
+    """MOV.L Rm, @(disp,Rn)"""
+    n = (op_val >> 8) & 0xF
+    m = (op_val >> 4) & 0xF
+    disp = op_val & 0xF
+    return ([f"mem.write32(r[{n}] + {disp * 4}, r[{m}])"], False)
+
+def _gen_movca(op_val, pc, bsp):
+    """MOVCA.L R0, @Rn (no cache model: a plain MOV.L)"""
+    n = (op_val >> 8) & 0xF
+    return ([f"mem.write32(r[{n}], r[0])"], False)
+
 # ---- R0-indexed ----
 
 def _gen_movbs0(op_val, pc, bsp):
@@ -469,6 +811,97 @@ def _gen_sts_pr(op_val, pc, bsp):
     n = (op_val >> 8) & 0xF
     return ([f"r[{n}] = sr['pr']"], False)
 
+# LDC/LDS/STC/STS for the remaining control and system registers.
+# `reg` is the expression the interpreter uses for it: sr['gbr'] etc.
+# for Register._sys entries, cpu.ssr/spc/sgr/dbr for the CPU attributes.
+# The value goes through _v so that a `mem.` line never also mentions
+# sr['sr'] (see _allocate_registers).
+
+def _ld(reg, *after):
+    """LDC/LDS Rm, <reg>, then the `after` lines"""
+    def gen(op_val, pc, bsp):
+        m = (op_val >> 8) & 0xF
+        return ([f"{reg} = r[{m}]", *after], False)
+    return gen
+
+def _ldl(reg, *after):
+    """LDC.L/LDS.L @Rm+, <reg>, then the `after` lines"""
+    def gen(op_val, pc, bsp):
+        m = (op_val >> 8) & 0xF
+        return ([f"_v = mem.read32(r[{m}])",
+                 f"{reg} = _v",
+                 f"r[{m}] = (r[{m}] + 4) & 0xFFFFFFFF", *after], False)
+    return gen
+
+def _st(reg):
+    """STC/STS <reg>, Rn"""
+    def gen(op_val, pc, bsp):
+        n = (op_val >> 8) & 0xF
+        return ([f"r[{n}] = {reg}"], False)
+    return gen
+
+def _stl(reg):
+    """STC.L/STS.L <reg>, @-Rn"""
+    def gen(op_val, pc, bsp):
+        n = (op_val >> 8) & 0xF
+        return ([f"r[{n}] = (r[{n}] - 4) & 0xFFFFFFFF",
+                 f"_v = {reg}",
+                 f"mem.write32(r[{n}], _v)"], False)
+    return gen
+
+def _gen_ldc_rbank(op_val, pc, bsp):
+    """LDC Rm, Rn_BANK"""
+    b = (op_val >> 4) & 0x7
+    return _ld(f"sr['r{b}_bank']")(op_val, pc, bsp)
+
+def _gen_ldcl_rbank(op_val, pc, bsp):
+    """LDC.L @Rm+, Rn_BANK"""
+    b = (op_val >> 4) & 0x7
+    return _ldl(f"sr['r{b}_bank']")(op_val, pc, bsp)
+
+def _gen_stc_rbank(op_val, pc, bsp):
+    """STC Rm_BANK, Rn"""
+    b = (op_val >> 4) & 0x7
+    return _st(f"sr['r{b}_bank']")(op_val, pc, bsp)
+
+def _gen_stcl_rbank(op_val, pc, bsp):
+    """STC.L Rm_BANK, @-Rn"""
+    b = (op_val >> 4) & 0x7
+    return _stl(f"sr['r{b}_bank']")(op_val, pc, bsp)
+
+# ---- DSP repeat-loop setup ----
+
+def _gen_ldrs(op_val, pc, bsp):
+    """LDRS @(disp,PC)"""
+    return ([f"sr['rs'] = {(pc + 4 + ((op_val & 0xFF) << 1)) & 0xFFFFFFFF}"], False)
+
+def _gen_ldre(op_val, pc, bsp):
+    """LDRE @(disp,PC)"""
+    return ([f"sr['re'] = {(pc + 4 + ((op_val & 0xFF) << 1)) & 0xFFFFFFFF}"], False)
+
+def _gen_ldrc_imm(op_val, pc, bsp):
+    """LDRC #imm"""
+    return ([f"sr['rc'] = {op_val & 0xFF}"], False)
+
+# ---- SLEEP / TRAPA ----
+
+def _gen_sleep(op_val, pc, bsp):
+    """SLEEP: ends the block unlinked; run() does the fast-forward."""
+    return (["cpu.is_sleeping = True",
+             f"cpu.pc = 0x{pc + 2:X}"], False)
+
+def _gen_trapa(op_val, pc, bsp):
+    """TRAPA #imm: enter the trap handler at VBR + 0x100 (ends the block)."""
+    imm = op_val & 0xFF
+    return ([f"cpu.spc = {(pc + 2) & 0xFFFFFFFF}",
+             f"_v = sr['sr']",
+             f"cpu.ssr = _v",
+             f"cpu.sgr = r[15]",
+             f"cpu.tra = {imm << 2}",
+             f"cpu.expevt = 0x160",
+             f"sr['sr'] = _v | 0xB0000000",
+             f"cpu.pc = (sr['vbr'] + 0x100) & 0xFFFFFFFF"], False)
+
 # ---- NOP ----
 
 def _gen_nop(op_val, pc, bsp):
@@ -508,6 +941,80 @@ def _gen_bt(op_val, pc, bsp):
                  f"cpu.pc = {next_pc}"], False)
 
 
+# ---- Delayed branches ----
+#
+# Same contract as the generators above, plus `slot`: the already
+# generated lines of the delay-slot instruction (compiled at pc + 2).
+# Everything the branch reads (T, Rm, PR, SPC) is sampled *before* the
+# slot runs and PR/SR are written before it, exactly like
+# _exec_delay_slot in the interpreter.  The emitted code always leaves
+# cpu.pc set.  An unconditional branch back to the block start is NOT
+# turned into a `while True:` loop -- nothing inside would ever break
+# out -- so the dispatcher's spin detection still sees it.
+
+def _delayed_cond(op_val, pc, bsp, slot, taken_if_t):
+    disp = op_val & 0xFF
+    if disp & 0x80:
+        disp -= 0x100
+    target = (pc + 4 + (disp << 1)) & 0xFFFFFFFF
+    next_pc = (pc + 4) & 0xFFFFFFFF
+    test = "_taken" if taken_if_t else "not _taken"
+    lines = ["_taken = sr['sr'] & 1"] + slot
+    if target == bsp:
+        return (lines + [f"if {test}: continue",
+                         f"break"], True)
+    return (lines + [f"if {test}:",
+                     f"    cpu.pc = {target}",
+                     f"    return",
+                     f"cpu.pc = {next_pc}"], False)
+
+def _gen_bfs(op_val, pc, bsp, slot):
+    return _delayed_cond(op_val, pc, bsp, slot, False)
+
+def _gen_bts(op_val, pc, bsp, slot):
+    return _delayed_cond(op_val, pc, bsp, slot, True)
+
+def _gen_bra(op_val, pc, bsp, slot):
+    target = (pc + 4 + (_sext12(op_val) << 1)) & 0xFFFFFFFF
+    return (slot + [f"cpu.pc = {target}"], False)
+
+def _gen_bsr(op_val, pc, bsp, slot):
+    target = (pc + 4 + (_sext12(op_val) << 1)) & 0xFFFFFFFF
+    return ([f"sr['pr'] = {(pc + 4) & 0xFFFFFFFF}"] + slot +
+            [f"cpu.pc = {target}"], False)
+
+def _gen_braf(op_val, pc, bsp, slot):
+    m = (op_val >> 8) & 0xF
+    return ([f"_target = ({pc + 4} + r[{m}]) & 0xFFFFFFFF"] + slot +
+            [f"cpu.pc = _target"], False)
+
+def _gen_bsrf(op_val, pc, bsp, slot):
+    m = (op_val >> 8) & 0xF
+    return ([f"_target = ({pc + 4} + r[{m}]) & 0xFFFFFFFF",
+             f"sr['pr'] = {(pc + 4) & 0xFFFFFFFF}"] + slot +
+            [f"cpu.pc = _target"], False)
+
+def _gen_jmp(op_val, pc, bsp, slot):
+    m = (op_val >> 8) & 0xF
+    return ([f"_target = r[{m}]"] + slot + [f"cpu.pc = _target"], False)
+
+def _gen_jsr(op_val, pc, bsp, slot):
+    m = (op_val >> 8) & 0xF
+    return ([f"_target = r[{m}]",
+             f"sr['pr'] = {(pc + 4) & 0xFFFFFFFF}"] + slot +
+            [f"cpu.pc = _target"], False)
+
+def _gen_rts(op_val, pc, bsp, slot):
+    return ([f"_target = sr['pr']"] + slot + [f"cpu.pc = _target"], False)
+
+def _gen_rte(op_val, pc, bsp, slot):
+    # SR is restored from SSR before the delay slot runs.
+    return ([f"_target = cpu.spc & 0xFFFFFFFF",
+             f"sr['sr'] = cpu.ssr & 0xFFFFFFFF",
+             f"cpu.irq_check = True"] + slot +
+            [f"cpu.pc = _target"], False)
+
+
 # ---------------------------------------------------------------------------
 # Code generator registry: op_id -> generator function
 # ---------------------------------------------------------------------------
@@ -530,20 +1037,32 @@ CODE_GENS: Dict[int, Callable] = {
     16: _gen_movbm,     # MOV.B Rm, @-Rn
     17: _gen_movwm,     # MOV.W Rm, @-Rn
     18: _gen_movlm,     # MOV.L Rm, @-Rn
-    # 25-50: indexed/GBR loads -- add as needed
+    25: _gen_movbl4,    # MOV.B @(disp,Rm), R0
+    28: _gen_movwl4,    # MOV.W @(disp,Rm), R0
+    31: _gen_movll4,    # MOV.L @(disp,Rm), Rn
+    33: _gen_movbs4,    # MOV.B R0, @(disp,Rn)
+    35: _gen_movws4,    # MOV.W R0, @(disp,Rn)
+    37: _gen_movls4,    # MOV.L Rm, @(disp,Rn)
     39: _gen_movbl0,    # MOV.B @(R0,Rm), Rn
     40: _gen_movwl0,    # MOV.W @(R0,Rm), Rn
     41: _gen_movll0,    # MOV.L @(R0,Rm), Rn
     42: _gen_movbs0,    # MOV.B Rm, @(R0,Rn)
     43: _gen_movws0,    # MOV.W Rm, @(R0,Rn)
     44: _gen_movls0,    # MOV.L Rm, @(R0,Rn)
+    45: _gen_movbl_gbr, # MOV.B @(disp,GBR), R0
+    46: _gen_movwl_gbr, # MOV.W @(disp,GBR), R0
+    47: _gen_movll_gbr, # MOV.L @(disp,GBR), R0
     48: _gen_movbs_gbr, # MOV.B R0, @(disp,GBR)
     49: _gen_movws_gbr, # MOV.W R0, @(disp,GBR)
     50: _gen_movls_gbr, # MOV.L R0, @(disp,GBR)
     60: _gen_movt,      # MOVT Rn
+    62: _gen_swapb,     # SWAP.B Rm, Rn
+    63: _gen_swapw,     # SWAP.W Rm, Rn
+    64: _gen_xtrct,     # XTRCT Rm, Rn
     79: _gen_add,       # ADD Rm, Rn
     80: _gen_addi,      # ADD #imm, Rn
     81: _gen_addc,      # ADDC Rm, Rn
+    82: _gen_addv,      # ADDV Rm, Rn
     83: _gen_cmpim,     # CMP/EQ #imm, R0
     84: _gen_cmpeq,     # CMP/EQ Rm, Rn
     85: _gen_cmphs,     # CMP/HS Rm, Rn
@@ -552,26 +1071,49 @@ CODE_GENS: Dict[int, Callable] = {
     88: _gen_cmpgt,     # CMP/GT Rm, Rn
     89: _gen_cmppl,     # CMP/PL Rn
     90: _gen_cmppz,     # CMP/PZ Rn
+    91: _gen_cmpstr,    # CMP/STR Rm, Rn
+    96: _gen_div0s,     # DIV0S Rm, Rn
+    97: _gen_div0u,     # DIV0U
+    98: _gen_div1,      # DIV1 Rm, Rn
+    101: _gen_dmuls,    # DMULS.L Rm, Rn
+    102: _gen_dmulu,    # DMULU.L Rm, Rn
     103: _gen_dt,       # DT Rn
+    104: _gen_extsb,    # EXTS.B Rm, Rn
+    105: _gen_extsw,    # EXTS.W Rm, Rn
+    106: _gen_extub,    # EXTU.B Rm, Rn
+    107: _gen_extuw,    # EXTU.W Rm, Rn
+    108: _gen_macl,     # MAC.L @Rm+, @Rn+
+    109: _gen_macw,     # MAC.W @Rm+, @Rn+
+    110: _gen_mull,     # MUL.L Rm, Rn
+    112: _gen_mulsw,    # MULS.W Rm, Rn
+    113: _gen_muluw,    # MULU.W Rm, Rn
     114: _gen_neg,      # NEG Rm, Rn
     115: _gen_negc,     # NEGC Rm, Rn
     116: _gen_sub,      # SUB Rm, Rn
     117: _gen_subc,     # SUBC Rm, Rn
+    118: _gen_subv,     # SUBV Rm, Rn
     119: _gen_and_rm,   # AND Rm, Rn
     120: _gen_and_imm,  # AND #imm, R0
+    121: _gen_andb_gbr, # AND.B #imm, @(R0,GBR)
     122: _gen_not,      # NOT Rm, Rn
     123: _gen_or_rm,    # OR Rm, Rn
     124: _gen_or_imm,   # OR #imm, R0
+    125: _gen_orb_gbr,  # OR.B #imm, @(R0,GBR)
+    126: _gen_tasb,     # TAS.B @Rn
     127: _gen_tst_rm,   # TST Rm, Rn
     128: _gen_tst_imm,  # TST #imm, R0
+    129: _gen_tstb_gbr, # TST.B #imm, @(R0,GBR)
     130: _gen_xor_rm,   # XOR Rm, Rn
     131: _gen_xor_imm,  # XOR #imm, R0
+    132: _gen_xorb_gbr, # XOR.B #imm, @(R0,GBR)
     133: _gen_rotcl,    # ROTCL Rn
     134: _gen_rotcr,    # ROTCR Rn
     135: _gen_rotl,     # ROTL Rn
     136: _gen_rotr,     # ROTR Rn
+    137: _gen_shad,     # SHAD Rm, Rn
     138: _gen_shal,     # SHAL Rn
     139: _gen_shar,     # SHAR Rn
+    140: _gen_shld,     # SHLD Rm, Rn
     141: _gen_shll,     # SHLL Rn
     142: _gen_shll2,    # SHLL2 Rn
     143: _gen_shll8,    # SHLL8 Rn
@@ -585,14 +1127,503 @@ CODE_GENS: Dict[int, Callable] = {
     164: _gen_clrmac,   # CLRMAC
     165: _gen_clrs,     # CLRS
     166: _gen_clrt,     # CLRT
+    169: _ld("sr['sr']", "cpu.irq_check = True"),    # LDC Rm, SR
+    170: _ldl("sr['sr']", "cpu.irq_check = True"),   # LDC.L @Rm+, SR
+    172: _ld("sr['gbr']"),      # LDC Rm, GBR
+    173: _ldl("sr['gbr']"),     # LDC.L @Rm+, GBR
+    174: _ld("sr['vbr']"),      # LDC Rm, VBR
+    175: _ldl("sr['vbr']"),     # LDC.L @Rm+, VBR
+    184: _ld("cpu.ssr"),        # LDC Rm, SSR
+    185: _ldl("cpu.ssr"),       # LDC.L @Rm+, SSR
+    186: _ld("cpu.spc"),        # LDC Rm, SPC
+    187: _ldl("cpu.spc"),       # LDC.L @Rm+, SPC
+    188: _ld("cpu.dbr"),        # LDC Rm, DBR
+    189: _ldl("cpu.dbr"),       # LDC.L @Rm+, DBR
+    190: _gen_ldc_rbank,        # LDC Rm, Rn_BANK
+    191: _gen_ldcl_rbank,       # LDC.L @Rm+, Rn_BANK
+    194: _ld("sr['mach']"),     # LDS Rm, MACH
+    195: _ldl("sr['mach']"),    # LDS.L @Rm+, MACH
+    196: _ld("sr['macl']"),     # LDS Rm, MACL
+    197: _ldl("sr['macl']"),    # LDS.L @Rm+, MACL
     198: _gen_lds_pr,   # LDS Rm, PR
+    199: _ldl("sr['pr']"),      # LDS.L @Rm+, PR
+    200: _ld("sr['rs']"),       # LDS Rm, RS
+    201: _ldl("sr['rs']"),      # LDS.L @Rm+, RS
+    202: _ld("sr['re']"),       # LDS Rm, RE
+    203: _ldl("sr['re']"),      # LDS.L @Rm+, RE
+    204: _ld("sr['rc']"),       # LDS Rm, RC
+    205: _ldl("sr['rc']"),      # LDS.L @Rm+, RC
+    206: _ld("sr['mod']"),      # LDS Rm, MOD
+    207: _ld("sr['dsr']"),      # LDS Rm, DSR
+    208: _st("sr['rs']"),       # STS RS, Rn
+    209: _stl("sr['rs']"),      # STS.L RS, @-Rn
+    210: _st("sr['re']"),       # STS RE, Rn
+    211: _stl("sr['re']"),      # STS.L RE, @-Rn
+    212: _gen_nop,      # LDTLB (no MMU model)
+    213: _gen_movca,    # MOVCA.L R0, @Rn
     214: _gen_nop,      # NOP
+    215: _gen_nop,      # OCBI @Rn (no cache model)
+    216: _gen_nop,      # OCBP @Rn
+    217: _gen_nop,      # OCBWB @Rn
+    218: _gen_nop,      # PREF @Rn
     225: _gen_sett,     # SETT
     224: _gen_sets,     # SETS
+    226: _gen_sleep,    # SLEEP
+    228: _st("sr['sr']"),       # STC SR, Rn
+    229: _stl("sr['sr']"),      # STC.L SR, @-Rn
+    231: _st("sr['gbr']"),      # STC GBR, Rn
+    232: _stl("sr['gbr']"),     # STC.L GBR, @-Rn
+    233: _st("sr['vbr']"),      # STC VBR, Rn
+    234: _stl("sr['vbr']"),     # STC.L VBR, @-Rn
+    241: _st("cpu.sgr"),        # STC SGR, Rn
+    242: _stl("cpu.sgr"),       # STC.L SGR, @-Rn
+    243: _st("cpu.ssr"),        # STC SSR, Rn
+    244: _stl("cpu.ssr"),       # STC.L SSR, @-Rn
+    245: _st("cpu.spc"),        # STC SPC, Rn
+    246: _stl("cpu.spc"),       # STC.L SPC, @-Rn
+    247: _st("cpu.dbr"),        # STC DBR, Rn
+    248: _stl("cpu.dbr"),       # STC.L DBR, @-Rn
+    249: _gen_stc_rbank,        # STC Rm_BANK, Rn
+    250: _gen_stcl_rbank,       # STC.L Rm_BANK, @-Rn
+    251: _st("sr['mach']"),     # STS MACH, Rn
+    252: _stl("sr['mach']"),    # STS.L MACH, @-Rn
+    253: _st("sr['macl']"),     # STS MACL, Rn
+    254: _stl("sr['macl']"),    # STS.L MACL, @-Rn
     255: _gen_sts_pr,   # STS PR, Rn
+    256: _stl("sr['pr']"),      # STS.L PR, @-Rn
+    270: _gen_trapa,    # TRAPA #imm
+    271: _st("sr['rc']"),       # STS RC, Rn
+    272: _stl("sr['rc']"),      # STS.L RC, @-Rn
+    273: _gen_ldrs,     # LDRS @(disp,PC)
+    274: _gen_ldre,     # LDRE @(disp,PC)
+    275: _gen_ldrc_imm, # LDRC #imm
+    276: _ld("sr['rc']"),       # LDRC Rm
+    300: _gen_nop,      # ICBI @Rn
+    301: _gen_nop,      # PREFI @Rn
+    302: _gen_nop,      # SYNCO
+}
+
+# Delayed branches: op_id -> generator(op_val, pc, bsp, slot_lines)
+DELAYED_GENS: Dict[int, Callable] = {
+    150: _gen_bfs,      # BF/S disp
+    152: _gen_bts,      # BT/S disp
+    153: _gen_bra,      # BRA disp
+    154: _gen_braf,     # BRAF Rm
+    155: _gen_bsr,      # BSR disp
+    156: _gen_bsrf,     # BSRF Rm
+    157: _gen_jmp,      # JMP @Rm
+    158: _gen_jsr,      # JSR @Rm
+    161: _gen_rts,      # RTS
+    221: _gen_rte,      # RTE
 }
 
 
+# ---------------------------------------------------------------------------
+# Block chaining
+#
+# A compiled block whose exit goes to a constant PC ends in
+#     cpu.pc = <target>
+#     return _L[i]
+# where `_L` is the block's own link list (a global of its exec
+# namespace).  _L[i] holds the successor's compiled function once that
+# block is compiled, or None; JITCompiler.run keeps calling whatever a
+# block returns, so linked blocks run back to back without going
+# through the dispatcher's cache lookup, hotness and spin bookkeeping.
+# Indirect exits (JMP/JSR/RTS/RTE/BRAF/BSRF) return None.
+# ---------------------------------------------------------------------------
+
+_EXIT_RE = re.compile(r'^(\s*)cpu\.pc = (\d+)$')
+
+
+def _link_exits(lines: List[str], start_pc: int, count: str) -> Tuple[List[str], List[int]]:
+    """
+    Rewrite the constant-PC exits in a block's function source into
+    `return _L[i], count` and every other exit into `return None, count`
+    (`count` is the expression for the instructions executed).  Returns
+    (lines, targets) with targets[i] the PC that slot i links to.  Exits
+    back to the block itself are left unlinked so the dispatcher still
+    notices a block spinning on itself.
+    """
+    out: List[str] = []
+    targets: List[int] = []
+    n = len(lines)
+    i = 0
+    while i < n:
+        line = lines[i]
+        i += 1
+        if line.strip() == "return":
+            out.append(f"{line}{' None, ' + count}")
+            continue
+        out.append(line)
+        m = _EXIT_RE.match(line)
+        if m is None or int(m.group(2)) == start_pc:
+            continue
+        indent = m.group(1)
+        if i < n and lines[i] == f"{indent}return":
+            i += 1  # replaced below
+        elif not (i == n and indent == "    "):
+            continue  # a PC update that isn't an exit
+        out.append(f"{indent}return _L[{len(targets)}], {count}")
+        targets.append(int(m.group(2)))
+    if not out[-1].lstrip().startswith("return "):
+        out.append(f"    return None, {count}")
+    return out, targets
+
+
+# ---------------------------------------------------------------------------
+# Inline memory access
+#
+# The generators emit loads and stores against the MemoryMap
+# (`X = mem.readN(addr)` / `mem.writeN(addr, val)`); _inline_memory
+# rewrites them so that addresses in the JIT's fast windows (RAM and its
+# P2 mirror, ILRAM, XRAM -- see JITCompiler.FAST_REGIONS) touch the
+# backing bytearray directly:
+#
+#     _a = r[4]
+#     if 0 <= (_o := (_a & 0xDFFFFFFF) - 0x8C000000) <= 0xFFFC:
+#         r[5] = _R32(_M0, _o)[0]
+#     elif 0 <= (_o := _a - 0xE5200000) <= 0xFFC:
+#         r[5] = _R32(_M1, _o)[0]
+#     else:
+#         r[5] = mem.read32(_a)
+#
+# Stores check the window's executable-page bitmap (_Ck) and report
+# writes over compiled code (_Xk = Memory._code_written), exactly like
+# Memory.writeN.  Only the `else:` fallback can reach MMIO, so that is
+# where _allocate_registers writes dirty registers back.  Constant
+# addresses (PC-relative loads) are resolved at compile time against
+# every plain-Memory window, ROM included.
+#
+# Each window is (k, start, end, mask, base): `_Mk` is the bytearray of
+# the region mapped at `base`, [start, end) the part of it the window
+# covers, and `mask` is 0xDFFFFFFF when the same Memory is also mapped
+# 0x20000000 higher (P1/P2 mirrors), so one guard covers both.  A region
+# splits into several windows around the pages a data watchpoint covers
+# (MemoryMap.watched_spans), which must keep going through the map.
+# ---------------------------------------------------------------------------
+
+_R16 = struct.Struct('>H').unpack_from
+_R32 = struct.Struct('>I').unpack_from
+_W16 = struct.Struct('>H').pack_into
+_W32 = struct.Struct('>I').pack_into
+
+_LOAD_RE = re.compile(r'^(\s*)(.+?) = mem\.read(8|16|32)\((.*)\)$')
+_STORE_RE = re.compile(r'^(\s*)mem\.write(8|16|32)\((.*)\)$')
+_SIMPLE_ADDR_RE = re.compile(r'^(?:r\[\d+\]|_\w+)$')
+_WIDTH_MASK = {8: 0xFF, 16: 0xFFFF, 32: 0xFFFFFFFF}
+
+
+def _split_args(args: str) -> Tuple[str, str]:
+    """Split `addr, val` at the top-level comma."""
+    depth = 0
+    for i, c in enumerate(args):
+        if c in '([':
+            depth += 1
+        elif c in ')]':
+            depth -= 1
+        elif c == ',' and depth == 0:
+            return args[:i].strip(), args[i + 1:].strip()
+    raise ValueError(f"bad store arguments: {args!r}")
+
+
+def _fast_read(k, width, off):
+    if width == 8:
+        return f"_M{k}[{off}]"
+    return f"_R{width}(_M{k}, {off})[0]"
+
+
+def _fast_write(k, width, off, val):
+    if width == 8:
+        return f"_M{k}[{off}] = {val}"
+    return f"_W{width}(_M{k}, {off}, {val})"
+
+
+def _inline_memory(lines: List[str], chain: List[tuple], direct: List[tuple]) -> List[str]:
+    """Give the block's MemoryMap accesses an inline fast path."""
+    out: List[str] = []
+    for line in lines:
+        load = _LOAD_RE.match(line)
+        store = None if load else _STORE_RE.match(line)
+        if load is None and store is None:
+            out.append(line)
+            continue
+        if load is not None:
+            ind, dest, width, addr = load.group(1), load.group(2), int(load.group(3)), load.group(4).strip()
+        else:
+            ind, width = store.group(1), int(store.group(2))
+            addr, val = _split_args(store.group(3))
+            mask = _WIDTH_MASK[width]
+            if not (val.endswith(f"& 0x{mask:X}")
+                    or (width == 32 and _REG_RE.fullmatch(val))):
+                val = f"({val}) & 0x{mask:X}"
+        size = width >> 3
+
+        if addr.isdigit():
+            # Constant address: pick the window now
+            a = int(addr)
+            for k, start, end, _, base in direct:
+                if start <= a and a + size <= end and load is not None:
+                    out.append(f"{ind}{dest} = {_fast_read(k, width, a - base)}")
+                    break
+            else:
+                out.append(line)
+            continue
+        if not chain:
+            out.append(line)
+            continue
+
+        if not _SIMPLE_ADDR_RE.match(addr):
+            out.append(f"{ind}_a = ({addr}) & 0xFFFFFFFF")
+            addr = "_a"
+        for i, (k, start, end, amask, base) in enumerate(chain):
+            kw = "if" if i == 0 else "elif"
+            a = f"({addr} & 0x{amask:X})" if amask is not None else addr
+            lo = "0" if start == base else f"0x{start - base:X}"
+            out.append(f"{ind}{kw} {lo} <= (_o := {a} - 0x{base:X}) <= 0x{end - base - size:X}:")
+            if load is not None:
+                out.append(f"{ind}    {dest} = {_fast_read(k, width, '_o')}")
+            else:
+                out.append(f"{ind}    {_fast_write(k, width, '_o', val)}")
+                out.append(f"{ind}    if _C{k}[_o >> {CODE_PAGE_SHIFT}]: _X{k}(_o, {size})")
+        out.append(f"{ind}else:")
+        if load is not None:
+            out.append(f"{ind}    {dest} = mem.read{width}({addr})")
+        else:
+            out.append(f"{ind}    mem.write{width}({addr}, {val})")
+    return out
+
+
+# ---------------------------------------------------------------------------
+# Register allocation
+#
+# The generators above are written against the architectural state:
+# `r[n]` (Register._r) and `sr['sr']` (Register._sys).  _allocate_registers
+# rewrites a block's finished source so that
+#   - every r[n] the block touches lives in a local `rn`, loaded once on
+#     entry;
+#   - the T bit lives in the local `T` (0/1); the usual generator idioms
+#     for reading/setting/clearing T become plain local accesses, any
+#     other use of sr['sr'] syncs T out before and back in after;
+#   - written registers (and T) are stored back before every `return`
+#     and at the end of the function, and registers dirtied since the
+#     last store are written back before every `mem.` access, which may
+#     reach MMIO or raise (the dispatcher then sees exact state).  An
+#     access that is the `else:` fallback of an inline fast path (see
+#     _inline_memory) writes them back without marking them clean, as
+#     the fast path didn't.
+# Inside a `while True:` self-loop everything the loop body writes is
+# considered dirty at the top of the body.
+#
+# Which lines write which registers comes from the rewritten source's
+# syntax tree (_register_stores), so any form of assignment counts.  A
+# block whose source still reaches the register file some other way --
+# a computed r[...] index, `r`, `sr` or `mem` handed to a helper, or
+# cpu.regs -- can't be allocated and isn't compiled.
+# ---------------------------------------------------------------------------
+
+_REG_RE = re.compile(r'\br\[(\d+)\]')
+_LOCAL_REG_RE = re.compile(r'r(\d+)')
+_T_SET_RE = re.compile(r"^(\s*)sr\['sr'\] = \(sr\['sr'\] & ~1\) \| (.*)$")
+_T_NAME_RE = re.compile(r'\bT\b')
+
+
+def _indent_of(line: str) -> str:
+    return line[:len(line) - len(line.lstrip())]
+
+
+def _register_stores(body: List[str]) -> List[set]:
+    """
+    For each line of a rewritten function body, the registers (n for the
+    local `rn`, 'T' for T) it assigns to.  Raises ValueError if the body
+    reaches the register file other than through constant r[n] (already
+    rewritten), sr[<name>] and mem.<method>.
+    """
+    tree = ast.parse("def _f():\n" + "".join(line + "\n" for line in body) + "    pass")
+    stores: List[set] = [set() for _ in body]
+    wrapped = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Subscript) and isinstance(node.value, ast.Name):
+            name = node.value.id
+            if name == 'r' or (name == 'sr' and not (isinstance(node.slice, ast.Constant)
+                                                     and isinstance(node.slice.value, str))):
+                raise ValueError(f"unallocated register access on line {node.lineno - 1}")
+            wrapped.add(id(node.value))
+        elif isinstance(node, ast.Attribute):
+            if isinstance(node.value, ast.Name):
+                if node.value.id == 'mem':
+                    wrapped.add(id(node.value))
+                elif node.value.id == 'cpu' and node.attr == 'regs':
+                    raise ValueError(f"cpu.regs used on line {node.lineno - 1}")
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Name):
+            continue
+        if node.id in ('r', 'sr', 'mem') and id(node) not in wrapped:
+            raise ValueError(f"`{node.id}` used directly on line {node.lineno - 1}")
+        if isinstance(node.ctx, ast.Store):
+            m = _LOCAL_REG_RE.fullmatch(node.id)
+            if m is not None and int(m.group(1)) < 16:
+                stores[node.lineno - 2].add(int(m.group(1)))
+            elif node.id == 'T':
+                stores[node.lineno - 2].add('T')
+    return stores
+
+
+def _allocate_registers(lines: List[str]) -> List[str]:
+    """Cache registers and T in locals for a block's function source.
+    Raises ValueError if the source can't be allocated (see above)."""
+    head, body = lines[:4], lines[4:]   # def + r/sr/mem setup
+
+    # 1. Rewrite register and T accesses
+    rewritten: List[str] = []
+    for line in body:
+        line = _REG_RE.sub(r'r\1', line)
+        ind = _indent_of(line)
+        m = _T_SET_RE.match(line)
+        if m is not None:
+            rewritten.append(f"{ind}T = {m.group(2)}")
+            continue
+        stripped = line.strip()
+        if stripped == "sr['sr'] |= 1":
+            rewritten.append(f"{ind}T = 1")
+            continue
+        if stripped == "sr['sr'] &= ~1":
+            rewritten.append(f"{ind}T = 0")
+            continue
+        line = line.replace("sr['sr'] & 1", "T")
+        if "sr['sr']" in line:
+            # Needs the whole SR: sync T around it
+            rewritten.append(f"{ind}sr['sr'] = (sr['sr'] & ~1) | T")
+            rewritten.append(line)
+            rewritten.append(f"{ind}T = sr['sr'] & 1")
+            continue
+        rewritten.append(line)
+
+    stores = _register_stores(rewritten)
+    used = sorted({int(n) for line in rewritten for n in re.findall(r'\br(\d+)\b', line)
+                   if int(n) < 16})
+    written = sorted({n for regs in stores for n in regs if n != 'T'})
+    uses_t = any(_T_NAME_RE.search(line) for line in rewritten)
+    writes_t = any('T' in regs for regs in stores)
+
+    def store(regs, ind, t):
+        out = [f"{ind}r[{n}] = r{n}" for n in regs]
+        if t:
+            out.append(f"{ind}sr['sr'] = (sr['sr'] & ~1) | T")
+        return out
+
+    # 2. Loads on entry
+    out = list(head)
+    out.extend(f"    r{n} = r[{n}]" for n in used)
+    if uses_t:
+        out.append("    T = sr['sr'] & 1")
+
+    # Registers written inside the self-loop body (dirty at its top)
+    loop_written = set()
+    loop_t = False
+    in_loop = False
+    for line, regs in zip(rewritten, stores):
+        if line == "    while True:":
+            in_loop = True
+            continue
+        if in_loop and not line.startswith("        "):
+            break
+        if in_loop:
+            loop_written |= regs - {'T'}
+            loop_t = loop_t or 'T' in regs
+
+    # 3. Stores before exits and MMIO-capable accesses
+    dirty = set()
+    dirty_t = False
+    prev = ""
+    for line, regs in zip(rewritten, stores):
+        ind = _indent_of(line)
+        stripped = line.strip()
+        if line == "    while True:":
+            out.append(line)
+            dirty |= loop_written
+            dirty_t = dirty_t or loop_t
+            continue
+        if stripped == "return" or stripped.startswith("return "):
+            out.extend(store(written, ind, writes_t))
+        elif "mem." in line:
+            out.extend(store(sorted(dirty), ind, dirty_t))
+            if prev.strip() != "else:":
+                dirty.clear()
+                dirty_t = False
+        out.append(line)
+        prev = line
+        dirty |= regs - {'T'}
+        if 'T' in regs:
+            # Set, or just reloaded from sr['sr']
+            dirty_t = "sr['sr']" not in stripped
+
+    last = out[-1].strip()
+    if not (last == "return" or last.startswith("return ")):
+        out.extend(store(written, "    ", writes_t))
+    return out
+
+
+# ---------------------------------------------------------------------------
+# Code tracking (self-modifying code / reloads)
+# ---------------------------------------------------------------------------
+
+class CodeTracker:
+    """Drop cached blocks when the guest writes over the code they came from.
+
+    Every compiled block registers the guest range it was decoded from.
+    The pages of that range are flagged in the backing Memory (see
+    Memory.mark_code); a later write to a flagged page calls back here and
+    only the blocks registered on that page are evicted from `caches`
+    (all dicts keyed by block start PC).  Pages are tracked per backing
+    Memory object, so a write through the P2 mirror of RAM also evicts
+    blocks compiled from the P1 address.
+    """
+
+    def __init__(self, cpu, caches: List[dict]):
+        self.cpu = cpu
+        self.caches = caches
+        # (id(mem), page) -> set of block start PCs
+        self._pages: Dict[Tuple[int, int], set] = {}
+        # Called with each evicted block start PC (JIT unlinking)
+        self.listeners: List[Callable] = []
+        self.invalidated = 0
+
+    def track(self, start_pc: int, end_pc: int, key: Optional[int] = None):
+        """Register a block decoded from guest addresses [start_pc, end_pc).
+
+        `key` is the cache PC to evict on a write (defaults to start_pc;
+        a compiled region registers each member under its head).
+        """
+        mem = self.cpu.mem
+        try:
+            if hasattr(mem, 'resolve'):
+                region, base = mem.mark_code(start_pc, end_pc, self._on_code_write)
+            else:
+                region, base = mem, 0
+                region.mark_code(start_pc, end_pc, self._on_code_write)
+        except (IndexError, AttributeError, TypeError):
+            return  # unmapped or not a plain Memory (MMIO) -- nothing to watch
+        region_key = id(region)
+        pc = start_pc if key is None else key
+        off = start_pc - base
+        for page in range(off >> CODE_PAGE_SHIFT, ((max(end_pc, start_pc + 1) - base - 1) >> CODE_PAGE_SHIFT) + 1):
+            self._pages.setdefault((region_key, page), set()).add(pc)
+
+    def _on_code_write(self, mem, page: int):
+        pcs = self._pages.pop((id(mem), page), None)
+        if not pcs:
+            return
+        for pc in pcs:
+            for cache in self.caches:
+                cache.pop(pc, None)
+            for listener in self.listeners:
+                listener(pc)
+        self.invalidated += len(pcs)
+
+    def clear(self):
+        self._pages.clear()
+
+
 # ---------------------------------------------------------------------------
 # Block runner (Phase 1: block cache)
 # ---------------------------------------------------------------------------
@@ -603,64 +1634,93 @@ class BlockRunner:
     def __init__(self, cpu):
         self.cpu = cpu
         self.block_cache: Dict[int, list] = {}
+        # pc -> cycles of the cached block, with cpu.cycle_costs (its
+        # delay slot is counted by _exec_delay_slot)
+        self.block_costs: Dict[int, int] = {}
+        self.tracker = CodeTracker(cpu, [self.block_cache, self.block_costs])
         self._build_branch_tables()
 
     def _build_branch_tables(self):
-        """Identify which op_vals are branches."""
-        emu = self.cpu.emulator
-        self.is_branch = [False] * 65536
-        # Build a set of branch handler objects
-        branch_handlers = set()
-        for op_id in BRANCH_OP_IDS:
-            h = emu._resolve_table.get(op_id)
-            if h is not None:
-                branch_handlers.add(h)
-        for op_val in range(65536):
-            entry = emu._dispatch[op_val]
-            if entry is not None and entry[0] in branch_handlers:
-                self.is_branch[op_val] = True
+        """Identify which op_vals end a block (branches and SLEEP)."""
+        decode = self.cpu.emulator._decode
+        self.is_branch = [d is not None and d[0] in BLOCK_END_OP_IDS
+                          for d in decode]
 
     def _compile_block(self, start_pc: int) -> list:
         """Decode instructions from start_pc until a branch. Return ops list."""
         ops = []
         pc = start_pc
         mem = self.cpu.mem
+        fetch = getattr(mem, 'fetch16', mem.read16)
         dispatch = self.cpu.emulator._dispatch
+        costs = self.cpu.cycle_costs
+        cycles = 0
         max_len = 256  # safety limit
 
         for _ in range(max_len):
             if pc > 0xFFFFFFFE:
                 break
-            op_val = mem.read16(pc)
+            op_val = fetch(pc)
             entry = dispatch[op_val]
             if entry is None:
                 break  # unknown instruction
             ops.append(entry)
+            if costs is not None:
+                cycles += costs[op_val]
             pc += 2
             if self.is_branch[op_val]:
                 break
 
+        if costs is not None:
+            self.block_costs[start_pc] = cycles
+        self.tracker.track(start_pc, max(pc, start_pc + 2))
         return ops
 
+    def run_watched(self, ops: list) -> int:
+        """Run `ops` like the plain loop, but stop after the one that hit
+        a data watchpoint.  Returns how many ran."""
+        mem = self.cpu.mem
+        n = 0
+        for handler, args in ops:
+            handler(*args)
+            n += 1
+            if mem.watch_hit is not None:
+                break
+        return n
+
     def run(self, max_steps: int = 10000000) -> int:
-        """Run using block caching. Much faster than step() loop."""
+        """Run using block caching. Much faster than step() loop.
+
+        Returns the number of instructions executed (whole blocks, so
+        up to one block past max_steps).  With data watchpoints set, stops
+        right after the instruction that hit one (see MemoryMap.watch_hit).
+        """
         cpu = self.cpu
         cache = self.block_cache
         get_block = self._compile_block
+        watched = getattr(cpu.mem, 'watchpoints', None)
 
         n = 0
         last = 0; lc = 0
         try:
-            for s in range(max_steps):
+            while n < max_steps:
+                if cpu.irq_check and cpu.check_interrupts():
+                    n += 1
+                    continue
                 pc = cpu.pc
                 ops = cache.get(pc)
                 if ops is None:
                     ops = get_block(pc)
                     cache[pc] = ops
 
-                for handler, args in ops:
-                    handler(*args)
-                n = s + 1
+                if watched:
+                    n += self.run_watched(ops)
+                    if cpu.mem.watch_hit is not None:
+                        break
+                else:
+                    for handler, args in ops:
+                        handler(*args)
+                    n += len(ops)
 
                 if cpu.pc == last:
                     lc += 1
@@ -685,6 +1745,10 @@ class JITCompiler:
     Falls back to BlockRunner (Phase 1) for blocks that can't be JIT'd.
     """
 
+    # Memory regions (MemoryMap names) whose loads/stores get an inline
+    # fast path, in guard order.
+    FAST_REGIONS = ("RAM", "ILRAM", "XRAM")
+
     def __init__(self, cpu):
         self.cpu = cpu
         # Phase 1 fallback
@@ -694,99 +1758,381 @@ class JITCompiler:
         # Hotness counter
         self.hotness: Dict[int, int] = {}
         self.threshold = 5  # compile after 5 executions
+        # Evict compiled functions (and restart hotness) on code writes
+        self.tracker = self.block_runner.tracker
+        # Hot blocks that failed to compile: pc -> reason (see _gen_block)
+        self._failed: Dict[int, str] = {}
+        # Polling loops seen spinning: pc -> _poll_loop() info or None
+        self._polls: Dict[int, Optional[tuple]] = {}
+        self.tracker.caches.extend((self.jit_cache, self.hotness, self._failed, self._polls))
+        self.tracker.listeners.append(self._unlink)
+        # Block chaining: target pc -> [(link list, slot)] pointing at it,
+        # and block pc -> (its link list, its exit targets)
+        self._links_to: Dict[int, List[Tuple[list, int]]] = {}
+        self._linked: Dict[int, Tuple[list, List[int]]] = {}
         self._jit_count = 0
         self._fallback_count = 0
-
-    def _jit_compile(self, start_pc: int) -> Optional[Callable]:
-        """Generate Python source for a block, exec it, return the function."""
-        cpu = self.cpu
-        mem = cpu.mem
-        dispatch = cpu.emulator._dispatch
+        self._chained = 0
+        self._region_count = 0
+        # Coverage: compiled block calls, and fallback runs per reason
+        self._compiled_runs = 0
+        self._blocked: Dict[str, int] = {}
+        self._miss = ""
+        # Instructions the current run() had executed when it last
+        # updated cpu.scheduler or checked for an interrupt (interrupt
+        # and scheduler hooks read it, see ruk.jcore.replay)
+        self.steps = 0
+        # Compiled code bakes in the watched pages: recompile on changes
+        if hasattr(cpu.mem, 'layout_listeners'):
+            cpu.mem.layout_listeners.append(self.flush)
+
+    def _watching(self) -> bool:
+        """Whether the memory map has data watchpoints set."""
+        return bool(getattr(self.cpu.mem, 'watchpoints', None))
+
+    def _gen_block(self, start_pc: int, bsp: int) -> Optional[Tuple[List[str], bool, int, int]]:
+        """
+        Generate the (unindented) body of the block at `start_pc`.
+
+        `bsp` is the PC a branch must target to be emitted as a self-loop
+        (`continue`/`break`); region members pass -1 so every exit is a
+        plain `cpu.pc = ...`.  Returns (body_lines, is_self_loop, end_pc,
+        steps) or None if the block can't be compiled, with the reason in
+        self._miss; `steps` counts a delayed branch and its slot as one,
+        like cpu.step().  Like BlockRunner._compile_block, the block stops
+        in front of an instruction with no decode entry (DSP ops).
+
+        With data watchpoints set, every instruction that touches memory
+        first stores its PC in cpu.pc (for MemoryMap.watch_hit) and is
+        followed by an exit on a hit; that exit returns `_WSTEP + k`
+        instructions, which the caller rewrites for its step counter.
+        """
+        mem = self.cpu.mem
+        fetch = getattr(mem, 'fetch16', mem.read16)
+        decode = self.cpu.emulator._decode
         is_branch = self.block_runner.is_branch
+        watching = self._watching()
 
         # Walk instructions and generate code
         body_lines = []
         is_self_loop = False
+        ends_with_branch = False
         pc = start_pc
+        steps = 0
         max_len = 256
 
         for _ in range(max_len):
             if pc > 0xFFFFFFFE:
                 break
-            op_val = mem.read16(pc)
+            op_val = fetch(pc)
 
-            # Find the op_id for this opcode
-            entry = dispatch[op_val]
+            # The shared decode table already knows the op_id
+            entry = decode[op_val]
             if entry is None:
-                return None  # can't JIT unknown instructions
-
-            # Look up the code generator by finding which op_id matches
-            # We need a reverse map from handler -> op_id
-            # Actually, we can build this once at init
-            op_id = self._handler_to_op_id.get(id(entry[0]))
-            if op_id is None:
-                return None  # no code generator for this instruction
+                if steps:
+                    break
+                self._miss = "undecoded"
+                return None
+            op_id = entry[0]
+
+            dgen = DELAYED_GENS.get(op_id)
+            if dgen is not None:
+                # Compile the delay-slot instruction inline.  A branch
+                # in the slot is illegal on the SH-4 -- leave it to the
+                # interpreter.
+                slot_pc = pc + 2
+                slot_val = fetch(slot_pc)
+                slot_entry = decode[slot_val]
+                if slot_entry is None or is_branch[slot_val]:
+                    self._miss = "delay slot"
+                    return None
+                slot_gen = CODE_GENS.get(slot_entry[0])
+                if slot_gen is None:
+                    self._miss = f"op {slot_entry[0]}"
+                    return None
+                slot = slot_gen(slot_val, slot_pc, bsp)
+                if slot is None:
+                    self._miss = f"op {slot_entry[0]}"
+                    return None
+                lines, self_loop_br = dgen(op_val, pc, bsp, slot[0])
+                if watching and any('mem.' in line for line in slot[0]):
+                    body_lines.append(f"cpu.pc = 0x{slot_pc:X}")
+                body_lines.extend(lines)
+                if self_loop_br:
+                    is_self_loop = True
+                pc += 4
+                steps += 1
+                ends_with_branch = True
+                break
 
             gen = CODE_GENS.get(op_id)
-            if gen is None:
-                return None  # no code generator
-
-            result = gen(op_val, pc, start_pc)
+            result = None if gen is None else gen(op_val, pc, bsp)
             if result is None:
+                self._miss = f"op {op_id}"
                 return None
 
             lines, self_loop_br = result
+            touches_mem = watching and any('mem.' in line for line in lines)
+            if touches_mem:
+                body_lines.append(f"cpu.pc = 0x{pc:X}")
             body_lines.extend(lines)
             if self_loop_br:
                 is_self_loop = True
 
             pc += 2
+            steps += 1
+
+            if touches_mem and not is_branch[op_val]:
+                body_lines.append("if mem.watch_hit is not None:")
+                body_lines.append(f"    cpu.pc = 0x{pc:X}")
+                body_lines.append(f"    return None, _WSTEP + {steps}")
 
             if is_branch[op_val]:
+                # BF/BT/TRAPA/SLEEP set cpu.pc on every path
+                ends_with_branch = True
                 break
 
-        if not body_lines and not is_self_loop:
-            # Empty block (just a NOP?) -- set PC and return
+        # If the block doesn't end with a branch (which sets cpu.pc
+        # itself), set PC to the fall-through address
+        if not is_self_loop and not ends_with_branch:
             body_lines.append(f"cpu.pc = {pc}")
 
-        # If the block doesn't end with a branch, set PC to the next instruction
-        if not is_self_loop:
-            # Check if the last instruction was a branch (it would have set cpu.pc)
-            # If not, set cpu.pc to the fall-through address
-            last_gen = CODE_GENS.get(op_id)
-            if last_gen not in (_gen_bf, _gen_bt):
-                body_lines.append(f"cpu.pc = {pc}")
+        return body_lines, is_self_loop, pc, steps
+
+    def _jit_compile(self, start_pc: int) -> Optional[Callable]:
+        """Generate Python source for a block (or a hot region starting
+        at it), exec it, return the function."""
+        fn = self._compile_region(start_pc)
+        if fn is not None:
+            return fn
+
+        block = self._gen_block(start_pc, start_pc)
+        if block is None:
+            return None
+        body_lines, is_self_loop, pc, size = block
+        stop = " or mem.watch_hit is not None" if self._watching() else ""
 
         # Build the function source
+        source_lines = ["def _jit_fn(cpu, _budget):"]
+        source_lines.append("    r = cpu.regs._r")
+        source_lines.append("    sr = cpu.regs._sys")
+        source_lines.append("    mem = cpu.mem")
         if is_self_loop:
-            # Wrap in while True for loop optimization
-            source_lines = ["def _jit_fn(cpu):"]
-            source_lines.append("    r = cpu.regs._r")
-            source_lines.append("    sr = cpu.regs._sys")
-            source_lines.append("    mem = cpu.mem")
+            # Wrap in while True for loop optimization, leaving at the
+            # loop head once the budget is used up
+            source_lines.append("    _c = 0")
             source_lines.append("    while True:")
+            source_lines.append(f"        if _c >= _budget{stop}:")
+            source_lines.append(f"            cpu.pc = {start_pc}")
+            source_lines.append("            return None, _c")
+            source_lines.append(f"        _c += {size}")
             for line in body_lines:
-                source_lines.append(f"        {line}")
+                source_lines.append(f"        {line.replace('_WSTEP', f'_c - {size}')}")
             # After break: set exit PC
             source_lines.append(f"    cpu.pc = {pc}")
+            count = "_c"
         else:
-            source_lines = ["def _jit_fn(cpu):"]
-            source_lines.append("    r = cpu.regs._r")
-            source_lines.append("    sr = cpu.regs._sys")
-            source_lines.append("    mem = cpu.mem")
             for line in body_lines:
-                source_lines.append(f"    {line}")
-
+                source_lines.append(f"    {line.replace('_WSTEP + ', '')}")
+            count = str(size)
+
+        return self._finish(source_lines, start_pc, count, [(start_pc, pc)], size)
+
+    # ---- Region compilation ----
+    #
+    # A loop whose body spans several blocks (if/else inside a loop, a
+    # loop closed by BRA, ...) would go through the dispatcher, or at
+    # best a chain link, once per block per iteration.  When the block
+    # at the head of such a loop gets hot, _find_region collects the
+    # blocks reachable from it through static exits that have already
+    # run (they have a hotness count or a cache entry) and that lead
+    # back to it, and _compile_region emits them as one function:
+    #
+    #     _b = 0
+    #     while True:
+    #         if _b == 0:
+    #             <block 0>          # in-region exit: _b = k; continue
+    #         elif _b == 1:
+    #             <block 1>          # other exits: cpu.pc = ...; return
+    #
+    # Control only leaves the function at real region exits, which are
+    # linked like any other block exit, or at an in-region transition
+    # once the budget is used up (`_c` counts the instructions run).
+
+    MAX_REGION_BLOCKS = 8
+
+    def _find_region(self, head: int) -> Tuple[List[int], Dict[int, tuple]]:
+        """Return (member PCs with `head` first, their generated blocks)."""
+        seen = self.hotness
+        cached = self.jit_cache
+        block_cache = self.block_runner.block_cache
+        blocks: Dict[int, tuple] = {}
+        succs: Dict[int, List[int]] = {}
+        order = [head]
+        i = 0
+        while i < len(order) and len(order) <= self.MAX_REGION_BLOCKS:
+            pc = order[i]
+            i += 1
+            block = self._gen_block(pc, -1)
+            if block is None:
+                if pc == head:
+                    return [], {}
+                order.remove(pc)
+                i -= 1
+                continue
+            blocks[pc] = block
+            succs[pc] = []
+            for line in block[0]:
+                m = _EXIT_RE.match(line)
+                if m is None:
+                    continue
+                target = int(m.group(2))
+                succs[pc].append(target)
+                if target in order or len(order) >= self.MAX_REGION_BLOCKS:
+                    continue
+                if target in seen or target in cached or target in block_cache:
+                    order.append(target)
+
+        # Keep only blocks on a cycle through the head
+        members = set(blocks)
+        back = {head}
+        changed = True
+        while changed:
+            changed = False
+            for pc in members - back:
+                if any(t in back for t in succs[pc]):
+                    back.add(pc)
+                    changed = True
+        region = [pc for pc in order if pc in back and pc in blocks]
+        return region, blocks
+
+    def _compile_region(self, head: int) -> Optional[Callable]:
+        region, blocks = self._find_region(head)
+        if len(region) < 2:
+            return None  # single block: the plain/self-loop path is enough
+        index = {pc: k for k, pc in enumerate(region)}
+        exits = 0
+        stop = " or mem.watch_hit is not None" if self._watching() else ""
+
+        source_lines = ["def _jit_fn(cpu, _budget):"]
+        source_lines.append("    r = cpu.regs._r")
+        source_lines.append("    sr = cpu.regs._sys")
+        source_lines.append("    mem = cpu.mem")
+        source_lines.append("    _c = 0")
+        source_lines.append("    _b = 0")
+        source_lines.append("    while True:")
+        for k, pc in enumerate(region):
+            body_lines = blocks[pc][0]
+            size = blocks[pc][3]
+            source_lines.append(f"        {'if' if k == 0 else 'elif'} _b == {k}:")
+            n = len(body_lines)
+            for idx, line in enumerate(body_lines):
+                m = _EXIT_RE.match(line)
+                nxt = body_lines[idx + 1] if idx + 1 < n else None
+                indent = f"            {m.group(1)}" if m is not None else ""
+                if m is not None and (nxt is None or nxt == f"{m.group(1)}return"):
+                    target = int(m.group(2))
+                    source_lines.append(f"{indent}_c += {size}")
+                    if target in index:
+                        source_lines.append(f"{indent}if _c >= _budget{stop}:")
+                        source_lines.append(f"{indent}    cpu.pc = {target}")
+                        source_lines.append(f"{indent}    return None, _c")
+                        source_lines.append(f"{indent}_b = {index[target]}")
+                        source_lines.append(f"{indent}continue")
+                    else:
+                        exits += 1
+                        source_lines.append(f"{indent}{line.strip()}")
+                        source_lines.append(f"{indent}return")
+                    continue
+                if line.strip() == "return" and idx > 0 and _EXIT_RE.match(body_lines[idx - 1]):
+                    continue  # already emitted with its exit above
+                source_lines.append(f"            {line.replace('_WSTEP', '_c')}")
+            if body_lines and not _EXIT_RE.match(body_lines[-1]):
+                # Indirect exit (JMP/RTS/...) sets cpu.pc from a local
+                source_lines.append(f"            _c += {size}")
+                source_lines.append("            return")
+                exits += 1
+        if not exits:
+            return None  # no way out: leave it to the dispatcher
+
+        fn = self._finish(source_lines, head, "_c", [(pc, blocks[pc][2]) for pc in region],
+                          sum(blocks[pc][3] for pc in region))
+        if fn is not None:
+            self._region_count += 1
+        return fn
+
+    def _memory_windows(self):
+        """
+        (chain, direct, bindings) for _inline_memory from the current
+        memory map: the FAST_REGIONS windows, every window usable for
+        constant addresses, and the names the generated code needs.
+        Watched pages are left out of both.
+        """
+        mem = self.cpu.mem
+        bindings = {'_R16': _R16, '_R32': _R32, '_W16': _W16, '_W32': _W32}
+        if not hasattr(mem, 'direct_windows'):
+            return [], [], bindings
+        windows = mem.direct_windows()
+        watched = mem.watched_spans() if hasattr(mem, 'watched_spans') else []
+
+        def pieces(start, end):
+            """[start, end) minus the watched spans."""
+            out = []
+            for lo, hi in watched:
+                if lo < end and start < hi:
+                    if start < lo:
+                        out.append((start, lo))
+                    start = max(start, hi)
+            if start < end:
+                out.append((start, end))
+            return out
+
+        direct = []
+        for k, (start, end, region, name) in enumerate(windows):
+            bindings[f'_M{k}'] = region._mem
+            direct.extend((k, lo, hi, None, start) for lo, hi in pieces(start, end))
+        chain = []
+        for wanted in self.FAST_REGIONS:
+            for k, (start, end, region, name) in enumerate(windows):
+                if name != wanted:
+                    continue
+                mirrored = (not (start | (end - 1)) & 0x20000000
+                            and any(s == start | 0x20000000 and m is region
+                                    for s, _, m, _ in windows))
+                bindings[f'_C{k}'] = region.code_pages()
+                bindings[f'_X{k}'] = region._code_written
+                chain.extend((k, lo, hi, 0xDFFFFFFF if mirrored else None, start)
+                             for lo, hi in pieces(start, end))
+        return chain, direct, bindings
+
+    def _finish(self, source_lines: List[str], start_pc: int, count: str,
+                ranges: List[Tuple[int, int]], steps: int) -> Optional[Callable]:
+        """Link, inline memory accesses, register-allocate and exec a
+        block's source.  `steps` is the instruction count of one pass
+        over `ranges` (see _cost)."""
+        source_lines, targets = _link_exits(source_lines, start_pc, count)
+        chain, direct, bindings = self._memory_windows()
+        source_lines = _inline_memory(source_lines, chain, direct)
+        try:
+            source_lines = _allocate_registers(source_lines)
+        except ValueError:
+            self._miss = "registers"
+            return None
         source = '\n'.join(source_lines)
 
         # Debug: uncomment to see generated source
         # import sys; print(f"[JIT] Compiling block at 0x{start_pc:08X}:\n{source}\n", file=sys.stderr)
 
         try:
-            namespace = {}
+            links = [None] * len(targets)
+            namespace = dict(bindings, _L=links)
             exec(source, namespace)
             fn = namespace['_jit_fn']
+            fn.jit_links = (links, targets)
+            fn.jit_cost = self._cost(ranges, steps)
             self._jit_count += 1
+            for lo, hi in ranges:
+                self.tracker.track(lo, hi, start_pc)
             return fn
         except Exception as e:
             import sys
@@ -794,56 +2140,284 @@ class JITCompiler:
             print(f"[JIT] Source:\n{source}", file=sys.stderr)
             return None
 
-    def _build_handler_to_op_id(self):
-        """Build a reverse map from handler id -> op_id."""
-        self._handler_to_op_id = {}
-        emu = self.cpu.emulator
-        for op_id, handler in emu._resolve_table.items():
-            self._handler_to_op_id[id(handler)] = op_id
+    def _cost(self, ranges: List[Tuple[int, int]], steps: int) -> Tuple[int, int]:
+        """
+        (cycles, steps) of one pass over the code in `ranges`, delay
+        slots included: run() charges k instructions of the function
+        k * cycles // steps cycles.  Exact for a block or a self-loop,
+        the average over its blocks for a region.
+        """
+        costs = self.cpu.cycle_costs
+        if costs is None or not steps:
+            return steps or 1, steps or 1
+        mem = self.cpu.mem
+        fetch = getattr(mem, 'fetch16', mem.read16)
+        cycles = sum(costs[fetch(pc)] for lo, hi in ranges for pc in range(lo, hi, 2))
+        return cycles, steps
+
+    # ---- Idle fast-forward ----
+    #
+    # A block that branches back to itself, only loads and computes on
+    # registers, and leaves the registers as they were (the dispatches
+    # before and after it ran agree) is waiting for a load to return
+    # something else.  Nothing it does can make that happen: only time
+    # can, through a peripheral.  run() then runs one more iteration to
+    # see which addresses it reads and calls cpu.fast_forward(addresses)
+    # to jump to when one of them may change.
+
+    def _poll_loop(self, pc: int):
+        """(ops, loads, cycles) of the polling loop at `pc`, or None.
+        `loads` lists (op index, op_val) of the loads, a delay slot's
+        at its branch; `cycles` leaves the delay slot out."""
+        info = self._polls.get(pc, False)
+        if info is not False:
+            return info
+        cpu = self.cpu
+        mem = cpu.mem
+        fetch = getattr(mem, 'fetch16', mem.read16)
+        decode = cpu.emulator._decode
+        dispatch = cpu.emulator._dispatch
+        costs = cpu.cycle_costs
+        ops, loads, cycles = [], [], 0
+        info = None
+        at = pc
+        for _ in range(MAX_POLL_LEN):
+            op_val = fetch(at)
+            d = decode[op_val]
+            if d is None or d[0] not in POLL_OP_IDS:
+                break
+            if d[0] in POLL_LOAD_IDS:
+                loads.append((len(ops), op_val))
+            ops.append(dispatch[op_val])
+            cycles += 1 if costs is None else costs[op_val]
+            if d[0] in POLL_BRANCH_IDS:
+                if d[0] in DELAYED_OP_IDS:
+                    slot = fetch(at + 2)
+                    sd = decode[slot]
+                    if sd is None or sd[0] not in POLL_OP_IDS or sd[0] in POLL_BRANCH_IDS:
+                        break
+                    if sd[0] in POLL_LOAD_IDS:
+                        loads.append((len(ops) - 1, slot))
+                disp = _sext12(op_val) if d[0] == 153 else _sext8(op_val)
+                if at + 4 + disp * 2 == pc:
+                    info = (ops, loads, cycles)
+                break
+            at += 2
+        self._polls[pc] = info
+        return info
+
+    def _skip_poll(self, pc: int) -> Tuple[int, bool]:
+        """
+        Run one iteration of the polling loop at `pc` (cpu.pc), then
+        fast-forward if it is still polling.  The scheduler must be up
+        to date.  Returns (instructions run, whether time jumped).
+        """
+        info = self._poll_loop(pc)
+        if info is None:
+            return 0, False
+        cpu = self.cpu
+        ops, loads, cycles = info
+        r = cpu.regs._r
+        sysregs = cpu.regs._sys
+        addresses = []
+        i = 0
+        for index, (handler, args) in enumerate(ops):
+            while i < len(loads) and loads[i][0] == index:
+                addresses.append(_poll_address(loads[i][1], r, sysregs['gbr']))
+                i += 1
+            handler(*args)
+        cpu.scheduler.advance(cycles)
+        if cpu.pc != pc:
+            return len(ops), False  # the polled value just changed
+        return len(ops), cpu.fast_forward(addresses)
+
+    def _install(self, pc: int, fn: Callable):
+        """Cache a compiled block and link it with its neighbours."""
+        self.jit_cache[pc] = fn
+        links, targets = fn.jit_links
+        self._linked[pc] = (links, targets)
+        jit_cache = self.jit_cache
+        links_to = self._links_to
+        for slot, target in enumerate(targets):
+            links_to.setdefault(target, []).append((links, slot))
+            links[slot] = jit_cache.get(target)
+        for other, slot in links_to.get(pc, ()):
+            other[slot] = fn
+
+    def _unlink(self, pc: int):
+        """Undo every link into and out of the (evicted) block at `pc`."""
+        for other, slot in self._links_to.get(pc, ()):
+            other[slot] = None
+        entry = self._linked.pop(pc, None)
+        if entry is None:
+            return
+        links, targets = entry
+        for target in set(targets):
+            incoming = self._links_to.get(target)
+            if incoming is not None:
+                incoming[:] = [e for e in incoming if e[0] is not links]
+
+    def flush(self):
+        """Drop every cached/compiled block (e.g. on CPU reset)."""
+        self.jit_cache.clear()
+        self.block_runner.block_cache.clear()
+        self.block_runner.block_costs.clear()
+        self.hotness.clear()
+        self._failed.clear()
+        self._polls.clear()
+        self.tracker.clear()
+        self._links_to.clear()
+        self._linked.clear()
 
     def run(self, max_steps: int = 10000000) -> int:
-        """Run using JIT with block cache fallback."""
+        """Run using JIT with block cache fallback.
+
+        Returns the number of guest instructions executed.  Compiled
+        code gets the remaining budget and stops at a block boundary
+        once it is used up, so a run overshoots max_steps by at most
+        one block.  With data watchpoints set, the run starts with no
+        pending hit and stops right after the instruction that hits one
+        (mem.watch_hit says which).
+
+        With a cpu.scheduler, the instructions are added to its clock
+        between dispatches: compiled code never gets a budget past the
+        next deadline or more than SCHED_QUANTUM, so events fire at
+        most one block late and peripheral registers read from compiled
+        code lag by at most SCHED_QUANTUM cycles.  With cpu.cycle_costs,
+        their cycles are added instead (fn.jit_cost, block_costs) and
+        budgets are converted from the cycles left.
+
+        A run also stops once the same pc comes back for 100 dispatches
+        in a row, unless cpu.fast_forward can move time on (see
+        _skip_poll).  SLEEP ends its block, and with cpu.fast_forward
+        time jumps to the next event right after it, so the wake-up
+        interrupt is taken before the next instruction, as in step().
+
+        Interrupts are taken between dispatches, and chains stop at the
+        next block once cpu.irq_check is set (see ruk.jcore.intc); a
+        taken interrupt counts as one step, like in step().
+        """
         cpu = self.cpu
-
-        # Build reverse map on first call
-        if not hasattr(self, '_handler_to_op_id'):
-            self._build_handler_to_op_id()
+        mem = cpu.mem
+        sched = cpu.scheduler
+        timed = sched is not None and cpu.cycle_costs is not None
+        fast_forward = cpu.fast_forward if sched is not None else None
+        fetch = getattr(mem, 'fetch16', mem.read16)
+        idle_state = None
+        block_costs = self.block_runner.block_costs
+        watched = getattr(mem, 'watchpoints', None)
+        if watched:
+            mem.watch_hit = None
+        run_watched = self.block_runner.run_watched
 
         jit_cache = self.jit_cache
         block_cache = self.block_runner.block_cache
         hotness = self.hotness
         threshold = self.threshold
         compile_block = self.block_runner._compile_block
+        failed = self._failed
+        blocked = self._blocked
 
         n = 0
+        chained = 0
+        compiled = 0
         last = 0; lc = 0
+        # Instructions already added to the scheduler; dispatch budget
+        done = 0
+        stop = max_steps
+        # Timed: cycles run since the last scheduler update, and the
+        # cycles left until its next deadline (or SCHED_QUANTUM)
+        y = 0
+        left = 0
         try:
-            for s in range(max_steps):
+            while n < max_steps:
+                if sched is not None:
+                    sched.now += y if timed else n - done
+                    done = n
+                    y = 0
+                    self.steps = n
+                    if sched.now >= sched.next_deadline:
+                        sched.run_due()
+                    left = min(sched.next_deadline - sched.now, SCHED_QUANTUM)
+                    stop = n + left
+                    if stop > max_steps:
+                        stop = max_steps
+                if cpu.irq_check:
+                    self.steps = n
+                    if cpu.check_interrupts():
+                        # Counted as a step, without cycles (like step())
+                        n += 1
+                        done += 1
+                        continue
                 pc = cpu.pc
 
                 # Try JIT cache first (fastest)
                 fn = jit_cache.get(pc)
-                if fn is not None:
-                    fn(cpu)
+                if fn is not None and timed:
+                    # Same as below, with budgets in cycles
+                    compiled += 1
+                    while True:
+                        cycles, size = fn.jit_cost
+                        b = min((left - y) * size // cycles, stop - n)
+                        nxt, k = fn(cpu, b if b > 0 else 1)
+                        n += k
+                        y += k * cycles // size
+                        if nxt is None or n >= stop or y >= left or cpu.irq_check:
+                            break
+                        if watched and mem.watch_hit is not None:
+                            break
+                        fn = nxt
+                        chained += 1
+                elif fn is not None:
+                    nxt, k = fn(cpu, stop - n)
+                    n += k
+                    compiled += 1
+                    # Follow chain links while they're set and budget remains
+                    while nxt is not None and n < stop and not cpu.irq_check:
+                        if watched and mem.watch_hit is not None:
+                            break
+                        nxt, k = nxt(cpu, stop - n)
+                        n += k
+                        chained += 1
                 else:
                     # Track hotness
                     count = hotness.get(pc, 0) + 1
                     hotness[pc] = count
 
                     if count >= threshold:
-                        # Hot enough -- try JIT compilation
-                        fn = self._jit_compile(pc)
+                        # Hot enough -- try JIT compilation (once: a
+                        # failure sticks until the code is rewritten)
+                        fn = None if pc in failed else self._jit_compile(pc)
                         if fn is not None:
-                            jit_cache[pc] = fn
-                            fn(cpu)
+                            self._install(pc, fn)
+                            if timed:
+                                cycles, size = fn.jit_cost
+                                b = min((left - y) * size // cycles, stop - n)
+                                k = fn(cpu, b if b > 0 else 1)[1]
+                                y += k * cycles // size
+                            else:
+                                k = fn(cpu, stop - n)[1]
+                            n += k
+                            compiled += 1
                         else:
                             # JIT failed -- use block cache
+                            reason = failed.get(pc)
+                            if reason is None:
+                                reason = failed[pc] = self._miss
+                            blocked[reason] = blocked.get(reason, 0) + 1
                             ops = block_cache.get(pc)
                             if ops is None:
                                 ops = compile_block(pc)
                                 block_cache[pc] = ops
-                            for handler, args in ops:
-                                handler(*args)
+                            if watched:
+                                k = run_watched(ops)
+                            else:
+                                for handler, args in ops:
+                                    handler(*args)
+                                k = len(ops)
+                            n += k
+                            if timed and k:
+                                y += block_costs.get(pc, k) * k // len(ops)
                             self._fallback_count += 1
                     else:
                         # Not hot yet -- use block cache
@@ -851,13 +2425,44 @@ class JITCompiler:
                         if ops is None:
                             ops = compile_block(pc)
                             block_cache[pc] = ops
-                        for handler, args in ops:
-                            handler(*args)
-
-                n = s + 1
-
+                        if watched:
+                            k = run_watched(ops)
+                        else:
+                            for handler, args in ops:
+                                handler(*args)
+                            k = len(ops)
+                        n += k
+                        if timed and k:
+                            y += block_costs.get(pc, k) * k // len(ops)
+
+                if (cpu.is_sleeping and fast_forward is not None
+                        and fetch(cpu.pc - 2) == SLEEP_OP):
+                    # The block ended with SLEEP: bring the scheduler up
+                    # to the SLEEP, skip to the next event and charge the
+                    # SLEEP after it, like step() does
+                    if timed:
+                        sleep = cpu.cycle_costs[SLEEP_OP]
+                        sched.now += y - sleep
+                        y = sleep
+                    else:
+                        sched.now += n - 1 - done
+                        done = n - 1
+                    fast_forward(None)
+                if watched and mem.watch_hit is not None:
+                    break
                 if cpu.pc == last:
                     lc += 1
+                    if fast_forward is not None:
+                        idle = (tuple(cpu.regs._r), cpu.regs._sys['sr'])
+                        if lc > 1 and idle == idle_state:
+                            sched.now += y if timed else n - done
+                            k, skipped = self._skip_poll(last)
+                            n += k
+                            done = n
+                            y = 0
+                            if skipped:
+                                lc = 0
+                        idle_state = idle
                     if lc > 100:
                         break
                 else:
@@ -865,6 +2470,11 @@ class JITCompiler:
         except IndexError:
             cpu.ebreak = True
 
+        if sched is not None:
+            self.steps = n
+            sched.advance(y if timed else n - done)
+        self._chained += chained
+        self._compiled_runs += compiled + chained
         cpu.pc &= 0xFFFFFFFF
         return n
 
@@ -874,4 +2484,24 @@ class JITCompiler:
             'jit_cache_size': len(self.jit_cache),
             'block_cache_size': len(self.block_runner.block_cache),
             'fallback_count': self._fallback_count,
+            'invalidated': self.tracker.invalidated,
+            'chained': self._chained,
+            'regions': self._region_count,
+            'coverage': self.coverage(),
+        }
+
+    def coverage(self):
+        """Share of hot block executions that ran compiled code.
+
+        Counts every compiled call (dispatched or chained) against the
+        BlockRunner fallbacks of blocks that failed to compile; blocks
+        still below `threshold` are not counted.  `blocked` breaks the
+        fallbacks down by what stopped compilation.
+        """
+        runs = self._compiled_runs + self._fallback_count
+        return {
+            'compiled_runs': self._compiled_runs,
+            'fallback_runs': self._fallback_count,
+            'ratio': self._compiled_runs / runs if runs else 1.0,
+            'blocked': dict(sorted(self._blocked.items(), key=lambda kv: -kv[1])),
         }
@@ -1,4 +1,28 @@
-from typing import Tuple, Union
+import mmap
+import os
+from typing import Callable, List, Optional, Tuple, Union
+
+
+# Granularity of the executable-page bitmap (see Memory.mark_code).
+# 1KB keeps false sharing between code and nearby data (literal pools,
+# .data right after .text) low while the bitmap stays tiny: 16KB of
+# flags for the 16MB RAM.
+CODE_PAGE_SHIFT = 10
+CODE_PAGE_SIZE = 1 << CODE_PAGE_SHIFT
+
+# MemoryMap page table: 4KB pages, indexed in two levels (1MB directory
+# entries of 256 pages each) so unmapped parts of the 32-bit space share
+# one empty table.
+MAP_PAGE_SHIFT = 12
+MAP_PAGE_SIZE = 1 << MAP_PAGE_SHIFT
+MAP_L2_BITS = 8
+MAP_L2_MASK = (1 << MAP_L2_BITS) - 1
+MAP_PAGES = 1 << (32 - MAP_PAGE_SHIFT)
+
+# Allocation granularity of SparseMemory.
+SPARSE_PAGE_SHIFT = 12
+SPARSE_PAGE_SIZE = 1 << SPARSE_PAGE_SHIFT
+SPARSE_PAGE_MASK = SPARSE_PAGE_SIZE - 1
 
 
 class Memory:
@@ -11,8 +35,21 @@ class Memory:
     convention is needed because the emulator's MOV.B/W/L handlers pass
     ints to write8/16/32, and the CPU's step() does arithmetic on the
     values returned by read16.
+
+    Code tracking: the JIT marks the pages it compiled blocks from with
+    mark_code().  Until the first mark `_code_pages` stays None, so a
+    write to a memory that never held compiled code only pays one
+    attribute test; on a marked page the registered listeners are told
+    (listener(mem, page)) and the page flag is cleared -- the listener is
+    expected to drop every cached block on that page.  16/32-bit writes
+    are assumed aligned (as on the SH-4) and only check their first byte.
     """
 
+    # Class-level defaults so subclasses that skip __init__ (MMIODevice)
+    # still have them.
+    _code_pages = None
+    _code_listeners = ()
+
     def __init__(self, size):
         self._mem = bytearray(size)
         self._ptr = 0
@@ -52,6 +89,8 @@ class Memory:
 
     def write8(self, addr, val: int) -> int:
         self._mem[addr] = val & 0xFF
+        if self._code_pages is not None and self._code_pages[addr >> CODE_PAGE_SHIFT]:
+            self._code_written(addr, 1)
         return val
 
     def write16(self, addr: int, val: int):
@@ -61,6 +100,8 @@ class Memory:
             v = val & 0xFFFF
             m[addr] = (v >> 8) & 0xFF
             m[addr + 1] = v & 0xFF
+            if self._code_pages is not None and self._code_pages[addr >> CODE_PAGE_SHIFT]:
+                self._code_written(addr, 2)
             return
         raise IndexError(f'Out of bound write16 : "{addr:04X}"')
 
@@ -73,6 +114,8 @@ class Memory:
             m[addr + 1] = (v >> 16) & 0xFF
             m[addr + 2] = (v >> 8) & 0xFF
             m[addr + 3] = v & 0xFF
+            if self._code_pages is not None and self._code_pages[addr >> CODE_PAGE_SHIFT]:
+                self._code_written(addr, 4)
             return
         raise IndexError(f'Out of bound write32 : "{addr:04X}"')
 
@@ -86,9 +129,28 @@ class Memory:
         if isinstance(data, int):
             self._mem[addr] = data & 0xFF
             self._ptr = addr + 1
+            if self._code_pages is not None:
+                self._code_written(addr, 1)
             return
         self._mem[addr: addr + len(data)] = data
         self._ptr = addr + len(data)
+        if self._code_pages is not None and len(data):
+            self._code_written(addr, len(data))
+
+    def read_block(self, addr: int, size: int) -> bytes:
+        """Copy `size` bytes starting at offset `addr`."""
+        if addr < 0 or addr + size > self._size:
+            raise IndexError(f'Out of bound read_block : "{addr:04X}"')
+        return bytes(memoryview(self._mem)[addr:addr + size])
+
+    def write_block(self, addr: int, data) -> None:
+        """Write the bytes-like `data` starting at offset `addr`."""
+        size = len(data)
+        if addr < 0 or addr + size > self._size:
+            raise IndexError(f'Out of bound write_block : "{addr:04X}"')
+        self._mem[addr:addr + size] = data
+        if self._code_pages is not None and size:
+            self._code_written(addr, size)
 
     def __setitem__(self, key, value):
         return self.write8(key, value)
@@ -102,6 +164,457 @@ class Memory:
     def get_range(self, start: int, end: int):
         return self._mem[start:end]
 
+    # ---- executable-page tracking ----
+
+    def mark_code(self, start: int, end: int, listener: Callable):
+        """
+        Flag the pages covering offsets [start, end) as holding compiled
+        code and register `listener(mem, page)` for writes to them.
+        """
+        pages = self.code_pages()
+        if listener not in self._code_listeners:
+            self._code_listeners.append(listener)
+        first = start >> CODE_PAGE_SHIFT
+        last = min((max(end, start + 1) - 1) >> CODE_PAGE_SHIFT, len(pages) - 1)
+        if first <= last:
+            pages[first:last + 1] = b'\x01' * (last + 1 - first)
+
+    def code_pages(self) -> bytearray:
+        """
+        The executable-page bitmap, allocated on first use.  Code that
+        writes `_mem` directly (the JIT's inline stores) binds it and
+        must call _code_written(addr, size) when the page flag is set.
+        """
+        if self._code_pages is None:
+            self._code_pages = bytearray((len(self) >> CODE_PAGE_SHIFT) + 1)
+            self._code_listeners = []
+        return self._code_pages
+
+    def is_code(self, addr: int) -> bool:
+        """True if the page holding offset `addr` has compiled code."""
+        pages = self._code_pages
+        return pages is not None and bool(pages[addr >> CODE_PAGE_SHIFT])
+
+    def _code_written(self, addr: int, size: int):
+        pages = self._code_pages
+        for page in range(addr >> CODE_PAGE_SHIFT, ((addr + size - 1) >> CODE_PAGE_SHIFT) + 1):
+            if page < len(pages) and pages[page]:
+                pages[page] = 0
+                for listener in list(self._code_listeners):
+                    listener(self, page)
+
+
+class MappedMemory(Memory):
+    """
+    Memory region backed by a file mapping (the OS ROM image), so pages
+    are read from the file on demand instead of copied into a bytearray
+    up front.
+
+    The mapping is copy-on-write: the file is never modified, and guest
+    writes stay private to the process, like they did on the bytearray
+    copy.  `_mem` supports the same indexing and buffer protocol as a
+    bytearray, so the JIT can still access the region directly.
+    """
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            # mmap can't map an empty file
+            self._mem = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY) if size else bytearray()
+        self._ptr = 0
+        self._size = size
+        self.path = path
+
+
+class SparseMemory(Memory):
+    """
+    Memory region whose backing store is allocated lazily, one
+    SPARSE_PAGE_SIZE page at a time, on the first non-zero write to it.
+    Unwritten pages read as zero.
+
+    Same interface as Memory (int reads/writes, write_bin, get_range,
+    code tracking), but there is no flat `_mem` bytearray, so the JIT
+    does not inline accesses to it -- meant for large, mostly untouched
+    regions (catch-all MMIO, display buffers, DSP Y memory).
+    """
+
+    def __init__(self, size):
+        self._pages = {}
+        self._ptr = 0
+        self._size = size
+
+    def __len__(self):
+        return self._size
+
+    def allocated(self) -> int:
+        """Bytes of backing store actually allocated."""
+        return len(self._pages) << SPARSE_PAGE_SHIFT
+
+    def _check(self, addr: int, size: int, what: str):
+        if addr < 0 or addr + size > self._size:
+            raise IndexError(f'Out of bound {what} : "{addr:04X}"')
+
+    def read8(self, addr: int) -> int:
+        self._check(addr, 1, 'read8')
+        page = self._pages.get(addr >> SPARSE_PAGE_SHIFT)
+        return page[addr & SPARSE_PAGE_MASK] if page is not None else 0
+
+    def read16(self, addr: int) -> int:
+        self._check(addr, 2, 'read16')
+        return int.from_bytes(self.get_range(addr, addr + 2), "big")
+
+    def read32(self, addr: int) -> int:
+        self._check(addr, 4, 'read32')
+        return int.from_bytes(self.get_range(addr, addr + 4), "big")
+
+    def write8(self, addr, val: int) -> int:
+        self._check(addr, 1, 'write8')
+        self._store(addr, bytes((val & 0xFF,)))
+        return val
+
+    def write16(self, addr: int, val: int):
+        self._check(addr, 2, 'write16')
+        self._store(addr, (val & 0xFFFF).to_bytes(2, "big"))
+
+    def write32(self, addr: int, val: int):
+        self._check(addr, 4, 'write32')
+        self._store(addr, (val & 0xFFFFFFFF).to_bytes(4, "big"))
+
+    def write_bin(self, addr: int, data) -> None:
+        if isinstance(data, int):
+            data = bytes((data & 0xFF,))
+        self._check(addr, len(data), 'write_bin')
+        self._store(addr, data)
+        self._ptr = addr + len(data)
+
+    def read_block(self, addr: int, size: int) -> bytes:
+        self._check(addr, size, 'read_block')
+        return bytes(self.get_range(addr, addr + size))
+
+    def write_block(self, addr: int, data) -> None:
+        self._check(addr, len(data), 'write_block')
+        self._store(addr, data)
+
+    def _store(self, addr: int, data):
+        pages = self._pages
+        pos = 0
+        while pos < len(data):
+            index = (addr + pos) >> SPARSE_PAGE_SHIFT
+            offset = (addr + pos) & SPARSE_PAGE_MASK
+            chunk = data[pos:pos + SPARSE_PAGE_SIZE - offset]
+            page = pages.get(index)
+            if page is None and any(chunk):
+                page = pages[index] = bytearray(SPARSE_PAGE_SIZE)
+            if page is not None:
+                page[offset:offset + len(chunk)] = chunk
+            pos += len(chunk)
+        if self._code_pages is not None and len(data):
+            self._code_written(addr, len(data))
+
+    def get_range(self, start: int, end: int):
+        start = max(start, 0)
+        end = min(end, self._size)
+        out = bytearray(max(end - start, 0))
+        pos = start
+        while pos < end:
+            offset = pos & SPARSE_PAGE_MASK
+            size = min(SPARSE_PAGE_SIZE - offset, end - pos)
+            page = self._pages.get(pos >> SPARSE_PAGE_SHIFT)
+            if page is not None:
+                out[pos - start:pos - start + size] = page[offset:offset + size]
+            pos += size
+        return out
+
+
+class Watchpoint:
+    """
+    A data watchpoint on guest addresses [start, start + size).
+
+    `kind` is 'r', 'w' or 'rw'.  With `value` set, only accesses reading
+    or writing exactly that value (at the access size) hit.  The range
+    is bound to the backing Memory it resolves to, so accesses through
+    any mirror of the region (P1/P2) are watched too.  `hits` counts
+    matching accesses.
+    """
+
+    def __init__(self, start: int, size: int, kind: str = 'w', value: int = None):
+        if not kind or set(kind) - {'r', 'w'}:
+            raise ValueError(f"watchpoint kind must be 'r', 'w' or 'rw', not {kind!r}")
+        self.start = start & 0xFFFFFFFF
+        self.size = size
+        self.kind = kind
+        self.value = value
+        self.hits = 0
+        # Backing Memory and offsets, set by MemoryMap.add_watchpoint
+        self.mem = None
+        self.lo = 0
+        self.hi = 0
+
+    def __repr__(self):
+        cond = '' if self.value is None else f' == 0x{self.value:X}'
+        return f"<Watchpoint {self.kind} 0x{self.start:08X}+{self.size}{cond}>"
+
+
+class WatchHit:
+    """The first access that matched a watchpoint (see MemoryMap.watch_hit)."""
+
+    def __init__(self, watchpoint: Watchpoint, kind: str, address: int, size: int,
+                 value: Optional[int], pc: Optional[int]):
+        self.watchpoint = watchpoint
+        self.kind = kind          # 'r' or 'w'
+        self.address = address    # guest address as accessed
+        self.size = size
+        self.value = value        # value read/written (None for block writes)
+        self.pc = pc              # PC of the accessing instruction
+
+    def __repr__(self):
+        pc = '?' if self.pc is None else f'0x{self.pc:08X}'
+        value = '' if self.value is None else f' value=0x{self.value:X}'
+        return (f"<WatchHit {self.kind}{self.size * 8} 0x{self.address:08X}"
+                f"{value} pc={pc}>")
+
+
+class WatchedMemory(Memory):
+    """
+    What the MemoryMap page table returns instead of a region on the
+    pages a watchpoint covers: it performs the access on the real
+    Memory, then reports it to MemoryMap._watch_access.  Pages without
+    watchpoints keep resolving to the region itself, so they pay nothing.
+
+    Block reads (loaders, memory viewer) are not checked; block writes
+    are, without a value.
+    """
+
+    def __init__(self, memmap: 'MemoryMap', target: Memory, base: int):
+        self._memmap = memmap
+        self._target = target
+        self._base = base
+        self._ptr = 0
+        self._size = len(target)
+
+    def __len__(self):
+        return self._size
+
+    def read8(self, addr: int) -> int:
+        val = self._target.read8(addr)
+        self._memmap._watch_access('r', self, addr, 1, val)
+        return val
+
+    def read16(self, addr: int) -> int:
+        val = self._target.read16(addr)
+        self._memmap._watch_access('r', self, addr, 2, val)
+        return val
+
+    def read32(self, addr: int) -> int:
+        val = self._target.read32(addr)
+        self._memmap._watch_access('r', self, addr, 4, val)
+        return val
+
+    def write8(self, addr, val: int) -> int:
+        self._target.write8(addr, val)
+        self._memmap._watch_access('w', self, addr, 1, val & 0xFF)
+        return val
+
+    def write16(self, addr: int, val: int):
+        self._target.write16(addr, val)
+        self._memmap._watch_access('w', self, addr, 2, val & 0xFFFF)
+
+    def write32(self, addr: int, val: int):
+        self._target.write32(addr, val)
+        self._memmap._watch_access('w', self, addr, 4, val & 0xFFFFFFFF)
+
+    def write_bin(self, addr: int, data) -> None:
+        self._target.write_bin(addr, data)
+        if isinstance(data, int):
+            self._memmap._watch_access('w', self, addr, 1, data & 0xFF)
+        elif len(data):
+            self._memmap._watch_access('w', self, addr, len(data), None)
+
+    def write_block(self, addr: int, data) -> None:
+        self._target.write_block(addr, data)
+        if len(data):
+            self._memmap._watch_access('w', self, addr, len(data), None)
+
+    def read_block(self, addr: int, size: int) -> bytes:
+        return self._target.read_block(addr, size)
+
+    def get_range(self, start: int, end: int):
+        return self._target.get_range(start, end)
+
+    def mark_code(self, start: int, end: int, listener: Callable):
+        self._target.mark_code(start, end, listener)
+
+    def code_pages(self) -> bytearray:
+        return self._target.code_pages()
+
+    def is_code(self, addr: int) -> bool:
+        return self._target.is_code(addr)
+
+
+# Counter columns of AccessStats, in row order.
+ACCESS_KINDS = ('read8', 'read16', 'read32', 'write8', 'write16', 'write32', 'fetch')
+_R8, _R16, _R32, _W8, _W16, _W32, _FETCH = range(len(ACCESS_KINDS))
+
+
+class AccessStats:
+    """
+    Per-region, per-4KB-page access counters filled while
+    MemoryMap.enable_access_stats() is on, split by kind and width
+    (ACCESS_KINDS).  A 16-bit read at the CPU's PC counts as a fetch.
+
+    The JIT decodes each instruction once, when it compiles the block,
+    so with the JIT on `fetch` shows the code footprint rather than how
+    often it ran.  Block transfers (loaders, DMA, the memory viewer)
+    are not counted.
+    """
+
+    def __init__(self, memmap: 'MemoryMap'):
+        self._memmap = memmap
+        # region start -> {page number: [count per ACCESS_KINDS]}
+        self._counts = {}
+        # (region start, id(target)) -> CountedMemory, see MemoryMap._counted
+        self._proxies = {}
+
+    def reset(self):
+        for pages in self._counts.values():
+            pages.clear()
+
+    def _region_name(self, start: int) -> str:
+        meta = self._memmap._metas.get(start)
+        return meta["name"] if meta is not None else "???"
+
+    def pages(self) -> List[dict]:
+        """One row per (region, page) touched, by address."""
+        rows = []
+        for start, pages in self._counts.items():
+            name = self._region_name(start)
+            for page, counts in pages.items():
+                row = {'address': page << MAP_PAGE_SHIFT, 'region': name}
+                row.update(zip(ACCESS_KINDS, counts))
+                row['total'] = sum(counts)
+                rows.append(row)
+        rows.sort(key=lambda r: (r['address'], r['region']))
+        return rows
+
+    def regions(self) -> List[dict]:
+        """One row per region touched, by address."""
+        rows = []
+        for start, pages in sorted(self._counts.items()):
+            if not pages:
+                continue
+            counts = [sum(col) for col in zip(*pages.values())]
+            row = {'address': start, 'region': self._region_name(start)}
+            row.update(zip(ACCESS_KINDS, counts))
+            row['total'] = sum(counts)
+            rows.append(row)
+        return rows
+
+    def top_pages(self, n: int = 10) -> List[dict]:
+        """The `n` busiest pages, busiest first."""
+        return sorted(self.pages(), key=lambda r: -r['total'])[:n]
+
+    def to_json(self) -> str:
+        import json
+        return json.dumps({'page_size': MAP_PAGE_SIZE,
+                           'regions': self.regions(),
+                           'pages': self.pages()}, indent=1)
+
+    def to_csv(self) -> str:
+        lines = [','.join(('address', 'region') + ACCESS_KINDS + ('total',))]
+        for row in self.pages():
+            lines.append(','.join([f"0x{row['address']:08X}", row['region']]
+                                  + [str(row[k]) for k in ACCESS_KINDS + ('total',)]))
+        return '\n'.join(lines) + '\n'
+
+    def save(self, path: str):
+        """Write the page heatmap to `path`, as CSV if it ends in .csv, else JSON."""
+        text = self.to_csv() if path.lower().endswith('.csv') else self.to_json()
+        with open(path, 'w') as f:
+            f.write(text)
+
+
+class CountedMemory(Memory):
+    """
+    What the MemoryMap page table returns instead of a region while
+    access stats are on: it bumps the AccessStats counters of the page,
+    then performs the access on the real Memory (or WatchedMemory).
+    """
+
+    def __init__(self, memmap: 'MemoryMap', target: Memory, base: int, counts: dict):
+        self._memmap = memmap
+        self._target = target
+        self._base = base
+        self._counts = counts
+        self._ptr = 0
+        self._size = len(target)
+
+    def __len__(self):
+        return self._size
+
+    def _count(self, addr: int, kind: int):
+        page = (self._base + addr) >> MAP_PAGE_SHIFT
+        row = self._counts.get(page)
+        if row is None:
+            row = self._counts[page] = [0] * len(ACCESS_KINDS)
+        row[kind] += 1
+
+    def read8(self, addr: int) -> int:
+        self._count(addr, _R8)
+        return self._target.read8(addr)
+
+    def read16(self, addr: int) -> int:
+        cpu = self._memmap.watch_cpu
+        self._count(addr, _FETCH if cpu is not None and cpu.pc == self._base + addr else _R16)
+        return self._target.read16(addr)
+
+    def fetch16(self, addr: int) -> int:
+        self._count(addr, _FETCH)
+        return _backing(self._target).read16(addr)
+
+    def read32(self, addr: int) -> int:
+        self._count(addr, _R32)
+        return self._target.read32(addr)
+
+    def write8(self, addr, val: int) -> int:
+        self._count(addr, _W8)
+        return self._target.write8(addr, val)
+
+    def write16(self, addr: int, val: int):
+        self._count(addr, _W16)
+        self._target.write16(addr, val)
+
+    def write32(self, addr: int, val: int):
+        self._count(addr, _W32)
+        self._target.write32(addr, val)
+
+    def write_bin(self, addr: int, data) -> None:
+        self._target.write_bin(addr, data)
+
+    def write_block(self, addr: int, data) -> None:
+        self._target.write_block(addr, data)
+
+    def read_block(self, addr: int, size: int) -> bytes:
+        return self._target.read_block(addr, size)
+
+    def get_range(self, start: int, end: int):
+        return self._target.get_range(start, end)
+
+    def mark_code(self, start: int, end: int, listener: Callable):
+        self._target.mark_code(start, end, listener)
+
+    def code_pages(self) -> bytearray:
+        return self._target.code_pages()
+
+    def is_code(self, addr: int) -> bool:
+        return self._target.is_code(addr)
+
+
+def _backing(mem: Memory) -> Memory:
+    """The region behind the page-table stand-ins (CountedMemory, WatchedMemory)."""
+    while type(mem) is CountedMemory or type(mem) is WatchedMemory:
+        mem = mem._target
+    return mem
+
 
 class MemoryPermission:
     READ_PERMISSION = 1
@@ -132,24 +645,56 @@ class MemoryPermission:
 
 
 class MemoryMap:
+    """
+    Guest address space: a set of regions (start -> Memory) that may
+    overlap, the smallest (most specific) region winning.
+
+    Lookups go through a two-level page table.  Each 4KB page holds the
+    tuple of (start, end, mem) regions overlapping it, smallest first and
+    cut after the first one that covers the whole page (nothing larger
+    can win past it).  A page is usually covered by a single region, so
+    resolve() costs two list indexes and one bounds test whatever the
+    number of regions mapped; only pages split by a small, unaligned
+    region (MMIO blocks) test more than one entry.
+
+    Watchpoints (add_watchpoint) swap the region for a WatchedMemory in
+    the entries of the pages they cover, and only those.  The first
+    matching access is left in `watch_hit` for the CPU/JIT to stop on;
+    `watch_cpu` (set by the CPU) supplies its PC.  Code that bypasses
+    resolve() (the JIT's direct windows) must stay off watched_spans()
+    and re-read them when `layout_listeners` are called.
+
+    enable_access_stats() likewise swaps every region for a CountedMemory
+    until disable_access_stats(); while it is off the page table holds
+    the regions themselves and resolve() does no extra work.
+    """
+
+    _EMPTY_TABLE = ((),) * (1 << MAP_L2_BITS)
+
     def __init__(self):
         self._mem = {}
         self._metas = {}
-        # Last-region cache -- most accesses hit the same region repeatedly.
-        self._cache_start = -1
-        self._cache_end = -1
-        self._cache_mem = None
-        # Precomputed sorted list of (start, end, mem) for the cold path.
+        # Sorted list of (start, end, mem), smallest first.
         self._regions_sorted = []
+        # Page directory: one entry per 1MB, each a list of per-page
+        # region tuples (or the shared empty table).
+        self._pages = [self._EMPTY_TABLE] * (MAP_PAGES >> MAP_L2_BITS)
+        # Data watchpoints
+        self.watchpoints: List[Watchpoint] = []
+        self.watch_hit: Optional[WatchHit] = None
+        self.watch_cpu = None
+        self.layout_listeners: List[Callable] = []
+        self._watch_proxies = {}
+        # Access counters (enable_access_stats)
+        self.access_stats: Optional[AccessStats] = None
 
     def add(self, addr_start: int, memory: Memory, name: str = "-", perms: str = None):
+        old = self._mem.get(addr_start)
         self._mem[addr_start] = memory
         self._metas[addr_start] = {
             "perms": MemoryPermission.from_string(perms or "RWX"),
             "name": name
         }
-        # Invalidate caches -- the new region might overlap.
-        self._cache_start = -1
         # Rebuild the sorted regions list (smallest first, so the
         # "most specific region wins" rule is preserved).
         rs = []
@@ -158,6 +703,172 @@ class MemoryMap:
         # Sort by size ascending so smaller (more specific) regions win.
         rs.sort(key=lambda r: r[1] - r[0])
         self._regions_sorted = rs
+        # Only the pages the new (or replaced) region covers can change.
+        size = max(len(memory), len(old) if old is not None else 0)
+        self._map_pages(addr_start, addr_start + size)
+
+    def _map_pages(self, lo: int, hi: int):
+        """Recompute the page-table entries of the pages overlapping [lo, hi)."""
+        if hi <= lo:
+            return
+        pages = self._pages
+        first = max(lo, 0) >> MAP_PAGE_SHIFT
+        last = min((hi - 1) >> MAP_PAGE_SHIFT, MAP_PAGES - 1)
+        # Every region sharing one of these pages, not just [lo, hi).
+        lo, hi = first << MAP_PAGE_SHIFT, (last + 1) << MAP_PAGE_SHIFT
+        candidates = [r for r in self._regions_sorted if r[0] < hi and lo < r[1]]
+        for page in range(first, last + 1):
+            p_start = page << MAP_PAGE_SHIFT
+            p_end = p_start + MAP_PAGE_SIZE
+            entry = []
+            for region in candidates:
+                start, end, _ = region
+                if start < p_end and p_start < end:
+                    entry.append(region)
+                    if start <= p_start and p_end <= end:
+                        break
+            if self.watchpoints:
+                entry = [self._watched(region, p_start, p_end) for region in entry]
+            if self.access_stats is not None:
+                entry = [self._counted(region) for region in entry]
+            table = pages[page >> MAP_L2_BITS]
+            if table is self._EMPTY_TABLE:
+                table = pages[page >> MAP_L2_BITS] = list(table)
+            table[page & MAP_L2_MASK] = tuple(entry)
+
+    # ---- data watchpoints ----
+
+    def _watched(self, region: tuple, p_start: int, p_end: int) -> tuple:
+        """`region`, or its WatchedMemory stand-in if a watchpoint covers
+        part of it inside page [p_start, p_end)."""
+        start, end, mem = region
+        for wp in self.watchpoints:
+            if wp.mem is mem and start + wp.lo < p_end and p_start < start + wp.hi:
+                proxy = self._watch_proxies.get(start)
+                if proxy is None or proxy._target is not mem:
+                    proxy = self._watch_proxies[start] = WatchedMemory(self, mem, start)
+                return start, end, proxy
+        return region
+
+    def _remap_watchpoint(self, wp: Watchpoint):
+        """Rebuild the pages of every mirror of `wp`'s backing Memory it covers."""
+        for start, end, mem in self._regions_sorted:
+            if mem is wp.mem:
+                self._map_pages(start + wp.lo, start + wp.hi)
+        for listener in list(self.layout_listeners):
+            listener()
+
+    def add_watchpoint(self, address: int, size: int = 4, kind: str = 'w',
+                       value: int = None) -> Watchpoint:
+        """
+        Watch guest addresses [address, address + size) for reads ('r'),
+        writes ('w') or both ('rw'), optionally only for one value.
+        The range must lie in a single region.
+        """
+        wp = Watchpoint(address, size, kind, value)
+        mem, start = self.resolve(wp.start)
+        mem = _backing(mem)
+        if size <= 0 or wp.start + size > start + len(mem):
+            raise IndexError(f'Watchpoint crosses the end of its region : {hex(wp.start)}+{size}')
+        wp.mem, wp.lo, wp.hi = mem, wp.start - start, wp.start - start + size
+        self.watchpoints.append(wp)
+        self._remap_watchpoint(wp)
+        return wp
+
+    def remove_watchpoint(self, wp: Watchpoint):
+        self.watchpoints.remove(wp)
+        if self.watch_hit is not None and self.watch_hit.watchpoint is wp:
+            self.watch_hit = None
+        self._remap_watchpoint(wp)
+
+    def clear_watchpoints(self):
+        for wp in list(self.watchpoints):
+            self.remove_watchpoint(wp)
+
+    def watched_spans(self) -> List[Tuple[int, int]]:
+        """Guest (page-aligned) ranges that currently resolve through a
+        WatchedMemory, merged and sorted."""
+        spans = []
+        for wp in self.watchpoints:
+            for start, end, mem in self._regions_sorted:
+                if mem is wp.mem:
+                    lo = (start + wp.lo) & ~(MAP_PAGE_SIZE - 1)
+                    hi = (start + wp.hi + MAP_PAGE_SIZE - 1) & ~(MAP_PAGE_SIZE - 1)
+                    spans.append((lo, hi))
+        spans.sort()
+        merged = []
+        for lo, hi in spans:
+            if merged and lo <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(hi, merged[-1][1]))
+            else:
+                merged.append((lo, hi))
+        return merged
+
+    def _watch_access(self, kind: str, proxy: WatchedMemory, offset: int, size: int,
+                      value: Optional[int]):
+        """Record the first access matching a watchpoint in watch_hit."""
+        mem = proxy._target
+        cpu = self.watch_cpu
+        address = proxy._base + offset
+        for wp in self.watchpoints:
+            if (wp.mem is mem and kind in wp.kind and wp.lo < offset + size and offset < wp.hi
+                    and (wp.value is None or wp.value == value)):
+                # The CPU's own instruction fetch is not a data read
+                if kind == 'r' and size == 2 and cpu is not None and cpu.pc == address:
+                    return
+                wp.hits += 1
+                if self.watch_hit is None:
+                    self.watch_hit = WatchHit(wp, kind, address, size, value,
+                                              None if cpu is None else cpu.pc & 0xFFFFFFFF)
+
+    # ---- access stats ----
+
+    def _counted(self, region: tuple) -> tuple:
+        """`region` with its CountedMemory stand-in."""
+        start, end, mem = region
+        stats = self.access_stats
+        proxy = stats._proxies.get((start, id(mem)))
+        if proxy is None or proxy._target is not mem:
+            counts = stats._counts.setdefault(start, {})
+            proxy = stats._proxies[start, id(mem)] = CountedMemory(self, mem, start, counts)
+        return start, end, proxy
+
+    def _remap_all(self):
+        for start, end, _ in self._regions_sorted:
+            self._map_pages(start, end)
+        for listener in list(self.layout_listeners):
+            listener()
+
+    def enable_access_stats(self) -> AccessStats:
+        """
+        Start counting accesses per region and page (see AccessStats).
+        Returns the counters, which keep accumulating until
+        disable_access_stats(); enabling again returns the same ones.
+        """
+        if self.access_stats is None:
+            self.access_stats = AccessStats(self)
+            self._remap_all()
+        return self.access_stats
+
+    def disable_access_stats(self) -> Optional[AccessStats]:
+        """Stop counting; returns the counters collected so far."""
+        stats, self.access_stats = self.access_stats, None
+        if stats is not None:
+            self._remap_all()
+        return stats
+
+    def alias(self, addr_start: int, target: int, name: str = "-", perms: str = None):
+        """
+        Map the region registered at `target` again at `addr_start`,
+        sharing its backing store (e.g. the P1/P2 mirrors of RAM and
+        ROM).  Permissions default to the target's.
+        """
+        memory = self._mem.get(target)
+        if memory is None:
+            raise IndexError(f'Address is unmapped : {hex(target)}')
+        if perms is None:
+            perms = MemoryPermission.to_string(self._metas[target]["perms"])
+        self.add(addr_start, memory, name, perms)
 
     def resolve(self, address: Union[int, bytearray]) -> Tuple[Memory, int]:
         """
@@ -166,20 +877,13 @@ class MemoryMap:
         This lets MMIO peripherals (small, e.g. 0x30 bytes for TMU)
         take priority over catch-all regions (large, e.g. 16MB).
         """
-        # Fast path: check the cached region first.
-        cs = self._cache_start
-        if cs <= address < self._cache_end:
-            return self._cache_mem, cs
-
-        # Cold path: scan the precomputed (start, end, mem) list.
-        # No len() calls needed here -- ends are precomputed in add().
-        for start, end, mem in self._regions_sorted:
-            if start <= address < end:
-                # Update cache
-                self._cache_start = start
-                self._cache_end = end
-                self._cache_mem = mem
-                return mem, start
+        try:
+            for start, end, mem in self._pages[address >> (MAP_PAGE_SHIFT + MAP_L2_BITS)][
+                    (address >> MAP_PAGE_SHIFT) & MAP_L2_MASK]:
+                if start <= address < end:
+                    return mem, start
+        except IndexError:
+            pass  # beyond the 32-bit space
         # no memory mapped
         raise IndexError(f'Address is unmapped : {hex(address)}')
 
@@ -274,6 +978,87 @@ class MemoryMap:
             return mem.write8(address - start, v)
         raise IndexError(f'Address overflow : {hex(address)}')  # pragma: no cover
 
+    def _span(self, address: int, end: int) -> Tuple[Memory, int, int]:
+        """
+        (mem, region_start, span_end): the region resolve() returns for
+        `address` and how far (up to `end`) it keeps winning -- until its
+        own end or the start of a smaller region nested in it.
+        """
+        mem, start = self.resolve(address)
+        limit = min(end, start + len(mem))
+        if self.watchpoints:
+            # Watched and unwatched pages resolve differently
+            limit = min(limit, (address | (MAP_PAGE_SIZE - 1)) + 1)
+        target = _backing(mem)
+        for s, e, m in self._regions_sorted:
+            if s == start and m is target:
+                break  # regions past this one are larger and never win over it
+            if address < s < limit:
+                limit = s
+        return mem, start, limit
+
+    def read_block(self, address: int, size: int) -> bytes:
+        """
+        Read `size` bytes starting at `address`, one slice per region
+        crossed (MMIO devices are read word by word).
+        """
+        end = address + size
+        chunks = []
+        while address < end:
+            mem, start, limit = self._span(address, end)
+            chunks.append(mem.read_block(address - start, limit - address))
+            address = limit
+        return b''.join(chunks)
+
+    def write_block(self, address: int, data) -> None:
+        """Write the bytes-like `data` starting at `address` (see read_block)."""
+        data = memoryview(data).cast('B')
+        end = address + len(data)
+        pos = address
+        while pos < end:
+            mem, start, limit = self._span(pos, end)
+            mem.write_block(pos - start, data[pos - address:limit - address])
+            pos = limit
+
+    def mark_code(self, address: int, end: int, listener: Callable):
+        """
+        Flag guest addresses [address, end) as compiled code (see
+        Memory.mark_code).  Mirrors share the backing Memory, so a write
+        through any alias of the region reaches the listener.
+        Returns (mem, region_start).
+        """
+        mem, start = self.resolve(address)
+        mem = _backing(mem)
+        mem.mark_code(address - start, min(end, start + len(mem)) - start, listener)
+        return mem, start
+
+    def fetch16(self, address: int) -> int:
+        """read16 for instruction decoding: never triggers watchpoints,
+        counts as a fetch in the access stats."""
+        mem, start = self.resolve(address)
+        if type(mem) is CountedMemory:
+            return mem.fetch16(address - start)
+        return _backing(mem).read16(address - start)
+
+    def direct_windows(self):
+        """
+        Flat (Memory or MappedMemory) regions that resolve() returns
+        for every address they cover (no smaller or earlier region
+        overlaps them), as a list of (start, end, mem, name).  Their
+        `_mem` buffers can be accessed directly at `address - start`.
+        None while access stats are on: every access must be counted.
+        """
+        windows = []
+        if self.access_stats is not None:
+            return windows
+        for i, (start, end, mem) in enumerate(self._regions_sorted):
+            if type(mem) is not Memory and type(mem) is not MappedMemory:
+                continue
+            if any(s < end and start < e for s, e, _ in self._regions_sorted[:i]):
+                continue
+            windows.append((start, end, mem, self._metas[start]["name"]))
+        return windows
+
     def get_mapped_areas(self):
         mapped_areas = []
         for start, memory in self._mem.items():
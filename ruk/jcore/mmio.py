@@ -5,15 +5,190 @@ Provides an `MMIODevice` class that wraps a peripheral object so it can
 be registered with `MemoryMap.add()`, and an `attach_tmu()` helper that
 maps a TMU peripheral into the memory map.
 
-Also provides `attach_rtc()` and `attach_ubc()` helpers (see rtc.py and
-ubc.py).
+Also provides `attach_rtc()`, `attach_ubc()` and `attach_ipr()` helpers
+(see rtc.py, ubc.py and intc.py).
+
+Peripherals with a fixed register layout describe it declaratively by
+subclassing `RegisterMapped` (see below) instead of decoding addresses
+in `if addr == ...` chains; `MMIODevice` compiles their map into
+per-width dicts keyed by offset, so a register access is one lookup
+and one call.
 """
 
-from typing import Callable, Optional
+from functools import partial
+from typing import Callable, Dict, Iterable, Optional, Tuple
 
 from ruk.jcore.memory import Memory, MemoryMap
 
 
+# ---------------------------------------------------------------------------
+# Register maps
+# ---------------------------------------------------------------------------
+
+# A register map row: (address, width, getter, setter).  An access of
+# `width` bytes (1, 2 or 4) at `address` calls getter() -> int, which
+# must return the value already masked to the width, or setter(value)
+# with the value masked to the width.  Either may be None (write-only /
+# read-only register).  A register that answers several access widths
+# has one row per width.
+RegisterRow = Tuple[int, int, Optional[Callable], Optional[Callable]]
+
+
+def register_attr(obj, name: str, mask: int = None) -> Tuple[Callable, Callable]:
+    """
+    (getter, setter) for a register held whole in the int attribute
+    `obj.<name>`.  With `mask`, reads return only those bits (narrow
+    accesses to a wider register).
+    """
+    if mask is None:
+        get = partial(getattr, obj, name)
+    else:
+        def get():
+            return getattr(obj, name) & mask
+    return get, partial(setattr, obj, name)
+
+
+def register_field(obj, name: str, shift: int, bits: int) -> Tuple[Callable, Callable]:
+    """
+    (getter, setter) for bits [shift, shift + bits) of the int attribute
+    `obj.<name>`: reads extract them, writes merge them in.
+    """
+    mask = (1 << bits) - 1
+    keep = ~(mask << shift)
+
+    def get():
+        return (getattr(obj, name) >> shift) & mask
+
+    def put(val):
+        setattr(obj, name, (getattr(obj, name) & keep) | ((val & mask) << shift))
+    return get, put
+
+
+def compile_register_map(rows: Iterable[RegisterRow], base: int = 0,
+                         size: int = None) -> Tuple[Dict[int, dict], Dict[int, dict]]:
+    """
+    Index a register map by access width: returns (getters, setters),
+    each {width: {address - base: callable}}.  With `size`, rows outside
+    [base, base + size) are left out.
+    """
+    getters = {1: {}, 2: {}, 4: {}}
+    setters = {1: {}, 2: {}, 4: {}}
+    for address, width, get, put in rows:
+        off = address - base
+        if size is not None and not 0 <= off < size:
+            continue
+        if get is not None:
+            getters[width][off] = get
+        if put is not None:
+            setters[width][off] = put
+    return getters, setters
+
+
+def hook_registers(getters: Dict[int, dict], setters: Dict[int, dict],
+                   before: Optional[Callable] = None, after: Optional[Callable] = None):
+    """
+    Wrap compiled register tables in place so every access calls
+    before() first and every write calls after() once done (a lazily
+    clocked peripheral catching up with the scheduler, see
+    ruk.jcore.scheduler).
+    """
+    def hook_get(get):
+        def hooked():
+            before()
+            return get()
+        return hooked
+
+    def hook_put(put):
+        def hooked(val):
+            if before is not None:
+                before()
+            put(val)
+            if after is not None:
+                after()
+        return hooked
+
+    for table in getters.values():
+        if before is not None:
+            for off, get in table.items():
+                table[off] = hook_get(get)
+    for table in setters.values():
+        for off, put in table.items():
+            table[off] = hook_put(put)
+
+
+class RegisterMapped:
+    """
+    Base for peripherals described by a register map.
+
+    Subclasses implement `register_map()` (rows of RegisterRow, absolute
+    addresses) and call `_build_registers()` once their state exists.
+    Accesses no row answers read as 0 and ignore writes.  The read/write
+    methods here serve direct callers (tests, other peripherals); a
+    peripheral mapped through MMIODevice is dispatched by offset without
+    going through them.
+
+    `on_access()` and `on_written()`, when set before the peripheral is
+    mapped, run before every register access and after every register
+    write (see hook_registers).
+    """
+
+    on_access: Optional[Callable[[], None]] = None
+    on_written: Optional[Callable[[], None]] = None
+
+    def register_map(self) -> Iterable[RegisterRow]:
+        raise NotImplementedError
+
+    def _build_registers(self):
+        getters, setters = compile_register_map(self.register_map())
+        self._get8, self._get16, self._get32 = getters[1], getters[2], getters[4]
+        self._set8, self._set16, self._set32 = setters[1], setters[2], setters[4]
+
+    def read8(self, addr: int) -> int:
+        if self.on_access is not None:
+            self.on_access()
+        get = self._get8.get(addr)
+        return 0 if get is None else get()
+
+    def read16(self, addr: int) -> int:
+        if self.on_access is not None:
+            self.on_access()
+        get = self._get16.get(addr)
+        return 0 if get is None else get()
+
+    def read32(self, addr: int) -> int:
+        if self.on_access is not None:
+            self.on_access()
+        get = self._get32.get(addr)
+        return 0 if get is None else get()
+
+    def write8(self, addr: int, val: int):
+        put = self._set8.get(addr)
+        if put is not None:
+            if self.on_access is not None:
+                self.on_access()
+            put(val & 0xFF)
+            if self.on_written is not None:
+                self.on_written()
+
+    def write16(self, addr: int, val: int):
+        put = self._set16.get(addr)
+        if put is not None:
+            if self.on_access is not None:
+                self.on_access()
+            put(val & 0xFFFF)
+            if self.on_written is not None:
+                self.on_written()
+
+    def write32(self, addr: int, val: int):
+        put = self._set32.get(addr)
+        if put is not None:
+            if self.on_access is not None:
+                self.on_access()
+            put(val & 0xFFFFFFFF)
+            if self.on_written is not None:
+                self.on_written()
+
+
 class MMIODevice(Memory):
     """
     A Memory-like object whose reads/writes are delegated to a peripheral.
@@ -27,6 +202,12 @@ class MMIODevice(Memory):
     The MemoryMap calls `Memory.read8/read16/read32` and
     `Memory.write_bin` with the offset (address - region_start); we
     translate back to absolute addresses before calling the peripheral.
+
+    If the peripheral has a `register_map()` (see RegisterMapped), the
+    rows inside this device's range are compiled into per-width dicts
+    keyed by offset, and accesses they answer call the register's
+    getter/setter directly (through its on_access/on_written hooks, if
+    set).  Anything else still goes to the peripheral's readN/writeN.
     """
 
     def __init__(self, base_addr: int, size: int, peripheral, name: str = "MMIO"):
@@ -36,27 +217,57 @@ class MMIODevice(Memory):
         self._peripheral = peripheral
         self._ptr = 0
         self._name = name
+        register_map = getattr(peripheral, 'register_map', None)
+        rows = register_map() if register_map is not None else ()
+        getters, setters = compile_register_map(rows, base_addr, size)
+        before = getattr(peripheral, 'on_access', None)
+        after = getattr(peripheral, 'on_written', None)
+        if before is not None or after is not None:
+            hook_registers(getters, setters, before, after)
+        self._get8, self._get16, self._get32 = getters[1], getters[2], getters[4]
+        self._set8, self._set16, self._set32 = setters[1], setters[2], setters[4]
 
     # ---- the Memory interface RuK's MemoryMap actually uses ----
 
     def read8(self, addr: int) -> int:
+        get = self._get8.get(addr)
+        if get is not None:
+            return get()
         return self._peripheral.read8(self._base_addr + addr) & 0xFF
 
     def read16(self, addr: int) -> int:
+        get = self._get16.get(addr)
+        if get is not None:
+            return get()
         return self._peripheral.read16(self._base_addr + addr) & 0xFFFF
 
     def read32(self, addr: int) -> int:
+        get = self._get32.get(addr)
+        if get is not None:
+            return get()
         return self._peripheral.read32(self._base_addr + addr) & 0xFFFFFFFF
 
     def write8(self, addr: int, val: int) -> int:
-        self._peripheral.write8(self._base_addr + addr, val & 0xFF)
+        put = self._set8.get(addr)
+        if put is not None:
+            put(val & 0xFF)
+        else:
+            self._peripheral.write8(self._base_addr + addr, val & 0xFF)
         return val
 
     def write16(self, addr: int, val: int):
-        self._peripheral.write16(self._base_addr + addr, val & 0xFFFF)
+        put = self._set16.get(addr)
+        if put is not None:
+            put(val & 0xFFFF)
+        else:
+            self._peripheral.write16(self._base_addr + addr, val & 0xFFFF)
 
     def write32(self, addr: int, val: int):
-        self._peripheral.write32(self._base_addr + addr, val & 0xFFFFFFFF)
+        put = self._set32.get(addr)
+        if put is not None:
+            put(val & 0xFFFFFFFF)
+        else:
+            self._peripheral.write32(self._base_addr + addr, val & 0xFFFFFFFF)
 
     def write_bin(self, addr: int, data) -> None:
         """Accept both bytes and int (for backwards compatibility)."""
@@ -67,23 +278,52 @@ class MMIODevice(Memory):
         # raw int.  So we accept both int and bytes here.
         if isinstance(data, int):
             # Treat as a single byte
-            self._peripheral.write8(self._base_addr + addr, data & 0xFF)
+            self.write8(addr, data)
             self._ptr = addr + 1
             return
         if len(data) == 1:
-            self._peripheral.write8(self._base_addr + addr, data[0])
+            self.write8(addr, data[0])
         elif len(data) == 2:
-            val = int.from_bytes(data, "big")
-            self._peripheral.write16(self._base_addr + addr, val)
+            self.write16(addr, int.from_bytes(data, "big"))
         elif len(data) == 4:
-            val = int.from_bytes(data, "big")
-            self._peripheral.write32(self._base_addr + addr, val)
+            self.write32(addr, int.from_bytes(data, "big"))
         else:
             # Fallback: byte-by-byte
             for i, b in enumerate(data):
-                self._peripheral.write8(self._base_addr + addr + i, b)
+                self.write8(addr + i, b)
         self._ptr = addr + len(data)
 
+    def read_block(self, addr: int, size: int) -> bytes:
+        """Block read as the widest aligned register accesses that fit."""
+        out = bytearray()
+        end = addr + size
+        while addr < end:
+            if not addr & 3 and end - addr >= 4:
+                out += self.read32(addr).to_bytes(4, "big")
+                addr += 4
+            elif not addr & 1 and end - addr >= 2:
+                out += self.read16(addr).to_bytes(2, "big")
+                addr += 2
+            else:
+                out.append(self.read8(addr))
+                addr += 1
+        return bytes(out)
+
+    def write_block(self, addr: int, data) -> None:
+        """Block write as the widest aligned register accesses that fit."""
+        pos = 0
+        while pos < len(data):
+            a = addr + pos
+            if not a & 3 and len(data) - pos >= 4:
+                self.write32(a, int.from_bytes(data[pos:pos + 4], "big"))
+                pos += 4
+            elif not a & 1 and len(data) - pos >= 2:
+                self.write16(a, int.from_bytes(data[pos:pos + 2], "big"))
+                pos += 2
+            else:
+                self.write8(a, data[pos])
+                pos += 1
+
     def __len__(self):
         return self._size
 
@@ -187,6 +427,13 @@ def attach_bsc(memory_map: MemoryMap, bsc) -> None:
     memory_map.add(BSC_BASE, bsc_dev, name="BSC", perms="RW")
 
 
+def attach_ipr(memory_map: MemoryMap, intc) -> None:
+    """Map an InterruptController's IPRA..IPRL (Casio INTC2) at 0xA4080000."""
+    from ruk.jcore.intc import INTC_BASE, INTC_SIZE
+    intc_dev = MMIODevice(INTC_BASE, INTC_SIZE, intc, name="INTC")
+    memory_map.add(INTC_BASE, intc_dev, name="INTC", perms="RW")
+
+
 def attach_cpg(memory_map: MemoryMap, cpg) -> None:
     """Map a CPG (Clock Pulse Generator) at 0xA4150000."""
     from ruk.jcore.cpg import CPG_BASE, CPG_SIZE
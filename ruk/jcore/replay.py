@@ -0,0 +1,367 @@
+"""
+Reverse execution: step back and reverse-continue.
+
+A Timeline drives a Classpad forward while keeping what is needed to
+get back to any earlier instruction:
+
+    timeline = cp.enable_timeline()
+    timeline.run(1_000_000)
+    timeline.step()
+    timeline.step_back(500)                 # 500 instructions earlier
+    timeline.reverse_continue({0x8C001234}) # last time pc was 0x8C001234
+
+Going back restores the nearest earlier checkpoint (ruk.jcore.checkpoint)
+and re-executes up to the target instruction.  `timeline.now` counts
+every instruction the timeline ran (a step() that takes an interrupt
+counts as one), so targets are exact.
+
+Re-execution only matches the original run if the machine sees the same
+events, so the timeline logs the three that do not follow from memory
+and registers alone:
+
+  - How instructions ran.  The log keeps, as run lengths, which
+    instructions were stepped and which ran in the JIT.  Stepped spans
+    are stepped again.  JIT spans go through the JIT again, or through
+    step() where they must stop at an exact count (within RUN_SLACK of
+    a logged event, and everywhere for reverse_continue), without
+    on_step or the UBC either way.
+  - Peripheral time in JIT spans.  step() moves the scheduler
+    (ruk.jcore.scheduler) on after every instruction, but the JIT only
+    between dispatches, and where those fall depends on what had been
+    compiled so far.  So while the JIT runs, every time something looks
+    at peripheral time (a clock catches up: a timer register access, an
+    event firing) the timeline logs the scheduler's time with the count
+    of the JIT's last update of it, as well as the time at the end of
+    each run.  Re-executing a JIT span, the CPU runs without the
+    scheduler and the timeline sets the logged times at those counts,
+    so every timer read returns what it did the first time.
+  - Interrupt deliveries.  Each INTEVT taken from the INTC is logged
+    with the instruction count it was taken at (in the JIT, from its
+    progress through the run).  While re-executing, the CPU is made to
+    check for an interrupt at those counts and the INTC hands out
+    exactly those, whatever is pending, so requests made from outside
+    the CPU (tests, the GUI) are replayed as well.  JIT spans are
+    stepped around them.
+
+Fast-forward (Classpad.enable_fast_forward) skips instructions without
+counting them, so it is off while a timeline records.
+
+Drive the machine through the timeline (step, run, run_with_check)
+rather than the CPU directly, or the counts go wrong.  After changing
+the machine from outside (a reset, a register edit) call sync(), so no
+re-execution crosses the change.
+
+Going back forgets the future: the checkpoints and log entries after the
+target are dropped, and running forward again records a new history.
+"""
+
+from bisect import bisect_right
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from ruk.jcore.checkpoint import Checkpoint
+
+# Compiled code stops within one block (at most 256 instructions, see
+# BlockRunner._compile_block) of its budget; JIT re-execution stops this
+# many instructions short of a target and steps the rest.
+RUN_SLACK = 256
+
+
+class Timeline:
+    """
+    Instruction-exact history of `cp` (see the module docstring).
+
+    :param interval: stepped instructions between checkpoints.  step()
+                     runs about 100x slower than compiled code, and so
+                     does re-executing stepped spans.
+    :param run_interval: instructions run in the JIT between checkpoints
+    :param budget: CheckpointRing budget, when the ring is created here
+    """
+
+    def __init__(self, cp, interval: int = 100_000, run_interval: int = 2_000_000,
+                 budget: int = 64 << 20):
+        self.cp = cp
+        self.interval = interval
+        self.run_interval = run_interval
+        self.ring = cp.checkpoints if cp.checkpoints is not None else cp.enable_checkpoints(budget)
+        self.now = 0
+        # checkpoint index -> instruction count it was taken at
+        self._times: Dict[int, int] = {}
+        # (count, stepped): from `count` on, instructions were stepped
+        # (True) or run in the JIT (False), until the next entry
+        self._modes: List[Tuple[int, bool]] = []
+        # instruction count -> INTEVT delivered by the step at that count
+        self._irqs: Dict[int, int] = {}
+        # instruction count -> scheduler time the JIT had moved it to
+        # there, when someone looked (see the module docstring)
+        self._syncs: Dict[int, int] = {}
+        self._stepped = 0
+        self._ran = 0
+        self._replaying = False
+        self._running = False
+        self._run_total = 0
+        intc = cp.intc
+        if intc is not None:
+            self._take_live = intc.take_pending
+            intc.take_pending = self._take_pending
+        cp.scheduler.on_sync = self._on_sync
+        self.sync()
+
+    # ---- recording ----
+
+    def _count(self) -> int:
+        """Count of the instruction about to run (inside a run(), the JIT's)."""
+        if self._running:
+            return self.now + self.cp.cpu._jit.steps
+        return self.now
+
+    def _take_pending(self, sr: int) -> Optional[int]:
+        intc = self.cp.intc
+        if self._replaying:
+            intevt = self._irqs.get(self._count())
+            if intevt is not None:
+                intc.discard(intevt)
+            return intevt
+        intevt = self._take_live(sr)
+        if intevt is not None:
+            self._irqs[self._count()] = intevt
+        return intevt
+
+    def _on_sync(self):
+        if self._running and not self._replaying:
+            self._syncs[self._count()] = self.cp.scheduler.now
+
+    def _mark(self, stepped: bool):
+        modes = self._modes
+        if modes and modes[-1][1] == stepped:
+            return
+        if modes and modes[-1][0] == self.now:
+            modes.pop()
+            if modes and modes[-1][1] == stepped:
+                return
+        modes.append((self.now, stepped))
+
+    def _advance_run(self, steps: int):
+        self._syncs[self.now + steps] = self.cp.scheduler.now
+        self.now += steps
+        self._ran += steps
+        if self._ran >= self.run_interval:
+            self.sync()
+
+    def step(self):
+        """Execute one instruction (ticking the peripherals, taking interrupts)."""
+        self._mark(True)
+        self.cp.cpu.step()
+        self.now += 1
+        self._stepped += 1
+        if self._stepped >= self.interval:
+            self.sync()
+
+    def run(self, max_steps: int = 10000000) -> int:
+        """CPU.run() through the timeline; returns the steps executed."""
+        self._mark(False)
+        self._running = True
+        try:
+            steps = self.cp.cpu.run(max_steps)
+        finally:
+            self._running = False
+        self._advance_run(steps)
+        return steps
+
+    def run_with_check(self, should_continue, max_steps_per_batch: int = 50000,
+                       tick_callback=None, tick_interval: int = 500) -> int:
+        """CPU.run_with_check() through the timeline (checkpoints between batches)."""
+        self._mark(False)
+        self._run_total = 0
+
+        def on_batch(total: int):
+            self._advance_run(total - self._run_total)
+            self._run_total = total
+            if tick_callback is not None:
+                tick_callback(total)
+
+        self._running = True
+        try:
+            return self.cp.cpu.run_with_check(should_continue, max_steps_per_batch,
+                                              on_batch, tick_interval)
+        finally:
+            self._running = False
+
+    def sync(self) -> Checkpoint:
+        """
+        Take a checkpoint now.  Called every `interval` instructions, and
+        needed after changing the machine from outside the timeline.
+        """
+        checkpoint = self.ring.take()
+        self._times[checkpoint.index] = self.now
+        self._stepped = self._ran = 0
+        self._forget_before(self._time(self.ring[0]))
+        return checkpoint
+
+    # ---- history ----
+
+    def _time(self, checkpoint: Checkpoint) -> Optional[int]:
+        return self._times.get(checkpoint.index)
+
+    @property
+    def start(self) -> int:
+        """The earliest instruction count the timeline can go back to."""
+        return min(self._known()[0][0], self.now)
+
+    def _known(self) -> List[Tuple[int, Checkpoint]]:
+        """(count, checkpoint) for the checkpoints taken by the timeline, oldest first."""
+        return [(self._times[c.index], c) for c in self.ring if c.index in self._times]
+
+    def _forget_before(self, count: Optional[int]):
+        """Drop the log entries older than `count` (the oldest checkpoint)."""
+        live = {c.index for c in self.ring}
+        self._times = {index: t for index, t in self._times.items() if index in live}
+        if count is None:
+            return
+        i = bisect_right(self._modes, (count, True)) - 1
+        if i > 0:
+            del self._modes[:i]
+        if self._irqs and min(self._irqs) < count:
+            self._irqs = {t: intevt for t, intevt in self._irqs.items() if t >= count}
+        if self._syncs and min(self._syncs) < count:
+            self._syncs = {t: time for t, time in self._syncs.items() if t >= count}
+
+    def _forget_after(self):
+        """Drop the log entries from `now` on: the future is rewritten."""
+        while self._modes and self._modes[-1][0] >= self.now:
+            self._modes.pop()
+        if self._irqs and max(self._irqs) >= self.now:
+            self._irqs = {t: intevt for t, intevt in self._irqs.items() if t < self.now}
+        # The time logged at `now` is already in the machine's past
+        if self._syncs and max(self._syncs) > self.now:
+            self._syncs = {t: time for t, time in self._syncs.items() if t <= self.now}
+        live = {c.index for c in self.ring}
+        self._times = {index: t for index, t in self._times.items() if index in live}
+
+    def _restore(self, count: int, checkpoint: Checkpoint):
+        self.ring.restore(checkpoint)
+        self.now = count
+
+    def _step_to(self, count: int, breakpoints, hit: Optional[int]) -> Optional[int]:
+        """Step up to `count`, taking the logged interrupts; returns the last breakpoint hit."""
+        cpu = self.cp.cpu
+        irqs = self._irqs
+        while self.now < count:
+            if breakpoints is not None and cpu.pc in breakpoints:
+                hit = self.now
+            if self.now in irqs:
+                cpu.irq_check = True
+            cpu.step()
+            self.now += 1
+        return hit
+
+    def _run_to(self, count: int):
+        """Run the JIT up to `count` at most RUN_SLACK instructions short."""
+        cpu = self.cp.cpu
+        self._running = True
+        try:
+            while count - self.now > RUN_SLACK:
+                steps = cpu.run(count - self.now - RUN_SLACK)
+                if not steps:
+                    break
+                self.now += steps
+        finally:
+            self._running = False
+
+    def _replay(self, target: int, breakpoints=None) -> Optional[int]:
+        """
+        Re-execute from `now` to `target` following the log.  With
+        `breakpoints`, everything is stepped and the return value is the
+        last count before `target` at which pc was in `breakpoints`.
+        """
+        cpu = self.cp.cpu
+        sched = self.cp.scheduler
+        on_step, ubc = cpu.on_step, cpu.ubc
+        modes = self._modes
+        hit = None
+        self._replaying = True
+        try:
+            while self.now < target:
+                i = bisect_right(modes, (self.now, True)) - 1
+                stepped = modes[i][1] if i >= 0 else True
+                end = target if i + 1 >= len(modes) else min(target, modes[i + 1][0])
+                if stepped:
+                    hit = self._step_to(end, breakpoints, hit)
+                    continue
+                # Compiled code neither calls on_step nor checks the UBC,
+                # and the logged times stand in for its scheduler updates
+                step_count = cpu._step_count
+                cpu.on_step = cpu.ubc = cpu.scheduler = None
+                # Stop exactly at each logged time, and step each logged
+                # interrupt
+                marks = {t for t in self._syncs if self.now < t <= end}
+                marks.update(t + 1 for t in self._irqs if self.now <= t < end)
+                marks.add(end)
+                for mark in sorted(marks):
+                    if breakpoints is None:
+                        self._run_to(mark)
+                    hit = self._step_to(mark, breakpoints, hit)
+                    time = self._syncs.get(mark)
+                    if time is not None:
+                        sched.advance(time - sched.now)
+                # Compiled code does not count steps
+                cpu._step_count = step_count
+                cpu.on_step, cpu.ubc, cpu.scheduler = on_step, ubc, sched
+        finally:
+            cpu.on_step, cpu.ubc, cpu.scheduler = on_step, ubc, sched
+            self._replaying = self._running = False
+            if getattr(cpu.mem, 'watch_hit', None) is not None:
+                cpu.mem.watch_hit = None
+        return hit
+
+    def _settle(self, checkpoint_count: int):
+        self._forget_after()
+        self._stepped = self.now - checkpoint_count
+        self._ran = 0
+
+    def seek(self, target: int) -> int:
+        """
+        Go back to instruction count `target` (not earlier than `start`,
+        not later than `now`).  Returns the count reached.
+        """
+        if target > self.now:
+            raise ValueError(f"can't seek forward to {target} (now {self.now})")
+        count, checkpoint = self._known()[0]
+        for t, c in self._known():
+            if t <= target:
+                count, checkpoint = t, c
+        target = max(target, count)
+        self._restore(count, checkpoint)
+        self._replay(target)
+        self._settle(count)
+        return self.now
+
+    def step_back(self, count: int = 1) -> int:
+        """Go back `count` instructions.  Returns how many it went back."""
+        now = self.now
+        return now - self.seek(now - count)
+
+    def reverse_continue(self, breakpoints: Iterable[int]) -> Optional[int]:
+        """
+        Go back to the last instruction before `now` whose pc is in
+        `breakpoints` and return its count.  Without one, stop at
+        `start` and return None.
+
+        Scans checkpoint intervals newest first, stepping through each.
+        """
+        breakpoints = {addr & 0xFFFFFFFF for addr in breakpoints}
+        end = self.now
+        candidates = [(t, c) for t, c in self._known() if t < end]
+        if not candidates:
+            return None
+        for count, checkpoint in reversed(candidates):
+            self._restore(count, checkpoint)
+            hit = self._replay(end, breakpoints)
+            if hit is not None:
+                self._restore(count, checkpoint)
+                self._replay(hit)
+                self._settle(count)
+                return hit
+            end = count
+        self._restore(count, checkpoint)
+        self._settle(count)
+        return None
@@ -53,7 +53,10 @@ Reference:
 
 import calendar
 import datetime
-from typing import Callable, Optional
+from functools import partial
+from typing import Callable, Optional, Tuple
+
+from ruk.jcore.mmio import RegisterMapped, register_attr
 
 
 # ===========================================================================
@@ -137,12 +140,52 @@ def int_to_bcd16(n: int) -> int:
     n %= 10000
     return (int_to_bcd8(n // 100) << 8) | int_to_bcd8(n % 100)
 
+def _next_day(day: int, month: int, year: int):
+    """The (day, month, year) after the given one, as the RTC counts."""
+    day += 1
+    # Days in this month (handle leap years for February)
+    if month == 2:
+        leap = (year % 4 == 0 and year % 100 != 0) or (year % 400 == 0)
+        dim = 29 if leap else 28
+    elif month in (4, 6, 9, 11):
+        dim = 30
+    else:
+        dim = 31
+
+    if day > dim:
+        # Roll over to next month
+        day = 1
+        month += 1
+        if month > 12:
+            month = 1
+            year = (year + 1) % 10000
+    return day, month, year
+
+
+def _tod_matches(hour: Optional[int], minute: Optional[int], sec: Optional[int],
+                 lo: int, hi: int) -> bool:
+    """
+    True if a time of day in [lo, hi] (seconds since midnight) has the
+    given hour, minute and second (None: any).
+    """
+    for h in ([hour] if hour is not None else range(lo // 3600, hi // 3600 + 1)):
+        for m in ([minute] if minute is not None else range(60)):
+            base = h * 3600 + m * 60
+            if base > hi:
+                return False
+            if base + 59 < lo:
+                continue
+            if sec is None or lo <= base + sec <= hi:
+                return True
+    return False
+
+
 
 # ===========================================================================
 # RTC peripheral
 # ===========================================================================
 
-class RTC:
+class RTC(RegisterMapped):
     """
     Casio SH7305 Real-Time Clock.
 
@@ -191,6 +234,8 @@ class RTC:
         # Callback for delivering IRQs to the INTC
         self.on_irq: Optional[Callable[[int], None]] = None
 
+        self._build_registers()
+
     def _init_to_defaults(self):
         """Initialize counters to the cp-emu defaults (2010-01-01 00:00:00)."""
         # Time counters (all in BCD except R64CNT and RWKCNT)
@@ -252,118 +297,165 @@ class RTC:
         This is important for OS boot: the Casio OS polls R64CNT
         waiting for it to change BEFORE it sets RCR2.START.  If we
         gate R64CNT on START, the OS hangs forever in the polling loop.
-        """
-        for _ in range(cycles):
-            self._tick_one()
 
-    def _tick_one(self):
-        """Advance the RTC by one 128-Hz tick.
-
-        R64CNT always advances (free-running).  The date/time registers
-        only advance when RCR2.START=1.
+        The cost does not depend on `cycles`: the counters, the
+        calendar and the periodic divider are advanced arithmetically.
+        Flags are set as if ticked one by one, but each interrupt is
+        raised at most once per call (the flags stay set until the
+        handler clears them); the scheduler ticks up to each one.
         """
-        # R64CNT always advances (it's a free-running 128-Hz counter)
-        self.r64cnt = (self.r64cnt + 1) & 0xFF
-
-        # Check periodic interrupt (always checked, regardless of START)
-        self._check_periodic()
-
-        if self.r64cnt < 128:
-            # Still within the same second
+        if cycles <= 0:
             return
-
-        # R64CNT rolled over: a new second has begun.
-        # Set the carry flag (always, even if START=0 -- the carry flag
-        # indicates R64CNT wrapped, not that the time advanced).
-        self.r64cnt = 0
-        self.rcr1 |= RCR1_CF
-
-        # Only advance the date/time registers if START=1
-        if not (self.rcr2 & RCR2_START):
-            # START=0: RTC time is stopped, but R64CNT still ticks.
-            # Still fire the carry interrupt if RCR1.CIE is set.
+        seconds, self.r64cnt = divmod(self.r64cnt + cycles, 128)
+        started = self.rcr2 & RCR2_START
+
+        # The periodic divider counts every tick, and again at each
+        # second boundary while the time runs.
+        periodic = self._advance_periodic(cycles + (seconds if started else 0))
+
+        if seconds:
+            # R64CNT rolled over: a new second has begun.  The carry
+            # flag is set even if START=0 (it indicates R64CNT wrapped,
+            # not that the time advanced).
+            self.rcr1 |= RCR1_CF
+            alarm = bool(started) and self._advance_time(seconds)
             if self.rcr1 & RCR1_CIE:
                 self._raise_irq(RTC_INTEVT_CARRY)
-            return
-
-        # Increment seconds
-        sec = bcd8_to_int(self.rseccnt) + 1
-        if sec >= 60:
-            self.rseccnt = int_to_bcd8(0)
-            # Increment minutes
-            minute = bcd8_to_int(self.rmincnt) + 1
-            if minute >= 60:
-                self.rmincnt = int_to_bcd8(0)
-                # Increment hours
-                hour = bcd8_to_int(self.rhrcnt) + 1
-                if hour >= 24:
-                    self.rhrcnt = int_to_bcd8(0)
-                    # Increment day of week (0..6, plain binary)
-                    self.rwkcnt = (self.rwkcnt + 1) % 7
-                    # Increment day of month, with month/year rollover
-                    self._increment_day()
-                else:
-                    self.rhrcnt = int_to_bcd8(hour)
-            else:
-                self.rmincnt = int_to_bcd8(minute)
-        else:
-            self.rseccnt = int_to_bcd8(sec)
-
-        # Carry interrupt
-        if self.rcr1 & RCR1_CIE:
-            self._raise_irq(RTC_INTEVT_CARRY)
-
-        # Alarm check
-        if self.rcr1 & RCR1_AIE:
-            if self._alarm_matches():
+            if alarm:
                 self.rcr1 |= RCR1_AF
                 self._raise_irq(RTC_INTEVT_ALARM)
 
-        # Periodic interrupt (also checked at the second boundary)
-        self._check_periodic()
-
-    def _increment_day(self):
-        """Increment RDAYCNT, handling month/year rollover."""
-        day = bcd8_to_int(self.rdaycnt) + 1
-        month = bcd8_to_int(self.rmoncnt)
-        year = bcd16_to_int(self.ryrcnt)
-
-        # Days in this month (handle leap years for February)
-        if month == 2:
-            leap = (year % 4 == 0 and year % 100 != 0) or (year % 400 == 0)
-            dim = 29 if leap else 28
-        elif month in (4, 6, 9, 11):
-            dim = 30
-        else:
-            dim = 31
-
-        if day > dim:
-            # Roll over to next month
-            day = 1
-            month += 1
-            if month > 12:
-                month = 1
-                year += 1
-                self.ryrcnt = int_to_bcd16(year)
-            self.rmoncnt = int_to_bcd8(month)
-        self.rdaycnt = int_to_bcd8(day)
+        if periodic:
+            self.rcr2 |= RCR2_PEF
+            self._raise_irq(RTC_INTEVT_PRI)
 
-    def _check_periodic(self):
-        """Check if the periodic interrupt should fire."""
+    def _advance_periodic(self, counts: int) -> bool:
+        """Advance the periodic divider; True if it fired."""
         pes = (self.rcr2 & RCR2_PES) >> RCR2_PES_S
         if pes == 0:
-            return   # periodic interrupt disabled
-        # The periodic interrupt fires every (128 / rate) ticks.
+            return False   # periodic interrupt disabled
+        # The periodic interrupt fires every (128 / rate) counts.
         # rate is in Hz (e.g. pes=6 -> 1 Hz -> every 128 ticks).
         rate = RTC_PERIODIC_RATES[pes]
         if rate == 0:
-            return
+            return False
         period = int(128 / rate)
-        self._periodic_counter += 1
-        if self._periodic_counter >= period:
-            self._periodic_counter = 0
-            self.rcr2 |= RCR2_PEF
-            self._raise_irq(RTC_INTEVT_PRI)
+        first = max(period - self._periodic_counter, 1)
+        if counts < first:
+            self._periodic_counter += counts
+            return False
+        self._periodic_counter = (counts - first) % period
+        return True
+
+    def _advance_time(self, seconds: int) -> bool:
+        """
+        Advance the date/time counters by `seconds` seconds.  Returns
+        True if the alarm matched at any of them (RCR1.AIE set).
+        """
+        alarm = bool(self.rcr1 & RCR1_AIE)
+        hit = False
+        # Out-of-range values written by the program wrap at their next
+        # carry (within the hour); tick up to there one second at a time.
+        while seconds and not self._time_valid():
+            self._next_second()
+            seconds -= 1
+            hit = hit or (alarm and self._alarm_matches())
+        if not seconds:
+            return hit
+        if alarm and not hit:
+            hit = self._alarm_within(seconds)
+        tod = (bcd8_to_int(self.rhrcnt) * 3600 + bcd8_to_int(self.rmincnt) * 60
+               + bcd8_to_int(self.rseccnt) + seconds)
+        days, tod = divmod(tod, 86400)
+        hour, rest = divmod(tod, 3600)
+        self.rhrcnt = int_to_bcd8(hour)
+        self.rmincnt = int_to_bcd8(rest // 60)
+        self.rseccnt = int_to_bcd8(rest % 60)
+        if days:
+            # Day of week (0..6, plain binary)
+            self.rwkcnt = (self.rwkcnt + days) % 7
+            self._advance_days(days)
+        return hit
+
+    def _time_valid(self) -> bool:
+        return (bcd8_to_int(self.rseccnt) < 60 and bcd8_to_int(self.rmincnt) < 60
+                and bcd8_to_int(self.rhrcnt) < 24)
+
+    def _next_second(self):
+        """Advance the time counters by one second, carrying into the date."""
+        sec = bcd8_to_int(self.rseccnt) + 1
+        if sec < 60:
+            self.rseccnt = int_to_bcd8(sec)
+            return
+        self.rseccnt = int_to_bcd8(0)
+        minute = bcd8_to_int(self.rmincnt) + 1
+        if minute < 60:
+            self.rmincnt = int_to_bcd8(minute)
+            return
+        self.rmincnt = int_to_bcd8(0)
+        hour = bcd8_to_int(self.rhrcnt) + 1
+        if hour < 24:
+            self.rhrcnt = int_to_bcd8(hour)
+            return
+        self.rhrcnt = int_to_bcd8(0)
+        self.rwkcnt = (self.rwkcnt + 1) % 7
+        self._increment_day()
+
+    def _advance_days(self, days: int):
+        """Advance RDAYCNT/RMONCNT/RYRCNT by `days` days."""
+        while days > 0:
+            day, month, year = (bcd8_to_int(self.rdaycnt), bcd8_to_int(self.rmoncnt),
+                                bcd16_to_int(self.ryrcnt))
+            try:
+                date = datetime.date(year, month, day) + datetime.timedelta(days=days)
+            except (ValueError, OverflowError):
+                # Not a date (written by the program) or past year 9999:
+                # one day at a time, like the counters would.
+                self._increment_day()
+                days -= 1
+                continue
+            self.rdaycnt = int_to_bcd8(date.day)
+            self.rmoncnt = int_to_bcd8(date.month)
+            self.ryrcnt = int_to_bcd16(date.year)
+            return
+
+    def _increment_day(self):
+        """Increment RDAYCNT, handling month/year rollover."""
+        day, month, year = _next_day(bcd8_to_int(self.rdaycnt), bcd8_to_int(self.rmoncnt),
+                                     bcd16_to_int(self.ryrcnt))
+        self.rdaycnt = int_to_bcd8(day)
+        self.rmoncnt = int_to_bcd8(month)
+        self.ryrcnt = int_to_bcd16(year)
+
+    def next_event(self) -> Optional[int]:
+        """
+        128-Hz ticks until the RTC may raise an interrupt (carry, alarm
+        or periodic), or None if none is enabled.  Errs early: the
+        periodic counter also advances at each second boundary.
+        """
+        ticks = []
+        if self.rcr1 & (RCR1_CIE | RCR1_AIE):
+            ticks.append(128 - self.r64cnt)
+        pes = (self.rcr2 & RCR2_PES) >> RCR2_PES_S
+        if pes:
+            left = max(int(128 / RTC_PERIODIC_RATES[pes]) - self._periodic_counter, 1)
+            ticks.append(left - (self.r64cnt + left) // 128)
+        return max(min(ticks), 1) if ticks else None
+
+    def next_change(self, addr: int) -> Optional[Tuple[str, int]]:
+        """
+        (clock, ticks) until the register at `addr` changes without an
+        interrupt of its own: R64CNT every tick, the time counters and
+        RCR1.CF at the next second.  None for the others.  Used to
+        fast-forward polling loops (see Classpad.enable_fast_forward).
+        """
+        offset = addr - RTC_BASE
+        if offset == RTC_R64CNT:
+            return 'rtc', 1
+        if offset == RTC_RCR1 or (RTC_RSECCNT <= offset <= RTC_RYRCNT + 1
+                                  and self.rcr2 & RCR2_START):
+            return 'rtc', 128 - self.r64cnt
+        return None
 
     def _alarm_matches(self) -> bool:
         """Check if the current time matches the alarm settings."""
@@ -384,94 +476,105 @@ class RTC:
             return False
         return True
 
-    # ---- MMIO read/write ----
-
-    def read8(self, addr: int) -> int:
-        offset = addr - RTC_BASE
-        if offset == RTC_R64CNT:   return self.r64cnt
-        if offset == RTC_RSECCNT:  return self.rseccnt
-        if offset == RTC_RMINCNT:  return self.rmincnt
-        if offset == RTC_RHRCNT:   return self.rhrcnt
-        if offset == RTC_RWKCNT:   return self.rwkcnt
-        if offset == RTC_RDAYCNT:  return self.rdaycnt
-        if offset == RTC_RMONCNT:  return self.rmoncnt
-        if offset == RTC_RSECAR:   return self.rsecar
-        if offset == RTC_RMINAR:   return self.rminar
-        if offset == RTC_RHRAR:    return self.rhrar
-        if offset == RTC_RWKAR:    return self.rwkar
-        if offset == RTC_RDAYAR:   return self.rdayar
-        if offset == RTC_RMONAR:   return self.rmonar
-        if offset == RTC_RCR1:     return self.rcr1
-        if offset == RTC_RCR2:     return self.rcr2
-        if offset == RTC_RCR3:     return self.rcr3
-        return 0
-
-    def read16(self, addr: int) -> int:
-        offset = addr - RTC_BASE
-        if offset == RTC_RYRCNT:   return self.ryrcnt
-        if offset == RTC_RYRAR:    return self.ryrar
-        return 0
-
-    def read32(self, addr: int) -> int:
-        return 0   # no 32-bit RTC registers
+    def _alarm_target(self, reg: int, limit: int) -> Optional[int]:
+        """
+        The counter value an enabled alarm field matches (see
+        _alarm_matches): None for don't care, -1 if none can.
+        """
+        if not reg & 1:
+            return None
+        value = bcd8_to_int(reg >> 4)
+        return value if value < limit and int_to_bcd8(value) == reg >> 4 else -1
 
-    def write8(self, addr: int, val: int):
-        val &= 0xFF
-        offset = addr - RTC_BASE
-        if offset == RTC_R64CNT:
-            pass   # R64CNT is read-only
-        elif offset == RTC_RSECCNT: self.rseccnt = val
-        elif offset == RTC_RMINCNT: self.rmincnt = val
-        elif offset == RTC_RHRCNT:  self.rhrcnt  = val
-        elif offset == RTC_RWKCNT:  self.rwkcnt  = val & 0x07
-        elif offset == RTC_RDAYCNT: self.rdaycnt = val
-        elif offset == RTC_RMONCNT: self.rmoncnt = val
-        elif offset == RTC_RSECAR:  self.rsecar  = val
-        elif offset == RTC_RMINAR:  self.rminar  = val
-        elif offset == RTC_RHRAR:   self.rhrar   = val
-        elif offset == RTC_RWKAR:   self.rwkar   = val
-        elif offset == RTC_RDAYAR:  self.rdayar  = val
-        elif offset == RTC_RMONAR:  self.rmonar  = val
-        elif offset == RTC_RCR1:
-            # CF and AF are write-0-to-clear
-            if (val & RCR1_CF) == 0:
-                self.rcr1 &= ~RCR1_CF & 0xFF
-            if (val & RCR1_AF) == 0:
-                self.rcr1 &= ~RCR1_AF & 0xFF
-            # CIE and AIE are write-anywhere
-            self.rcr1 = (self.rcr1 & (RCR1_CF | RCR1_AF)) | (val & ~(RCR1_CF | RCR1_AF) & 0xFF)
-        elif offset == RTC_RCR2:
-            # PEF is write-0-to-clear
-            if (val & RCR2_PEF) == 0:
-                self.rcr2 &= ~RCR2_PEF & 0xFF
-            old = self.rcr2
-            self.rcr2 = (self.rcr2 & RCR2_PEF) | (val & ~RCR2_PEF & 0xFF)
-            # Handle RESET: writing 1 to RESET bit resets all counters
-            if val & RCR2_RESET:
-                self.r64cnt = 0
-                self.rseccnt = 0
-                self.rmincnt = 0
-                self.rhrcnt = 0
-                self.rwkcnt = 0
-                self.rdaycnt = int_to_bcd8(1)
-                self.rmoncnt = int_to_bcd8(1)
-                self.ryrcnt = int_to_bcd16(2000)
-                self.rcr2 &= ~RCR2_RESET & 0xFF
-            # When START transitions from 0 to 1, reset the periodic counter
-            if (val & RCR2_START) and not (old & RCR2_START):
-                self._periodic_counter = 0
-        elif offset == RTC_RCR3:
-            self.rcr3 = val
-
-    def write16(self, addr: int, val: int):
-        val &= 0xFFFF
-        offset = addr - RTC_BASE
-        if offset == RTC_RYRCNT:   self.ryrcnt = val
-        elif offset == RTC_RYRAR:  self.ryrar = val
+    def _alarm_within(self, seconds: int) -> bool:
+        """
+        True if the alarm matches at any of the next `seconds` seconds
+        after the current (in-range) time.  Scans day by day.
+        """
+        sec = self._alarm_target(self.rsecar, 60)
+        minute = self._alarm_target(self.rminar, 60)
+        hour = self._alarm_target(self.rhrar, 24)
+        mday = self._alarm_target(self.rdayar, 32)
+        month = self._alarm_target(self.rmonar, 13)
+        wday = self.rwkar & 0x07 if self.rwkar & 1 else None
+        if -1 in (sec, minute, hour, mday, month):
+            return False
 
-    def write32(self, addr: int, val: int):
-        # No 32-bit registers; tolerate 32-bit writes by ignoring them
-        pass
+        day, mon, year = (bcd8_to_int(self.rdaycnt), bcd8_to_int(self.rmoncnt),
+                          bcd16_to_int(self.ryrcnt))
+        wk = self.rwkcnt
+        tod = (bcd8_to_int(self.rhrcnt) * 3600 + bcd8_to_int(self.rmincnt) * 60
+               + bcd8_to_int(self.rseccnt) + 1)
+        # Any day/month/weekday combination recurs within 8 years
+        # (Feb 29 across a non-leap century), or never does.
+        for _ in range(8 * 366 + 8):
+            span = min(86400 - tod, seconds)
+            if (mday in (None, day) and month in (None, mon) and wday in (None, wk)
+                    and _tod_matches(hour, minute, sec, tod, tod + span - 1)):
+                return True
+            seconds -= span
+            if seconds <= 0:
+                break
+            tod = 0
+            day, mon, year = _next_day(day, mon, year)
+            wk = (wk + 1) % 7
+        return False
+
+    # ---- MMIO register map ----
+
+    def register_map(self):
+        """The RTC registers: 8-bit except the 16-bit year counters."""
+        rows = []
+        for off, name in ((RTC_RSECCNT, 'rseccnt'), (RTC_RMINCNT, 'rmincnt'),
+                          (RTC_RHRCNT, 'rhrcnt'), (RTC_RDAYCNT, 'rdaycnt'),
+                          (RTC_RMONCNT, 'rmoncnt'), (RTC_RSECAR, 'rsecar'),
+                          (RTC_RMINAR, 'rminar'), (RTC_RHRAR, 'rhrar'),
+                          (RTC_RWKAR, 'rwkar'), (RTC_RDAYAR, 'rdayar'),
+                          (RTC_RMONAR, 'rmonar'), (RTC_RCR3, 'rcr3')):
+            rows.append((RTC_BASE + off, 1, *register_attr(self, name)))
+        rows += [
+            # R64CNT is read-only
+            (RTC_BASE + RTC_R64CNT, 1, partial(getattr, self, 'r64cnt'), None),
+            (RTC_BASE + RTC_RWKCNT, 1, partial(getattr, self, 'rwkcnt'), self._write_rwkcnt),
+            (RTC_BASE + RTC_RCR1, 1, partial(getattr, self, 'rcr1'), self._write_rcr1),
+            (RTC_BASE + RTC_RCR2, 1, partial(getattr, self, 'rcr2'), self._write_rcr2),
+            (RTC_BASE + RTC_RYRCNT, 2, *register_attr(self, 'ryrcnt')),
+            (RTC_BASE + RTC_RYRAR, 2, *register_attr(self, 'ryrar')),
+        ]
+        return rows
+
+    def _write_rwkcnt(self, val: int):
+        self.rwkcnt = val & 0x07
+
+    def _write_rcr1(self, val: int):
+        # CF and AF are write-0-to-clear
+        if (val & RCR1_CF) == 0:
+            self.rcr1 &= ~RCR1_CF & 0xFF
+        if (val & RCR1_AF) == 0:
+            self.rcr1 &= ~RCR1_AF & 0xFF
+        # CIE and AIE are write-anywhere
+        self.rcr1 = (self.rcr1 & (RCR1_CF | RCR1_AF)) | (val & ~(RCR1_CF | RCR1_AF) & 0xFF)
+
+    def _write_rcr2(self, val: int):
+        # PEF is write-0-to-clear
+        if (val & RCR2_PEF) == 0:
+            self.rcr2 &= ~RCR2_PEF & 0xFF
+        old = self.rcr2
+        self.rcr2 = (self.rcr2 & RCR2_PEF) | (val & ~RCR2_PEF & 0xFF)
+        # Handle RESET: writing 1 to RESET bit resets all counters
+        if val & RCR2_RESET:
+            self.r64cnt = 0
+            self.rseccnt = 0
+            self.rmincnt = 0
+            self.rhrcnt = 0
+            self.rwkcnt = 0
+            self.rdaycnt = int_to_bcd8(1)
+            self.rmoncnt = int_to_bcd8(1)
+            self.ryrcnt = int_to_bcd16(2000)
+            self.rcr2 &= ~RCR2_RESET & 0xFF
+        # When START transitions from 0 to 1, reset the periodic counter
+        if (val & RCR2_START) and not (old & RCR2_START):
+            self._periodic_counter = 0
 
     # ---- introspection ----
 
@@ -0,0 +1,209 @@
+"""
+Event scheduler for peripheral time.
+
+Peripherals used to be ticked from cpu.on_step after every step(), and
+not at all under the JIT.  Instead, the Classpad keeps one Scheduler
+whose `now` counts emulated cycles: one per instruction by default, or
+each instruction's issue cycles once cpu.cycle_costs is set (see
+ruk.jcore.timing).  The interpreter adds them after every step(); the
+JIT adds those of each block it dispatches, and never gives compiled
+code a budget that runs past `next_deadline`, so events fire on time in
+both engines.
+
+Peripherals are advanced lazily through Clocks.  A Clock turns cycles
+into ticks of one peripheral clock (`period` cycles per tick) and
+catches the peripheral up, with one tick(n) call, only when someone
+looks:
+
+  - before every access to its registers (MMIODevice calls the
+    peripheral's on_access hook, see Classpad), so the program always
+    reads current counters;
+  - at the peripheral's next deadline: next_event() says in how many
+    ticks something happens that nobody has to read a register to
+    notice (a compare match, an underflow, an interrupt), and the
+    Clock schedules an event there.
+
+A register write can move the deadline, so the peripheral's on_written
+hook reschedules its clocks after each one.
+
+    sched = Scheduler()
+    clock = sched.add_clock('cmt', 1, tmu.tick_cmt, tmu.cmt_next_event)
+    sched.advance(5000)        # fires the compare match on the way
+
+set_period() changes a clock's rate (the CPG dividers were rewritten)
+from `now` on.  Whenever a clock catches up, someone is looking at
+peripheral time: `on_sync`, if set, is called first (ruk.jcore.replay
+logs the time then).  snapshot_state() keeps `now`, and where each clock is
+and at what period; the deadlines are recomputed on restore.  One-off events from schedule() are not saved.
+"""
+
+import heapq
+from itertools import count
+from typing import Callable, Dict, List, Optional
+
+# next_deadline when nothing is scheduled
+NEVER = 1 << 62
+
+
+class Event:
+    """A callback due at cycle `deadline` (see Scheduler.schedule)."""
+    __slots__ = ('deadline', 'callback', 'name', 'active')
+
+    def __init__(self, deadline: int, callback: Callable[[], None], name: str):
+        self.deadline = deadline
+        self.callback = callback
+        self.name = name
+        self.active = True
+
+    def __repr__(self):
+        state = "" if self.active else " cancelled"
+        return f"<Event {self.name} @{self.deadline}{state}>"
+
+
+class Clock:
+    """
+    One peripheral clock driven by a Scheduler (see the module docstring).
+
+    :param period: CPU cycles per tick of this clock
+    :param tick: tick(n) advances the peripheral by n ticks
+    :param next_event: returns the ticks until the peripheral's next
+                       deadline, or None if it has none
+    """
+
+    def __init__(self, scheduler: 'Scheduler', name: str, period: int,
+                 tick: Callable[[int], None], next_event: Callable[[], Optional[int]]):
+        self.scheduler = scheduler
+        self.name = name
+        self.period = period
+        self.tick = tick
+        self.next_event = next_event
+        # Ticks the peripheral has been advanced to
+        self.ticks = scheduler.now // period
+        self._event: Optional[Event] = None
+
+    def sync(self):
+        """Catch the peripheral up with the scheduler."""
+        scheduler = self.scheduler
+        if scheduler.on_sync is not None:
+            scheduler.on_sync()
+        ticks = scheduler.now // self.period - self.ticks
+        if ticks > 0:
+            self.ticks += ticks
+            self.tick(ticks)
+
+    def reschedule(self):
+        """Move the deadline to wherever next_event() now puts it."""
+        if self._event is not None:
+            self.scheduler.cancel(self._event)
+            self._event = None
+        ticks = self.next_event()
+        if ticks is not None:
+            deadline = (self.ticks + max(ticks, 1)) * self.period
+            self._event = self.scheduler.schedule(deadline, self._fire, self.name)
+
+    def set_period(self, period: int):
+        """Tick every `period` cycles from now on."""
+        self.sync()
+        if period == self.period:
+            return
+        # The partial tick in progress is dropped
+        self.period = period
+        self.ticks = self.scheduler.now // period
+        self.reschedule()
+
+    def _fire(self):
+        self._event = None
+        self.sync()
+        self.reschedule()
+
+
+class Scheduler:
+    """Emulated-cycle counter and the events due on it, earliest first."""
+
+    def __init__(self):
+        self.now = 0
+        self.next_deadline = NEVER
+        self.clocks: Dict[str, Clock] = {}
+        self._heap: List[tuple] = []
+        self._order = count()
+        # Called before any clock catches up (see the module docstring)
+        self.on_sync: Optional[Callable[[], None]] = None
+
+    # ---- events ----
+
+    def schedule(self, deadline: int, callback: Callable[[], None], name: str = "") -> Event:
+        """Call callback() once `now` reaches `deadline` (cycles)."""
+        event = Event(deadline, callback, name)
+        heapq.heappush(self._heap, (deadline, next(self._order), event))
+        if deadline < self.next_deadline:
+            self.next_deadline = deadline
+        return event
+
+    def cancel(self, event: Event):
+        """Drop a pending event (no-op if it already fired)."""
+        event.active = False
+        self._settle()
+
+    def _settle(self):
+        """Pop cancelled events off the top and refresh next_deadline."""
+        heap = self._heap
+        while heap and not heap[0][2].active:
+            heapq.heappop(heap)
+        self.next_deadline = heap[0][0] if heap else NEVER
+
+    def advance(self, cycles: int):
+        """Move time forward, firing the events that come due."""
+        self.now += cycles
+        if self.now >= self.next_deadline:
+            self.run_due()
+
+    def run_due(self):
+        """Fire every event due by `now`, in deadline order."""
+        heap = self._heap
+        while heap and heap[0][0] <= self.now:
+            event = heapq.heappop(heap)[2]
+            if event.active:
+                event.active = False
+                event.callback()
+        self._settle()
+
+    # ---- clocks ----
+
+    def add_clock(self, name: str, period: int, tick: Callable[[int], None],
+                  next_event: Callable[[], Optional[int]]) -> Clock:
+        """Drive a peripheral clock from this scheduler and schedule its first deadline."""
+        clock = self.clocks[name] = Clock(self, name, period, tick, next_event)
+        clock.reschedule()
+        return clock
+
+    def sync(self):
+        """Catch every clocked peripheral up with `now`."""
+        for clock in self.clocks.values():
+            clock.sync()
+
+    def reschedule(self):
+        """Catch up, then recompute every clock's deadline (after a register write)."""
+        for clock in self.clocks.values():
+            clock.sync()
+            clock.reschedule()
+
+    def pending(self) -> List[Event]:
+        """The events still to fire, earliest first."""
+        return [entry[2] for entry in sorted(self._heap) if entry[2].active]
+
+    # ---- snapshots (see ruk.jcore.snapshot) ----
+
+    def snapshot_state(self) -> dict:
+        return {'now': self.now,
+                'clocks': {name: clock.ticks for name, clock in self.clocks.items()},
+                'periods': {name: clock.period for name, clock in self.clocks.items()}}
+
+    def restore_state(self, state: dict):
+        """Load snapshot_state(); call once the peripherals are restored."""
+        self.now = state['now']
+        for name, period in state.get('periods', {}).items():
+            self.clocks[name].period = period
+        for name, ticks in state['clocks'].items():
+            self.clocks[name].ticks = ticks
+        for clock in self.clocks.values():
+            clock.reschedule()
@@ -0,0 +1,268 @@
+"""
+Whole-machine snapshots: CPU, memory regions and peripherals.
+
+A snapshot is a dict of plain data (ints, bytes, lists, dicts), pickled
+and compressed behind a short header, so a long boot can be saved once and every later
+run can start from it:
+
+    data = cp.snapshot('booted.snap')
+    ...
+    cp.restore('booted.snap')
+
+Memory is stored per MAP_PAGE_SIZE page.  Only the pages that differ
+from the region's initial contents are kept: zero for Memory and
+SparseMemory, the image file for a MappedMemory ROM, which usually
+leaves just a few pages.  The kept pages of a region are concatenated
+and compressed together.
+
+Restoring writes every buffer in place (the JIT binds `_mem` directly),
+touching only the pages that actually change, then drops every compiled
+block.
+
+Peripheral state is gathered generically (see capture_state): plain
+attributes, bytearrays, lists/deques/dicts of plain values and lists of
+objects holding only scalars (timer, DMA and UBC channels).  Callbacks
+(and on_* attributes, set or not) and references to other components
+are left alone.  An object can
+provide its own snapshot_state()/restore_state(state) instead (the CPU,
+the InterruptController and the Scheduler do).
+"""
+
+import mmap
+import pickle
+import zlib
+from collections import deque
+
+from ruk.jcore.memory import MAP_PAGE_SIZE, MappedMemory, Memory, SparseMemory
+
+SNAPSHOT_MAGIC = b'RUKSNAP\x00'
+# Bump when the layout changes; restore() refuses other versions.
+SNAPSHOT_VERSION = 3
+
+# Classpad attributes holding the peripherals, in snapshot order.  The
+# scheduler comes last: it reschedules from the restored peripherals.
+PERIPHERALS = ('tmu', 'rtc', 'dma', 'display', 'ubc', 'bsc', 'cpg', 'intc', 'scheduler')
+
+# RegisterMapped dispatch tables: derived from the register map, not state.
+_REGISTER_TABLES = frozenset(('_get8', '_get16', '_get32', '_set8', '_set16', '_set32'))
+
+_PLAIN = (int, float, bool, str, bytes, type(None))
+_PLAIN_TYPES = frozenset(_PLAIN)
+_ZERO_PAGE = bytes(MAP_PAGE_SIZE)
+
+
+class _Opaque(Exception):
+    """Raised by _capture for values that are not plain data."""
+
+
+class ObjectState(dict):
+    """Captured attributes of a nested object (e.g. one TMU channel)."""
+
+
+def _capture(value):
+    if isinstance(value, _PLAIN):
+        return value
+    if isinstance(value, bytearray):
+        return bytes(value)
+    if isinstance(value, (list, tuple, deque)):
+        if set(map(type, value)) <= _PLAIN_TYPES:
+            return list(value)  # e.g. a framebuffer row, without a Python-level loop
+        return [_capture(v) for v in value]
+    if isinstance(value, dict):
+        out = {}
+        for k, v in value.items():
+            if not isinstance(k, _PLAIN):
+                raise _Opaque
+            out[k] = _capture(v)
+        return out
+    if hasattr(value, '__dict__') and not callable(value):
+        # Only small records of scalars (channels), never components
+        attrs = vars(value)
+        if all(isinstance(v, _PLAIN) for v in attrs.values()):
+            return ObjectState(attrs)
+    raise _Opaque
+
+
+def capture_state(obj) -> dict:
+    """The plain-data attributes of `obj` (see the module docstring)."""
+    if hasattr(obj, 'snapshot_state'):
+        return obj.snapshot_state()
+    state = {}
+    for name, value in vars(obj).items():
+        if name.startswith('on_') or name in _REGISTER_TABLES:
+            continue  # callbacks (even when unset), register dispatch
+        try:
+            state[name] = _capture(value)
+        except _Opaque:
+            pass  # callback, component reference, lock, ...
+    return state
+
+
+def apply_state(obj, state: dict):
+    """Write back what capture_state(obj) returned, in place where it can."""
+    if hasattr(obj, 'restore_state'):
+        obj.restore_state(state)
+        return
+    for name, saved in state.items():
+        current = getattr(obj, name, None)
+        if isinstance(saved, ObjectState) and current is not None:
+            apply_state(current, saved)
+        elif isinstance(current, (list, deque)) and isinstance(saved, list):
+            if (len(current) == len(saved)
+                    and all(isinstance(s, ObjectState) for s in saved)):
+                for item, item_state in zip(current, saved):
+                    apply_state(item, item_state)
+            elif isinstance(current, deque):
+                current.clear()
+                current.extend(saved)
+            else:
+                current[:] = saved
+        elif isinstance(current, bytearray) and isinstance(saved, bytes):
+            current[:] = saved
+        elif isinstance(current, dict) and isinstance(saved, dict):
+            current.clear()
+            current.update(saved)
+        else:
+            setattr(obj, name, saved)
+
+
+# ---- memory ----
+
+def file_image(mem: MappedMemory):
+    """Read-only mapping of the file behind `mem` (None if empty)."""
+    if not len(mem):
+        return None
+    with open(mem.path, 'rb') as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _pack(pages: list, chunks: list) -> dict:
+    return {'pages': pages, 'data': zlib.compress(b''.join(chunks), 1)}
+
+
+def _unpack(saved: dict) -> dict:
+    """page index -> page contents."""
+    data = zlib.decompress(saved['data'])
+    return {index: data[i * MAP_PAGE_SIZE:(i + 1) * MAP_PAGE_SIZE]
+            for i, index in enumerate(saved['pages'])}
+
+
+def capture_memory(mem: Memory) -> dict:
+    """The pages of `mem` that differ from its initial contents."""
+    size = len(mem)
+    pages, chunks = [], []
+    if type(mem) is SparseMemory:
+        for index, page in sorted(mem._pages.items()):
+            if page != _ZERO_PAGE:
+                pages.append(index)
+                chunks.append(bytes(page))
+        return dict(_pack(pages, chunks), kind='sparse', size=size)
+
+    buf = mem._mem
+    image = file_image(mem) if type(mem) is MappedMemory else None
+    try:
+        for offset in range(0, size, MAP_PAGE_SIZE):
+            page = buf[offset:offset + MAP_PAGE_SIZE]
+            base = _ZERO_PAGE if image is None else image[offset:offset + MAP_PAGE_SIZE]
+            if page != base[:len(page)]:
+                pages.append(offset // MAP_PAGE_SIZE)
+                chunks.append(bytes(page).ljust(MAP_PAGE_SIZE, b'\x00'))
+    finally:
+        if image is not None:
+            image.close()
+    kind = 'mapped' if image is not None else 'flat'
+    return dict(_pack(pages, chunks), kind=kind, size=size)
+
+
+def restore_memory(mem: Memory, saved: dict):
+    """Bring `mem` back to what capture_memory returned, in place."""
+    if saved['size'] != len(mem):
+        raise ValueError(f"snapshot region is {saved['size']:#x} bytes, "
+                         f"the mapped one {len(mem):#x}")
+    pages = _unpack(saved)
+    if type(mem) is SparseMemory:
+        mem._pages.clear()
+        for index, page in pages.items():
+            mem._pages[index] = bytearray(page)
+        return
+
+    size = len(mem)
+    buf = mem._mem
+    image = file_image(mem) if type(mem) is MappedMemory else None
+    try:
+        for offset in range(0, size, MAP_PAGE_SIZE):
+            end = min(offset + MAP_PAGE_SIZE, size)
+            want = pages.get(offset // MAP_PAGE_SIZE)
+            if want is None:
+                want = _ZERO_PAGE if image is None else image[offset:end]
+            want = want[:end - offset]
+            # Only write pages that change: untouched pages of a mapped
+            # ROM stay shared with the file.
+            if buf[offset:end] != want:
+                buf[offset:end] = want
+    finally:
+        if image is not None:
+            image.close()
+
+
+def memory_regions(memmap):
+    """(start, mem) of every distinct Memory-backed region, aliases once."""
+    seen = set()
+    for start, mem in sorted(memmap._mem.items()):
+        if type(mem) not in (Memory, MappedMemory, SparseMemory) or id(mem) in seen:
+            continue
+        seen.add(id(mem))
+        yield start, mem
+
+
+# ---- machine ----
+
+def capture_devices(cp) -> dict:
+    """CPU and peripheral state of `cp`, as plain data (no memory)."""
+    return {
+        'cpu': cp.cpu.snapshot_state(),
+        'classpad': {'cpu_step_count': cp._cpu_step_count},
+        'peripherals': {name: capture_state(getattr(cp, name)) for name in PERIPHERALS
+                        if getattr(cp, name) is not None},
+    }
+
+
+def check_devices(cp, state: dict):
+    """Raise ValueError unless `cp` has every peripheral `state` holds."""
+    missing = [name for name in state['peripherals'] if getattr(cp, name) is None]
+    if missing:
+        raise ValueError(f"snapshot has peripherals this Classpad lacks: {', '.join(missing)}")
+
+
+def restore_devices(cp, state: dict):
+    """Load what capture_devices() returned; the CPU last (it flushes the JIT)."""
+    for name, saved in state['peripherals'].items():
+        apply_state(getattr(cp, name), saved)
+    cp._cpu_step_count = state['classpad']['cpu_step_count']
+    cp.cpu.restore_state(state['cpu'])
+
+
+def snapshot(cp) -> bytes:
+    """Serialize the whole Classpad `cp` (see the module docstring)."""
+    state = capture_devices(cp)
+    state['version'] = SNAPSHOT_VERSION
+    state['regions'] = {start: capture_memory(mem) for start, mem in memory_regions(cp.mem)}
+    return SNAPSHOT_MAGIC + zlib.compress(pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL), 1)
+
+
+def restore(cp, data: bytes):
+    """Load a snapshot() of a Classpad with the same memory map and peripherals."""
+    if not data.startswith(SNAPSHOT_MAGIC):
+        raise ValueError("not a RuK snapshot")
+    state = pickle.loads(zlib.decompress(data[len(SNAPSHOT_MAGIC):]))
+    if state.get('version') != SNAPSHOT_VERSION:
+        raise ValueError(f"unsupported snapshot version {state.get('version')!r}")
+
+    regions = dict(memory_regions(cp.mem))
+    if set(regions) != set(state['regions']):
+        raise ValueError("snapshot memory map does not match this Classpad")
+    check_devices(cp, state)
+
+    for start, saved in state['regions'].items():
+        restore_memory(regions[start], saved)
+    restore_devices(cp, state)
@@ -0,0 +1,88 @@
+"""
+Instruction timing: how many CPU cycles each instruction costs, and how
+many CPU cycles each peripheral clock tick lasts.
+
+By default every instruction counts as one cycle and the Classpad's
+peripheral clocks run much faster than on hardware (see
+Classpad.CLOCK_PERIODS), which keeps the OS boot polling loops short.
+Classpad.enable_timing() switches to this module's model instead:
+
+  - cpu.cycle_costs maps every opcode to the issue cycles of its
+    instruction (OP_CYCLES, per op_id of the Emulator dispatch table).
+    step() adds them to the scheduler instead of 1; the JIT adds the
+    precomputed cost of the blocks it runs, and _exec_delay_slot the
+    cost of a delay slot run on its own.
+  - the peripheral clock periods are derived from the CPG dividers
+    (clock_periods), and follow FRQCR writes.
+
+The costs are SH-4A issue latencies for the common case (cache hit, no
+pipeline stall, branch taken for the conditional ones): close enough for
+timer ratios, not a cycle-accurate pipeline.
+"""
+
+from typing import Dict, List, Optional
+
+# Issue cycles per op_id; anything not listed costs 1.  Grouped like the
+# handler registration in Emulator.__init__.
+OP_CYCLES: Dict[int, int] = {
+    # --- arithmetic / logic ---
+    101: 2, 102: 2,                 # DMULS.L, DMULU.L
+    108: 2, 109: 2,                 # MAC.L, MAC.W
+    110: 2,                         # MUL.L
+    121: 3, 125: 3, 129: 3, 132: 3,  # AND.B / OR.B / TST.B / XOR.B @(R0,GBR)
+    126: 3,                         # TAS.B
+    # --- branches ---
+    149: 2, 150: 2, 151: 2, 152: 2,  # BF, BF/S, BT, BT/S (taken)
+    153: 2, 155: 2,                 # BRA, BSR
+    154: 3, 156: 3, 157: 3, 158: 3,  # BRAF, BSRF, JMP, JSR
+    161: 3,                         # RTS
+    # --- system / control ---
+    212: 2,                         # LDTLB
+    221: 4,                         # RTE
+    226: 4,                         # SLEEP (to the standby state)
+    300: 8,                         # ICBI
+    302: 4,                         # SYNCO
+    # --- LDC / LDS / STC / STS ---
+    169: 4, 170: 4,                 # LDC(.L) SR
+    174: 2, 175: 2,                 # LDC(.L) VBR
+    228: 2, 229: 2,                 # STC(.L) SR
+    # --- misc ---
+    270: 8,                         # TRAPA
+}
+
+# CMT count clock: Pphi / 64 (~460 kHz at the boot dividers)
+CMT_DIVIDER = 64
+# ETMU count clock: RCLK, and the RTC 128 Hz tick
+ETMU_HZ = 32768
+RTC_TICK_HZ = 128
+
+
+def cycle_costs(emulator, op_cycles: Optional[Dict[int, int]] = None) -> List[int]:
+    """
+    Cycles for each 16-bit opcode (indexed like emulator._dispatch).
+    Opcodes outside the table (DSP, unknown) cost 1.
+
+    :param op_cycles: op_id -> cycles overriding OP_CYCLES
+    """
+    table = dict(OP_CYCLES)
+    if op_cycles:
+        table.update(op_cycles)
+    get = table.get
+    return [1 if d is None else get(d[0], 1) for d in emulator._decode]
+
+
+def clock_periods(rates: dict) -> Dict[str, int]:
+    """
+    CPU cycles per tick of each Classpad peripheral clock, from the
+    CPG clock_rates() (Hz).
+    """
+    iphi = rates['iphi']
+    pphi = rates['pphi']
+
+    def period(hz: int) -> int:
+        return max(1, round(iphi / hz))
+
+    return {'cmt': period(pphi // CMT_DIVIDER),
+            'rtc': period(RTC_TICK_HZ),
+            'pphi': period(pphi),
+            'etmu': period(ETMU_HZ)}
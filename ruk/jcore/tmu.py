@@ -72,7 +72,10 @@ Because RuK doesn't model Pphi or RTC clocks yet, we expose a
 test harness uses this to fire interrupts deterministically.
 """
 
-from typing import Callable, Optional, List
+from functools import partial
+from typing import Callable, Optional, List, Tuple
+
+from ruk.jcore.mmio import RegisterMapped, register_attr, register_field
 
 
 # ===========================================================================
@@ -196,6 +199,16 @@ ETMU_TCR_UNF  = 1 << 1
 # Channel model
 # ===========================================================================
 
+def _reload(tcor: int, over: int) -> int:
+    """
+    TCNT `over` counts after it reached 0 and was reloaded from TCOR,
+    reloading again each time it gets back to 0 (TCOR=0: it wraps).
+    """
+    if tcor == 0:
+        return -over & 0xFFFFFFFF
+    return tcor - over % tcor
+
+
 class TMUChannel:
     """
     A single standard SH-4 TMU channel.
@@ -252,7 +265,8 @@ class TMUChannel:
         """
         Advance this channel by `pphi_cycles` Pphi ticks.  When the prescaler
         underflows, decrement TCNT; when TCNT underflows, set UNF, reload
-        from TCOR, and raise an IRQ if UNIE is set.
+        from TCOR, and raise an IRQ if UNIE is set.  Any number of
+        underflows is handled in one step; the IRQ is returned once.
         """
         if not self.running:
             return None
@@ -267,19 +281,19 @@ class TMUChannel:
         self.prescaler_counter %= prescaler_period
 
         # Decrement TCNT, handling underflow
-        old_tcnt = self.tcnt
-        if decr >= self.tcnt:
-            # underflow(s)
-            self.tcnt = (self.tcnt - decr) & 0xFFFFFFFF
-            # reload from TCOR (may underflow again if TCOR is small)
-            # For simplicity, assume a single underflow per tick batch.
-            self.tcnt = (self.tcor - (-self.tcnt & 0xFFFFFFFF)) & 0xFFFFFFFF
-            self.tcr |= TMU_TCR_UNF
-            self.irq_pending = bool(self.tcr & TMU_TCR_UNIE)
-            return self.intevt if self.irq_pending else None
-        else:
+        if decr < self.tcnt:
             self.tcnt -= decr
             return None
+        self.tcnt = _reload(self.tcor, decr - self.tcnt)
+        self.tcr |= TMU_TCR_UNF
+        self.irq_pending = bool(self.tcr & TMU_TCR_UNIE)
+        return self.intevt if self.irq_pending else None
+
+    def next_event(self) -> Optional[int]:
+        """Pphi ticks until TCNT underflows, or None while stopped."""
+        if not self.running:
+            return None
+        return max(max(self.tcnt, 1) * (1 << self.prescaler_shift) - self.prescaler_counter, 1)
 
 
 class ETMUChannel:
@@ -348,24 +362,26 @@ class ETMUChannel:
         if not self.running:
             return None
 
-        old_tcnt = self.tcnt
-        if rtc_cycles >= self.tcnt:
-            # underflow
-            self.tcnt = (self.tcnt - rtc_cycles) & 0xFFFFFFFF
-            self.tcnt = (self.tcor - (-self.tcnt & 0xFFFFFFFF)) & 0xFFFFFFFF
-            self.tcr |= ETMU_TCR_UNF
-            self.irq_pending = bool(self.tcr & ETMU_TCR_UNIE)
-            return self.intevt if self.irq_pending else None
-        else:
+        if rtc_cycles < self.tcnt:
             self.tcnt -= rtc_cycles
             return None
+        self.tcnt = _reload(self.tcor, rtc_cycles - self.tcnt)
+        self.tcr |= ETMU_TCR_UNF
+        self.irq_pending = bool(self.tcr & ETMU_TCR_UNIE)
+        return self.intevt if self.irq_pending else None
+
+    def next_event(self) -> Optional[int]:
+        """RTC clock ticks until TCNT underflows, or None while stopped."""
+        if not self.running:
+            return None
+        return max(self.tcnt, 1)
 
 
 # ===========================================================================
 # Top-level TMU+ETMU peripheral
 # ===========================================================================
 
-class TMU:
+class TMU(RegisterMapped):
     """
     Combined TMU (3 standard channels) + ETMU (6 Casio channels) peripheral.
 
@@ -399,6 +415,8 @@ class TMU:
         # Signature: on_irq(intevt_code: int) -> None
         self.on_irq: Optional[Callable[[int], None]] = None
 
+        self._build_registers()
+
     # ---- address helpers ----
 
     @staticmethod
@@ -420,14 +438,20 @@ class TMU:
         interrupt, in priority order (TMU0 first, then TMU1, TMU2, then the
         6 ETMUs in channel order).
         """
-        # Standard TMU
+        self.tick_pphi(pphi_cycles)
+        self.tick_etmu(rtc_cycles)
+
+    def tick_pphi(self, cycles: int):
+        """Advance the standard TMU channels by `cycles` Pphi ticks."""
         for ch in self.tmu_channels:
-            intevt = ch.tick(pphi_cycles)
+            intevt = ch.tick(cycles)
             if intevt is not None:
                 self._raise_irq(intevt)
-        # Casio ETMU
+
+    def tick_etmu(self, cycles: int):
+        """Advance the ETMU channels by `cycles` RTC clock ticks."""
         for ch in self.etmu_channels:
-            intevt = ch.tick(rtc_cycles)
+            intevt = ch.tick(cycles)
             if intevt is not None:
                 self._raise_irq(intevt)
 
@@ -443,183 +467,130 @@ class TMU:
           5. CMCNT resets to 0 after a compare match
 
         CMCNT and CMCOR are 16-bit registers (0xFFFF max).
+
+        Computed in one go whatever `cycles` is, as if ticked one by one
+        (the count stops at the first match when it auto-stops); the
+        interrupt is raised once per call.
         """
-        if not (self.cmstr & CMT_CMSTR_STR):
+        if not (self.cmstr & CMT_CMSTR_STR) or cycles <= 0:
             return   # CMT not running
-        for _ in range(cycles):
-            self.cmcnt = (self.cmcnt + 1) & 0xFFFF  # 16-bit
-            if self.cmcnt == 0:
+        match = self.cmt_next_event()
+        if match is None or cycles < match:
+            # No compare match; CMCNT may still wrap through 0
+            if self.cmcnt + cycles > 0xFFFF:
                 self.cmcsr |= CMT_CMCSR_OVF
-            # Compare match: when CMCNT reaches CMCOR
-            if self.cmcnt == self.cmcor or self.cmcor == 0:
-                self.cmcsr |= CMT_CMCSR_CMF
-                self.cmcnt = 0
-                # Raise interrupt if CMIE is set
-                if self.cmcsr & CMT_CMCSR_CMIE:
-                    self._raise_irq(CMT_INTEVT)
-                # Auto-stop: if bit 8 (AUTOSTOP) is NOT set, clear STR
-                if not (self.cmcsr & CMT_CMCSR_AUTOSTOP):
-                    self.cmstr &= ~CMT_CMSTR_STR & 0xFFFF
-
-    # ---- MMIO read/write ----
-
-    def read8(self, addr: int) -> int:
-        if addr == TMU_TSTR:
-            return self.tstr & 0xFF
-        # CMT registers (8-bit access)
-        if addr == CMT_CMSTR_ADDR:
-            return self.cmstr & 0xFF
-        if addr == CMT_CMSTR_ADDR + 1:
-            return (self.cmstr >> 8) & 0xFF
-        if addr == CMT_CMCSR_ADDR:
-            return self.cmcsr & 0xFF
-        if addr == CMT_CMCSR_ADDR + 1:
-            return (self.cmcsr >> 8) & 0xFF
-        # ETMU TSTR / TCR (8-bit registers)
-        for ch in self.etmu_channels:
-            if addr == ch.base_addr + ETMU_TSTR_OFF:
-                return ch.read_tstr()
-            if addr == ch.base_addr + ETMU_TCR_OFF:
-                return ch.read_tcr()
-        return 0x00
-
-    def read16(self, addr: int) -> int:
-        # Standard TMU TCR0/1/2 are 16-bit, at offset 0x08 of each channel
-        # (channel base = TCOR, so TCR = base + 0x08).
-        for i, ch in enumerate(self.tmu_channels):
-            if addr == self._tmu_chan_addr(i, 0x08):
-                return ch.read_tcr()
-        # CMT registers
-        if addr == CMT_CMSTR_ADDR:
-            return self.cmstr & 0xFFFF
-        if addr == CMT_CMCSR_ADDR:
-            return self.cmcsr & 0xFFFF
-        # CMCNT and CMCOR can also be read as 16-bit
-        if addr == CMT_CMCNT_ADDR:
-            return self.cmcnt & 0xFFFF
-        if addr == CMT_CMCNT_ADDR + 2:
-            return (self.cmcnt >> 16) & 0xFFFF
-        if addr == CMT_CMCOR_ADDR:
-            return self.cmcor & 0xFFFF
-        if addr == CMT_CMCOR_ADDR + 2:
-            return (self.cmcor >> 16) & 0xFFFF
-        return 0x0000
-
-    def read32(self, addr: int) -> int:
-        # Standard TMU TCOR/TCNT (at offsets 0x00 and 0x04 of each channel)
-        for i, ch in enumerate(self.tmu_channels):
-            if addr == self._tmu_chan_addr(i, 0x00):
-                return ch.read_tcor()
-            if addr == self._tmu_chan_addr(i, 0x04):
-                return ch.read_tcnt()
-        # ETMU TCOR/TCNT
-        for ch in self.etmu_channels:
-            if addr == ch.base_addr + ETMU_TCOR_OFF:
-                return ch.read_tcor()
-            if addr == ch.base_addr + ETMU_TCNT_OFF:
-                return ch.read_tcnt()
-        # CMT registers (32-bit)
-        if addr == CMT_CMCNT_ADDR:
-            return self.cmcnt & 0xFFFFFFFF
-        if addr == CMT_CMCOR_ADDR:
-            return self.cmcor & 0xFFFFFFFF
-        return 0x00000000
-
-    def write8(self, addr: int, val: int):
-        val &= 0xFF
-        if addr == TMU_TSTR:
-            self._write_tstr(val)
-            return
-        # CMT registers can be written as 8-bit too
-        if addr == CMT_CMSTR_ADDR:
-            self.cmstr = (self.cmstr & 0xFF00) | val
-            return
-        if addr == CMT_CMSTR_ADDR + 1:
-            self.cmstr = (self.cmstr & 0x00FF) | (val << 8)
-            return
-        if addr == CMT_CMCSR_ADDR:
-            self.cmcsr = (self.cmcsr & 0xFF00) | val
+            self.cmcnt = (self.cmcnt + cycles) & 0xFFFF  # 16-bit
             return
-        if addr == CMT_CMCSR_ADDR + 1:
-            self.cmcsr = (self.cmcsr & 0x00FF) | (val << 8)
-            return
-        for ch in self.etmu_channels:
-            if addr == ch.base_addr + ETMU_TSTR_OFF:
-                ch.write_tstr(val)
-                return
-            if addr == ch.base_addr + ETMU_TCR_OFF:
-                ch.write_tcr(val)
-                return
-
-    def write16(self, addr: int, val: int):
-        val &= 0xFFFF
+        # Compare match: when CMCNT reaches CMCOR.  CMCNT only wraps
+        # through 0 on the way if it started above CMCOR.
+        if self.cmcnt + match > 0xFFFF:
+            self.cmcsr |= CMT_CMCSR_OVF
+        self.cmcsr |= CMT_CMCSR_CMF
+        self.cmcnt = 0
+        # Raise interrupt if CMIE is set (once, however many matched)
+        if self.cmcsr & CMT_CMCSR_CMIE:
+            self._raise_irq(CMT_INTEVT)
+        # Auto-stop: if bit 8 (AUTOSTOP) is NOT set, clear STR
+        if not (self.cmcsr & CMT_CMCSR_AUTOSTOP):
+            self.cmstr &= ~CMT_CMSTR_STR & 0xFFFF
+        elif self.cmcor:
+            # Free-running: a match every CMCOR ticks from 0
+            self.cmcnt = (cycles - match) % self.cmcor
+
+    # ---- deadlines (see ruk.jcore.scheduler) ----
+
+    def pphi_next_event(self) -> Optional[int]:
+        """Pphi ticks until a standard TMU channel underflows, or None."""
+        ticks = [t for t in (ch.next_event() for ch in self.tmu_channels) if t is not None]
+        return min(ticks) if ticks else None
+
+    def etmu_next_event(self) -> Optional[int]:
+        """RTC clock ticks until an ETMU channel underflows, or None."""
+        ticks = [t for t in (ch.next_event() for ch in self.etmu_channels) if t is not None]
+        return min(ticks) if ticks else None
+
+    def cmt_next_event(self) -> Optional[int]:
+        """CMT ticks until the next compare match, or None while stopped."""
+        if not (self.cmstr & CMT_CMSTR_STR):
+            return None
+        if self.cmcor == 0:
+            return 1
+        if self.cmcor > 0xFFFF:
+            return None   # CMCNT is 16-bit, it never gets there
+        return (self.cmcor - self.cmcnt - 1) % 0x10000 + 1
+
+    def next_change(self, addr: int) -> Optional[Tuple[str, int]]:
+        """
+        (clock, ticks) until the register at `addr` changes without an
+        event of its own: the running counters.  None for the others
+        (flags only change at a deadline, or on a write).  Used to
+        fast-forward polling loops (see Classpad.enable_fast_forward).
+        """
+        if CMT_CMCNT_ADDR <= addr < CMT_CMCNT_ADDR + 4:
+            return ('cmt', 1) if self.cmstr & CMT_CMSTR_STR else None
         for i, ch in enumerate(self.tmu_channels):
-            if addr == self._tmu_chan_addr(i, 0x08):
-                ch.write_tcr(val)
-                return
-        # Tolerate 16-bit writes to TSTR (8-bit register)
-        if addr == TMU_TSTR:
-            self._write_tstr(val & 0xFF)
-            return
-        # CMT registers (16-bit)
-        if addr == CMT_CMSTR_ADDR:
-            self.cmstr = val
-            return
-        if addr == CMT_CMCSR_ADDR:
-            # CMF and OVF are write-0-to-clear
-            if (val & CMT_CMCSR_CMF) == 0:
-                self.cmcsr &= ~CMT_CMCSR_CMF & 0xFFFF
-            if (val & CMT_CMCSR_OVF) == 0:
-                self.cmcsr &= ~CMT_CMCSR_OVF & 0xFFFF
-            self.cmcsr = (self.cmcsr & (CMT_CMCSR_CMF | CMT_CMCSR_OVF)) | (val & ~(CMT_CMCSR_CMF | CMT_CMCSR_OVF) & 0xFFFF)
-            return
-        # CMCNT and CMCOR can also be written as 16-bit (low half)
-        if addr == CMT_CMCNT_ADDR:
-            self.cmcnt = (self.cmcnt & 0xFFFF0000) | (val & 0xFFFF)
-            return
-        if addr == CMT_CMCNT_ADDR + 2:
-            self.cmcnt = (self.cmcnt & 0x0000FFFF) | ((val & 0xFFFF) << 16)
-            return
-        if addr == CMT_CMCOR_ADDR:
-            self.cmcor = (self.cmcor & 0xFFFF0000) | (val & 0xFFFF)
-            return
-        if addr == CMT_CMCOR_ADDR + 2:
-            self.cmcor = (self.cmcor & 0x0000FFFF) | ((val & 0xFFFF) << 16)
-            return
+            tcnt = self._tmu_chan_addr(i, 0x04)
+            if tcnt <= addr < tcnt + 4:
+                if not ch.running:
+                    return None
+                return 'pphi', (1 << ch.prescaler_shift) - ch.prescaler_counter
+        for ch in self.etmu_channels:
+            tcnt = ch.base_addr + ETMU_TCNT_OFF
+            if tcnt <= addr < tcnt + 4:
+                return ('etmu', 1) if ch.running else None
+        return None
+
+    # ---- MMIO register map ----
 
-    def write32(self, addr: int, val: int):
-        val &= 0xFFFFFFFF
+    def register_map(self):
+        """
+        The TMU, ETMU and CMT registers.  The 8-bit TSTR and the 16-bit
+        TCRs also take wider writes (some programs use MOV.L on them),
+        and the CMT registers can be accessed in halves.
+        """
+        rows = [
+            (TMU_TSTR, 1, partial(getattr, self, 'tstr'), self._write_tstr),
+            (TMU_TSTR, 2, None, self._write_tstr),
+            (TMU_TSTR, 4, None, self._write_tstr),
+        ]
         for i, ch in enumerate(self.tmu_channels):
-            if addr == self._tmu_chan_addr(i, 0x00):    # TCOR
-                ch.write_tcor(val)
-                return
-            if addr == self._tmu_chan_addr(i, 0x04):    # TCNT
-                ch.write_tcnt(val)
-                return
-            # Some programs (and our test) accidentally use MOV.L (32-bit)
-            # to write the 16-bit TCR.  Tolerate this by treating a 32-bit
-            # write to the TCR address as a 16-bit write (low 16 bits).
-            if addr == self._tmu_chan_addr(i, 0x08):    # TCR (16-bit)
-                ch.write_tcr(val & 0xFFFF)
-                return
-        # Tolerate 32-bit writes to TSTR (8-bit register)
-        if addr == TMU_TSTR:
-            self._write_tstr(val & 0xFF)
-            return
+            rows += [
+                (self._tmu_chan_addr(i, 0x00), 4, ch.read_tcor, ch.write_tcor),
+                (self._tmu_chan_addr(i, 0x04), 4, ch.read_tcnt, ch.write_tcnt),
+                (self._tmu_chan_addr(i, 0x08), 2, ch.read_tcr, ch.write_tcr),
+                (self._tmu_chan_addr(i, 0x08), 4, None, ch.write_tcr),
+            ]
         for ch in self.etmu_channels:
-            if addr == ch.base_addr + ETMU_TCOR_OFF:
-                ch.write_tcor(val)
-                return
-            if addr == ch.base_addr + ETMU_TCNT_OFF:
-                ch.write_tcnt(val)
-                return
-        # CMT registers (32-bit)
-        if addr == CMT_CMCNT_ADDR:
-            self.cmcnt = val
-            return
-        if addr == CMT_CMCOR_ADDR:
-            self.cmcor = val
-            return
+            rows += [
+                (ch.base_addr + ETMU_TSTR_OFF, 1, ch.read_tstr, ch.write_tstr),
+                (ch.base_addr + ETMU_TCR_OFF, 1, ch.read_tcr, ch.write_tcr),
+                (ch.base_addr + ETMU_TCOR_OFF, 4, ch.read_tcor, ch.write_tcor),
+                (ch.base_addr + ETMU_TCNT_OFF, 4, ch.read_tcnt, ch.write_tcnt),
+            ]
+        cmcsr_get = partial(getattr, self, 'cmcsr')
+        rows += [
+            (CMT_CMSTR_ADDR, 1, *register_field(self, 'cmstr', 0, 8)),
+            (CMT_CMSTR_ADDR + 1, 1, *register_field(self, 'cmstr', 8, 8)),
+            (CMT_CMSTR_ADDR, 2, *register_attr(self, 'cmstr')),
+            (CMT_CMCSR_ADDR, 1, *register_field(self, 'cmcsr', 0, 8)),
+            (CMT_CMCSR_ADDR + 1, 1, *register_field(self, 'cmcsr', 8, 8)),
+            (CMT_CMCSR_ADDR, 2, cmcsr_get, self._write_cmcsr),
+            (CMT_CMCNT_ADDR, 2, *register_field(self, 'cmcnt', 0, 16)),
+            (CMT_CMCNT_ADDR + 2, 2, *register_field(self, 'cmcnt', 16, 16)),
+            (CMT_CMCNT_ADDR, 4, *register_attr(self, 'cmcnt')),
+            (CMT_CMCOR_ADDR, 2, *register_field(self, 'cmcor', 0, 16)),
+            (CMT_CMCOR_ADDR + 2, 2, *register_field(self, 'cmcor', 16, 16)),
+            (CMT_CMCOR_ADDR, 4, *register_attr(self, 'cmcor')),
+        ]
+        return rows
+
+    def _write_cmcsr(self, val: int):
+        # CMF and OVF are write-0-to-clear
+        if (val & CMT_CMCSR_CMF) == 0:
+            self.cmcsr &= ~CMT_CMCSR_CMF & 0xFFFF
+        if (val & CMT_CMCSR_OVF) == 0:
+            self.cmcsr &= ~CMT_CMCSR_OVF & 0xFFFF
+        self.cmcsr = (self.cmcsr & (CMT_CMCSR_CMF | CMT_CMCSR_OVF)) | (val & ~(CMT_CMCSR_CMF | CMT_CMCSR_OVF) & 0xFFFF)
 
     def _write_tstr(self, val: int):
         old = self.tstr
@@ -67,6 +67,8 @@ Reference:
 
 from typing import Optional, Callable
 
+from ruk.jcore.mmio import RegisterMapped, register_attr
+
 
 # ===========================================================================
 # Constants
@@ -171,7 +173,7 @@ class UBCChannel:
         self.cetr = 0
 
 
-class UBC:
+class UBC(RegisterMapped):
     """
     SH-4 User Break Controller.
 
@@ -189,6 +191,7 @@ class UBC:
         self.channels = [UBCChannel(0), UBCChannel(1)]
         self.ccmfr = 0   # Channel match flag register
         self.cbcr = 0    # Break control register
+        self._build_registers()
 
     @property
     def ubde(self) -> bool:
@@ -258,76 +261,36 @@ class UBC:
         """Disable a UBC channel."""
         self.channels[channel].cbr &= ~CBR_CE & 0xFFFFFFFF
 
-    # ---- MMIO read/write ----
-
-    def _chan_offsets(self, ch: int):
-        if ch == 0:
-            return (UBC_CBR0_OFF, UBC_CRR0_OFF, UBC_CAR0_OFF, UBC_CAMR0_OFF)
-        else:
-            return (UBC_CBR1_OFF, UBC_CRR1_OFF, UBC_CAR1_OFF, UBC_CAMR1_OFF)
-
-    def read8(self, addr: int) -> int:
-        return self.read32(addr) & 0xFF
-
-    def read16(self, addr: int) -> int:
-        return self.read32(addr) & 0xFFFF
-
-    def read32(self, addr: int) -> int:
-        off = addr - UBC_BASE
-        if off == UBC_CBR0_OFF:  return self.channels[0].cbr
-        if off == UBC_CRR0_OFF:  return self.channels[0].crr
-        if off == UBC_CAR0_OFF:  return self.channels[0].car
-        if off == UBC_CAMR0_OFF: return self.channels[0].camr
-        if off == UBC_CBR1_OFF:  return self.channels[1].cbr
-        if off == UBC_CRR1_OFF:  return self.channels[1].crr
-        if off == UBC_CAR1_OFF:  return self.channels[1].car
-        if off == UBC_CAMR1_OFF: return self.channels[1].camr
-        if off == UBC_CDR1_OFF:  return self.channels[1].cdr
-        if off == UBC_CDMR1_OFF: return self.channels[1].cdmr
-        if off == UBC_CETR1_OFF: return self.channels[1].cetr
-        if off == UBC_CCMFR_OFF: return self.ccmfr
-        if off == UBC_CBCR_OFF:  return self.cbcr
-        return 0
-
-    def write8(self, addr: int, val: int):
-        self.write32(addr, val)
-
-    def write16(self, addr: int, val: int):
-        self.write32(addr, val)
-
-    def write32(self, addr: int, val: int):
-        val &= 0xFFFFFFFF
-        off = addr - UBC_BASE
-        if off == UBC_CBR0_OFF:
-            self.channels[0].cbr = val
-        elif off == UBC_CRR0_OFF:
-            self.channels[0].crr = val
-        elif off == UBC_CAR0_OFF:
-            self.channels[0].car = val
-        elif off == UBC_CAMR0_OFF:
-            self.channels[0].camr = val
-        elif off == UBC_CBR1_OFF:
-            self.channels[1].cbr = val
-        elif off == UBC_CRR1_OFF:
-            self.channels[1].crr = val
-        elif off == UBC_CAR1_OFF:
-            self.channels[1].car = val
-        elif off == UBC_CAMR1_OFF:
-            self.channels[1].camr = val
-        elif off == UBC_CDR1_OFF:
-            self.channels[1].cdr = val
-        elif off == UBC_CDMR1_OFF:
-            self.channels[1].cdmr = val
-        elif off == UBC_CETR1_OFF:
-            self.channels[1].cetr = val
-        elif off == UBC_CCMFR_OFF:
-            # CCMFR is write-0-to-clear (writing 0 clears the flag, writing 1 has no effect)
-            if (val & CCMFR_MF0) == 0:
-                self.ccmfr &= ~CCMFR_MF0 & 0xFFFFFFFF
-            if (val & CCMFR_MF1) == 0:
-                self.ccmfr &= ~CCMFR_MF1 & 0xFFFFFFFF
-        elif off == UBC_CBCR_OFF:
-            self.cbcr = val
+    # ---- MMIO register map ----
+
+    def register_map(self):
+        """
+        Every UBC register is 32-bit; 8/16-bit reads return its low
+        bits and 8/16-bit writes store the (zero-extended) value.
+        """
+        ch0, ch1 = self.channels
+        regs = [(UBC_CBR0_OFF, ch0, 'cbr'), (UBC_CRR0_OFF, ch0, 'crr'),
+                (UBC_CAR0_OFF, ch0, 'car'), (UBC_CAMR0_OFF, ch0, 'camr'),
+                (UBC_CBR1_OFF, ch1, 'cbr'), (UBC_CRR1_OFF, ch1, 'crr'),
+                (UBC_CAR1_OFF, ch1, 'car'), (UBC_CAMR1_OFF, ch1, 'camr'),
+                (UBC_CDR1_OFF, ch1, 'cdr'), (UBC_CDMR1_OFF, ch1, 'cdmr'),
+                (UBC_CETR1_OFF, ch1, 'cetr'), (UBC_CBCR_OFF, self, 'cbcr')]
+        rows = []
+        for off, obj, name in regs:
+            rows += [(UBC_BASE + off, 1, *register_attr(obj, name, 0xFF)),
+                     (UBC_BASE + off, 2, *register_attr(obj, name, 0xFFFF)),
+                     (UBC_BASE + off, 4, *register_attr(obj, name))]
+        for width, mask in ((1, 0xFF), (2, 0xFFFF), (4, 0xFFFFFFFF)):
+            rows.append((UBC_BASE + UBC_CCMFR_OFF, width,
+                         lambda mask=mask: self.ccmfr & mask, self._write_ccmfr))
+        return rows
+
+    def _write_ccmfr(self, val: int):
+        # CCMFR is write-0-to-clear (writing 0 clears the flag, writing 1 has no effect)
+        if (val & CCMFR_MF0) == 0:
+            self.ccmfr &= ~CCMFR_MF0 & 0xFFFFFFFF
+        if (val & CCMFR_MF1) == 0:
+            self.ccmfr &= ~CCMFR_MF1 & 0xFFFFFFFF
 
     # ---- introspection ----
 
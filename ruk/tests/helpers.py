@@ -0,0 +1,38 @@
+"""
+Shared fixture for the tests that run small programs on a Classpad.
+
+Programs are SH-4 assembly (ruk.tools.assembler), loaded at the start of
+RAM where the CPU starts.  An interrupt handler, if given, goes to
+HANDLER with VBR pointing at it (the IRQ vector is VBR + 0x600).
+"""
+
+from typing import Optional
+
+from ruk.classpad import Classpad
+from ruk.tools.assembler import SH4Assembler
+
+RAM = 0x8C000000
+HANDLER = RAM + 0x1000
+
+# A ROM of NOPs, for tests that never leave RAM
+NOP_ROM = b'\x00\x09' * 0x1000
+
+
+def asm(text: str, start_addr: int = RAM) -> bytes:
+    """Assemble `text` at `start_addr`; unknown instructions are an error."""
+    assembler = SH4Assembler()
+    code = assembler.assemble(text, start_addr)
+    if assembler.errors:
+        raise ValueError('\n'.join(assembler.errors))
+    return bytes(code)
+
+
+def make_cp(program: str, handler: Optional[str] = None, rom=NOP_ROM,
+            ram_size: int = 0x100000, **peripherals) -> Classpad:
+    """A Classpad starting at RAM running `program` (with_* flags in `peripherals`)."""
+    cp = Classpad(rom, start_pc=RAM, ram_size=ram_size, **peripherals)
+    cp.ram.write_bin(0, asm(program))
+    if handler is not None:
+        cp.ram.write_bin(HANDLER - RAM, asm(handler, HANDLER))
+        cp.cpu.regs['vbr'] = HANDLER - 0x600
+    return cp
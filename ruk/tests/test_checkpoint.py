@@ -0,0 +1,84 @@
+from unittest import TestCase
+
+from ruk.tests.helpers import make_cp
+
+# Endless loop storing an incrementing r1 at r2, r2 walking up RAM_P2 by
+# 0x40 per iteration, so each run dirties a few new pages (from compiled
+# code once the loop is hot).
+PROGRAM = """
+        mov #0, r1
+        mov.l addr, r2
+        nop
+    loop:
+        add #1, r1
+        mov.l r1, @r2
+        add #0x40, r2
+        bra loop
+        nop
+        nop
+        nop
+    addr:
+        .long 0xAC010000
+"""
+
+
+class TestCheckpoints(TestCase):
+    def setUp(self) -> None:
+        self.cp = make_cp(PROGRAM, with_tmu=True, with_rtc=True, with_display=True)
+        self.cp.mem.write32(0xE5200000, 0x11111111)   # ILRAM, in the base copy
+        self.ring = self.cp.enable_checkpoints()
+
+    def state(self):
+        cp = self.cp
+        return (cp.cpu.pc, list(cp.cpu.regs._r), bytes(cp.ram._mem), bytes(cp._rom._mem),
+                cp.mem.read32(0xE5200000), cp.mem.read32(0xFE300000),
+                cp.tmu.cmcnt, cp.rtc.r64cnt)
+
+    def run_and_take(self, i):
+        self.cp.cpu.run(20000)
+        self.cp.mem.write32(0x80000010 + i * 4, i + 1)
+        self.cp.mem.write32(0xFE300000, i + 1)
+        return self.ring.take()
+
+    def test_only_dirty_pages_are_kept(self):
+        checkpoint = self.run_and_take(0)
+        # 20000 steps store ~ 4000 * 0x40 bytes, plus the ROM and FE3 pages
+        self.assertLess(len(checkpoint.pages), 300)
+        self.assertIn((0x80000000, 0), checkpoint.pages)
+        self.assertEqual(len(self.ring), 2)
+        again = self.ring.take()
+        self.assertEqual(again.pages, {})
+
+    def test_restore_earlier_checkpoints(self):
+        states = [self.state()]
+        for i in range(4):
+            self.run_and_take(i)
+            states.append(self.state())
+        self.cp.cpu.run(5000)
+        self.cp.mem.write32(0xE5200000, 0)
+
+        self.ring.restore(self.ring[2])
+        self.assertEqual(self.state(), states[2])
+        self.assertEqual(len(self.ring), 3)
+        self.cp.cpu.run(20000)
+        self.ring.restore()
+        self.assertEqual(self.state(), states[2])
+        self.ring.restore(self.ring[0])
+        self.assertEqual(self.state(), states[0])
+
+        # Same run from the restored state gives the same result
+        self.run_and_take(0)
+        self.assertEqual(self.state(), states[1])
+
+    def test_budget_folds_oldest_into_base(self):
+        self.ring.budget = 4096
+        states = []
+        for i in range(6):
+            self.run_and_take(i)
+            states.append(self.state())
+        self.assertLess(len(self.ring), 7)
+        self.assertGreater(len(self.ring), 0)
+        first = self.ring[0]
+        self.assertEqual(first.pages, {})
+        self.ring.restore(first)
+        self.assertEqual(self.state(), states[first.index - 1])
@@ -0,0 +1,72 @@
+import os
+import tempfile
+from unittest import TestCase, skipUnless
+from unittest.mock import MagicMock, patch
+
+from ruk.jcore import decode
+from ruk.jcore.emulator import Emulator
+from ruk.jcore.generated_opcodes import opcodes_table
+
+
+def _first_match(op_val):
+    for op_id, fmt, mask, code, args_struct in opcodes_table:
+        if op_val & mask == code:
+            return op_id, args_struct
+    return None, None
+
+
+class TestDecodeTable(TestCase):
+    def setUp(self) -> None:
+        self.emu = Emulator(MagicMock(debug=False))
+
+    def test_first_match_priority(self):
+        for op_val in range(0, 65536, 97):
+            op_id, args_struct = _first_match(op_val)
+            entry = self.emu._decode[op_val]
+            if entry is None:
+                continue
+            self.assertEqual(entry[0], op_id, hex(op_val))
+            values = {(op_val & m) >> decode.arg_shift(m) for m in args_struct.values()}
+            self.assertTrue(set(entry[1]) <= values, hex(op_val))
+
+    def test_dispatch_binds_handlers(self):
+        handler, args = self.emu._dispatch[0x6123]  # mov r2, r1
+        self.assertEqual(handler, self.emu.MOV)
+        self.assertEqual(args, (2, 1))
+        self.assertIsNone(self.emu._dispatch[0xFFFF])
+
+    def test_shared_between_emulators(self):
+        other = Emulator(MagicMock(debug=False))
+        self.assertIs(other._decode, self.emu._decode)
+        self.assertIsNot(other._dispatch, self.emu._dispatch)
+        self.assertEqual(other._dispatch[0x6123][0], other.MOV)
+
+    def test_disk_cache_roundtrip(self):
+        orders = {0: ('m', 'n'), 1: ('i', 'n')}
+        with tempfile.TemporaryDirectory() as tmp, \
+                patch.dict(os.environ, {'RUK_CACHE_DIR': tmp}), \
+                patch.dict(decode._tables, clear=True):
+            built = decode.decode_table(orders)
+            self.assertEqual(len(os.listdir(tmp)), 1)
+            decode._tables.clear()
+            with patch.object(decode, 'build_decode_table') as build:
+                loaded = decode.decode_table(orders)
+                build.assert_not_called()
+        self.assertEqual(loaded, built)
+        self.assertEqual(loaded[0x6123], (0, (2, 1)))
+
+    def test_disk_cache_is_opt_in(self):
+        with patch.dict(os.environ, clear=True):
+            self.assertIsNone(decode._cache_dir())
+
+    @skipUnless(hasattr(os, 'getuid'), "no file owners")
+    def test_shared_cache_dir_is_not_loaded(self):
+        orders = {0: ('m', 'n')}
+        with tempfile.TemporaryDirectory() as tmp, \
+                patch.dict(os.environ, {'RUK_CACHE_DIR': tmp}), \
+                patch.dict(decode._tables, clear=True):
+            decode.decode_table(orders)
+            path = os.path.join(tmp, os.listdir(tmp)[0])
+            self.assertIsNotNone(decode._load(path))
+            os.chmod(tmp, 0o777)
+            self.assertIsNone(decode._load(path))
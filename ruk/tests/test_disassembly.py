@@ -2,6 +2,8 @@ from unittest import TestCase
 from unittest.mock import patch
 
 from ruk.jcore.disassembly import Disassembler
+from ruk.jcore.generated_opcodes import opcodes_table
+from ruk.jcore.memory import Memory, MemoryMap
 
 
 class TestDisassembler(TestCase):
@@ -18,3 +20,29 @@ class TestDisassembler(TestCase):
     def test_disasm_trace_only(self):
         self.disasm = Disassembler(debug=False)
         self.assertEqual(("add #h'{i:04x}, r{n:d}", {'i': 127, 'n': 1}), self.disasm.disasm(0x717f, trace_only=True))
+
+    def test_disasm_first_match(self):
+        for op in range(0, 0x10000, 61):
+            expected = next((e for e in opcodes_table if op & e[2] == e[3]), None)
+            if expected is None:
+                with self.assertRaises(IndexError):
+                    self.disasm.disasm(op)
+            else:
+                self.assertEqual(expected[0], self.disasm.disasm(op)[0])
+
+    def test_disasm_unknown(self):
+        with self.assertRaises(IndexError):
+            self.disasm.disasm(0xFFFF)
+
+    def test_disasm_range(self):
+        mem = Memory(8)
+        mem.write_bin(0, bytes.fromhex('717f0009ffff6123'))
+        mm = MemoryMap()
+        mm.add(0x1000, mem)
+        listing = self.disasm.disasm_range(mm, 0x1000, 0x1008)
+        self.assertEqual([a for a, *_ in listing], [0x1000, 0x1002, 0x1004, 0x1006])
+        self.assertEqual(listing[0], (0x1000, 0x717f, "add #h'{i:04x}, r{n:d}", {'n': 1, 'i': 127}))
+        self.assertEqual(listing[1][2], 'nop')
+        self.assertEqual(listing[2], (0x1004, 0xFFFF, None, {}))
+        self.assertEqual(listing, [(a + 0x1000, *rest) for a, *rest in self.disasm.disasm_range(mem, 0, 8)])
+
@@ -0,0 +1,154 @@
+from itertools import product
+from unittest import TestCase
+
+from ruk.jcore.intc import INTC_BASE
+from ruk.jcore.jit import JITCompiler
+from ruk.jcore.rtc import RTC_BASE
+from ruk.jcore.tmu import (CMT_CMCOR_ADDR, CMT_CMCSR_ADDR, CMT_CMCSR_CMIE, CMT_CMSTR_ADDR,
+                           CMT_CMSTR_STR, CMT_INTEVT)
+from ruk.tests.helpers import HANDLER, RAM, make_cp
+
+# Wait for CMCSR.CMF (@r1), then spin
+CMF_POLL = """
+    poll:
+        mov.w @r1, r0
+        cmp/pz r0
+        bt poll
+    done:
+        bra done
+        nop
+"""
+# Same, counting the polls in r2: not idle
+CMF_COUNT = """
+    poll:
+        mov.w @r1, r0
+        add #1, r2
+        cmp/pz r0
+        bt poll
+    done:
+        bra done
+        nop
+"""
+# r2 = R64CNT (@r1); wait until it changes; then spin
+R64CNT_POLL = """
+        mov.b @r1, r2
+    poll:
+        mov.b @r1, r0
+        cmp/eq r2, r0
+        bt poll
+    done:
+        bra done
+        nop
+"""
+# SLEEP, then spin
+SLEEP = """
+        sleep
+    done:
+        bra done
+        nop
+"""
+# SLEEP, then count in r3
+SLEEP_COUNT = """
+        sleep
+        add #1, r3
+        add #1, r3
+    done:
+        bra done
+        nop
+"""
+# Interrupt handler: r4 = r3
+COPY_R3 = """
+        mov r3, r4
+    done:
+        bra done
+        nop
+"""
+
+
+class TestFastForward(TestCase):
+    def classpad(self, program, cmcor=1000, cmcsr=0, timing=False, handler=None):
+        cp = make_cp(program, handler, with_tmu=True, with_rtc=True)
+        if timing:
+            cp.enable_timing()
+        cp.enable_fast_forward()
+        cp.cpu.regs[1] = CMT_CMCSR_ADDR
+        cp.mem.write16(CMT_CMCSR_ADDR, cmcsr)
+        cp.mem.write16(CMT_CMCOR_ADDR, cmcor)
+        cp.mem.write16(CMT_CMSTR_ADDR, CMT_CMSTR_STR)
+        return cp
+
+    def test_flag_poll_jumps_to_the_compare_match(self):
+        cp = self.classpad(CMF_POLL, cmcor=60_000)
+        steps = cp.cpu.run(1_000_000)
+        self.assertEqual(cp.cpu.pc, RAM + 6)
+        self.assertGreaterEqual(cp.scheduler.now, 60_000)
+        self.assertLess(cp.scheduler.now, 60_000 + 2000)
+        self.assertLess(steps, 5000)
+
+    def test_counting_loop_is_not_skipped(self):
+        cp = self.classpad(CMF_COUNT)
+        steps = cp.cpu.run(100_000)
+        self.assertEqual(cp.cpu.pc, RAM + 8)
+        self.assertEqual(cp.scheduler.now, steps)
+        self.assertAlmostEqual(cp.cpu.regs[2], 1000 // 4, delta=10)
+
+    def test_counter_poll_stops_at_the_next_tick(self):
+        cp = self.classpad(R64CNT_POLL, timing=True)
+        cp.cpu.regs[1] = RTC_BASE
+        period = cp.scheduler.clocks['rtc'].period
+        steps = cp.cpu.run(10_000_000)
+        self.assertEqual(cp.cpu.pc, RAM + 8)
+        self.assertEqual(cp.cpu.regs[0], (cp.cpu.regs[2] + 1) % 128)
+        self.assertGreaterEqual(cp.scheduler.now, period)
+        self.assertLess(cp.scheduler.now, period + 2000)
+        self.assertLess(steps, 5000)
+
+    def test_sleep_wakes_on_the_next_interrupt(self):
+        cp = self.classpad(SLEEP, cmcsr=CMT_CMCSR_CMIE)
+        cpu = cp.cpu
+        cpu.regs['sr'] = 0x40000000
+        cp.mem.write16(INTC_BASE, 0x1000)     # CMT (TMU0 slot) at priority 1
+        cpu.step()
+        self.assertTrue(cpu.is_sleeping)
+        self.assertEqual(cp.scheduler.now, 1001)
+        self.assertTrue(cp.intc.has_pending())
+        cpu.step()
+        self.assertEqual(cpu.intevt, CMT_INTEVT)
+        self.assertEqual(cpu.pc, cpu.regs['vbr'] + 0x600)
+        self.assertFalse(cpu.is_sleeping)
+
+    def test_run_wakes_like_step(self):
+        # threshold=1: the SLEEP block runs compiled straight away
+        for timing, threshold in product((False, True), (5, 1)):
+            with self.subTest(timing=timing, threshold=threshold):
+                stepped, ran = (self.classpad(SLEEP_COUNT, cmcsr=CMT_CMCSR_CMIE, timing=timing,
+                                              handler=COPY_R3) for _ in range(2))
+                for cp in stepped, ran:
+                    cp.cpu.regs['sr'] = 0x40000000
+                    cp.mem.write16(INTC_BASE, 0x1000)
+                ran.cpu._jit = JITCompiler(ran.cpu)
+                ran.cpu._jit.threshold = threshold
+                # SLEEP, then the interrupt: nothing after the SLEEP ran
+                stepped.cpu.step()
+                stepped.cpu.step()
+                self.assertEqual(ran.cpu.run(2), 2)
+                for cp in stepped, ran:
+                    self.assertEqual(cp.cpu.pc, HANDLER)
+                    self.assertEqual(cp.cpu.intevt, CMT_INTEVT)
+                self.assertEqual(ran.scheduler.now, stepped.scheduler.now)
+                stepped.cpu.step()
+                ran.cpu.run(1)
+                self.assertEqual(stepped.cpu.regs[4], 0)
+                self.assertEqual(ran.cpu.regs[4], 0)
+
+    def test_not_with_a_timeline(self):
+        cp = self.classpad(CMF_POLL, cmcor=60_000)
+        cp.enable_timeline()
+        self.assertIsNone(cp.cpu.fast_forward)
+        with self.assertRaises(ValueError):
+            cp.enable_fast_forward()
+        # Polled for real, every instruction counted
+        while cp.cpu.pc != RAM + 6:
+            cp.timeline.run(100_000)
+        self.assertEqual(cp.scheduler.now, cp.timeline.now)
+        self.assertGreaterEqual(cp.timeline.now, 60_000)
@@ -0,0 +1,94 @@
+from unittest import TestCase
+
+from ruk.jcore.intc import INTC_BASE, SR_BL, InterruptController
+from ruk.tests.helpers import HANDLER, RAM, make_cp
+
+TMU0, TMU1 = 0x400, 0x420
+
+PROGRAM = """
+        add #1, r2
+        add #1, r2
+        add #1, r2
+        ldc r1, sr
+        add #1, r2
+    done:
+        bra done
+        nop
+"""
+# Interrupt handler: spin
+ISR = """
+    spin:
+        bra spin
+        nop
+"""
+
+
+class TestInterruptController(TestCase):
+    def test_highest_priority_above_imask(self):
+        intc = InterruptController()
+        intc.enable()
+        intc.ipr[0] = 0x5900        # IPRA: TMU0 at 5, TMU1 at 9
+        intc.request(TMU0)
+        intc.request(TMU1)
+        intc.request(TMU0)
+        self.assertEqual(intc.sources(), [TMU0, TMU1])
+        self.assertIsNone(intc.take_pending(0x40000000 | SR_BL))
+        self.assertEqual(intc.take_pending(0x60), TMU1)
+        self.assertIsNone(intc.take_pending(0x60))
+        self.assertTrue(intc.has_pending())
+        self.assertFalse(intc.has_pending(0x60))
+        self.assertEqual(intc.take_pending(0x40), TMU0)
+        self.assertEqual(intc.pending, 0)
+
+    def test_unprogrammed_source_is_never_taken(self):
+        intc = InterruptController()
+        intc.enable()
+        intc.request(TMU1)
+        self.assertFalse(intc.has_pending())
+        self.assertIsNone(intc.take_pending(0))
+
+
+class TestDelivery(TestCase):
+    def classpad(self):
+        cp = make_cp(PROGRAM, ISR, with_tmu=True, with_rtc=True)
+        cpu = cp.cpu
+        cpu.regs['sr'] = 0x400000F0     # IMASK = 15
+        cpu.regs[1] = 0x40000000        # IMASK = 0
+        cp.mem.write16(INTC_BASE, 0x5000)
+        return cp
+
+    def test_ipr_registers(self):
+        cp = self.classpad()
+        self.assertEqual(cp.mem.read16(INTC_BASE), 0x5000)
+        self.assertEqual(cp.intc.priority(TMU0), 5)
+        cp.cpu.irq_check = False
+        cp.mem.write16(INTC_BASE + 4 * 10, 0x00A0)      # IPRK: RTC
+        self.assertTrue(cp.cpu.irq_check)
+        self.assertEqual(cp.intc.priority(0x4C0), 10)
+
+    def test_step_takes_it_once_sr_allows(self):
+        cp = self.classpad()
+        cpu = cp.cpu
+        cp.intc.request(TMU0)
+        cpu.step()
+        # Masked: the check is not repeated until SR or the pending set changes
+        self.assertFalse(cpu.irq_check)
+        self.assertTrue(cp.intc.pending)
+        while cpu.pc != HANDLER:
+            cpu.step()
+        self.assertEqual(cpu.intevt, TMU0)
+        self.assertEqual(cpu.spc, RAM + 8)
+        self.assertEqual(cpu.regs[2], 3)
+        self.assertTrue(cpu.regs['sr'] & SR_BL)
+        self.assertEqual(cp.intc.pending, 0)
+
+    def test_jit_takes_it_at_the_next_block(self):
+        cp = self.classpad()
+        cpu = cp.cpu
+        cp.intc.request(TMU0)
+        cpu.run(1000)
+        self.assertEqual(cpu.pc, HANDLER)
+        self.assertEqual(cpu.intevt, TMU0)
+        self.assertEqual(cpu.ssr, 0x40000000)
+        self.assertIn(cpu.spc, (RAM + 8, RAM + 10))
+        self.assertEqual(cp.intc.pending, 0)
@@ -1,6 +1,8 @@
+import os
+import tempfile
 from unittest import TestCase
 
-from ruk.jcore.memory import Memory, MemoryMap
+from ruk.jcore.memory import MappedMemory, Memory, MemoryMap, SparseMemory
 
 
 class TestMemory(TestCase):
@@ -123,4 +125,269 @@ class TestMemory(TestCase):
     def test__write8(self):
         self.assertEqual(self.memmap.read8(0x870), b'\xFF')
         self.memmap.write8(0x870, b'\x42')
-        self.assertEqual(self.memmap.read8(0x870), b'\x42')
\ No newline at end of file
+        self.assertEqual(self.memmap.read8(0x870), b'\x42')
+
+    def test_direct_windows(self):
+        small = Memory(0x10)
+        self.memmap.add(0x900, small, name="SMALL")
+        self.memmap.add(0x4000, self.mem, name="MIRROR")
+        windows = {name: (start, end, mem) for start, end, mem, name in self.memmap.direct_windows()}
+        # MEM is shadowed by SMALL, so it can't be accessed directly.
+        self.assertEqual(set(windows), {"SMALL", "MIRROR"})
+        self.assertEqual(windows["MIRROR"], (0x4000, 0x4800, self.mem))
+
+    def test_resolve_page_table(self):
+        big = Memory(0x500000)
+        self.memmap.add(0xA4000000, big, name="BIG")
+        # Unaligned small region in the middle of a page of BIG.
+        tmu = Memory(0x30)
+        self.memmap.add(0xA4490004, tmu, name="TMU")
+        self.assertEqual(self.memmap.resolve(0xA4490004), (tmu, 0xA4490004))
+        self.assertEqual(self.memmap.resolve(0xA4490033), (tmu, 0xA4490004))
+        self.assertEqual(self.memmap.resolve(0xA4490000), (big, 0xA4000000))
+        self.assertEqual(self.memmap.resolve(0xA4490034), (big, 0xA4000000))
+        self.assertEqual(self.memmap.resolve(0xA40FFFFF), (big, 0xA4000000))
+        # Adding the big region after the small one doesn't shadow it.
+        self.memmap.add(0x0, Memory(0x10000), name="LOW")
+        self.assertEqual(self.memmap.resolve(0x900), (self.mem, 0x800))
+        # Replacing a region remaps the pages it used to cover.
+        self.memmap.add(0xA4000000, Memory(0x1000), name="SMALLER")
+        self.assertEqual(self.memmap.resolve(0xA4490010), (tmu, 0xA4490004))
+        for address in (0xA4001000, 0xA4490000, -1, 1 << 32):
+            with self.assertRaises(IndexError):
+                self.memmap.resolve(address)
+
+
+class TestSparseMemory(TestCase):
+    def setUp(self) -> None:
+        self.mem = SparseMemory(0x10000)
+
+    def test_reads_zero_without_allocating(self):
+        self.assertEqual(len(self.mem), 0x10000)
+        self.assertEqual(self.mem.read32(0x1234), 0)
+        self.assertEqual(self.mem.get_range(0xFFF0, 0x10010), bytearray(0x10))
+        self.mem.write32(0x2000, 0)
+        self.assertEqual(self.mem.allocated(), 0)
+        with self.assertRaises(IndexError):
+            self.mem.read8(0x10000)
+        with self.assertRaises(IndexError):
+            self.mem.write32(0xFFFE, 1)
+
+    def test_writes_across_pages(self):
+        self.mem.write32(0x0FFE, 0xDEADBEEF)
+        self.assertEqual(self.mem.allocated(), 0x2000)
+        self.assertEqual(self.mem.read32(0x0FFE), 0xDEADBEEF)
+        self.assertEqual(self.mem.read16(0x1000), 0xBEEF)
+        self.mem.write_bin(0x3FFF, b'\x01\x02')
+        self.assertEqual(self.mem.get_range(0x3FFE, 0x4002), b'\x00\x01\x02\x00')
+        self.mem[0x5000] = 0x7F
+        self.assertEqual(self.mem[0x5000], 0x7F)
+
+    def test_in_memory_map(self):
+        memmap = MemoryMap()
+        memmap.add(0xA4000000, self.mem, name="SPARSE")
+        memmap.write16(0xA4000010, 0x1234)
+        self.assertEqual(memmap.read16(0xA4000010), 0x1234)
+        self.assertEqual(memmap.direct_windows(), [])
+
+
+class TestAliasAndMappedMemory(TestCase):
+    def test_alias_shares_backing(self):
+        memmap = MemoryMap()
+        ram = Memory(0x100)
+        memmap.add(0x8C000000, ram, name="RAM", perms="RW")
+        memmap.alias(0xAC000000, 0x8C000000, name="RAM (P2)")
+        memmap.write32(0xAC000010, 0xCAFEBABE)
+        self.assertEqual(memmap.read32(0x8C000010), 0xCAFEBABE)
+        self.assertEqual(memmap.resolve(0xAC000000), (ram, 0xAC000000))
+        self.assertIn((0xAC000000, 0xAC000100, "RAM (P2)", "RW"), memmap.get_mapped_areas())
+        with self.assertRaises(IndexError):
+            memmap.alias(0xA0000000, 0x80000000)
+
+    def test_mapped_memory(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "rom.bin")
+            with open(path, "wb") as f:
+                f.write(bytes(range(16)))
+            rom = MappedMemory(path)
+            memmap = MemoryMap()
+            memmap.add(0x80000000, rom, name="ROM", perms="RX")
+            self.assertEqual(len(rom), 16)
+            self.assertEqual(memmap.read32(0x80000004), 0x04050607)
+            self.assertEqual(rom.get_range(14, 16), b'\x0e\x0f')
+            # Writes stay private: the file is left untouched.
+            memmap.write16(0x80000000, 0xBEEF)
+            self.assertEqual(rom.read16(0), 0xBEEF)
+            self.assertEqual([w[3] for w in memmap.direct_windows()], ["ROM"])
+            del memmap, rom
+            with open(path, "rb") as f:
+                self.assertEqual(f.read(2), b'\x00\x01')
+
+
+class TestBlockAccess(TestCase):
+    def setUp(self) -> None:
+        from ruk.jcore.mmio import MMIODevice
+
+        class Regs:
+            def __init__(self):
+                self.accesses = []
+
+            def read32(self, addr):
+                self.accesses.append(('r32', addr))
+                return addr & 0xFFFFFFFF
+
+            def write32(self, addr, val):
+                self.accesses.append(('w32', addr, val))
+
+            def write8(self, addr, val):
+                self.accesses.append(('w8', addr, val))
+
+        self.regs = Regs()
+        self.memmap = MemoryMap()
+        self.low = Memory(0x100)
+        self.high = SparseMemory(0x100)
+        self.memmap.add(0x1000, self.low, name="LOW")
+        self.memmap.add(0x1100, self.high, name="HIGH")
+        self.memmap.add(0x1080, MMIODevice(0x1080, 0x8, self.regs), name="REGS")
+
+    def test_write_block_splits_regions(self):
+        self.memmap.write_block(0x10F0, bytes(range(0x20)))
+        self.assertEqual(self.low.get_range(0xF0, 0x100), bytes(range(0x10)))
+        self.assertEqual(self.high.get_range(0, 0x10), bytes(range(0x10, 0x20)))
+        self.assertEqual(self.memmap.read_block(0x10F0, 0x20), bytes(range(0x20)))
+        with self.assertRaises(IndexError):
+            self.memmap.write_block(0x11F0, bytes(0x20))
+
+    def test_nested_mmio_uses_register_accesses(self):
+        self.memmap.write_block(0x107C, b'\x11' * 4 + b'\x22' * 9)
+        self.assertEqual(self.regs.accesses, [('w32', 0x1080, 0x22222222),
+                                              ('w32', 0x1084, 0x22222222)])
+        self.assertEqual(self.low.read32(0x7C), 0x11111111)
+        self.assertEqual(self.low.read8(0x88), 0x22)
+        self.assertEqual(self.memmap.read_block(0x1080, 8), b'\x00\x00\x10\x80\x00\x00\x10\x84')
+
+
+class TestWatchpoints(TestCase):
+    def setUp(self) -> None:
+        self.memmap = MemoryMap()
+        self.ram = Memory(0x4000)
+        self.other = Memory(0x1000)
+        self.memmap.add(0x8C000000, self.ram, name="RAM")
+        self.memmap.alias(0xAC000000, 0x8C000000, name="RAM_P2")
+        self.memmap.add(0x8C004000, self.other, name="OTHER")
+
+    def test_only_watched_pages_are_wrapped(self):
+        wp = self.memmap.add_watchpoint(0x8C001010, 4, 'w')
+        self.assertIsNot(self.memmap.resolve(0x8C001000)[0], self.ram)
+        self.assertIsNot(self.memmap.resolve(0xAC001FFF)[0], self.ram)
+        self.assertIs(self.memmap.resolve(0x8C000FFF)[0], self.ram)
+        self.assertIs(self.memmap.resolve(0x8C002000)[0], self.ram)
+        self.assertEqual(self.memmap.watched_spans(), [(0x8C001000, 0x8C002000),
+                                                       (0xAC001000, 0xAC002000)])
+        self.memmap.remove_watchpoint(wp)
+        self.assertIs(self.memmap.resolve(0x8C001010)[0], self.ram)
+        self.assertEqual(self.memmap.watched_spans(), [])
+
+    def test_write_through_alias_hits(self):
+        wp = self.memmap.add_watchpoint(0x8C001010, 4, 'w')
+        self.memmap.write32(0x8C001008, 1)
+        self.memmap.read32(0x8C001010)
+        self.assertIsNone(self.memmap.watch_hit)
+        self.memmap.write8(0xAC001013, 0x5A)
+        hit = self.memmap.watch_hit
+        self.assertIs(hit.watchpoint, wp)
+        self.assertEqual((hit.kind, hit.address, hit.size, hit.value), ('w', 0xAC001013, 1, 0x5A))
+        self.assertEqual(self.ram.read8(0x1013), 0x5A)
+        # The first hit is kept, later ones are counted
+        self.memmap.write32(0x8C001010, 2)
+        self.assertIs(self.memmap.watch_hit, hit)
+        self.assertEqual(wp.hits, 2)
+
+    def test_read_and_value_condition(self):
+        wp = self.memmap.add_watchpoint(0x8C000100, 2, 'r', value=0x1234)
+        self.memmap.write16(0x8C000100, 0x1234)
+        self.assertEqual(self.memmap.read16(0x8C000100), 0x1234)
+        self.assertEqual(self.memmap.watch_hit.value, 0x1234)
+        self.memmap.watch_hit = None
+        self.memmap.write16(0x8C000100, 0x4321)
+        self.memmap.read16(0x8C000100)
+        self.assertIsNone(self.memmap.watch_hit)
+        self.assertEqual(wp.hits, 1)
+
+    def test_block_accesses(self):
+        self.memmap.add_watchpoint(0x8C000FFE, 4, 'rw')
+        self.assertEqual(self.memmap.read_block(0x8C000F00, 0x200), bytes(0x200))
+        self.assertIsNone(self.memmap.watch_hit)
+        self.memmap.write_block(0x8C000F00, bytes(range(256)) * 2)
+        self.assertEqual(self.memmap.watch_hit.kind, 'w')
+        self.assertIsNone(self.memmap.watch_hit.value)
+        self.assertEqual(self.ram.read16(0x1000), 0x0001)
+
+    def test_bad_watchpoints(self):
+        with self.assertRaises(IndexError):
+            self.memmap.add_watchpoint(0x10, 4)
+        with self.assertRaises(IndexError):
+            self.memmap.add_watchpoint(0x8C003FFE, 4)
+        with self.assertRaises(ValueError):
+            self.memmap.add_watchpoint(0x8C000000, 4, 'x')
+        self.assertEqual(self.memmap.watchpoints, [])
+
+
+class TestAccessStats(TestCase):
+    def setUp(self) -> None:
+        self.memmap = MemoryMap()
+        self.ram = Memory(0x4000)
+        self.memmap.add(0x8C000000, self.ram, name="RAM")
+        self.memmap.alias(0xAC000000, 0x8C000000, name="RAM_P2")
+
+    def test_off_by_default(self):
+        self.assertIsNone(self.memmap.access_stats)
+        self.assertIs(self.memmap.resolve(0x8C000000)[0], self.ram)
+        self.assertEqual(len(self.memmap.direct_windows()), 2)
+
+    def test_counts_by_page_and_width(self):
+        stats = self.memmap.enable_access_stats()
+        self.assertIs(self.memmap.enable_access_stats(), stats)
+        self.assertEqual(self.memmap.direct_windows(), [])
+        self.memmap.write32(0x8C000010, 0x12345678)
+        self.memmap.read16(0x8C000010)
+        self.memmap.read8(0xAC001001)
+        self.memmap.fetch16(0x8C000000)
+        self.assertEqual(self.ram.read32(0x10), 0x12345678)
+        pages = {(r['address'], r['region']): r for r in stats.pages()}
+        self.assertEqual(set(pages), {(0x8C000000, "RAM"), (0xAC001000, "RAM_P2")})
+        row = pages[0x8C000000, "RAM"]
+        self.assertEqual((row['write32'], row['read16'], row['fetch'], row['total']), (1, 1, 1, 3))
+        self.assertEqual(stats.top_pages(1)[0]['address'], 0x8C000000)
+        self.assertEqual([r['total'] for r in stats.regions()], [3, 1])
+
+        self.assertIs(self.memmap.disable_access_stats(), stats)
+        self.assertIs(self.memmap.resolve(0x8C000000)[0], self.ram)
+        self.memmap.read32(0x8C000010)
+        self.assertEqual(stats.regions()[0]['total'], 3)
+
+    def test_with_watchpoints(self):
+        stats = self.memmap.enable_access_stats()
+        self.memmap.add_watchpoint(0x8C000100, 4, 'r')
+        self.memmap.read32(0xAC000100)
+        self.assertEqual(self.memmap.watch_hit.address, 0xAC000100)
+        self.assertEqual(stats.regions()[0]['read32'], 1)
+        self.memmap.disable_access_stats()
+        self.memmap.watch_hit = None
+        self.memmap.read32(0x8C000100)
+        self.assertIsNotNone(self.memmap.watch_hit)
+
+    def test_export(self):
+        import json
+        stats = self.memmap.enable_access_stats()
+        self.memmap.write8(0x8C002003, 1)
+        with tempfile.TemporaryDirectory() as tmp:
+            stats.save(os.path.join(tmp, 'heat.csv'))
+            stats.save(os.path.join(tmp, 'heat.json'))
+            with open(os.path.join(tmp, 'heat.csv')) as f:
+                lines = f.read().splitlines()
+            with open(os.path.join(tmp, 'heat.json')) as f:
+                data = json.load(f)
+        self.assertEqual(lines[1], "0x8C002000,RAM,0,0,0,1,0,0,0,1")
+        self.assertEqual(data['page_size'], 0x1000)
+        self.assertEqual(data['pages'][0]['write8'], 1)
@@ -0,0 +1,61 @@
+from unittest import TestCase
+
+from ruk.jcore.mmio import (MMIODevice, RegisterMapped, compile_register_map,
+                            register_attr, register_field)
+
+
+class _Regs(RegisterMapped):
+    BASE = 0x1000
+
+    def __init__(self):
+        self.ctrl = 0
+        self.count = 0
+        self.acks = []
+        self._build_registers()
+
+    def register_map(self):
+        b = self.BASE
+        return [
+            (b + 0x0, 2, *register_attr(self, 'ctrl', 0xFFFF)),
+            (b + 0x0, 1, *register_field(self, 'ctrl', 0, 8)),
+            (b + 0x1, 1, *register_field(self, 'ctrl', 8, 8)),
+            (b + 0x4, 4, *register_attr(self, 'count')),
+            (b + 0x8, 1, None, self.acks.append),
+            (b + 0xC, 1, lambda: 0x5A, None),
+        ]
+
+
+class TestRegisterMap(TestCase):
+    def setUp(self) -> None:
+        self.regs = _Regs()
+
+    def test_compile_keys_by_offset(self):
+        getters, setters = compile_register_map(self.regs.register_map(), base=0x1000, size=0x8)
+        self.assertEqual(sorted(getters[1]), [0x0, 0x1])
+        self.assertEqual(sorted(getters[4]), [0x4])
+        self.assertEqual(setters[1], {0x0: setters[1][0x0], 0x1: setters[1][0x1]})
+
+    def test_fields_and_widths(self):
+        self.regs.write16(0x1000, 0x12345)
+        self.assertEqual(self.regs.ctrl, 0x2345)
+        self.regs.write8(0x1001, 0xAB)
+        self.assertEqual(self.regs.read16(0x1000), 0xAB45)
+        self.assertEqual(self.regs.read8(0x1000), 0x45)
+
+    def test_unmapped_and_one_sided_rows(self):
+        self.assertEqual(self.regs.read32(0x1000), 0)
+        self.regs.write32(0x1000, 0xFFFF)
+        self.assertEqual(self.regs.ctrl, 0)
+        self.regs.write8(0x1008, 0x1FF)
+        self.assertEqual(self.regs.acks, [0xFF])
+        self.assertEqual(self.regs.read8(0x1008), 0)
+        self.regs.write8(0x100C, 1)
+        self.assertEqual(self.regs.read8(0x100C), 0x5A)
+
+    def test_mmio_device_dispatch(self):
+        dev = MMIODevice(0x1000, 0x10, self.regs)
+        dev.write32(0x4, 0x1_0000_0001)
+        self.assertEqual(self.regs.count, 1)
+        self.assertEqual(dev.read32(0x4), 1)
+        dev.write8(0x1, 0x7F)
+        self.assertEqual(dev.read16(0x0), 0x7F00)
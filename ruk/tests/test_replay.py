@@ -0,0 +1,162 @@
+from unittest import TestCase
+
+from ruk.jcore.intc import INTC_BASE
+from ruk.jcore.tmu import CMT_CMCOR_ADDR, CMT_CMSTR_ADDR, CMT_CMSTR_STR
+from ruk.tests.helpers import HANDLER, RAM, make_cp
+
+# Endless two-block loop: r1 counts up, stored to RAM_P2 + 0x400, r3 sums r1
+PROGRAM = """
+        mov #0, r1
+        mov.l addr, r2
+    loop:
+        add #1, r1
+        mov.l r1, @r2
+        bra sum
+        nop
+        nop
+    sum:
+        add r1, r3
+        bra loop
+        nop
+    addr:
+        .long 0xAC000400
+"""
+# r3 sums the free-running CMCNT
+TIMER_POLL = """
+        mov.l addr, r2
+    loop:
+        mov.l @r2, r0
+        add r0, r3
+        bra loop
+        nop
+        .align 2
+    addr:
+        .long 0xA44A0064
+"""
+# Interrupt handler: count in r5, RTE
+ISR = """
+        add #1, r5
+        rte
+        nop
+"""
+
+
+class TestTimeline(TestCase):
+    def setUp(self) -> None:
+        cp = self.cp = make_cp(PROGRAM, ISR, with_tmu=True, with_rtc=True)
+        # Privileged, interrupts unmasked; TMU0 and TMU1 (IPRA) at priority 1
+        cp.cpu.regs['sr'] = 0x40000000
+        cp.mem.write16(INTC_BASE, 0x1100)
+        self.timeline = cp.enable_timeline(interval=300, run_interval=5000)
+        self.history = {}
+        self.record()
+
+    def state(self):
+        cp = self.cp
+        return (cp.cpu.pc, list(cp.cpu.regs._r), cp.cpu.regs['sr'], cp.cpu._step_count,
+                cp.ram.read32(0x400), cp.tmu.cmcnt, cp.rtc.r64cnt, cp.intc.snapshot_state())
+
+    def record(self):
+        self.history[self.timeline.now] = self.state()
+
+    def forward(self, rounds=3):
+        """Stepped spans with an interrupt raised from outside, and JIT runs."""
+        for _ in range(rounds):
+            self.timeline.run(4000)
+            self.record()
+            for i in range(250):
+                if i == 100:
+                    self.cp.intc.request(0x400)
+                self.timeline.step()
+                self.record()
+
+    def test_step_back_replays_history(self):
+        self.forward()
+        self.assertEqual(self.cp.cpu.regs[5], 3)
+        self.assertGreater(len(self.timeline.ring), 3)
+        now = self.timeline.now
+        self.assertEqual(self.timeline.step_back(1), 1)
+        self.assertEqual(self.state(), self.history[now - 1])
+        for count in sorted(self.history, reverse=True)[1::23]:
+            self.timeline.seek(count)
+            self.assertEqual(self.timeline.now, count)
+            self.assertEqual(self.state(), self.history[count])
+        with self.assertRaises(ValueError):
+            self.timeline.seek(self.timeline.now + 1)
+
+    def test_reverse_continue(self):
+        self.forward()
+        hit = self.timeline.reverse_continue({HANDLER})
+        self.assertEqual(self.state(), self.history[hit])
+        self.assertEqual(self.cp.cpu.pc, HANDLER)
+        self.assertEqual(self.cp.cpu.regs[5], 2)
+        earlier = self.timeline.reverse_continue({HANDLER})
+        self.assertLess(earlier, hit)
+        self.assertEqual(self.state(), self.history[earlier])
+        self.assertEqual(self.cp.cpu.regs[5], 1)
+
+        self.assertIsNone(self.timeline.reverse_continue({RAM + 0x800}))
+        self.assertEqual(self.timeline.now, 0)
+        self.assertEqual(self.state(), self.history[0])
+
+    def test_new_future_after_going_back(self):
+        self.forward(rounds=2)
+        self.timeline.step_back(3000)
+        self.history = {k: v for k, v in self.history.items() if k <= self.timeline.now}
+        self.cp.intc.request(0x420)
+        self.forward(rounds=1)
+        self.assertEqual(self.timeline.step_back(100), 100)
+        self.assertEqual(self.cp.cpu.regs[5], 3)
+        self.assertEqual(self.state(), self.history[self.timeline.now])
+
+
+class TestTimerPoll(TestCase):
+    """JIT spans whose program reads a timer."""
+
+    def classpad(self):
+        cp = make_cp(TIMER_POLL, with_tmu=True)
+        cp.mem.write16(CMT_CMCOR_ADDR, 0xFFFF)
+        cp.mem.write16(CMT_CMSTR_ADDR, CMT_CMSTR_STR)
+        cp.enable_timeline(interval=300, run_interval=5000)
+        return cp
+
+    @staticmethod
+    def state(cp):
+        return (cp.cpu.pc, list(cp.cpu.regs._r), cp.scheduler.now, cp.tmu.cmcnt)
+
+    @staticmethod
+    def forward(cp, history):
+        """JIT runs (each stops after 100 polls) and stepped spans."""
+        timeline = cp.timeline
+        for steps in (3000, 1500, 20, 9000, 700, 2500):
+            end = timeline.now + steps
+            while timeline.now < end:
+                timeline.run(end - timeline.now)
+                history[timeline.now] = TestTimerPoll.state(cp)
+            for _ in range(7):
+                timeline.step()
+                history[timeline.now] = TestTimerPoll.state(cp)
+
+    def test_seek_reads_the_same_counts(self):
+        cp = self.classpad()
+        history = {0: self.state(cp)}
+        self.forward(cp, history)
+        for count in sorted(history, reverse=True):
+            cp.timeline.seek(count)
+            self.assertEqual(self.state(cp), history[count])
+
+    def test_reverse_continue_reads_the_same_counts(self):
+        cp, twin = self.classpad(), self.classpad()
+        for machine in (cp, twin):
+            self.forward(machine, {})
+            machine.timeline.run(500)
+        # In the last JIT run: stepped through in the search
+        hit = cp.timeline.reverse_continue({RAM + 4})
+        self.assertGreater(hit, twin.timeline.now - 500)
+        twin.timeline.seek(hit)
+        self.assertEqual(self.state(cp), self.state(twin))
+        history = {}
+        self.forward(cp, history)
+        for count in sorted(history, reverse=True)[::5]:
+            cp.timeline.seek(count)
+            self.assertEqual(self.state(cp), history[count])
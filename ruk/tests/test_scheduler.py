@@ -0,0 +1,81 @@
+from unittest import TestCase
+
+from ruk.jcore.rtc import RTC_BASE
+from ruk.jcore.scheduler import NEVER, Scheduler
+from ruk.jcore.tmu import CMT_CMCNT_ADDR, CMT_CMCOR_ADDR, CMT_CMCSR_ADDR, CMT_CMSTR_ADDR, CMT_CMSTR_STR
+from ruk.tests.helpers import RAM, make_cp
+
+# r2 counts polls of CMCSR (@r1) until CMF is set, then spin
+PROGRAM = """
+    poll:
+        mov.w @r1, r0
+        add #1, r2
+        cmp/pz r0
+        bt poll
+    done:
+        bra done
+        nop
+"""
+
+
+class TestScheduler(TestCase):
+    def test_events_fire_in_deadline_order(self):
+        sched = Scheduler()
+        fired = []
+        for deadline in (30, 10, 20):
+            sched.schedule(deadline, lambda d=deadline: fired.append(d))
+        late = sched.schedule(20, lambda: fired.append('cancelled'))
+        sched.cancel(late)
+        self.assertEqual(sched.next_deadline, 10)
+        sched.advance(25)
+        self.assertEqual(fired, [10, 20])
+        self.assertEqual(sched.next_deadline, 30)
+        sched.advance(5)
+        self.assertEqual(fired, [10, 20, 30])
+        self.assertEqual(sched.next_deadline, NEVER)
+        self.assertEqual(sched.pending(), [])
+
+    def test_clock_catches_up_lazily(self):
+        sched = Scheduler()
+        ticks = []
+        clock = sched.add_clock('slow', 4, ticks.append, lambda: 10)
+        self.assertEqual(sched.next_deadline, 40)
+        sched.advance(39)
+        self.assertEqual(ticks, [])
+        clock.sync()
+        self.assertEqual(ticks, [9])
+        sched.advance(1)
+        self.assertEqual(ticks, [9, 1])
+        self.assertEqual(sched.next_deadline, 80)
+
+
+class TestClasspadScheduler(TestCase):
+    def setUp(self) -> None:
+        cp = self.cp = make_cp(PROGRAM, with_tmu=True, with_rtc=True)
+        cp.cpu.regs[1] = CMT_CMCSR_ADDR
+        cp.mem.write16(CMT_CMCOR_ADDR, 1000)
+        cp.mem.write16(CMT_CMSTR_ADDR, CMT_CMSTR_STR)
+
+    def test_counters_read_current_time(self):
+        cp = self.cp
+        r64cnt = cp.rtc.r64cnt
+        cp.scheduler.advance(500)
+        self.assertEqual(cp.tmu.cmcnt, 0)   # not caught up yet
+        self.assertEqual(cp.mem.read16(CMT_CMCNT_ADDR), 500)
+        # R64CNT: one tick every 4 cycles, wrapping at 128
+        self.assertEqual(cp.mem.read8(RTC_BASE), (r64cnt + 125) % 128)
+
+    def test_compare_match_while_stepping(self):
+        cpu = self.cp.cpu
+        while cpu.pc != RAM + 8:
+            cpu.step()
+        self.assertEqual(self.cp.scheduler.now, cpu._step_count)
+        # The poll after cycle 1000 sees CMF
+        self.assertEqual(cpu.regs[2], 1000 // 4 + 1)
+
+    def test_compare_match_under_jit(self):
+        cpu = self.cp.cpu
+        steps = cpu.run(100_000)
+        self.assertEqual(cpu.pc, RAM + 8)
+        self.assertEqual(self.cp.scheduler.now, steps)
+        self.assertAlmostEqual(cpu.regs[2], 1000 // 4, delta=10)
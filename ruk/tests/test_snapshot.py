@@ -0,0 +1,120 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from ruk.classpad import Classpad
+from ruk.jcore.memory import Memory, SparseMemory
+from ruk.jcore.snapshot import capture_memory, restore_memory
+from ruk.tests.helpers import RAM, make_cp
+
+# r1 counts to 50 in a loop, storing each value to RAM_P2 + 0x400
+PROGRAM = """
+        mov #0, r1
+        mov.l addr, r2
+        mov #50, r3
+    loop:
+        add #1, r1
+        mov.l r1, @r2
+        dt r3
+        bf loop
+    done:
+        bra done
+        nop
+        nop
+    addr:
+        .long 0xAC000400
+"""
+
+
+class TestSnapshot(TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.rom = os.path.join(self.tmp.name, 'rom.bin')
+        with open(self.rom, 'wb') as f:
+            f.write(bytes(range(256)) * 0x1000 + bytes(0x300000))
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def make_cp(self):
+        return make_cp(PROGRAM, rom=self.rom, ram_size=0x100_0000, with_tmu=True,
+                       with_rtc=True, with_dma=True, with_display=True, with_ubc=True)
+
+    @staticmethod
+    def state(cp):
+        return (cp.cpu.pc, list(cp.cpu.regs._r), cp.cpu.regs['sr'], cp.cpu._step_count,
+                cp.ram.read_block(0, 0x1000), cp.mem.read32(0x80000010),
+                cp.mem.read32(0xFE300000), cp.tmu.cmcor, cp.tmu.tmu_channels[1].tcnt,
+                cp.rtc.r64cnt, cp.display._fb[3][:4], cp.intc.snapshot_state())
+
+    def test_restore_in_place(self):
+        cp = self.make_cp()
+        cp.cpu.run(100)
+        cp.mem.write32(0x80000010, 0xDEADBEEF)
+        cp.mem.write32(0xFE300000, 7)
+        cp.tmu.cmcor = 55
+        cp.intc.request(0x400)
+        path = os.path.join(self.tmp.name, 'machine.snap')
+        data = cp.snapshot(path)
+        saved = self.state(cp)
+
+        cp.cpu.run(100000)
+        cp.mem.write32(0x80000010, 1)
+        cp.mem.write32(0x80000100, 5)
+        cp.mem.write32(0xFE300000, 0)
+        cp.tmu.tmu_channels[1].tcnt = 3
+        cp.display._fb[3][0] = 0
+        cp.intc.clear()
+        self.assertNotEqual(self.state(cp), saved)
+
+        cp.restore(path)
+        self.assertEqual(self.state(cp), saved)
+        # ROM pages the snapshot did not hold go back to the file
+        self.assertEqual(cp.mem.read32(0x80000100), 0x00010203)
+        self.assertLess(len(data), 64 * 1024)
+
+    def test_restore_on_fresh_machine(self):
+        cp = self.make_cp()
+        cp.cpu.run(120)
+        data = cp.snapshot()
+        other = self.make_cp()
+        other.restore(data)
+        self.assertEqual(self.state(other), self.state(cp))
+        cp.cpu.run(5000)
+        other.cpu.run(5000)
+        self.assertEqual(self.state(other), self.state(cp))
+        self.assertEqual(other.ram.read32(0x400), 50)
+
+    def test_mismatched_machine(self):
+        data = self.make_cp().snapshot()
+        with self.assertRaises(ValueError):
+            Classpad(self.rom, start_pc=RAM).restore(data)
+        with self.assertRaises(ValueError):
+            self.make_cp().restore(b'nope')
+
+
+class TestMemoryPages(TestCase):
+    def test_zero_pages_skipped(self):
+        mem = Memory(0x10000)
+        mem.write32(0x2004, 0x12345678)
+        saved = capture_memory(mem)
+        self.assertEqual(saved['pages'], [2])
+        mem.write32(0x8000, 1)
+        mem.write32(0x2004, 0)
+        buf = mem._mem
+        restore_memory(mem, saved)
+        self.assertIs(mem._mem, buf)
+        self.assertEqual(mem.read32(0x2004), 0x12345678)
+        self.assertEqual(mem.read32(0x8000), 0)
+
+    def test_sparse(self):
+        mem = SparseMemory(0x10000)
+        mem.write8(0x3001, 9)
+        mem.write8(0x5000, 1)
+        mem.write8(0x5000, 0)
+        saved = capture_memory(mem)
+        self.assertEqual(saved['pages'], [3])
+        mem.write8(0x7000, 1)
+        restore_memory(mem, saved)
+        self.assertEqual(mem.read8(0x3001), 9)
+        self.assertEqual(mem.allocated(), 0x1000)
@@ -0,0 +1,96 @@
+from unittest import TestCase
+
+from ruk.jcore.cpg import CPG_BASE, CPG_FRQCR_OFF
+from ruk.jcore.timing import clock_periods, cycle_costs
+from ruk.jcore.tmu import CMT_CMCOR_ADDR, CMT_CMCSR_ADDR, CMT_CMSTR_ADDR, CMT_CMSTR_STR
+from ruk.tests.helpers import RAM, make_cp
+
+# 1 + 100 * 6 cycles to reach the BRA-to-self at RAM + 10
+LOOP = """
+        mov #100, r1
+    loop:
+        mul.l r1, r1        ! 2 cycles
+        dt r1               ! 1
+        bf.s loop           ! 2
+        add #1, r2          ! 1
+    done:
+        bra done
+        nop
+        nop
+"""
+# r2 counts polls of CMCSR (@r1) until CMF is set (5 cycles a poll)
+POLL = """
+    poll:
+        mov.w @r1, r0
+        add #1, r2
+        cmp/pz r0
+        bt poll
+    done:
+        bra done
+        nop
+"""
+
+
+def _classpad(program):
+    cp = make_cp(program, with_tmu=True, with_rtc=True)
+    cp.enable_timing()
+    return cp
+
+
+class TestTiming(TestCase):
+    def test_boot_clock_periods(self):
+        cp = _classpad(LOOP)
+        rates = cp.cpg.clock_rates()
+        self.assertEqual(rates['iphi'], 117_964_800)
+        self.assertEqual(rates['pphi'], 29_491_200)
+        self.assertEqual(clock_periods(rates),
+                         {'cmt': 256, 'rtc': 921_600, 'pphi': 4, 'etmu': 3600})
+        self.assertEqual({name: clock.period for name, clock in cp.scheduler.clocks.items()},
+                         clock_periods(rates))
+
+    def test_frqcr_write_retunes_clocks(self):
+        cp = _classpad(LOOP)
+        cp.scheduler.advance(1000)
+        # Iphi /2 instead of /4: twice the CPU cycles per peripheral tick
+        cp.mem.write32(CPG_BASE + CPG_FRQCR_OFF, 0x0F002203)
+        clocks = cp.scheduler.clocks
+        self.assertEqual(clocks['cmt'].period, 512)
+        self.assertEqual(clocks['pphi'].period, 8)
+        self.assertEqual(clocks['cmt'].ticks, 1000 // 512)
+        self.assertEqual(cp.scheduler.snapshot_state()['periods']['etmu'], 7200)
+
+    def test_cycle_costs(self):
+        cp = _classpad(LOOP)
+        costs = cycle_costs(cp.cpu.emulator, {214: 5})
+        self.assertEqual(costs[0x0009], 5)            # NOP, overridden
+        self.assertEqual(costs[0x0117], 2)            # MUL.L
+        self.assertEqual(cp.cpu.cycle_costs[0x0009], 1)
+
+    def test_step_and_jit_count_the_same_cycles(self):
+        stepped = _classpad(LOOP)
+        cpu = stepped.cpu
+        while cpu.pc != RAM + 10:
+            cpu.step()
+        self.assertEqual(cpu._step_count, 301)
+        self.assertEqual(stepped.scheduler.now, 601)
+
+        ran = _classpad(LOOP)
+        self.assertEqual(ran.cpu.run(301), 301)
+        self.assertEqual(ran.cpu.pc, RAM + 10)
+        self.assertEqual(ran.scheduler.now, 601)
+
+    def test_compare_match_at_real_ratio(self):
+        for run in (False, True):
+            cp = _classpad(POLL)
+            cpu = cp.cpu
+            cpu.regs[1] = CMT_CMCSR_ADDR
+            cp.mem.write16(CMT_CMCOR_ADDR, 4)
+            cp.mem.write16(CMT_CMSTR_ADDR, CMT_CMSTR_STR)
+            if run:
+                cpu.run(100_000)
+            else:
+                while cpu.pc != RAM + 8:
+                    cpu.step()
+            self.assertEqual(cpu.pc, RAM + 8)
+            # CMF after 4 CMT ticks of 256 cycles
+            self.assertAlmostEqual(cpu.regs[2], 4 * 256 // 5, delta=2 if not run else 10)
@@ -408,7 +408,7 @@ class SH4Assembler:
                         disp = parse_imm(parts[0]) or 0
                         rn2 = parse_reg(parts[1])
                         if rn2 is not None:
-                            return (0b1000 << 12) | (0b0001 << 8) | (rn2 << 4) | (disp & 0xF)
+                            return (0b1000 << 12) | (0b0001 << 8) | (rn2 << 4) | ((disp // 2) & 0xF)
                 # mov.w @(disp,Rm), R0  ->  1000_0101_mmmm_dddd
                 if src.startswith('@(') and rn == 0:
                     inner = src[2:src.index(')')]
@@ -417,7 +417,7 @@ class SH4Assembler:
                         disp = parse_imm(parts[0]) or 0
                         rm2 = parse_reg(parts[1])
                         if rm2 is not None:
-                            return (0b1000 << 12) | (0b0101 << 8) | (rm2 << 4) | (disp & 0xF)
+                            return (0b1000 << 12) | (0b0101 << 8) | (rm2 << 4) | ((disp // 2) & 0xF)
                 # mov.w @(disp,PC), Rn  ->  1001_nnnn_dddd
                 if src.startswith('@(') and 'PC' in src and rn is not None:
                     disp_str = src[2:src.index(',')]
@@ -439,6 +439,27 @@ class SH4Assembler:
                     rm = parse_reg(src[1:])
                     if rm is not None and rn is not None:
                         return (0b0110 << 12) | (rn << 8) | (rm << 4) | 0b0000
+                # mov.b R0, @(disp,Rn)  ->  1000_0000_nnnn_dddd
+                if rm == 0 and dst.startswith('@('):
+                    inner = dst[2:dst.index(')')]
+                    parts = inner.split(',')
+                    if len(parts) == 2:
+                        disp = parse_imm(parts[0]) or 0
+                        rn2 = parse_reg(parts[1])
+                        if rn2 is not None:
+                            return (0b1000 << 12) | (0b0000 << 8) | (rn2 << 4) | (disp & 0xF)
+                # mov.b @(disp,GBR), R0  ->  1100_0100_dddd_dddd
+                # mov.b @(disp,Rm), R0  ->  1000_0100_mmmm_dddd
+                if src.startswith('@(') and rn == 0:
+                    inner = src[2:src.index(')')]
+                    parts = inner.split(',')
+                    if len(parts) == 2:
+                        disp = parse_imm(parts[0]) or 0
+                        if parts[1].strip().lower() == 'gbr':
+                            return (0b1100 << 12) | (0b0100 << 8) | (disp & 0xFF)
+                        rm2 = parse_reg(parts[1])
+                        if rm2 is not None:
+                            return (0b1000 << 12) | (0b0100 << 8) | (rm2 << 4) | (disp & 0xF)
 
         # ---- ADD ----
         if mnem == 'add':
@@ -493,6 +514,13 @@ class SH4Assembler:
                         return (0b0011 << 12) | (rn << 8) | (rm << 4) | 0b0110
                     if mnem == 'cmp/gt':
                         return (0b0011 << 12) | (rn << 8) | (rm << 4) | 0b0111
+            if len(ops) == 1:
+                rn = parse_reg(ops[0])
+                if rn is not None:
+                    if mnem == 'cmp/pz':
+                        return (0b0100 << 12) | (rn << 8) | 0x11
+                    if mnem == 'cmp/pl':
+                        return (0b0100 << 12) | (rn << 8) | 0x15
         if mnem == 'cmp/eq' and len(ops) == 2 and ops[0].startswith('#'):
             # cmp/eq #imm, R0
             imm = parse_imm(ops[0]) or 0
@@ -736,11 +764,11 @@ class SH4Assembler:
                 rn = parse_reg(ops[1])
                 if rn is not None:
                     if reg == 'sr':
-                        return (0b0000 << 12) | (rn << 8) | 0x0E
+                        return (0b0000 << 12) | (rn << 8) | 0x02
                     if reg == 'gbr':
-                        return (0b0000 << 12) | (rn << 8) | 0x1E
+                        return (0b0000 << 12) | (rn << 8) | 0x12
                     if reg == 'vbr':
-                        return (0b0000 << 12) | (rn << 8) | 0x2E
+                        return (0b0000 << 12) | (rn << 8) | 0x22
 
         # ---- TRAPA ----
         if mnem == 'trapa':
@@ -765,6 +793,14 @@ class SH4Assembler:
                 if rm is not None:
                     return (0b0100 << 12) | (rm << 8) | 0x2B
 
+        # ---- MUL.L ----
+        if mnem == 'mul.l':
+            if len(ops) == 2:
+                rm = parse_reg(ops[0])
+                rn = parse_reg(ops[1])
+                if rm is not None and rn is not None:
+                    return (0b0000 << 12) | (rn << 8) | (rm << 4) | 0b0111
+
         # ---- DT ----
         if mnem == 'dt':
             if len(ops) == 1:
@@ -820,7 +856,85 @@ class SH4Assembler:
                 rm = parse_reg(ops[0])
                 rn = parse_reg(ops[1])
                 if rm is not None and rn is not None:
-                    return (0b0010 << 12) | (rn << 8) | (rm << 4) | 0b1011
+                    return (0b0010 << 12) | (rn << 8) | (rm << 4) | 0b1010
+
+        # ---- AND.B / OR.B / XOR.B / TST.B #imm, @(R0,GBR) ----
+        if mnem in ('and.b', 'or.b', 'xor.b', 'tst.b'):
+            if len(ops) == 2 and ops[0].startswith('#'):
+                if ops[1].replace(' ', '').lower() == '@(r0,gbr)':
+                    imm = parse_imm(ops[0]) or 0
+                    code = {'tst.b': 0b1100, 'and.b': 0b1101,
+                            'xor.b': 0b1110, 'or.b': 0b1111}[mnem]
+                    return (0b1100 << 12) | (code << 8) | (imm & 0xFF)
+
+        # ---- MOVT ----
+        if mnem == 'movt':
+            if len(ops) == 1:
+                rn = parse_reg(ops[0])
+                if rn is not None:
+                    return (0b0000 << 12) | (rn << 8) | 0x29
+
+        # ---- BRAF / BSRF ----
+        if mnem in ('braf', 'bsrf'):
+            if len(ops) == 1:
+                rm = parse_reg(ops[0])
+                if rm is not None:
+                    return (0b0000 << 12) | (rm << 8) | (0x23 if mnem == 'braf' else 0x03)
+
+        # ---- DIV0U / DIV0S / DIV1 ----
+        if mnem == 'div0u':
+            return 0x0019
+
+        if mnem in ('div0s', 'div1'):
+            if len(ops) == 2:
+                rm = parse_reg(ops[0])
+                rn = parse_reg(ops[1])
+                if rm is not None and rn is not None:
+                    if mnem == 'div0s':
+                        return (0b0010 << 12) | (rn << 8) | (rm << 4) | 0b0111
+                    return (0b0011 << 12) | (rn << 8) | (rm << 4) | 0b0100
+
+        # ---- DMULS.L / DMULU.L ----
+        if mnem in ('dmuls.l', 'dmulu.l'):
+            if len(ops) == 2:
+                rm = parse_reg(ops[0])
+                rn = parse_reg(ops[1])
+                if rm is not None and rn is not None:
+                    low = 0b1101 if mnem == 'dmuls.l' else 0b0101
+                    return (0b0011 << 12) | (rn << 8) | (rm << 4) | low
+
+        # ---- SHAD / SHLD ----
+        if mnem in ('shad', 'shld'):
+            if len(ops) == 2:
+                rm = parse_reg(ops[0])
+                rn = parse_reg(ops[1])
+                if rm is not None and rn is not None:
+                    low = 0b1100 if mnem == 'shad' else 0b1101
+                    return (0b0100 << 12) | (rn << 8) | (rm << 4) | low
+
+        # ---- MAC.W / MAC.L @Rm+, @Rn+ ----
+        if mnem in ('mac.w', 'mac.l'):
+            if len(ops) == 2 and all(op.startswith('@') and op.endswith('+') for op in ops):
+                rm = parse_reg(ops[0][1:-1])
+                rn = parse_reg(ops[1][1:-1])
+                if rm is not None and rn is not None:
+                    high = 0b0100 if mnem == 'mac.w' else 0b0000
+                    return (high << 12) | (rn << 8) | (rm << 4) | 0b1111
+
+        # ---- STS.L / LDS.L (MACH, MACL, PR) ----
+        if mnem == 'sts.l':
+            if len(ops) == 2 and ops[1].startswith('@-'):
+                code = {'mach': 0x02, 'macl': 0x12, 'pr': 0x22}.get(ops[0].lower())
+                rn = parse_reg(ops[1][2:])
+                if code is not None and rn is not None:
+                    return (0b0100 << 12) | (rn << 8) | code
+
+        if mnem == 'lds.l':
+            if len(ops) == 2 and ops[0].startswith('@') and ops[0].endswith('+'):
+                rm = parse_reg(ops[0][1:-1])
+                code = {'mach': 0x06, 'macl': 0x16, 'pr': 0x26}.get(ops[1].lower())
+                if code is not None and rm is not None:
+                    return (0b0100 << 12) | (rm << 8) | code
 
         return None  # unknown instruction
 
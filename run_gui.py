@@ -26,14 +26,12 @@ def main():
         print("No project selected. Exiting.")
         return 0
 
-    # Load the ROM
-    with open(project.rom_path, 'rb') as f:
-        rom = f.read()
-    print(f"Loaded ROM: {project.rom_path} ({len(rom)} bytes)")
+    # Load the ROM (mapped from the file, paged in on demand)
+    print(f"Loaded ROM: {project.rom_path} ({os.path.getsize(project.rom_path)} bytes)")
 
     # Create the Classpad with selected peripherals
     from ruk.classpad import Classpad
-    cp = Classpad(rom, debug=False, start_pc=project.start_pc,
+    cp = Classpad(project.rom_path, debug=False, start_pc=project.start_pc,
                   with_tmu=project.with_tmu, with_rtc=project.with_rtc,
                   with_dma=project.with_dma, with_display=project.with_display,
                   with_ubc=project.with_ubc)
@@ -2,10 +2,15 @@
 """Standalone hh3 runner.
 
 Usage:
-    python3 run_hh3.py <file.hh3> [max_steps]
+    python3 run_hh3.py <file.hh3> [max_steps] [--heatmap out.json|out.csv] [--top N]
 
 Loads and runs an .hh3 file on the RuK emulator with all peripherals
 attached.  Useful for quick testing without the GUI.
+
+--heatmap counts memory accesses per region and 4KB page during the run
+(MemoryMap.enable_access_stats) and writes them as JSON, or CSV if the
+file name ends in .csv.  --top prints the N busiest pages (default 10
+when --heatmap is given).  Counting slows the run down noticeably.
 """
 import sys, os, time
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
@@ -14,13 +19,30 @@ from ruk.classpad import Classpad
 from ruk.jcore.hh3 import run_hh3, parse_elf, get_metadata
 
 
+def _pop_option(args, name):
+    """Remove `name value` from args and return value (None if absent)."""
+    if name not in args:
+        return None
+    i = args.index(name)
+    if i + 1 >= len(args):
+        print(__doc__)
+        sys.exit(1)
+    value = args[i + 1]
+    del args[i:i + 2]
+    return value
+
+
 def main():
-    if len(sys.argv) < 2:
+    args = sys.argv[1:]
+    heatmap_path = _pop_option(args, '--heatmap')
+    top = _pop_option(args, '--top')
+    top = int(top) if top is not None else (10 if heatmap_path else 0)
+    if len(args) < 1:
         print(__doc__)
         sys.exit(1)
 
-    hh3_path = sys.argv[1]
-    max_steps = int(sys.argv[2]) if len(sys.argv) > 2 else 10_000_000
+    hh3_path = args[0]
+    max_steps = int(args[1]) if len(args) > 1 else 10_000_000
 
     # 1. Print hh3 metadata
     with open(hh3_path, 'rb') as f:
@@ -50,13 +72,11 @@ def main():
     if not os.path.exists(rom_path):
         print(f"\nERROR: OS ROM not found at {rom_path}")
         sys.exit(1)
-    with open(rom_path, 'rb') as f:
-        rom = f.read()
-    print(f"\nOS ROM:         {len(rom):,} bytes")
+    print(f"\nOS ROM:         {os.path.getsize(rom_path):,} bytes")
 
     # 3. Set up Classpad with all peripherals
     cp = Classpad(
-        rom, debug=False,
+        rom_path, debug=False,
         with_tmu=True, with_rtc=True, with_dma=True,
         with_display=True, with_bsc=True, with_cpg=True,
     )
@@ -74,6 +94,7 @@ def main():
     print(f"R6 (envp):      0x{cp.cpu.regs[6]:08X}")
 
     # 5. Run
+    stats = cp.cpu.mem.enable_access_stats() if heatmap_path or top else None
     print(f"\nRunning ({max_steps:,} steps max)...")
     t0 = time.perf_counter()
     try:
@@ -83,6 +104,8 @@ def main():
         import traceback; traceback.print_exc()
         steps = cp.cpu._step_count
     t1 = time.perf_counter()
+    if stats is not None:
+        cp.cpu.mem.disable_access_stats()
 
     print(f"\nResults:")
     print(f"  Wall time:    {t1-t0:.2f}s")
@@ -100,6 +123,20 @@ def main():
     print(f"  R12=0x{r[12]:08X}  R13=0x{r[13]:08X}  R14=0x{r[14]:08X}  R15=0x{r[15]:08X}")
     print(f"  PR =0x{r['pr']:08X}  SR =0x{r['sr']:08X}")
 
+    if stats is not None:
+        if heatmap_path:
+            stats.save(heatmap_path)
+            print(f"\nHeatmap:        {heatmap_path}")
+        if top:
+            print(f"\nTop {top} pages:")
+            print(f"  {'page':>10}  {'region':<12} {'total':>10} {'fetch':>10} "
+                  f"{'reads':>10} {'writes':>10}")
+            for row in stats.top_pages(top):
+                reads = row['read8'] + row['read16'] + row['read32']
+                writes = row['write8'] + row['write16'] + row['write32']
+                print(f"  0x{row['address']:08X}  {row['region']:<12} {row['total']:>10,} "
+                      f"{row['fetch']:>10,} {reads:>10,} {writes:>10,}")
+
 
 if __name__ == '__main__':
     main()
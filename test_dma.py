@@ -177,8 +177,8 @@ def test_interrupt():
     start_dma(cp, 0)
 
     # Check the interrupt was queued
-    assert not cp.intc._queue.empty(), "DMA interrupt should have been queued"
-    intevt = cp.intc._queue.get_nowait()
+    assert cp.intc.pending, "DMA interrupt should have been queued"
+    intevt, = cp.intc.sources()
     assert intevt == DMA_INTEVT[0], f"Expected INTEVT=0x{DMA_INTEVT[0]:X}, got 0x{intevt:X}"
     print(f"  PASS: DMA interrupt queued (INTEVT=0x{intevt:X})")
 
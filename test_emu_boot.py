@@ -6,7 +6,7 @@ Boots the Casio fx-CG50 OS ROM (3070.bin) from address 0x80000000.
 The OS initializes hardware, sets up the display, and eventually reaches
 the main menu.  This test runs headlessly and prints progress.
 
-The CPU registers and peripherals are auto-ticked via the on_step callback,
+The peripherals advance on the Classpad's scheduler in step() and the JIT,
 so polling loops (RTC R64CNT, CMT CMCSR) advance correctly.
 
 Usage:
@@ -0,0 +1,876 @@
+#!/usr/bin/env python3
+"""
+JIT / block-cache tests for RuK.
+
+Covers the behaviour of ruk.jcore.jit that the instruction-level tests
+can't see because they single-step:
+  - Cached and compiled blocks are evicted when the guest writes over
+    the code they were decoded from (self-modifying code, reloads),
+    including writes through the P2 mirror of RAM, while blocks on other
+    pages stay warm.
+  - Delayed branches are compiled with their delay slot inline and
+    behave exactly like the interpreter's _exec_delay_slot.
+  - Compiled blocks with static successors are chained, and the links
+    are undone when the successor is evicted.
+  - Registers and T cached in locals are written back before memory
+    accesses (which may reach MMIO) and on every exit.
+  - Loops spanning several blocks are compiled into one region function
+    that only returns at real exits.
+  - Loads/stores to RAM, its P2 mirror and ILRAM go straight to the
+    bytearrays but still invalidate code they overwrite; everything
+    else (MMIO) takes the MemoryMap path with registers written back.
+  - A ROM mapped from its file (P1 and P2 mirrors sharing it) is
+    compiled like any other flat region.
+  - Every op_id the Emulator implements has a code generator, and the
+    arithmetic/system ones give the interpreter's results.
+  - Data watchpoints stop compiled code right after the accessing
+    instruction, with the interpreter's state, and take the watched
+    pages off the inline fast path only while they are set.
+  - Access stats count every load/store of compiled code (the inline
+    fast path is off while they are enabled) and flush the cache when
+    toggled.
+  - run() returns exact step counts (a delayed branch and its slot are
+    one step, as in cpu.step()), and compiled loops stop on the step
+    budget with the interpreter's state at that point.
+
+Run with:
+    python3 test_jit.py
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from ruk.classpad import Classpad
+from ruk.jcore.jit import JITCompiler
+from ruk.jcore.mmio import MMIODevice
+from ruk.tests.helpers import RAM, asm, make_cp
+
+
+RAM_P2 = 0xAC000000
+
+
+def op(text: str) -> int:
+    """The opcode of one instruction."""
+    return int.from_bytes(asm(text), 'big')
+
+
+def run_from(cp, pc, steps=1000):
+    cp.cpu.pc = pc
+    cp.cpu.ebreak = False
+    return cp.cpu.run(steps)
+
+
+def jit_block(cp, pc, budget=1 << 30):
+    """Compile the block at `pc` (must succeed) and run it once."""
+    jit = JITCompiler(cp.cpu)
+    fn = jit._jit_compile(pc)
+    assert fn is not None, f"block at 0x{pc:08X} was not JIT-compiled"
+    cp.cpu.pc = pc
+    fn(cp.cpu, budget)
+    return cp.cpu.pc
+
+
+def run_interp(cp, pc, max_steps=100000):
+    """Single-step from `pc` until the CPU spins on one PC."""
+    cp.cpu.pc = pc
+    last = None
+    for _ in range(max_steps):
+        cp.cpu.step()
+        if cp.cpu.pc == last:
+            break
+        last = cp.cpu.pc
+
+
+def same_state(cp, ref, regs=range(16)):
+    """Assert `cp` and `ref` agree on pc, the given registers and SR."""
+    assert cp.cpu.pc == ref.cpu.pc, f"pc {cp.cpu.pc:#x} != {ref.cpu.pc:#x}"
+    for i in regs:
+        assert cp.cpu.regs[i] == ref.cpu.regs[i], f"r{i}: {cp.cpu.regs[i]:#x} != {ref.cpu.regs[i]:#x}"
+    assert cp.cpu.regs['sr'] == ref.cpu.regs['sr']
+
+
+# Calls (BSR, JSR + RTS), a BF/S counted loop and a BRA to the spin.
+CALLS_PROGRAM = """
+        mov #0, r9              ! 0x00
+        mov #32, r10
+    outer:
+        bsr leaf                ! 0x04
+        mov r9, r4
+        mov #20, r5
+    inner:
+        add r4, r9              ! 0x0A
+        dt r5
+        bf.s inner
+        add #1, r4
+        mov.l leaf2_addr, r1    ! 0x12
+        jsr @r1
+        add r0, r9              ! r0 from leaf
+        dt r10                  ! 0x18
+        bf outer
+        bra done                ! 0x1C
+        nop
+    leaf:
+        mov r4, r0              ! 0x20
+        rts
+        add #3, r0
+    leaf2:
+        rts                     ! 0x26
+        nop
+        .align 2
+    leaf2_addr:
+        .long leaf2
+    done:
+        bra done                ! 0x30
+        nop
+"""
+
+
+# Counted loop with an if/else in its body: three blocks, one cycle.
+BRANCHY_LOOP = """
+        mov #100, r1
+        mov #0, r9
+    loop:
+        mov r1, r0              ! 0x04
+        tst #1, r0
+        bt even
+        add #3, r9              ! 0x0A
+        add #5, r9
+    even:
+        add #1, r9              ! 0x0E
+        dt r1
+        bf loop
+    done:
+        bra done                ! 0x14
+        nop
+"""
+
+
+# Loop counting r2 up to r4 that leaves early once r2 reaches r3:
+# two blocks, one cycle, two ways out.
+BRA_LOOP = """
+        mov #0, r1
+        mov #0, r2
+    loop:
+        add #3, r1              ! 0x04
+        add #1, r2
+        cmp/eq r2, r3
+        bt found
+        cmp/gt r4, r2           ! 0x0C
+        bf.s loop
+        add r2, r1
+    done:
+        bra done                ! 0x12
+        nop
+    found:
+        bra found               ! 0x16
+        nop
+"""
+
+
+# One loop using the multiply/divide, swap/extend, dynamic shift,
+# displacement, GBR and system register generators.  Expects r13 (data),
+# GBR, r8/r9 (MAC operands) and r15 (stack) to point into RAM.
+ALU_LOOP = """
+        mov #20, r10
+    loop:
+        mov r10, r1             ! 0x02
+        shll8 r1
+        mov #7, r2
+        div0u
+        div1 r2, r1
+        rotcl r1
+        div1 r2, r1
+        div0s r2, r1
+        div1 r2, r1
+        mul.l r2, r1
+        sts macl, r0
+        dmuls.l r2, r1
+        sts mach, r3
+        swap.b r1, r3
+        swap.w r1, r4
+        xtrct r3, r4
+        exts.b r0, r5
+        shad r5, r4
+        shld r4, r3
+        mov.l @(4, r13), r6
+        mov.l r4, @(8, r13)
+        mov.w @(6, r13), r0
+        mov.b r0, @(5, r13)
+        mov.b @(4, gbr), r0
+        mov #4, r0
+        and.b #0x0F, @(r0, gbr)
+        or.b #0x30, @(r0, gbr)
+        xor.b #0x55, @(r0, gbr)
+        tst.b #1, @(r0, gbr)
+        stc gbr, r7
+        mac.w @r8+, @r9+
+        mac.l @r8+, @r9+
+        sts.l macl, @-r15
+        lds.l @r15+, pr
+        dt r10
+        bf loop
+    done:
+        bra done                ! 0x4A
+        nop
+"""
+
+
+# r1 counts to 50 in a loop, storing each value to RAM_P2 + 0x400
+WATCHED_LOOP = """
+        mov #0, r1
+        mov.l addr, r2
+        mov #50, r3
+    loop:
+        add #1, r1              ! 0x06
+        mov.l r1, @r2           ! 0x08
+        dt r3
+        bf loop
+    done:
+        bra done                ! 0x0E
+        nop
+        .align 2
+    addr:
+        .long 0xAC000400
+"""
+
+
+# ---------------------------------------------------------------------------
+# Tests
+# ---------------------------------------------------------------------------
+
+def test_code_write_invalidates_block():
+    """Rewriting an instruction through the P2 mirror takes effect."""
+    cp = make_cp("""
+        mov #1, r0
+        sett
+        bt spin
+    spin:
+        bra spin                ! 0x06
+        nop
+    """)
+    # A second block on another page that must survive the write.
+    cp.ram.write_bin(0x800, asm("""
+        mov #3, r1
+    spin:
+        bra spin
+        nop
+    """, RAM + 0x800))
+    for _ in range(8):  # hot enough to be JIT-compiled
+        run_from(cp, RAM)
+    run_from(cp, RAM + 0x800)
+    jit = cp.cpu._jit
+    assert cp.cpu.regs[0] == 1
+    assert RAM in jit.jit_cache
+    assert RAM + 0x800 in jit.block_runner.block_cache
+
+    cp.cpu.mem.write16(RAM_P2, op('mov #2, r0'))
+    assert RAM not in jit.jit_cache
+    assert RAM not in jit.block_runner.block_cache
+    assert RAM + 0x800 in jit.block_runner.block_cache
+
+    run_from(cp, RAM)
+    assert cp.cpu.regs[0] == 2, f"stale block ran: r0={cp.cpu.regs[0]}"
+    assert jit.stats()['invalidated'] >= 1
+
+
+def test_data_write_is_free():
+    """Writes to pages without code don't touch the caches."""
+    cp = make_cp("""
+        mov #1, r0
+    spin:
+        bra spin
+        nop
+    """)
+    run_from(cp, RAM)
+    jit = cp.cpu._jit
+    cached = dict(jit.block_runner.block_cache)
+    cp.cpu.mem.write32(RAM + 0x4000, 0xDEADBEEF)
+    assert jit.block_runner.block_cache == cached
+    assert not cp.ram.is_code(0x4000)
+    assert cp.ram.is_code(0)
+
+
+def test_delayed_branches_match_interpreter():
+    """BSR/JSR/RTS/BF.S/BRA blocks compile and give interpreter results."""
+    ref = make_cp(CALLS_PROGRAM)
+    run_interp(ref, RAM)
+    cp = make_cp(CALLS_PROGRAM)
+    run_from(cp, RAM, steps=100000)
+    jit = cp.cpu._jit
+    assert cp.cpu.pc == RAM + 0x30
+    same_state(cp, ref, (0, 4, 5, 9, 10))
+    assert cp.cpu.regs['pr'] == ref.cpu.regs['pr']
+    assert jit.stats()['fallback_count'] == 0
+    assert RAM + 0x20 in jit.jit_cache  # leaf ends in RTS
+
+
+def test_delay_slot_sees_branch_state():
+    """Target/T are sampled before the slot; PR is set before it."""
+    # bt.s with `clrt` in the slot: still taken
+    cp = make_cp("""
+        sett
+        bt.s taken
+        clrt
+        mov #1, r1
+    taken:
+        mov #2, r2              ! 0x08
+    """)
+    assert jit_block(cp, RAM) == RAM + 0x08
+    assert cp.cpu.regs['sr'] & 1 == 0
+    # jmp @r3 with `mov #0, r3` in the slot jumps to the old r3
+    cp = make_cp("""
+        jmp @r3
+        mov #0, r3
+    """)
+    cp.cpu.regs[3] = RAM + 0x100
+    assert jit_block(cp, RAM) == RAM + 0x100
+    assert cp.cpu.regs[3] == 0
+    # bsrf r2 with `sts pr, r1` in the slot sees the new PR
+    cp = make_cp("""
+        bsrf r2
+        sts pr, r1
+    """)
+    cp.cpu.regs[2] = 0x40
+    assert jit_block(cp, RAM) == RAM + 0x44
+    assert cp.cpu.regs[1] == RAM + 4
+    # braf r2 with a slot that clobbers r2
+    cp = make_cp("""
+        braf r2
+        mov #0, r2
+    """)
+    cp.cpu.regs[2] = 0x10
+    assert jit_block(cp, RAM) == RAM + 0x14
+
+
+def test_rte_restores_sr_before_slot():
+    """RTE: SR = SSR before the slot runs, PC = SPC afterwards."""
+    cp = make_cp("""
+        rte
+        movt r1
+    """)
+    cp.cpu.spc = RAM + 0x200
+    cp.cpu.ssr = 0x40000001
+    cp.cpu.regs['sr'] = 0x700000F0
+    assert jit_block(cp, RAM) == RAM + 0x200
+    assert cp.cpu.regs['sr'] == 0x40000001
+    assert cp.cpu.regs[1] == 1
+
+
+def test_blocks_are_chained_and_unlinked():
+    """Static exits link straight to the successor's compiled block."""
+    cp = make_cp(CALLS_PROGRAM)
+    run_from(cp, RAM, steps=100000)
+    jit = cp.cpu._jit
+    assert jit.stats()['chained'] > 0
+    # `dt r10 ; bf outer` links to the (hot) outer-loop block.
+    links, targets = jit.jit_cache[RAM + 0x18].jit_links
+    assert sorted(targets) == [RAM + 0x04, RAM + 0x1C]
+    slot = targets.index(RAM + 0x04)
+    assert links[slot] is jit.jit_cache[RAM + 0x04]
+
+    # Rewriting the successor evicts it and unlinks the predecessor.
+    cp.cpu.mem.write16(RAM + 0x06, op('mov r9, r4'))
+    assert RAM + 0x04 not in jit.jit_cache
+    assert links[slot] is None
+
+    ref = make_cp(CALLS_PROGRAM)
+    run_interp(ref, RAM)
+    run_from(cp, RAM, steps=100000)
+    assert cp.cpu.regs[9] == ref.cpu.regs[9]
+
+
+def test_recompiled_successor_is_relinked():
+    """A successor on another page is linked again once it is compiled
+    again; an evicted predecessor's links stay undone."""
+    cp = make_cp("""
+        mov #1, r1
+        bra 0x8C000800
+        nop
+    """)
+    far = RAM + 0x800
+    cp.ram.write_bin(0x800, asm("""
+        add #1, r2
+    spin:
+        bra spin
+        nop
+    """, far))
+    for _ in range(8):
+        run_from(cp, RAM, steps=3)
+    jit = cp.cpu._jit
+    links, targets = jit.jit_cache[RAM].jit_links
+    assert targets == [far] and links[0] is jit.jit_cache[far]
+
+    # Only the successor's page is written: the predecessor stays
+    old = links[0]
+    cp.cpu.mem.write16(far, op('add #1, r2'))
+    assert far not in jit.jit_cache and RAM in jit.jit_cache
+    assert links[0] is None
+    for _ in range(8):
+        run_from(cp, RAM, steps=3)
+    assert jit.jit_cache[RAM].jit_links[0] is links
+    assert links[0] is jit.jit_cache[far] and links[0] is not old
+
+    # Once the predecessor is gone, compiling the successor again
+    # doesn't touch its links
+    cp.cpu.mem.write16(RAM, op('mov #1, r1'))
+    cp.cpu.mem.write16(far, op('add #1, r2'))
+    for _ in range(8):
+        run_from(cp, far, steps=1)
+    assert far in jit.jit_cache and RAM not in jit.jit_cache
+    assert links[0] is not jit.jit_cache[far]
+
+
+def test_indirect_and_self_exits_are_not_linked():
+    """RTS/JSR exits and a block branching to itself go back through
+    the dispatcher."""
+    cp = make_cp(CALLS_PROGRAM)
+    run_from(cp, RAM, steps=100000)
+    jit = cp.cpu._jit
+    assert jit.jit_cache[RAM + 0x20].jit_links[1] == []   # leaf: rts
+    assert jit.jit_cache[RAM + 0x12].jit_links[1] == []   # jsr @r1
+    assert RAM + 0x30 in jit.jit_cache
+    assert jit.jit_cache[RAM + 0x30].jit_links[1] == []   # done: bra done
+    # The inner loop's BF/S back to itself is unlinked, its exit isn't
+    assert jit.jit_cache[RAM + 0x0A].jit_links[1] == [RAM + 0x12]
+
+
+def test_multi_block_loop_is_one_region():
+    """A loop body spanning blocks runs inside one compiled function."""
+    ref = make_cp(BRANCHY_LOOP)
+    run_interp(ref, RAM)
+    cp = make_cp(BRANCHY_LOOP)
+    run_from(cp, RAM, steps=100000)
+    jit = cp.cpu._jit
+    assert cp.cpu.regs[9] == ref.cpu.regs[9] == 500
+    assert cp.cpu.pc == RAM + 0x14
+    assert jit.stats()['regions'] == 1
+    # Once compiled, the whole remaining loop is a single dispatch.
+    fn = jit.jit_cache[RAM + 0x04]
+    assert fn.jit_links[1] == [RAM + 0x14, RAM + 0x14]
+    assert RAM + 0x0A not in jit.jit_cache and RAM + 0x0E not in jit.jit_cache
+
+    # Writing over a member block evicts the region at its head.
+    cp.cpu.mem.write16(RAM + 0x0C, op('add #6, r9'))
+    assert RAM + 0x04 not in jit.jit_cache
+    ref.ram.write16(0x0C, op('add #6, r9'))
+    for c in (cp, ref):
+        c.cpu.regs[9] = 0
+    run_interp(ref, RAM)
+    run_from(cp, RAM, steps=100000)
+    assert cp.cpu.regs[9] == ref.cpu.regs[9] == 550
+
+
+def test_region_leaves_by_either_exit():
+    """A region with exits from two of its blocks leaves by the right one."""
+    for limit, found in ((40, 200), (200, 30)):
+        ref = make_cp(BRA_LOOP)
+        cp = make_cp(BRA_LOOP)
+        for c in (cp, ref):
+            c.cpu.regs[3] = found
+            c.cpu.regs[4] = limit
+        run_interp(ref, RAM)
+        run_from(cp, RAM, steps=100000)
+        jit = cp.cpu._jit
+        assert cp.cpu.pc == RAM + (0x12 if limit < found else 0x16)
+        same_state(cp, ref)
+        # The first block also runs the setup: the region starts at 0x0C
+        assert jit.stats()['regions'] == 1
+        assert RAM + 0x04 not in jit.jit_cache
+        assert sorted(jit.jit_cache[RAM + 0x0C].jit_links[1]) == [RAM + 0x12, RAM + 0x16]
+
+
+def test_region_matches_the_interpreter_in_any_batch():
+    """Every way through the regions, stopped anywhere, gives step()'s state."""
+    for program in (BRANCHY_LOOP, BRA_LOOP):
+        ref = make_cp(program)
+        cp = make_cp(program)
+        for c in (cp, ref):
+            c.cpu.regs[3] = 90
+            c.cpu.regs[4] = 100
+            c.cpu.pc = RAM
+        for budget in [1, 2, 3, 5, 7, 11] * 30:
+            n = cp.cpu.run(budget)
+            for _ in range(n):
+                ref.cpu.step()
+            same_state(cp, ref)
+        assert cp.cpu._jit.stats()['regions'] >= 1
+
+
+def test_budget_stops_loops_with_exact_state():
+    """Small run() batches match single-stepping instruction for instruction."""
+    for program in (CALLS_PROGRAM, BRANCHY_LOOP):
+        ref = make_cp(program)
+        ref.cpu.pc = RAM
+        cp = make_cp(program)
+        cp.cpu.pc = RAM
+        total = 0
+        for budget in [37, 5, 101, 1] * 40:
+            n = cp.cpu.run(budget)
+            assert budget <= n < budget + 16, f"ran {n} for a budget of {budget}"
+            for _ in range(n):
+                ref.cpu.step()
+            total += n
+            assert cp.cpu.pc == ref.cpu.pc, f"after {total}: pc {cp.cpu.pc:#x} != {ref.cpu.pc:#x}"
+            for i in range(16):
+                assert cp.cpu.regs[i] == ref.cpu.regs[i], f"after {total}: r{i}"
+            assert cp.cpu.regs['sr'] == ref.cpu.regs['sr']
+        assert cp.cpu._jit.stats()['jit_compiled'] > 0
+
+
+class _RegisterSnooper:
+    """MMIO peripheral that records the CPU's architectural state on writes."""
+
+    def __init__(self, cpu):
+        self.cpu = cpu
+        self.seen = []
+
+    def write16(self, addr, val):
+        self.seen.append((val, self.cpu.regs[1], self.cpu.regs['sr'] & 1))
+
+    def read16(self, addr):
+        return 0
+
+
+def test_fast_path_stores_invalidate_code():
+    """Guest stores inlined into JIT code still evict the blocks they hit."""
+    cp = make_cp("""
+        mov.w r4, @r1
+    spin:
+        bra spin
+        nop
+    """)
+    # The block the store overwrites
+    cp.ram.write_bin(0x20, asm("""
+        mov #7, r0
+    spin:
+        bra spin
+        nop
+    """, RAM + 0x20))
+    for _ in range(8):
+        run_from(cp, RAM + 0x20)
+    jit = cp.cpu._jit
+    assert RAM + 0x20 in jit.jit_cache and cp.cpu.regs[0] == 7
+
+    cp.cpu.regs[1] = RAM_P2 + 0x20
+    cp.cpu.regs[4] = op('mov #9, r0')
+    assert jit_block(cp, RAM) == RAM + 0x02
+    assert RAM + 0x20 not in jit.jit_cache
+    run_from(cp, RAM + 0x20)
+    assert cp.cpu.regs[0] == 9
+
+    # ILRAM is a fast window too
+    cp.cpu.regs[1] = 0xE5200010
+    cp.cpu.regs[4] = 0xBEEF
+    jit_block(cp, RAM)
+    assert cp.cpu.mem.read16(0xE5200010) == 0xBEEF
+
+
+def test_every_emulator_op_has_a_generator():
+    """No op_id the interpreter implements forces a BlockRunner fallback."""
+    from ruk.jcore.jit import CODE_GENS, DELAYED_GENS
+    cp = make_cp('')
+    missing = sorted(op_id for op_id in cp.cpu.emulator._resolve_table
+                     if op_id not in CODE_GENS and op_id not in DELAYED_GENS)
+    assert not missing, f"no JIT generator for op_ids {missing}"
+
+
+def test_alu_and_system_ops_match_interpreter():
+    """MUL/DIV/MAC, displacement, GBR and LDS/STS code gives interpreter results."""
+    data = bytes((i * 37 + 11) & 0xFF for i in range(0x400))
+    cps = []
+    for _ in range(2):
+        c = make_cp(ALU_LOOP)
+        c.ram.write_bin(0x1000, data)
+        c.cpu.regs[13] = RAM + 0x1000
+        c.cpu.regs['gbr'] = RAM + 0x1080
+        c.cpu.regs[8] = RAM + 0x1100
+        c.cpu.regs[9] = RAM + 0x1180
+        c.cpu.regs[15] = RAM + 0x1400
+        cps.append(c)
+    ref, cp = cps
+    run_interp(ref, RAM)
+    run_from(cp, RAM, steps=100000)
+    assert cp.cpu.pc == RAM + 0x4A
+    same_state(cp, ref)
+    for name in ('mach', 'macl', 'pr', 'gbr'):
+        assert cp.cpu.regs[name] == ref.cpu.regs[name], name
+    assert cp.ram._mem[0x1000:0x1400] == ref.ram._mem[0x1000:0x1400]
+    cov = cp.cpu._jit.coverage()
+    assert cov['fallback_runs'] == 0 and cov['ratio'] == 1.0, cov
+    assert RAM + 0x02 in cp.cpu._jit.jit_cache
+
+
+def test_rom_mapped_from_file():
+    """A ROM mapped from its file runs compiled and is shared by both mirrors."""
+    import tempfile
+    program = asm("""
+        mov.l value, r1
+        add #1, r2
+    spin:
+        bra spin
+        nop
+    value:
+        .long 0x12345678
+    """, 0x80000000)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'rom.bin')
+        with open(path, 'wb') as f:
+            f.write(program)
+        cp = Classpad(path, debug=False, start_pc=0x80000000, ram_size=0x10000)
+        run_from(cp, 0x80000000, steps=100)
+        assert cp.cpu.regs[1] == 0x12345678 and cp.cpu.regs[2] == 1
+        assert cp.cpu.pc == 0x80000004
+        assert 0x80000004 in cp.cpu._jit.jit_cache
+        assert cp.cpu.mem.resolve(0xA0000000)[0] is cp.cpu.mem.resolve(0x80000000)[0]
+        assert cp.cpu.mem.read32(0xA0000008) == 0x12345678
+        del cp
+
+
+def test_locals_written_back_before_mmio():
+    """A peripheral sees registers/T as of the access, the CPU after exit."""
+    cp = make_cp("""
+        mov #5, r1
+        sett
+        mov.w r1, @r2
+        mov #7, r1
+        clrt
+        mov.w r1, @r2
+        add #1, r1
+        movt r0
+    spin:
+        bra spin                ! 0x10
+        nop
+    """)
+    snoop = _RegisterSnooper(cp.cpu)
+    cp.cpu.mem.add(0xA4F00000, MMIODevice(0xA4F00000, 0x10, snoop), name="SNOOP")
+    cp.cpu.regs[2] = 0xA4F00000
+    assert jit_block(cp, RAM) == RAM + 0x10
+    assert snoop.seen == [(5, 5, 1), (7, 7, 0)]
+    assert cp.cpu.regs[1] == 8
+    assert cp.cpu.regs[0] == 0
+    assert cp.cpu.regs['sr'] & 1 == 0
+
+    # A fast-path (RAM) store doesn't write r1 back, so the MMIO store
+    # after it still must.
+    cp.ram.write_bin(0x40, asm("""
+        mov #9, r1
+        mov.l r1, @r3
+        mov.w r1, @r2
+    spin:
+        bra spin
+        nop
+    """, RAM + 0x40))
+    cp.cpu.regs[3] = RAM + 0x100
+    assert jit_block(cp, RAM + 0x40) == RAM + 0x46
+    assert snoop.seen[-1] == (9, 9, 0)
+    assert cp.ram.read32(0x100) == 9
+
+
+def test_locals_written_back_on_every_exit():
+    """Registers and T kept in locals reach the CPU whichever way the
+    block leaves: either side of a branch, an indirect jump, the end of
+    the budget in a loop."""
+    # Conditional exit, taken and not
+    branch = """
+        mov #5, r1
+        add r1, r2
+        cmp/eq r1, r3
+        bt taken
+        mov #1, r4              ! 0x08
+    taken:
+        mov #2, r4              ! 0x0A
+    """
+    for r3, pc in ((5, 0x0A), (6, 0x08)):
+        cp = make_cp(branch)
+        cp.cpu.regs[2] = 10
+        cp.cpu.regs[3] = r3
+        assert jit_block(cp, RAM) == RAM + pc
+        assert (cp.cpu.regs[1], cp.cpu.regs[2]) == (5, 15)
+        assert cp.cpu.regs['sr'] & 1 == (r3 == 5)
+
+    # Indirect exit, with the slot writing a register and T
+    cp = make_cp("""
+        mov #5, r1
+        add r1, r2
+        jmp @r3
+        cmp/eq r1, r2
+    """)
+    cp.cpu.regs[3] = RAM + 0x100
+    assert jit_block(cp, RAM) == RAM + 0x100
+    assert (cp.cpu.regs[1], cp.cpu.regs[2]) == (5, 5)
+    assert cp.cpu.regs['sr'] & 1 == 1
+
+    # A self-loop stopped by its budget, against single-stepping
+    loop = """
+        mov #50, r2
+    loop:
+        add #3, r1              ! 0x02
+        dt r2
+        bf loop
+    done:
+        bra done
+        nop
+    """
+    for budget in (1, 4, 30):
+        ref = make_cp(loop)
+        cp = make_cp(loop)
+        for c in (cp, ref):
+            c.cpu.pc = RAM
+            c.cpu.step()
+        fn = JITCompiler(cp.cpu)._jit_compile(RAM + 0x02)
+        k = fn(cp.cpu, budget)[1]
+        assert budget <= k < budget + 3
+        for _ in range(k):
+            ref.cpu.step()
+        same_state(cp, ref)
+
+
+def test_every_generator_can_be_allocated():
+    """Every generator's code reaches registers only in forms the
+    register allocator understands."""
+    from ruk.jcore.jit import CODE_GENS, DELAYED_GENS, _allocate_registers
+    cp = make_cp('')
+    first = {}
+    for op_val, entry in enumerate(cp.cpu.emulator._decode):
+        if entry is not None:
+            first.setdefault(entry[0], op_val)
+    head = ["def _jit_fn(cpu, _budget):", "    r = cpu.regs._r",
+            "    sr = cpu.regs._sys", "    mem = cpu.mem"]
+    for op_id, op_val in first.items():
+        if op_id in DELAYED_GENS:
+            lines = DELAYED_GENS[op_id](op_val, RAM, -1, ["r[1] = r[2]"])[0]
+        else:
+            lines = CODE_GENS[op_id](op_val, RAM, -1)[0]
+        _allocate_registers(head + [f"    {line}" for line in lines])
+
+
+def test_allocation_follows_every_register_write():
+    """Writes in any form are written back; access it can't follow is refused."""
+    from ruk.jcore.jit import _allocate_registers
+    head = ["def _jit_fn(cpu, _budget):", "    r = cpu.regs._r",
+            "    sr = cpu.regs._sys", "    mem = cpu.mem"]
+    cp = make_cp('')
+    lines = _allocate_registers(head + [
+        "    r[1], r[2] = r[2], r[1]",
+        "    mem.write32(r[4], r[1])",
+        "    r[3] += r[1]",
+        "    sr['sr'] = (sr['sr'] & ~1) | (r[3] > 5)",
+        "    return",
+    ])
+    namespace = {}
+    exec('\n'.join(lines), namespace)
+    for n, val in ((1, 1), (2, 2), (3, 3), (4, RAM + 0x100)):
+        cp.cpu.regs[n] = val
+    snapshots = []
+    cp.cpu.mem.write32 = lambda addr, val: snapshots.append(tuple(cp.cpu.regs._r[1:3]))
+    namespace['_jit_fn'](cp.cpu, 1)
+    assert snapshots == [(2, 1)]
+    assert [cp.cpu.regs[n] for n in (1, 2, 3)] == [2, 1, 5]
+    assert cp.cpu.regs['sr'] & 1 == 0
+
+    for line in ("    helper(r)", "    r[r[0] & 15] = 0", "    cpu.regs[1] = 0",
+                 "    sr[name] = 0", "    helper(sr)"):
+        try:
+            _allocate_registers(head + [line])
+        except ValueError:
+            continue
+        raise AssertionError(f"allocated {line.strip()!r}")
+
+
+def test_watchpoints_stop_after_the_access():
+    """A hit stops run() right after the accessing instruction, like step()."""
+    cp = make_cp(WATCHED_LOOP)
+    ref = make_cp(WATCHED_LOOP)
+    wp = cp.cpu.mem.add_watchpoint(RAM + 0x400, 4, 'w', value=7)
+    ref.cpu.mem.add_watchpoint(RAM + 0x400, 4, 'w', value=7)
+    n = run_from(cp, RAM, 10000)
+    ref.cpu.pc = RAM
+    steps = 0
+    while ref.cpu.watch_hit is None:
+        ref.cpu.step()
+        steps += 1
+    hit = cp.cpu.watch_hit
+    assert n == steps and cp.cpu.pc == ref.cpu.pc == RAM + 0x0A
+    assert (hit.pc, hit.address, hit.value) == (RAM + 0x08, RAM_P2 + 0x400, 7)
+    assert cp.cpu.regs[1] == 7 and cp.cpu.regs[3] == ref.cpu.regs[3]
+    assert RAM + 0x06 in cp.cpu._jit.jit_cache, "the loop was not compiled"
+
+    # Without watchpoints the loop runs to the end at full speed
+    cp.cpu.mem.remove_watchpoint(wp)
+    assert not cp.cpu._jit.jit_cache
+    cp.cpu.run(10000)
+    assert cp.cpu.watch_hit is None
+    assert cp.ram.read32(0x400) == 50 and cp.cpu.pc == RAM + 0x0E
+
+
+def test_access_stats_count_compiled_code():
+    """Enabling access stats takes RAM off the inline path until disabled."""
+    cp = make_cp(WATCHED_LOOP)
+    run_from(cp, RAM, 10000)
+    assert cp.cpu._jit.jit_cache
+    stats = cp.cpu.mem.enable_access_stats()
+    assert not cp.cpu._jit.jit_cache
+    run_from(cp, RAM, 10000)
+    assert cp.ram.read32(0x400) == 50
+    pages = {(row['address'], row['region']): row for row in stats.pages()}
+    p2 = [row for (address, _), row in pages.items() if address == RAM_P2]
+    assert len(p2) == 1 and p2[0]['write32'] == 50, stats.pages()
+    p1 = [row for (address, _), row in pages.items() if address == RAM]
+    assert p1[0]['read32'] == 1 and p1[0]['fetch'] > 0
+    assert RAM + 0x06 in cp.cpu._jit.jit_cache, "the loop was not compiled"
+
+    cp.cpu.mem.disable_access_stats()
+    assert not cp.cpu._jit.jit_cache
+    before = stats.regions()
+    run_from(cp, RAM, 10000)
+    assert stats.regions() == before
+
+
+# ---------------------------------------------------------------------------
+# Main
+# ---------------------------------------------------------------------------
+
+def main():
+    tests = [
+        test_code_write_invalidates_block,
+        test_data_write_is_free,
+        test_delayed_branches_match_interpreter,
+        test_delay_slot_sees_branch_state,
+        test_rte_restores_sr_before_slot,
+        test_blocks_are_chained_and_unlinked,
+        test_recompiled_successor_is_relinked,
+        test_indirect_and_self_exits_are_not_linked,
+        test_multi_block_loop_is_one_region,
+        test_region_leaves_by_either_exit,
+        test_region_matches_the_interpreter_in_any_batch,
+        test_budget_stops_loops_with_exact_state,
+        test_fast_path_stores_invalidate_code,
+        test_locals_written_back_before_mmio,
+        test_locals_written_back_on_every_exit,
+        test_every_generator_can_be_allocated,
+        test_allocation_follows_every_register_write,
+        test_every_emulator_op_has_a_generator,
+        test_alu_and_system_ops_match_interpreter,
+        test_rom_mapped_from_file,
+        test_watchpoints_stop_after_the_access,
+        test_access_stats_count_compiled_code,
+    ]
+    passed = 0
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+            print(f"  PASS: {test.__name__}")
+        except (AssertionError, Exception) as e:
+            failed += 1
+            print(f"  FAIL: {test.__name__}: {e}")
+    print(f"\n{'='*60}")
+    print(f"Results: {passed} passed, {failed} failed")
+    return 0 if failed == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -9,11 +9,13 @@ Tests the Casio SH7305 RTC peripheral:
   4. Verify RCR1.CF (carry flag) is set on rollover
   5. Verify periodic interrupt fires at the configured rate
   6. Verify alarm interrupt fires when the alarm matches
+  7. Skip years in one tick call (calendar arithmetic)
 
 Run with:
     python3 test_rtc.py
 """
 
+import datetime
 import sys
 import os
 
@@ -195,8 +197,8 @@ def test_periodic_interrupt():
     # Tick 128 times (1 second) -- should fire 1 periodic IRQ
     rtc.tick_128hz(128)
     # Check INTC queue
-    assert not cp.intc._queue.empty(), "Periodic IRQ should have been queued"
-    intevt = cp.intc._queue.get_nowait()
+    assert cp.intc.pending, "Periodic IRQ should have been queued"
+    intevt, = cp.intc.sources()
     assert intevt == RTC_INTEVT_PRI, f"Expected INTEVT=0x{RTC_INTEVT_PRI:X}, got 0x{intevt:X}"
     assert rtc.rcr2 & RCR2_PEF, "PEF should be set after periodic IRQ"
     print(f"  PASS: 128 ticks at PES=6 (1 Hz) -> 1 periodic IRQ (INTEVT=0x{intevt:X})")
@@ -204,7 +206,7 @@ def test_periodic_interrupt():
     # Tick 128 more times -- another IRQ
     cp.intc.clear()
     rtc.tick_128hz(128)
-    assert not cp.intc._queue.empty(), "Second periodic IRQ should fire"
+    assert cp.intc.pending, "Second periodic IRQ should fire"
     print(f"  PASS: Another 128 ticks -> 2nd periodic IRQ")
 
 
@@ -220,8 +222,8 @@ def test_carry_interrupt():
     cp.intc.clear()
     # Tick 128 times -- should fire carry IRQ
     rtc.tick_128hz(128)
-    assert not cp.intc._queue.empty(), "Carry IRQ should have been queued"
-    intevt = cp.intc._queue.get_nowait()
+    assert cp.intc.pending, "Carry IRQ should have been queued"
+    intevt, = cp.intc.sources()
     assert intevt == RTC_INTEVT_CARRY, f"Expected INTEVT=0x{RTC_INTEVT_CARRY:X}, got 0x{intevt:X}"
     print(f"  PASS: 128 ticks with CIE=1 -> carry IRQ (INTEVT=0x{intevt:X})")
 
@@ -252,13 +254,51 @@ def test_alarm_interrupt():
     # Tick 2 seconds (256 ticks)
     rtc.tick_128hz(256)
     # The alarm should have fired when seconds hit 02
-    assert not cp.intc._queue.empty(), "Alarm IRQ should have been queued"
-    intevt = cp.intc._queue.get_nowait()
+    assert cp.intc.pending, "Alarm IRQ should have been queued"
+    intevt, = cp.intc.sources()
     assert intevt == RTC_INTEVT_ALARM, f"Expected INTEVT=0x{RTC_INTEVT_ALARM:X}, got 0x{intevt:X}"
     assert rtc.rcr1 & RCR1_AF, "AF should be set after alarm"
     print(f"  PASS: alarm at 00:00:02, time reached -> alarm IRQ (INTEVT=0x{intevt:X})")
 
 
+def test_long_skip():
+    """Test that a multi-year skip lands on the right date, in one call."""
+    print("\n[test] Long skip")
+    cp = Classpad(b'\x00\x09', debug=False, with_tmu=True, with_rtc=True)
+    rtc = cp.rtc
+    # 2023-02-28 12:34:56 + 40 ticks, Tuesday (week_day=2)
+    rtc.set_time(56, 34, 12, 2, 28, 2, 2023)
+    rtc.tick_128hz(40)
+    rtc.rcr2 = RCR2_START
+    # Alarm at xx:x3:x2 on day 9 (units only: see test_alarm_interrupt)
+    rtc.rsecar = 0x21
+    rtc.rminar = 0x31
+    rtc.rdayar = 0x91
+    rtc.rcr1 = RCR1_AIE
+    cp.intc.clear()
+    # Count the per-second / per-day steps: a valid time is advanced
+    # arithmetically, without any
+    stepped = []
+    for name in ('_next_second', '_increment_day'):
+        def counted(step=getattr(rtc, name), name=name):
+            stepped.append(name)
+            step()
+        setattr(rtc, name, counted)
+    skip = 3 * 365 * 86400 + 12345
+    rtc.tick_128hz(skip * 128 + 100)
+    want = datetime.datetime(2023, 2, 28, 12, 34, 56) + datetime.timedelta(seconds=skip + 1)
+    t = rtc.get_time()
+    got = datetime.datetime(t['year'], t['month'], t['month_day'],
+                            t['hours'], t['minutes'], t['seconds'])
+    assert got == want, f"Expected {want}, got {got}"
+    assert t['ticks'] == 12, f"R64CNT should be 12, got {t['ticks']}"
+    assert t['week_day'] == (want.weekday() + 1) % 7, f"Wrong weekday {t['week_day']}"
+    assert rtc.rcr1 & RCR1_AF, "AF should be set: the alarm time was passed"
+    assert cp.intc.sources() == [RTC_INTEVT_ALARM], "The alarm IRQ should be raised once"
+    assert not stepped, f"Skip stepped {len(stepped)} times"
+    print(f"  PASS: +{skip}s -> {got} in one step")
+
+
 def test_mmio_read_write():
     """Test that we can read/write RTC registers via the memory map."""
     print("\n[test] MMIO read/write")
@@ -291,6 +331,7 @@ def main():
         test_periodic_interrupt,
         test_carry_interrupt,
         test_alarm_interrupt,
+        test_long_skip,
         test_mmio_read_write,
     ]
     passed = 0
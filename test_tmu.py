@@ -93,6 +93,8 @@ def RTS():           return b'\x00\x0B'
 def JMP_RN(n):       return struct.pack('>H', 0x4020 | (n << 8) | 0x2B)  # JMP @Rn
 def JSR_RN(n):       return struct.pack('>H', 0x4000 | (n << 8) | 0x0B)  # JSR @Rn
 def SLEEP():         return b'\x00\x1B'
+def LDC_SPC(m):      return struct.pack('>H', 0x404E | (m << 8))  # LDC Rm, SPC
+def RTE():           return b'\x00\x2B'
 def MOVWL_G(d, r0):  return struct.pack('>H', 0x8500 | ((d & 0xFF)))  # MOV.W @(disp,GBR), R0 -- not used here
 def MOVWS0(m, n):    return struct.pack('>H', 0x8000 | (n << 8) | (m << 4) | 0x01)  # MOV.W Rm, @(R0,Rn)
 
@@ -291,11 +293,10 @@ def build_program():
     #      so we need to write TCR0 with UNF=0 and the other bits preserved).
     #      For simplicity, we just write TCR0 = 0x0100 (UNIE only, UNF=0),
     #      which clears UNF and keeps UNIE set.
-    #   3. Return to the main loop (JMP @PR or just JMP back to a known addr).
-    #      We don't have RTE in RuK, so we'll just JMP to the main loop.
-    #      But we don't know the main loop address at handler-compile time,
-    #      so we'll set PR from Python before the IRQ fires, or use a fixed
-    #      return address that the handler loads from a constant.
+    #   3. Return to the main loop with RTE, which also restores SR.BL=0
+    #      so the next interrupt can be taken.  We don't know the main
+    #      loop address at handler-compile time, so the handler loads a
+    #      fixed return address from a constant into SPC first.
     #
     # Simpler approach: the handler just increments the counter, clears UNF,
     # and returns to a fixed "main loop" address that we hardcode as
@@ -313,7 +314,7 @@ def build_program():
 
     # Clear TCR0.UNF but keep UNIE=1: write 0x0080.
     # MOV.L @(disp,PC), R6   -- TCR0 addr
-    handler += MOV_LL(0, 6)             # load TCR0 addr
+    handler += MOV_LL(2, 6)             # load TCR0 addr (pool entry 2)
     # Build 0x0080 in R0: MOV #1, R0; SHLL2 x3; SHLL
     handler += MOV_IMM(1, 0)
     handler += struct.pack('>H', 0x4008 | (0 << 8))    # SHLL2 R0 -> 4
@@ -329,8 +330,9 @@ def build_program():
     # Actually, let's just hardcode the return address in the pool.
     # MOV.L @(disp,PC), R3   -- return addr (= CODE_ADDR + loop_offset)
     handler += MOV_LL(1, 3)
-    # JMP @R3
-    handler += JMP_RN(3)
+    # LDC R3, SPC; RTE
+    handler += LDC_SPC(3)
+    handler += RTE()
     handler += NOP()                    # delay slot
 
     # Pool for the handler
@@ -359,17 +361,26 @@ def build_program():
     # 9: SHLL R0              @ offset 18
     # 10: MOV.W R0, @R6       @ offset 20
     # 11: MOV_LL(1, 3)        @ offset 22  <- entry 1 pool
-    # 12: JMP @R3             @ offset 24
-    # 13: NOP                 @ offset 26
+    # 12: LDC R3, SPC         @ offset 24
+    # 13: RTE                 @ offset 26
+    # 14: NOP                 @ offset 28
     pc = IRQ_HANDLER + 22
     eff_base = (pc + 4) & ~3
     target = IRQ_HANDLER + handler_pool_start + 4  # entry 1
     disp = (target - eff_base) // 4
     handler = handler[:22+1] + bytes([disp]) + handler[22+2:]
 
+    # Entry 2 (TCR0 addr): MOV.L at handler offset 8
+    pc = IRQ_HANDLER + 8
+    eff_base = (pc + 4) & ~3
+    target = IRQ_HANDLER + handler_pool_start + 8
+    disp = (target - eff_base) // 4
+    handler = handler[:8+1] + bytes([disp]) + handler[8+2:]
+
     # Append pool
     handler += struct.pack('>I', IRQ_COUNTER)
     handler += struct.pack('>I', CODE_ADDR + loop_offset)
+    handler += struct.pack('>I', TMU_CHAN_BASE + 0 * TMU_CHAN_STRIDE + 0x08)
 
     chunks[IRQ_HANDLER] = handler
 
@@ -418,6 +429,8 @@ def main():
     cp.cpu.regs['pr'] = CODE_ADDR + loop_offset
     # Set SR.BL=0, SR.MD=1 (privileged, interrupts allowed)
     cp.cpu.regs['sr'] = 0x40000000  # MD=1, BL=0, IF=0, RB=0
+    # IPRA: TMU0 at priority 1 (above IF=0); the INTC drops sources at 0
+    cp.mem.write16(0xA4080000, 0x1000)
 
     # Write all chunks to RAM
     for addr, data in chunks.items():
@@ -497,9 +510,9 @@ def main():
     cp.tick_tmu(rtc_cycles=5)
     print(f"  ETMU0 after tick: TCR=0x{etmu0.tcr:02X} (UNF={int(bool(etmu0.tcr & 0x02))}, UNIE={int(bool(etmu0.tcr & 0x01))})")
     print(f"  TCNT=0x{etmu0.tcnt:08X} (should be reloaded to ~5)")
-    print(f"  IRQ pending in INTC: {not cp.intc._queue.empty()}")
+    print(f"  IRQ pending in INTC: {bool(cp.intc.pending)}")
 
-    etmu_pass = (etmu0.tcr & 0x02) != 0 and (not cp.intc._queue.empty())
+    etmu_pass = (etmu0.tcr & 0x02) != 0 and bool(cp.intc.pending)
     if etmu_pass:
         print("  PASS: ETMU0 underflowed and queued an IRQ.")
     else: